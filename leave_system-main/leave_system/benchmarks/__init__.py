@@ -0,0 +1,78 @@
+"""
+性能基准脚本
+
+每个模块都可以独立运行（在 leave_system 目录下）：
+    python -m benchmarks.read_models --rows 5000
+
+脚本在临时测试数据库中生成数据，不会修改 db.sqlite3
+"""
+
+import os
+import sys
+import time
+
+
+def setup_django(with_database=True, test_db_name=None):
+    """
+    初始化 Django 并创建临时测试数据库
+
+    Args:
+        with_database (bool): 是否创建测试数据库，纯计算的基准不需要
+        test_db_name (str, optional): 测试数据库文件路径；SQLite 默认使用内存数据库，
+                                      多进程基准需要共享的数据库文件
+
+    Returns:
+        callable: 清理函数，销毁测试数据库
+    """
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'leave_system.settings')
+
+    import django
+    django.setup()
+
+    import logging
+    from django.test.utils import setup_test_environment, setup_databases, teardown_databases
+
+    logging.disable(logging.WARNING)
+    if not with_database:
+        return lambda: None
+    if test_db_name:
+        from django.db import connections
+        connections['default'].settings_dict.setdefault('TEST', {})['NAME'] = test_db_name
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    return lambda: teardown_databases(old_config, verbosity=0)
+
+
+def measure(func, repeat=5):
+    """
+    多次执行并返回最短耗时（秒）
+
+    Args:
+        func (callable): 无参数函数
+        repeat (int): 执行次数
+
+    Returns:
+        float: 最短耗时
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def print_table(title, headers, rows):
+    """以对齐的文本表格打印结果"""
+    widths = [
+        max(len(str(headers[i])), *(len(str(row[i])) for row in rows))
+        for i in range(len(headers))
+    ]
+    print(f"\n{title}")
+    print('  '.join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    print('  '.join('-' * w for w in widths))
+    for row in rows:
+        print('  '.join(str(c).ljust(w) for c, w in zip(row, widths)))
@@ -0,0 +1,183 @@
+"""
+基准用 BPMN 流程模型生成
+
+- approval_chain_bpmn: 多级审批链（全流程负载基准使用），每个环节为
+      脚本任务（计算 assigned_to）-> 用户任务（审批）-> 排他网关
+          action == 'reject' -> 结束
+          action == 'return' -> 回到本环节的脚本任务（退回重审）
+          默认              -> 下一环节（最后一个环节之后结束）
+- workflow_shape_bpmn: 按用户任务数、分支网关数、回退数生成不同规模的流程（引擎微基准使用）
+
+说明：流程变量写入 workflow.data，脚本任务中读不到（条件表达式可以），
+因此分配脚本中的组织架构查询使用生成时确定的常量参数
+"""
+
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+BPMN_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<bpmn:definitions xmlns:bpmn="http://www.omg.org/spec/BPMN/20100524/MODEL" '
+    'id="Definitions_{process_id}" targetNamespace="http://bpmn.io/schema/bpmn">\n'
+    '  <bpmn:process id="{process_id}" name="{name}" isExecutable="true">\n'
+)
+BPMN_FOOTER = '  </bpmn:process>\n</bpmn:definitions>\n'
+
+
+class ProcessBuilder:
+    """
+    逐个添加节点和连线，最后生成 BPMN XML
+
+    排他网关的默认路径为通过 flow(..., default=True) 添加的连线
+    """
+
+    def __init__(self, process_id, name=None):
+        self.process_id = process_id
+        self.name = name or process_id
+        self.elements = ['    <bpmn:startEvent id="start" />\n', '    <bpmn:endEvent id="end" />\n']
+        self.flows = []
+        self.gateways = []
+        self.defaults = {}
+
+    def script_task(self, task_id, name, script):
+        self.elements.append(
+            f'    <bpmn:scriptTask id="{task_id}" name="{escape(name)}">'
+            f'<bpmn:script>{escape(script)}</bpmn:script></bpmn:scriptTask>\n'
+        )
+        return task_id
+
+    def user_task(self, task_id, name):
+        self.elements.append(f'    <bpmn:userTask id="{task_id}" name="{escape(name)}" />\n')
+        return task_id
+
+    def exclusive_gateway(self, gateway_id):
+        self.gateways.append(gateway_id)
+        return gateway_id
+
+    def flow(self, source, target, condition=None, default=False):
+        flow_id = f"flow_{len(self.flows) + 1}"
+        if condition is None:
+            self.flows.append(f'    <bpmn:sequenceFlow id="{flow_id}" sourceRef="{source}" targetRef="{target}" />\n')
+        else:
+            self.flows.append(
+                f'    <bpmn:sequenceFlow id="{flow_id}" sourceRef="{source}" targetRef="{target}">'
+                f'<bpmn:conditionExpression>{escape(condition)}</bpmn:conditionExpression>'
+                f'</bpmn:sequenceFlow>\n'
+            )
+        if default:
+            self.defaults[source] = flow_id
+        return flow_id
+
+    def render(self):
+        gateways = [
+            f'    <bpmn:exclusiveGateway id="{gateway}"'
+            + (f' default="{self.defaults[gateway]}"' if gateway in self.defaults else '')
+            + ' />\n'
+            for gateway in self.gateways
+        ]
+        return (
+            BPMN_HEADER.format(process_id=self.process_id, name=escape(self.name))
+            + ''.join(self.elements)
+            + ''.join(gateways)
+            + ''.join(self.flows)
+            + BPMN_FOOTER
+        )
+
+
+def approval_chain_bpmn(process_id, assignment_scripts, name=None):
+    """
+    生成审批链流程
+
+    Args:
+        process_id (str): 流程 ID（与文件名一致）
+        assignment_scripts (list): 每个审批环节的分配脚本，如
+                                   "assigned_to = get_department_manager('技术部')"
+        name (str, optional): 流程名称
+
+    Returns:
+        str: BPMN XML
+    """
+    builder = ProcessBuilder(process_id, name)
+    previous = 'start'
+    for index, script in enumerate(assignment_scripts, start=1):
+        assign = builder.script_task(f"assign_{index}", f"分配审批人{index}", script)
+        approve = builder.user_task(f"approve_{index}", f"第{index}级审批")
+        decide = builder.exclusive_gateway(f"decide_{index}")
+        builder.flow(previous, assign, default=previous != 'start')
+        builder.flow(assign, approve)
+        builder.flow(approve, decide)
+        builder.flow(decide, 'end', "action == 'reject'")
+        builder.flow(decide, assign, "action == 'return'")
+        previous = decide
+    builder.flow(previous, 'end', default=True)
+    return builder.render()
+
+
+def workflow_shape_bpmn(process_id, user_tasks, gateways=0, loop_backs=0):
+    """
+    生成指定规模的流程
+
+    主干为 user_tasks 个串联的用户任务（每个之前有一个分配脚本任务）：
+    - 前 loop_backs 个用户任务之后加回退网关：action == 'return' 时回到该任务
+    - 前 gateways 个用户任务之后加分支网关：leave_hours >= 24 时经过一个额外的用户任务，
+      两条路径在合并网关汇合
+
+    Args:
+        process_id (str): 流程 ID
+        user_tasks (int): 主干用户任务数
+        gateways (int): 分支网关数（不超过 user_tasks）
+        loop_backs (int): 回退网关数（不超过 user_tasks）
+
+    Returns:
+        str: BPMN XML
+    """
+    builder = ProcessBuilder(process_id, f"{user_tasks} 任务 / {gateways} 分支 / {loop_backs} 回退")
+    previous, previous_is_gateway = 'start', False
+
+    def connect(target):
+        builder.flow(previous, target, default=previous_is_gateway)
+
+    for index in range(1, user_tasks + 1):
+        assign = builder.script_task(f"assign_{index}", f"分配{index}", f"assigned_to = 'approver{index}@example.com'")
+        task = builder.user_task(f"task_{index}", f"审批{index}")
+        connect(assign)
+        builder.flow(assign, task)
+        previous, previous_is_gateway = task, False
+
+        if index <= loop_backs:
+            loop = builder.exclusive_gateway(f"loop_{index}")
+            connect(loop)
+            builder.flow(loop, assign, "action == 'return'")
+            previous, previous_is_gateway = loop, True
+
+        if index <= gateways:
+            split = builder.exclusive_gateway(f"split_{index}")
+            merge = builder.exclusive_gateway(f"merge_{index}")
+            extra = builder.user_task(f"extra_{index}", f"附加审批{index}")
+            connect(split)
+            builder.flow(split, extra, "leave_hours >= 24")
+            builder.flow(split, merge, default=True)
+            builder.flow(extra, merge)
+            previous, previous_is_gateway = merge, False
+
+    connect('end')
+    return builder.render()
+
+
+def write_process_model(process_dir, process_model_id, xml):
+    """
+    按 SpiffWorkflowClient 的目录约定写入流程模型
+
+    Args:
+        process_dir (Path): 流程模型根目录
+        process_model_id (str): 形如 "bench/approval_chain"
+        xml (str): BPMN XML
+
+    Returns:
+        Path: 写入的文件
+    """
+    group, name = process_model_id.split('/')
+    path = Path(process_dir) / group / name / f"{name}.bpmn"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(xml, encoding='utf-8')
+    return path
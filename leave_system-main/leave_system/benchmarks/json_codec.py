@@ -0,0 +1,139 @@
+"""
+JSON 编解码基准
+
+对比标准库实现与 orjson 实现（leave_system.renderers）在典型响应上的耗时：
+- 我的申请列表（一页 200 行）
+- 待办任务列表（任务数据 task.data 嵌套较深）
+- BPMN 流程列表（JsonResponse）
+
+用法（在 leave_system 目录下）：
+    python -m benchmarks.json_codec --tasks 50 --data-keys 200
+"""
+
+import argparse
+from datetime import timedelta
+from decimal import Decimal
+
+from benchmarks import setup_django, measure, print_table
+
+
+def build_payloads(tasks, data_keys):
+    from django.utils import timezone
+
+    now = timezone.now()
+    leave_requests = {
+        'success': True,
+        'requests': [{
+            'id': i,
+            'user_email': f'user{i}@example.com',
+            'staff_full_name': f'员工{i}',
+            'staff_dept': '技术部',
+            'reason': '家中有事需要请假处理' * 3,
+            'leave_hours': 8,
+            'leave_type': 'annual',
+            'duration': 1.0,
+            'start_date': '2026-01-01',
+            'end_date': '2026-01-02',
+            'status': 'pending',
+            'status_display': '待审批',
+            'process_instance_id': f'instance-{i}',
+            'workflow_spec_name': 'leave-approval',
+            'created_at': now - timedelta(minutes=i),
+            'submitted_at': now - timedelta(minutes=i),
+            'completed_at': None,
+        } for i in range(200)],
+        'next_cursor': None,
+        'has_more': False,
+        'page_size': 200,
+    }
+
+    task_data = {f'field_{k}': {'value': k, 'label': f'字段{k}', 'items': list(range(5))} for k in range(data_keys)}
+    pending_tasks = {
+        'success': True,
+        'tasks': [{
+            'task_id': f'task_{i}',
+            'task_name': '部门经理审批',
+            'leave_request_id': i,
+            'leave_request': leave_requests['requests'][i % 200],
+            'assignee_email': 'manager@example.com',
+            'created_at': now,
+            'duration': Decimal('1.5'),
+            'data': task_data,
+        } for i in range(tasks)],
+    }
+
+    processes = {
+        'processes': [{
+            'id': f'group/process_{i}/process_{i}',
+            'name': f'流程{i}',
+            'description': '请假审批流程',
+            'path': f'/srv/process_models/group/process_{i}/process_{i}.bpmn',
+            'modified': now.isoformat(),
+        } for i in range(300)],
+        'count': 300,
+    }
+    return leave_requests, pending_tasks, processes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON 编解码基准')
+    parser.add_argument('--tasks', type=int, default=50, help='待办任务数')
+    parser.add_argument('--data-keys', type=int, default=200, help='每个任务 task.data 的字段数')
+    parser.add_argument('--repeat', type=int, default=20, help='每个场景的执行次数（取最短）')
+    args = parser.parse_args()
+
+    teardown = setup_django(with_database=False)
+    try:
+        from django.http import JsonResponse as DjangoJsonResponse
+        from rest_framework.parsers import JSONParser
+        from rest_framework.renderers import JSONRenderer
+        from leave_system.renderers import OrjsonRenderer, OrjsonParser, JsonResponse, orjson
+        import io
+
+        if orjson is None:
+            print('orjson 未安装，两种实现相同，跳过基准')
+            return
+
+        leave_requests, pending_tasks, processes = build_payloads(args.tasks, args.data_keys)
+        stdlib_renderer, fast_renderer = JSONRenderer(), OrjsonRenderer()
+        stdlib_parser, fast_parser = JSONParser(), OrjsonParser()
+        task_body = stdlib_renderer.render(pending_tasks)
+
+        scenarios = [
+            ('我的申请列表 渲染', len(stdlib_renderer.render(leave_requests)),
+             lambda: stdlib_renderer.render(leave_requests),
+             lambda: fast_renderer.render(leave_requests)),
+            ('待办任务 渲染', len(task_body),
+             lambda: stdlib_renderer.render(pending_tasks),
+             lambda: fast_renderer.render(pending_tasks)),
+            ('待办任务 解析', len(task_body),
+             lambda: stdlib_parser.parse(io.BytesIO(task_body), parser_context={}),
+             lambda: fast_parser.parse(io.BytesIO(task_body), parser_context={})),
+            ('流程列表 JsonResponse', len(DjangoJsonResponse(processes).content),
+             lambda: DjangoJsonResponse(processes),
+             lambda: JsonResponse(processes)),
+        ]
+
+        results = []
+        for name, size, stdlib_func, fast_func in scenarios:
+            stdlib_time = measure(stdlib_func, args.repeat)
+            fast_time = measure(fast_func, args.repeat)
+            results.append((
+                name,
+                f"{size / 1024:.0f}",
+                f"{stdlib_time * 1000:.2f}",
+                f"{fast_time * 1000:.2f}",
+                f"{stdlib_time / fast_time:.1f}x",
+            ))
+
+        print_table(
+            f"JSON 编解码（待办任务 {args.tasks} 个，task.data {args.data_keys} 个字段）",
+            ('场景', '大小(KB)', '标准库(ms)', 'orjson(ms)', '加速'),
+            results
+        )
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+"""
+审批全流程负载基准
+
+在临时测试数据库中（SQLite，或 DJANGO_SETTINGS_MODULE 指向的 PostgreSQL 配置）：
+1. 生成 N 个员工、若干部门（含负责人）、HR 角色和审批规则
+2. 生成多级审批流程模型（benchmarks.bpmn_models），审批规则把所有申请路由到该流程
+3. 通过 POST /api/leave/create/ 提交 M 个请假申请
+4. 逐级通过 POST /api/leave/approve/（或 /api/approval-tasks/<id>/approve/）审批，
+   按比例穿插拒绝（/api/leave/reject/）和退回（/api/leave/return/），
+   并查询审批人待办（/api/approval-tasks/my-tasks/、/api/leave/pending-approvals/）
+5. 查询申请人列表和审批历史
+
+Celery 使用 eager 模式，事件总线使用 sync 后端，结果可复现（--seed）。
+报告每个接口的请求数、错误数、p50/p95/p99 和吞吐量；
+--save-baseline 保存为基线，之后的运行自动与基线比较，p95 退化超过 --tolerance 时以非零状态退出。
+
+用法（在 leave_system 目录下）：
+    python -m benchmarks.lifecycle --employees 200 --requests 300 --stages 3
+    python -m benchmarks.lifecycle --save-baseline
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from benchmarks import setup_django, print_table
+from benchmarks.bpmn_models import approval_chain_bpmn, write_process_model
+
+PROCESS_MODEL_ID = 'bench/approval_chain'
+BASELINE_DIR = Path(__file__).resolve().parent / 'baselines'
+
+
+def percentile(sorted_values, p):
+    """最近秩百分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class LatencyRecorder:
+    """按接口记录延迟和错误"""
+
+    def __init__(self, client):
+        self.client = client
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def call(self, endpoint, method, path, data=None):
+        start = time.perf_counter()
+        if method == 'GET':
+            response = self.client.get(path)
+        else:
+            response = self.client.post(path, data=json.dumps(data or {}), content_type='application/json')
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[endpoint] += 1
+        return response
+
+    def summary(self):
+        result = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            total = sum(values)
+            result[endpoint] = {
+                'count': len(values),
+                'errors': self.errors[endpoint],
+                'p50_ms': round(percentile(values, 50) * 1000, 3),
+                'p95_ms': round(percentile(values, 95) * 1000, 3),
+                'p99_ms': round(percentile(values, 99) * 1000, 3),
+                'mean_ms': round(total / len(values) * 1000, 3),
+                'throughput_rps': round(len(values) / total, 1) if total else 0.0,
+            }
+        return result
+
+
+def seed_organization(employees, departments):
+    """
+    生成组织架构
+
+    Returns:
+        tuple: (申请人邮箱列表, 部门名称列表)
+    """
+    from django.contrib.auth.models import User
+    from organization.models import Department, Employee, Role
+
+    users = User.objects.bulk_create([User(username=f'bench{i}') for i in range(employees)])
+    depts = Department.objects.bulk_create([Department(name=f'部门{d}') for d in range(departments)])
+    Department.rebuild_tree()
+    staff = Employee.objects.bulk_create([
+        Employee(
+            user=user,
+            employee_id=f'B{i:06d}',
+            department=depts[i % departments],
+            position='员工',
+            level=1,
+            email=f'bench{i}@example.com',
+        )
+        for i, user in enumerate(users)
+    ])
+
+    # 每个部门的第一个员工担任负责人，其余员工的直属上级为部门负责人
+    managers = {dept.id: staff[d] for d, dept in enumerate(depts)}
+    for dept in depts:
+        dept.manager = managers[dept.id]
+    Department.objects.bulk_update(depts, ['manager'])
+    for employee in staff:
+        manager = managers[employee.department_id]
+        if employee.pk != manager.pk:
+            employee.direct_manager = manager
+    Employee.objects.bulk_update(staff, ['direct_manager'])
+    Employee.rebuild_management_chain()
+
+    hr = Role.objects.create(name='HR')
+    hr.employees.add(*staff[departments:departments + 3])
+
+    applicants = [e.email for e in staff if e.direct_manager_id]
+    return applicants, [dept.name for dept in depts]
+
+
+def install_process_model(process_dir, stages, department_names):
+    """生成多级审批流程并创建指向它的审批规则"""
+    from leave_api.models import ApprovalRule
+
+    scripts = []
+    for stage in range(stages):
+        if stage % 2 == 0:
+            dept = department_names[stage % len(department_names)]
+            scripts.append(f"assigned_to = get_department_manager('{dept}')")
+        else:
+            scripts.append("assigned_to = get_role_members('HR')[0]")
+    write_process_model(process_dir, PROCESS_MODEL_ID, approval_chain_bpmn('approval_chain', scripts))
+    ApprovalRule.objects.create(
+        name='基准审批链', priority=100, is_active=True, workflow_spec_name=PROCESS_MODEL_ID
+    )
+
+
+def ready_task(leave_request_id):
+    """读取申请当前的就绪任务（不计时，相当于客户端已打开待办详情）"""
+    from leave_api.models import LeaveRequest
+    from leave_api.spiff_client_v2 import spiff_client
+
+    leave_request = LeaveRequest.objects.get(id=leave_request_id)
+    if leave_request.completed_at or not leave_request.workflow_state:
+        return None
+    tasks = spiff_client.get_user_tasks(leave_request.workflow_state, leave_request.workflow_spec_name)
+    return tasks[0] if tasks else None
+
+
+def run(args, process_dir):
+    from django.test import Client
+
+    rng = random.Random(args.seed)
+    recorder = LatencyRecorder(Client())
+    applicants, department_names = seed_organization(args.employees, args.departments)
+    install_process_model(process_dir, args.stages, department_names)
+
+    # 提交
+    started = time.perf_counter()
+    open_requests = []
+    for i in range(args.requests):
+        applicant = applicants[i % len(applicants)]
+        response = recorder.call('POST /api/leave/create/', 'POST', '/api/leave/create/', {
+            'user_email': applicant,
+            'staff_full_name': f'员工{i}',
+            'reason': '基准测试',
+            'leave_hours': rng.choice([4, 8, 16, 24, 40]),
+            'leave_type': rng.choice(['annual', 'sick', 'personal']),
+            'duration': 1,
+        })
+        if response.status_code == 201:
+            open_requests.append((response.json()['leave_request_id'], applicant))
+
+    # 逐轮审批，直到所有申请完成或达到轮数上限
+    completed = 0
+    lookup_time = 0.0
+    for _ in range(args.stages * 3):
+        if not open_requests:
+            break
+        approvers = set()
+        still_open = []
+        for leave_request_id, applicant in open_requests:
+            lookup_start = time.perf_counter()
+            task = ready_task(leave_request_id)
+            lookup_time += time.perf_counter() - lookup_start
+            if task is None:
+                completed += 1
+                continue
+            approver = task.get('assigned_to') or 'unknown@example.com'
+            approvers.add(approver)
+            body = {
+                'leave_request_id': leave_request_id,
+                'task_id': task['id'],
+                'approver_email': approver,
+                'approver_name': '审批人',
+                'comment': '基准测试',
+            }
+            roll = rng.random()
+            if roll < args.reject_ratio:
+                recorder.call('POST /api/leave/reject/', 'POST', '/api/leave/reject/', body)
+            elif roll < args.reject_ratio + args.return_ratio:
+                recorder.call('POST /api/leave/return/', 'POST', '/api/leave/return/', body)
+            elif args.approve_endpoint == 'approval-tasks':
+                recorder.call(
+                    'POST /api/approval-tasks/<id>/approve/', 'POST',
+                    f'/api/approval-tasks/task_{leave_request_id}/approve/', body
+                )
+            else:
+                recorder.call('POST /api/leave/approve/', 'POST', '/api/leave/approve/', body)
+            still_open.append((leave_request_id, applicant))
+
+        for approver in sorted(approvers):
+            recorder.call('GET /api/approval-tasks/my-tasks/', 'GET',
+                          f'/api/approval-tasks/my-tasks/?user_email={approver}')
+            recorder.call('GET /api/leave/pending-approvals/', 'GET',
+                          f'/api/leave/pending-approvals/?user_email={approver}')
+        open_requests = still_open
+    # 读取就绪任务是基准自身的开销，不计入全流程耗时
+    elapsed = time.perf_counter() - started - lookup_time
+
+    # 申请人查询
+    for applicant in applicants[:min(len(applicants), args.requests)]:
+        recorder.call('GET /api/leave/my-requests/', 'GET', f'/api/leave/my-requests/?user_email={applicant}')
+    for leave_request_id in range(1, args.requests + 1, max(1, args.requests // 50)):
+        recorder.call('GET /api/leave/requests/<id>/history/', 'GET',
+                      f'/api/leave/requests/{leave_request_id}/history/')
+
+    return {
+        'params': {
+            'employees': args.employees,
+            'departments': args.departments,
+            'requests': args.requests,
+            'stages': args.stages,
+            'reject_ratio': args.reject_ratio,
+            'return_ratio': args.return_ratio,
+            'approve_endpoint': args.approve_endpoint,
+            'seed': args.seed,
+        },
+        'lifecycle': {
+            'completed': completed,
+            'unfinished': len(open_requests),
+            'elapsed_s': round(elapsed, 3),
+            'requests_per_s': round(completed / elapsed, 2) if elapsed else 0.0,
+        },
+        'endpoints': recorder.summary(),
+    }
+
+
+def compare_with_baseline(result, baseline, tolerance):
+    """
+    与基线比较 p95
+
+    Returns:
+        list: [(接口, 基线 p95, 本次 p95, 变化, 是否退化)]
+    """
+    if baseline['params'] != result['params']:
+        print(f"\n注意：基线参数 {baseline['params']} 与本次不同，比较结果仅供参考")
+    rows = []
+    for endpoint, stats in result['endpoints'].items():
+        base = baseline['endpoints'].get(endpoint)
+        if not base or not base['p95_ms']:
+            continue
+        change = stats['p95_ms'] / base['p95_ms'] - 1
+        rows.append((endpoint, base['p95_ms'], stats['p95_ms'], change, change > tolerance))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='审批全流程负载基准')
+    parser.add_argument('--employees', type=int, default=100, help='员工数')
+    parser.add_argument('--departments', type=int, default=5, help='部门数')
+    parser.add_argument('--requests', type=int, default=200, help='提交的请假申请数')
+    parser.add_argument('--stages', type=int, default=2, help='审批级数')
+    parser.add_argument('--reject-ratio', type=float, default=0.05, help='每次审批中拒绝的比例')
+    parser.add_argument('--return-ratio', type=float, default=0.05, help='每次审批中退回的比例')
+    parser.add_argument('--approve-endpoint', choices=('leave', 'approval-tasks'), default='leave',
+                        help='批准使用的接口')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--baseline', default=str(BASELINE_DIR / 'lifecycle.json'), help='基线文件')
+    parser.add_argument('--save-baseline', action='store_true', help='把本次结果保存为基线')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='允许的 p95 退化比例')
+    args = parser.parse_args()
+
+    teardown = setup_django()
+    process_dir = tempfile.TemporaryDirectory()
+    try:
+        from django.conf import settings
+        from leave_system.celery import app as celery_app
+        from leave_api.spiff_client_v2 import spiff_client
+
+        settings.CELERY_TASK_ALWAYS_EAGER = True
+        celery_app.conf.task_always_eager = True
+        settings.EVENT_BUS = dict(settings.EVENT_BUS, BACKEND='sync')
+        settings.TRACING = dict(getattr(settings, 'TRACING', {}), EXPORTER='none')
+        settings.QUERY_PROFILER = dict(settings.QUERY_PROFILER, LOG_SAMPLE_RATE=0)
+        spiff_client.process_dir = Path(process_dir.name)
+
+        result = run(args, process_dir.name)
+    finally:
+        process_dir.cleanup()
+        teardown()
+
+    lifecycle = result['lifecycle']
+    print(
+        f"\n完成 {lifecycle['completed']} 个申请（未完成 {lifecycle['unfinished']}），"
+        f"耗时 {lifecycle['elapsed_s']} s，{lifecycle['requests_per_s']} 个/秒"
+    )
+    print_table(
+        f"接口延迟（员工 {args.employees}，申请 {args.requests}，{args.stages} 级审批）",
+        ('接口', '次数', '错误', 'p50(ms)', 'p95(ms)', 'p99(ms)', '吞吐(次/秒)'),
+        [
+            (endpoint, s['count'], s['errors'], s['p50_ms'], s['p95_ms'], s['p99_ms'], s['throughput_rps'])
+            for endpoint, s in result['endpoints'].items()
+        ]
+    )
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(result, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+        print(f"\n基线已保存: {baseline_path}")
+        return
+
+    if baseline_path.exists():
+        rows = compare_with_baseline(result, json.loads(baseline_path.read_text(encoding='utf-8')), args.tolerance)
+        print_table(
+            f"与基线比较（{baseline_path.name}，允许退化 {args.tolerance:.0%}）",
+            ('接口', '基线 p95(ms)', '本次 p95(ms)', '变化', ''),
+            [(e, b, c, f"{change:+.1%}", '退化' if bad else '') for e, b, c, change, bad in rows]
+        )
+        if any(bad for *_, bad in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
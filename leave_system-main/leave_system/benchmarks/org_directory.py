@@ -0,0 +1,158 @@
+"""
+组织架构读接口查询次数基准
+
+在临时测试数据库中生成大规模组织架构（默认 10000 名员工、三级部门树、若干角色），
+依次请求 views_api 的简化接口和 DRF ViewSet 接口，统计每个接口执行的 SQL 条数和耗时。
+
+每个接口都有固定的查询次数上限（与数据量无关）；超过上限说明出现了 N+1 查询，脚本以非零状态退出。
+请求前清空响应缓存（organization.directory_cache），统计的是重新生成响应体的代价。
+
+用法（在 leave_system 目录下）：
+    python -m benchmarks.org_directory --employees 10000
+"""
+
+import argparse
+import sys
+import time
+from contextlib import ExitStack
+
+from benchmarks import setup_django, print_table
+
+
+def create_fixtures(employees, departments, roles, members_per_role):
+    """
+    生成组织架构：部门为三级树，每个部门第一个员工担任负责人，
+    其余员工的直属上级为部门负责人，部门负责人的直属上级为上级部门负责人
+
+    Returns:
+        tuple: (角色 ID 列表, 部门负责人员工 ID)
+    """
+    from django.contrib.auth.models import User
+    from organization.models import Department, Employee, Role
+
+    roots = Department.objects.bulk_create([Department(name=f'事业部{d}') for d in range(max(1, departments // 20))])
+    middles = Department.objects.bulk_create([
+        Department(name=f'中心{d}', parent=roots[d % len(roots)]) for d in range(max(1, departments // 5))
+    ])
+    leaves = Department.objects.bulk_create([
+        Department(name=f'组{d}', parent=middles[d % len(middles)])
+        for d in range(max(1, departments - len(roots) - len(middles)))
+    ])
+    depts = roots + middles + leaves
+    Department.rebuild_tree()
+
+    users = User.objects.bulk_create([
+        User(username=f'org{i}', first_name=f'员工{i}') for i in range(employees)
+    ], batch_size=1000)
+    staff = Employee.objects.bulk_create([
+        Employee(
+            user=user,
+            employee_id=f'O{i:06d}',
+            department=depts[i % len(depts)],
+            position='员工',
+            level=1 + i % 9,
+            email=f'org{i}@example.com',
+        )
+        for i, user in enumerate(users)
+    ], batch_size=1000)
+
+    managers = {dept.id: staff[d] for d, dept in enumerate(depts)}
+    for dept in depts:
+        dept.manager = managers[dept.id]
+    Department.objects.bulk_update(depts, ['manager'])
+    for employee in staff:
+        manager = managers[employee.department_id]
+        if employee.pk != manager.pk:
+            employee.direct_manager = manager
+    for dept in depts:
+        if dept.parent_id:
+            managers[dept.id].direct_manager = managers[dept.parent_id]
+    Employee.objects.bulk_update(staff, ['direct_manager'], batch_size=1000)
+    Employee.rebuild_management_chain()
+
+    role_ids = []
+    Membership = Role.employees.through
+    for r in range(roles):
+        role = Role.objects.create(name=f'角色{r}', description=f'基准角色 {r}')
+        Membership.objects.bulk_create([
+            Membership(role_id=role.id, employee_id=staff[(r * members_per_role + m) % employees].id)
+            for m in range(members_per_role)
+        ], batch_size=1000)
+        role_ids.append(role.id)
+    return role_ids, staff[0].id
+
+
+def run_query_checks(client, endpoints):
+    """
+    逐个请求接口并统计所有数据库连接上的查询次数
+
+    Returns:
+        list: [(接口, 状态码, 查询次数, 上限, 耗时 ms, 是否通过)]
+    """
+    from django.core.cache import caches
+    from django.db import connections
+    from django.test.utils import CaptureQueriesContext
+    from organization.directory_cache import get_directory_cache_settings
+
+    cache = caches[get_directory_cache_settings()['CACHE_ALIAS']]
+    results = []
+    for name, path, budget in endpoints:
+        cache.clear()
+        with ExitStack() as stack:
+            contexts = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+            start = time.perf_counter()
+            response = client.get(path)
+            elapsed = time.perf_counter() - start
+        queries = sum(len(context) for context in contexts)
+        ok = response.status_code == 200 and queries <= budget
+        results.append((name, response.status_code, queries, budget, f"{elapsed * 1000:.1f}", 'OK' if ok else 'FAIL'))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='组织架构读接口查询次数基准')
+    parser.add_argument('--employees', type=int, default=10000, help='员工数')
+    parser.add_argument('--departments', type=int, default=200, help='部门数')
+    parser.add_argument('--roles', type=int, default=10, help='角色数')
+    parser.add_argument('--members-per-role', type=int, default=1000, help='每个角色的成员数')
+    args = parser.parse_args()
+
+    teardown = setup_django()
+    try:
+        from django.test import Client
+
+        start = time.perf_counter()
+        role_ids, manager_id = create_fixtures(args.employees, args.departments, args.roles, args.members_per_role)
+        print(f"生成组织架构: {args.employees} 名员工, {args.departments} 个部门, "
+              f"{args.roles} 个角色, 耗时 {time.perf_counter() - start:.1f}s")
+
+        role_id = role_ids[0]
+        # (接口, 路径, 查询次数上限)；简化接口多一条数据版本查询（directory_cache）
+        endpoints = [
+            ('views_api 员工列表（200 条/页）', '/api/organization/api/employees/?page_size=200', 2),
+            ('views_api 部门列表（200 条/页）', '/api/organization/api/departments/?page_size=200', 2),
+            ('views_api 角色列表', '/api/organization/api/roles/', 2),
+            ('views_api 角色成员', f'/api/organization/api/roles/{role_id}/members/', 3),
+            ('DRF 员工列表（全部）', '/api/organization/employees/', 1),
+            ('DRF 部门列表（全部）', '/api/organization/departments/', 1),
+            ('DRF 角色列表', '/api/organization/roles/', 2),
+            ('DRF 角色成员', f'/api/organization/roles/{role_id}/members/', 2),
+            ('DRF 下属列表', f'/api/organization/employees/{manager_id}/subordinates/', 2),
+        ]
+        results = run_query_checks(Client(), endpoints)
+        print_table(
+            f"组织架构读接口查询次数（{args.employees} 名员工）",
+            ('接口', '状态', '查询数', '上限', '耗时(ms)', '结果'),
+            results
+        )
+
+        failed = [row[0] for row in results if row[-1] != 'OK']
+        if failed:
+            print(f"\n超过查询次数上限或请求失败: {', '.join(failed)}")
+            sys.exit(1)
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
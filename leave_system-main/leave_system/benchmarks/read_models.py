@@ -0,0 +1,116 @@
+"""
+读模型序列化基准
+
+对比列表接口的两种序列化路径（行/秒）：
+- 模型实例路径：加载完整 LeaveRequest（含 workflow_state），逐行调用 get_xxx_display()
+  或 LeaveRequestSerializer
+- 读模型路径：values() 只查询需要的列，预计算选项映射（leave_api.read_models）
+
+用法（在 leave_system 目录下）：
+    python -m benchmarks.read_models --rows 5000 --state-kb 20
+"""
+
+import argparse
+from datetime import date
+from decimal import Decimal
+
+from benchmarks import setup_django, measure, print_table
+
+
+def legacy_list_rows(queryset):
+    """原视图中的逐行构建方式"""
+    return [{
+        'id': r.id,
+        'user_email': r.user_email,
+        'staff_full_name': r.staff_full_name,
+        'staff_dept': r.staff_dept,
+        'reason': r.reason,
+        'leave_hours': r.leave_hours,
+        'leave_type': r.leave_type,
+        'duration': float(r.duration) if r.duration else None,
+        'start_date': r.start_date.isoformat() if r.start_date else None,
+        'end_date': r.end_date.isoformat() if r.end_date else None,
+        'status': r.status,
+        'status_display': r.get_status_display(),
+        'process_instance_id': r.process_instance_id,
+        'workflow_spec_name': r.workflow_spec_name,
+        'created_at': r.created_at.isoformat(),
+        'submitted_at': r.submitted_at.isoformat() if r.submitted_at else None,
+        'completed_at': r.completed_at.isoformat() if r.completed_at else None,
+    } for r in queryset]
+
+
+def create_fixtures(rows, state_kb):
+    from leave_api.models import LeaveRequest
+
+    state = {'serializer_version': '1', 'data': {'blob': 'x' * (state_kb * 1024)}}
+    statuses = [code for code, _ in LeaveRequest.STATUS_CHOICES]
+    leave_types = [code for code, _ in LeaveRequest.LEAVE_TYPE_CHOICES]
+    LeaveRequest.objects.bulk_create([
+        LeaveRequest(
+            user_email='bench@example.com',
+            staff_full_name=f'员工{i}',
+            staff_dept='技术部',
+            reason=f'请假原因 {i}',
+            leave_hours=8,
+            leave_type=leave_types[i % len(leave_types)],
+            duration=Decimal('1.0'),
+            start_date=date(2026, 1, 1),
+            end_date=date(2026, 1, 2),
+            status=statuses[i % len(statuses)],
+            process_instance_id=f'instance-{i}',
+            workflow_spec_name='leave-approval',
+            workflow_state=state,
+        )
+        for i in range(rows)
+    ], batch_size=500)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='读模型序列化基准')
+    parser.add_argument('--rows', type=int, default=5000, help='数据行数')
+    parser.add_argument('--state-kb', type=int, default=20, help='每行 workflow_state 的大小（KB）')
+    parser.add_argument('--repeat', type=int, default=5, help='每个场景的执行次数（取最短）')
+    args = parser.parse_args()
+
+    teardown = setup_django()
+    try:
+        from leave_api.models import LeaveRequest
+        from leave_api.serializers import LeaveRequestSerializer
+        from leave_api.read_models import (
+            LEAVE_REQUEST_LIST_FIELDS, leave_request_list_row,
+            LEAVE_REQUEST_API_FIELDS, leave_request_api_row,
+        )
+
+        create_fixtures(args.rows, args.state_kb)
+        queryset = LeaveRequest.objects.filter(user_email='bench@example.com').order_by('-created_at', '-id')
+
+        scenarios = [
+            ('我的申请列表 / 模型实例', lambda: legacy_list_rows(queryset.all())),
+            ('我的申请列表 / 读模型', lambda: [
+                leave_request_list_row(row) for row in queryset.values(*LEAVE_REQUEST_LIST_FIELDS)
+            ]),
+            ('待办申请 / LeaveRequestSerializer', lambda: [
+                LeaveRequestSerializer(r).data for r in queryset.all()
+            ]),
+            ('待办申请 / 读模型', lambda: [
+                leave_request_api_row(row) for row in queryset.values(*LEAVE_REQUEST_API_FIELDS)
+            ]),
+        ]
+
+        results = []
+        for name, func in scenarios:
+            elapsed = measure(func, args.repeat)
+            results.append((name, f"{elapsed * 1000:.1f}", f"{args.rows / elapsed:,.0f}"))
+
+        print_table(
+            f"读模型序列化（{args.rows} 行，workflow_state {args.state_kb} KB/行）",
+            ('场景', '耗时(ms)', '行/秒'),
+            results
+        )
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
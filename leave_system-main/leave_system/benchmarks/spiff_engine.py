@@ -0,0 +1,193 @@
+"""
+SpiffWorkflowClient 微基准
+
+对每个流程模型测量：
+- _load_bpmn_spec 冷加载（解析 + 预编译）和热加载（缓存命中）
+- start_process
+- deserialize_workflow / serialize_workflow（流程进行到一半时的状态）
+- complete_task（逐个完成所有用户任务，取平均）
+
+每项报告最短耗时、tracemalloc 统计的峰值内存分配，以及序列化状态大小。
+
+流程模型包括 process_models 中自带的模型和按规模生成的模型
+（benchmarks.bpmn_models.workflow_shape_bpmn：用户任务数 / 分支网关数 / 回退网关数）。
+
+用法（在 leave_system 目录下）：
+    python -m benchmarks.spiff_engine --sizes 5,20,50 --repeat 5
+    python -m benchmarks.spiff_engine --no-shipped
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks import setup_django, measure, print_table
+from benchmarks.bpmn_models import workflow_shape_bpmn, write_process_model
+
+VARIABLES = {
+    'user_email': 'bench@example.com',
+    'staff_full_name': '员工',
+    'staff_dept': '技术部',
+    'leave_type': 'annual',
+    'leave_hours': 40,
+    'duration': 5.0,
+    'reason': '基准测试',
+}
+
+
+def allocated_kb(func):
+    """
+    执行一次并返回 tracemalloc 统计的峰值分配（KB）
+
+    与计时分开执行，避免 tracemalloc 的开销影响耗时
+    """
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (peak - baseline) / 1024
+
+
+def new_client(process_dir):
+    from leave_api.spiff_client_v2 import SpiffWorkflowClient
+
+    client = SpiffWorkflowClient()
+    client.process_dir = Path(process_dir)
+    return client
+
+
+def run_to_completion(client, state, process_model_id, limit=1000):
+    """
+    逐个完成用户任务直到流程结束
+
+    Returns:
+        tuple: (每次 complete_task 的耗时列表, 流程中途的状态)
+    """
+    timings = []
+    states = [state]
+    for _ in range(limit):
+        tasks = client.get_user_tasks(state, process_model_id)
+        if not tasks:
+            break
+        start = time.perf_counter()
+        result = client.complete_task(state, process_model_id, tasks[0]['id'], {'action': 'approve'})
+        timings.append(time.perf_counter() - start)
+        if not result:
+            raise RuntimeError('complete_task 失败')
+        state = result['workflow_state']
+        states.append(state)
+        if result['completed']:
+            break
+    return timings, states[len(states) // 2]
+
+
+def benchmark_model(process_dir, process_model_id, repeat):
+    """
+    测量一个流程模型
+
+    Returns:
+        list: 表格行；出错的步骤显示为“失败”
+    """
+    client = new_client(process_dir)
+    rows = []
+
+    def cold_load():
+        client.specs_cache.pop(process_model_id, None)
+        client._load_bpmn_spec(process_model_id)
+
+    def row(step, func, extra=''):
+        rows.append((
+            process_model_id, step,
+            f"{measure(func, repeat) * 1000:.3f}",
+            f"{allocated_kb(func):.0f}",
+            extra,
+        ))
+
+    try:
+        row('_load_bpmn_spec 冷', cold_load)
+        row('_load_bpmn_spec 热', lambda: client._load_bpmn_spec(process_model_id))
+    except Exception as e:
+        rows.append((process_model_id, '_load_bpmn_spec', '失败', '', type(e).__name__))
+        return rows
+
+    started = client.start_process(process_model_id, dict(VARIABLES))
+    if not started or not started['workflow_state']:
+        rows.append((process_model_id, 'start_process', '失败', '', '工作流无法启动或序列化'))
+        return rows
+    row('start_process', lambda: client.start_process(process_model_id, dict(VARIABLES)),
+        f"状态 {len(started['workflow_state']) / 1024:.1f} KB")
+
+    timings, middle_state = run_to_completion(client, started['workflow_state'], process_model_id)
+    workflow = client.deserialize_workflow(middle_state, process_model_id)
+    row('deserialize_workflow', lambda: client.deserialize_workflow(middle_state, process_model_id),
+        f"状态 {len(middle_state) / 1024:.1f} KB")
+    row('serialize_workflow', lambda: client.serialize_workflow(workflow))
+
+    if timings:
+        state = started['workflow_state']
+        task_id = client.get_user_tasks(state, process_model_id)[0]['id']
+        complete = lambda: client.complete_task(state, process_model_id, task_id, {'action': 'approve'})
+        rows.append((
+            process_model_id, 'complete_task',
+            f"{sum(timings) / len(timings) * 1000:.3f}",
+            f"{allocated_kb(complete):.0f}",
+            f"{len(timings)} 个任务平均",
+        ))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SpiffWorkflowClient 微基准')
+    parser.add_argument('--sizes', default='5,20,50', help='生成流程的用户任务数，逗号分隔')
+    parser.add_argument('--gateway-ratio', type=float, default=0.5, help='带分支网关的用户任务比例')
+    parser.add_argument('--loop-ratio', type=float, default=0.5, help='带回退网关的用户任务比例')
+    parser.add_argument('--repeat', type=int, default=5, help='每项的执行次数（取最短）')
+    parser.add_argument('--no-shipped', action='store_true', help='不测量 process_models 中自带的模型')
+    args = parser.parse_args()
+
+    teardown = setup_django(with_database=False)
+    generated_dir = tempfile.TemporaryDirectory()
+    try:
+        from django.conf import settings
+
+        settings.TRACING = dict(getattr(settings, 'TRACING', {}), EXPORTER='none')
+        # 失败的步骤在表格中标出，不输出客户端的错误日志
+        logging.disable(logging.CRITICAL)
+
+        rows = []
+        if not args.no_shipped:
+            shipped_dir = Path(os.getenv('BPMN_PROCESS_DIR', settings.BASE_DIR.parent / 'process_models'))
+            for path in sorted(shipped_dir.glob('*/*/*.bpmn')):
+                process_model_id = f"{path.parent.parent.name}/{path.parent.name}"
+                rows.extend(benchmark_model(shipped_dir, process_model_id, args.repeat))
+
+        for size in (int(s) for s in args.sizes.split(',') if s):
+            gateways = int(size * args.gateway_ratio)
+            loop_backs = int(size * args.loop_ratio)
+            process_model_id = f"generated/shape_{size}"
+            write_process_model(
+                generated_dir.name, process_model_id,
+                workflow_shape_bpmn(f"shape_{size}", size, gateways, loop_backs)
+            )
+            rows.extend(benchmark_model(generated_dir.name, process_model_id, args.repeat))
+
+        print_table(
+            f"SpiffWorkflowClient 微基准（分支比例 {args.gateway_ratio}，回退比例 {args.loop_ratio}）",
+            ('流程模型', '操作', '耗时(ms)', '峰值分配(KB)', '说明'),
+            rows
+        )
+    finally:
+        generated_dir.cleanup()
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
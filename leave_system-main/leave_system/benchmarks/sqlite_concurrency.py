@@ -0,0 +1,266 @@
+"""
+SQLite 并发审批基准
+
+模拟多个 gunicorn worker（进程）× 每个 worker 多个线程同时审批，另有读线程持续查询待审批列表。
+分别在两种配置下运行（各自使用独立的临时数据库文件，在子进程中执行）：
+- default:    Django 自带 SQLite 后端的行为（rollback journal、DEFERRED 事务、无写队列，busy timeout 5 秒）
+- production: settings.SQLITE 的配置（WAL、synchronous=normal、BEGIN IMMEDIATE、进程内写队列和重试）
+
+审批通过 ApprovalService.approve_task 执行（与接口相同的写路径），每个申请按 --stages 级逐级批准。
+报告审批吞吐量、写/读延迟分位数、失败次数（其中 "database is locked" 单独统计）。
+
+用法（在 leave_system 目录下）：
+    python -m benchmarks.sqlite_concurrency --processes 4 --threads 4 --requests 200
+    python -m benchmarks.sqlite_concurrency --profiles production
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from benchmarks import setup_django, print_table
+from benchmarks.lifecycle import percentile, seed_organization, install_process_model, ready_task
+
+PROFILES = ('default', 'production')
+
+
+def profile_settings(name, production):
+    """
+    返回 (settings.SQLITE, busy timeout)
+
+    Args:
+        name (str): 'default' / 'production'
+        production (dict): settings.SQLITE
+    """
+    if name == 'production':
+        return dict(production), production['BUSY_TIMEOUT']
+    # 测试数据库文件由 production 配置创建（已是 WAL），这里显式切回 Django 默认的 rollback journal
+    return {'JOURNAL_MODE': 'delete', 'WRITE_QUEUE': False}, 5.0
+
+
+def seed(args):
+    """生成组织架构、流程模型，并提交 --requests 个申请"""
+    from leave_api.models import LeaveRequest
+    from leave_api.services import ApprovalService
+
+    applicants, department_names = seed_organization(args.employees, args.departments)
+    install_process_model(args.process_dir, args.stages, department_names)
+
+    service = ApprovalService()
+    ids = []
+    for i in range(args.requests):
+        leave_request = LeaveRequest.objects.create(
+            user_email=applicants[i % len(applicants)],
+            staff_full_name=f'员工{i}',
+            reason='基准测试',
+            leave_hours=8,
+            leave_type='annual',
+            duration=1,
+        )
+        service.submit_leave_request(leave_request)
+        ids.append(leave_request.id)
+    return ids
+
+
+def approve_all(leave_request_ids, result, lock):
+    """写线程：逐级批准分配给自己的申请"""
+    from django.db import connection
+    from leave_api.models import LeaveRequest
+    from leave_api.services import ApprovalService
+    from leave_system.sqlite import is_lock_error
+
+    service = ApprovalService()
+    latencies, errors, locked = [], 0, 0
+    try:
+        for leave_request_id in leave_request_ids:
+            # 失败的审批在下一次循环中重新读取就绪任务后重试，总次数有上限
+            for _ in range(20):
+                task = ready_task(leave_request_id)
+                if task is None:
+                    break
+                leave_request = LeaveRequest.objects.get(id=leave_request_id)
+                start = time.perf_counter()
+                try:
+                    service.approve_task(
+                        leave_request, task['id'], task.get('assigned_to') or 'unknown@example.com', '审批人'
+                    )
+                except Exception as e:
+                    errors += 1
+                    locked += is_lock_error(e)
+                    continue
+                finally:
+                    latencies.append(time.perf_counter() - start)
+    finally:
+        connection.close()
+    with lock:
+        result['write'].extend(latencies)
+        result['errors'] += errors
+        result['locked'] += locked
+
+
+def read_until(stop, result, lock):
+    """读线程：持续查询审批中的申请列表"""
+    from django.db import connection
+    from leave_api.models import LeaveRequest
+
+    latencies, errors = [], 0
+    try:
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                list(LeaveRequest.objects.filter(status__in=('pending', 'running')).order_by('-id')[:50])
+                LeaveRequest.objects.filter(status__in=('pending', 'running')).count()
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+    finally:
+        connection.close()
+    with lock:
+        result['read'].extend(latencies)
+        result['read_errors'] += errors
+
+
+def worker(leave_request_ids, args, queue):
+    """一个 worker 进程：--threads 个写线程和 --readers 个读线程"""
+    result = {'write': [], 'read': [], 'errors': 0, 'locked': 0, 'read_errors': 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+    writers = [
+        threading.Thread(target=approve_all, args=(leave_request_ids[i::args.threads], result, lock))
+        for i in range(args.threads)
+    ]
+    readers = [threading.Thread(target=read_until, args=(stop, result, lock)) for _ in range(args.readers)]
+    for thread in writers + readers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    stop.set()
+    for thread in readers:
+        thread.join()
+    queue.put(result)
+
+
+def run_profile(args):
+    """在当前进程中运行一种配置（由 main 以子进程方式调用）"""
+    db_dir = tempfile.TemporaryDirectory()
+    process_dir = tempfile.TemporaryDirectory()
+    args.process_dir = process_dir.name
+    teardown = setup_django(test_db_name=os.path.join(db_dir.name, 'bench.sqlite3'))
+    try:
+        from django.conf import settings
+        from django.db import connections
+        from leave_system.celery import app as celery_app
+        from leave_api.spiff_client_v2 import spiff_client
+
+        settings.CELERY_TASK_ALWAYS_EAGER = True
+        celery_app.conf.task_always_eager = True
+        settings.EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+        settings.EVENT_BUS = dict(settings.EVENT_BUS, BACKEND='sync')
+        settings.TRACING = dict(getattr(settings, 'TRACING', {}), EXPORTER='none')
+        settings.QUERY_PROFILER = dict(settings.QUERY_PROFILER, LOG_SAMPLE_RATE=0)
+        spiff_client.process_dir = Path(process_dir.name)
+
+        leave_request_ids = seed(args)
+
+        # 之后新建的连接使用被测配置；fork 之前关闭连接，子进程各自重新连接
+        settings.SQLITE, timeout = profile_settings(args.profile, settings.SQLITE)
+        connections['default'].settings_dict['OPTIONS']['timeout'] = timeout
+        connections.close_all()
+        # 切换日志模式需要独占数据库，在启动 worker 之前由单个连接完成
+        connections['default'].ensure_connection()
+        connections.close_all()
+
+        context = multiprocessing.get_context('fork')
+        queue = context.Queue()
+        processes = [
+            context.Process(target=worker, args=(leave_request_ids[i::args.processes], args, queue))
+            for i in range(args.processes)
+        ]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        elapsed = time.perf_counter() - started
+        for process in processes:
+            process.join()
+
+        with connections['default'].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+    finally:
+        teardown()
+        process_dir.cleanup()
+        db_dir.cleanup()
+
+    write = sorted(v for r in results for v in r['write'])
+    read = sorted(v for r in results for v in r['read'])
+    approvals = len(write) - sum(r['errors'] for r in results)
+    return {
+        'profile': args.profile,
+        'journal_mode': journal_mode,
+        'elapsed_s': round(elapsed, 3),
+        'approvals': approvals,
+        'approvals_per_s': round(approvals / elapsed, 1) if elapsed else 0.0,
+        'errors': sum(r['errors'] for r in results),
+        'locked': sum(r['locked'] for r in results),
+        'write_p50_ms': round(percentile(write, 50) * 1000, 2),
+        'write_p95_ms': round(percentile(write, 95) * 1000, 2),
+        'write_p99_ms': round(percentile(write, 99) * 1000, 2),
+        'reads': len(read),
+        'read_errors': sum(r['read_errors'] for r in results),
+        'read_p95_ms': round(percentile(read, 95) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite 并发审批基准')
+    parser.add_argument('--profiles', default=','.join(PROFILES), help='要比较的配置，逗号分隔')
+    parser.add_argument('--processes', type=int, default=4, help='worker 进程数')
+    parser.add_argument('--threads', type=int, default=4, help='每个进程的写线程数')
+    parser.add_argument('--readers', type=int, default=2, help='每个进程的读线程数')
+    parser.add_argument('--requests', type=int, default=200, help='请假申请数')
+    parser.add_argument('--stages', type=int, default=2, help='审批级数')
+    parser.add_argument('--employees', type=int, default=50, help='员工数')
+    parser.add_argument('--departments', type=int, default=5, help='部门数')
+    parser.add_argument('--profile', choices=PROFILES, help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        result = run_profile(args)
+        Path(args.result_file).write_text(json.dumps(result), encoding='utf-8')
+        return
+
+    # 每种配置在独立的子进程中运行，互不影响连接和数据库文件
+    results = []
+    for profile in (p for p in args.profiles.split(',') if p):
+        with tempfile.NamedTemporaryFile(suffix='.json') as result_file:
+            subprocess.run(
+                [sys.executable, '-m', 'benchmarks.sqlite_concurrency', *sys.argv[1:],
+                 '--profile', profile, '--result-file', result_file.name],
+                check=True, cwd=Path(__file__).resolve().parent.parent
+            )
+            results.append(json.loads(Path(result_file.name).read_text(encoding='utf-8')))
+
+    print_table(
+        f"SQLite 并发审批（{args.processes} 进程 × {args.threads} 写线程 + {args.readers} 读线程，"
+        f"{args.requests} 个申请 × {args.stages} 级）",
+        ('配置', '日志模式', '审批数', '审批/秒', '失败', '其中锁冲突',
+         '写 p50(ms)', '写 p95(ms)', '写 p99(ms)', '读次数', '读失败', '读 p95(ms)'),
+        [
+            (r['profile'], r['journal_mode'], r['approvals'], r['approvals_per_s'], r['errors'], r['locked'],
+             r['write_p50_ms'], r['write_p95_ms'], r['write_p99_ms'], r['reads'], r['read_errors'], r['read_p95_ms'])
+            for r in results
+        ]
+    )
+
+
+if __name__ == '__main__':
+    main()
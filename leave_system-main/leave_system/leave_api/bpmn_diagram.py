@@ -0,0 +1,251 @@
+"""
+LogicFlow 流程图与 BPMN XML 的转换
+
+设计器提交的每个节点/连线独立生成 BPMN 片段，整份文件由片段拼接而成：
+- 节点不输出 bpmn:incoming / bpmn:outgoing（可选元素，SpiffWorkflow 按 sequenceFlow 的
+  sourceRef / targetRef 建立连接），节点片段只取决于节点本身，连线变化不需要重新生成节点
+- 语义片段（bpmn:process 内）和图形片段（bpmndi:BPMNPlane 内）分开保存，拼接时分别放入
+
+LogicFlow 数据格式（与 BpmnAdapter 一致）：
+    节点: {"id", "type": "bpmn:userTask", "x", "y", "text": {"value"} | "名称", "properties": {...}}
+    连线: {"id", "type": "bpmn:sequenceFlow", "sourceNodeId", "targetNodeId", "text",
+           "pointsList": [{"x", "y"}, ...], "properties": {"conditionExpression": "..."}}
+
+节点 properties 中的简单值写入 spiffworkflow:properties；width / height 决定图形大小，
+网关的 default 为默认分支的连线 ID，脚本任务的 script 为脚本内容，
+preScript / postScript 写入 spiffworkflow:preScript / spiffworkflow:postScript
+"""
+
+import hashlib
+import json
+import re
+from xml.sax.saxutils import escape, quoteattr
+
+# LogicFlow 节点类型 -> (默认宽, 默认高)
+NODE_SHAPES = {
+    'bpmn:startEvent': (36, 36),
+    'bpmn:endEvent': (36, 36),
+    'bpmn:exclusiveGateway': (50, 50),
+    'bpmn:inclusiveGateway': (50, 50),
+    'bpmn:parallelGateway': (50, 50),
+    'bpmn:task': (100, 80),
+    'bpmn:userTask': (100, 80),
+    'bpmn:serviceTask': (100, 80),
+    'bpmn:scriptTask': (100, 80),
+    'bpmn:manualTask': (100, 80),
+}
+
+EDGE_TYPES = {'bpmn:sequenceFlow'}
+
+# 不写入 spiffworkflow:properties 的节点属性
+RESERVED_PROPERTIES = {'width', 'height', 'default', 'script', 'name', 'preScript', 'postScript'}
+
+# 节点属性 -> Spiff 扩展脚本元素（按输出顺序）
+EXTENSION_SCRIPTS = (
+    ('preScript', 'spiffworkflow:preScript'),
+    ('postScript', 'spiffworkflow:postScript'),
+)
+
+_XML_ID = re.compile(r'^[A-Za-z_][\w.-]*$')
+
+# SpiffWorkflow 内部任务规范使用的名称，BPMN 元素不能使用
+ENGINE_RESERVED_IDS = {'Root', 'Start', 'End'}
+
+DOCUMENT_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<bpmn:definitions xmlns:bpmn="http://www.omg.org/spec/BPMN/20100524/MODEL" '
+    'xmlns:bpmndi="http://www.omg.org/spec/BPMN/20100524/DI" '
+    'xmlns:dc="http://www.omg.org/spec/DD/20100524/DC" '
+    'xmlns:di="http://www.omg.org/spec/DD/20100524/DI" '
+    'xmlns:spiffworkflow="http://spiffworkflow.org/bpmn/schema/1.0/core" '
+    'id={definitions_id} targetNamespace="http://bpmn.io/schema/bpmn">\n'
+)
+
+
+class DiagramError(ValueError):
+    """流程图数据无效"""
+
+
+class RevisionConflict(DiagramError):
+    """保存基于的版本号不是当前版本（其他窗口已保存过）"""
+
+
+def is_valid_id(value):
+    """是否可以用作 BPMN 元素 id（XML NCName 的常用子集）"""
+    return isinstance(value, str) and bool(_XML_ID.match(value))
+
+
+def record_hash(record):
+    """设计器数据的规范化哈希（与键的顺序无关）"""
+    canonical = json.dumps(record, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+def _text(record):
+    text = record.get('text')
+    if isinstance(text, dict):
+        text = text.get('value')
+    return text if isinstance(text, str) and text else None
+
+
+def _name_attr(record):
+    name = _text(record)
+    return f' name={quoteattr(name)}' if name else ''
+
+
+def _number(value, field, element_id):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise DiagramError(f"{element_id}: {field} 不是数字")
+
+
+def _fmt(value):
+    return f"{value:g}"
+
+
+def render_node(record):
+    """
+    生成节点的 BPMN 片段
+
+    Returns:
+        tuple: (语义片段, 图形片段)
+
+    Raises:
+        DiagramError: 类型不支持或坐标无效
+    """
+    element_id = record['id']
+    element_type = record.get('type')
+    if element_type not in NODE_SHAPES:
+        raise DiagramError(f"{element_id}: 不支持的节点类型 {element_type}")
+    properties = record.get('properties') or {}
+    tag = element_type
+
+    attrs = f'id={quoteattr(element_id)}{_name_attr(record)}'
+    default_flow = properties.get('default')
+    if default_flow and element_type.endswith('Gateway'):
+        if not is_valid_id(default_flow):
+            raise DiagramError(f"{element_id}: 默认分支 {default_flow!r} 不是有效的连线 ID")
+        attrs += f' default={quoteattr(default_flow)}'
+    if element_type == 'bpmn:scriptTask':
+        attrs += ' scriptFormat="python"'
+
+    children = []
+    extension_properties = [
+        (key, value) for key, value in sorted(properties.items())
+        if key not in RESERVED_PROPERTIES and isinstance(value, (str, int, float, bool)) and value != ''
+    ]
+    extension_scripts = [
+        (tag_name, properties[key]) for key, tag_name in EXTENSION_SCRIPTS
+        if isinstance(properties.get(key), str) and properties[key].strip()
+    ]
+    if extension_properties or extension_scripts:
+        children.append('      <bpmn:extensionElements>\n')
+        if extension_properties:
+            children.append('        <spiffworkflow:properties>\n')
+            for key, value in extension_properties:
+                if isinstance(value, bool):
+                    value = 'true' if value else 'false'
+                children.append(
+                    f'          <spiffworkflow:property name={quoteattr(str(key))} value={quoteattr(str(value))} />\n'
+                )
+            children.append('        </spiffworkflow:properties>\n')
+        for tag_name, script in extension_scripts:
+            children.append(f'        <{tag_name}>{escape(script)}</{tag_name}>\n')
+        children.append('      </bpmn:extensionElements>\n')
+    script = properties.get('script')
+    if element_type == 'bpmn:scriptTask' and isinstance(script, str) and script.strip():
+        children.append(f'      <bpmn:script>{escape(script)}</bpmn:script>\n')
+
+    if children:
+        semantic = f'    <{tag} {attrs}>\n{"".join(children)}    </{tag}>\n'
+    else:
+        semantic = f'    <{tag} {attrs} />\n'
+
+    default_width, default_height = NODE_SHAPES[element_type]
+    width = _number(properties.get('width', default_width), 'width', element_id)
+    height = _number(properties.get('height', default_height), 'height', element_id)
+    # LogicFlow 的坐标是图形中心，BPMN 的 Bounds 是左上角
+    x = _number(record.get('x'), 'x', element_id) - width / 2
+    y = _number(record.get('y'), 'y', element_id) - height / 2
+    di = (
+        f'      <bpmndi:BPMNShape id={quoteattr(element_id + "_di")} bpmnElement={quoteattr(element_id)}>\n'
+        f'        <dc:Bounds x="{_fmt(x)}" y="{_fmt(y)}" width="{_fmt(width)}" height="{_fmt(height)}" />\n'
+        f'      </bpmndi:BPMNShape>\n'
+    )
+    return semantic, di
+
+
+def _condition(properties):
+    condition = properties.get('conditionExpression')
+    if isinstance(condition, dict):
+        condition = condition.get('#text') or condition.get('body')
+    return condition if isinstance(condition, str) and condition.strip() else None
+
+
+def render_edge(record):
+    """
+    生成连线的 BPMN 片段
+
+    Returns:
+        tuple: (语义片段, 图形片段)
+
+    Raises:
+        DiagramError: 类型不支持或缺少端点
+    """
+    element_id = record['id']
+    if record.get('type', 'bpmn:sequenceFlow') not in EDGE_TYPES:
+        raise DiagramError(f"{element_id}: 不支持的连线类型 {record.get('type')}")
+    source, target = record.get('sourceNodeId'), record.get('targetNodeId')
+    if not is_valid_id(source) or not is_valid_id(target):
+        raise DiagramError(f"{element_id}: 缺少起点或终点")
+
+    attrs = f'id={quoteattr(element_id)}{_name_attr(record)} sourceRef={quoteattr(source)} targetRef={quoteattr(target)}'
+    condition = _condition(record.get('properties') or {})
+    if condition:
+        semantic = (
+            f'    <bpmn:sequenceFlow {attrs}>\n'
+            f'      <bpmn:conditionExpression>{escape(condition)}</bpmn:conditionExpression>\n'
+            f'    </bpmn:sequenceFlow>\n'
+        )
+    else:
+        semantic = f'    <bpmn:sequenceFlow {attrs} />\n'
+
+    points = record.get('pointsList') or [p for p in (record.get('startPoint'), record.get('endPoint')) if p]
+    waypoints = ''.join(
+        f'        <di:waypoint x="{_fmt(_number(p.get("x"), "x", element_id))}" '
+        f'y="{_fmt(_number(p.get("y"), "y", element_id))}" />\n'
+        for p in points if isinstance(p, dict)
+    )
+    di = (
+        f'      <bpmndi:BPMNEdge id={quoteattr(element_id + "_di")} bpmnElement={quoteattr(element_id)}>\n'
+        f'{waypoints}'
+        f'      </bpmndi:BPMNEdge>\n'
+    )
+    return semantic, di
+
+
+def assemble_document(process_ref, name, fragments):
+    """
+    拼接完整的 BPMN 文件
+
+    Args:
+        process_ref (str): bpmn:process 的 id
+        name (str | None): 流程名称
+        fragments (list): [(语义片段, 图形片段)]，按输出顺序排列
+
+    Returns:
+        bytes: UTF-8 编码的 BPMN XML
+    """
+    name_attr = f' name={quoteattr(name)}' if name else ''
+    parts = [
+        DOCUMENT_HEADER.format(definitions_id=quoteattr(f"Definitions_{process_ref}")),
+        f'  <bpmn:process id={quoteattr(process_ref)}{name_attr} isExecutable="true">\n',
+    ]
+    parts.extend(semantic for semantic, _ in fragments)
+    parts.append('  </bpmn:process>\n')
+    parts.append(f'  <bpmndi:BPMNDiagram id={quoteattr(f"BPMNDiagram_{process_ref}")}>\n')
+    parts.append(f'    <bpmndi:BPMNPlane id={quoteattr(f"BPMNPlane_{process_ref}")} bpmnElement={quoteattr(process_ref)}>\n')
+    parts.extend(di for _, di in fragments)
+    parts.append('    </bpmndi:BPMNPlane>\n  </bpmndi:BPMNDiagram>\n</bpmn:definitions>\n')
+    return ''.join(parts).encode('utf-8')
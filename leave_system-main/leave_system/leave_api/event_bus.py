@@ -0,0 +1,302 @@
+"""
+领域事件总线
+
+替代同步的 Django 信号：事件在业务事务内发布，事务提交后（on_commit）才进入
+各消费者的队列，由后台线程按批次分发，消费者的数据库写入不再计入审批请求的响应时间
+
+主要功能：
+1. 事务内捕获事件，事务回滚时事件随之丢弃
+2. 每个消费者独立的队列、批大小和重试次数
+3. 三种分发方式（settings.EVENT_BUS['BACKEND']）：
+   - 'thread': 进程内工作线程批量执行消费者（默认）
+   - 'celery': 进程内工作线程攒批后，每批作为一个 Celery 任务在 worker 中执行
+   - 'sync': 提交后立即在当前线程执行（测试和管理命令使用）
+4. 每个消费者的处理计数、重试、失败和延迟（lag）统计
+
+用法：
+    from leave_api.event_bus import event_bus
+
+    @event_bus.subscribe('task_ready', name='task_ready_log', batch_size=100)
+    def handle_task_ready(events):
+        ...
+
+    event_bus.publish('task_ready', {'workflow_instance_id': ..., 'task_id': ...})
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# 默认配置
+DEFAULT_EVENT_BUS_SETTINGS = {
+    'BACKEND': 'thread',
+    # 攒批等待时间（秒）：拿到第一个事件后最多再等这么久凑满一批
+    'BATCH_WAIT': 0.05,
+    # 进程内重试的退避基数（秒），第 n 次重试等待 RETRY_BACKOFF * 2**(n-1)
+    'RETRY_BACKOFF': 0.5,
+}
+
+
+def get_event_bus_settings():
+    """合并默认配置和 settings.EVENT_BUS"""
+    config = dict(DEFAULT_EVENT_BUS_SETTINGS)
+    config.update(getattr(settings, 'EVENT_BUS', None) or {})
+    return config
+
+
+class Consumer:
+    """
+    事件消费者
+
+    属性:
+        name (str): 消费者名称（全局唯一，Celery 分发时用于定位处理函数）
+        event_type (str): 订阅的事件类型
+        handler (callable): 批处理函数，参数为事件字典列表
+        batch_size (int): 每批最大事件数
+        max_retries (int): 每批失败后的最大重试次数
+    """
+
+    def __init__(self, name, event_type, handler, batch_size=100, max_retries=3):
+        self.name = name
+        self.event_type = event_type
+        self.handler = handler
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.queue = queue.Queue()
+        self.worker = None
+        self.lock = threading.Lock()
+        self.stats = {
+            'published': 0,
+            'processed': 0,
+            'failed': 0,
+            'retries': 0,
+            'batches': 0,
+            'last_batch_size': 0,
+            'last_lag_seconds': 0.0,
+            'max_lag_seconds': 0.0,
+        }
+
+    def record_batch(self, events):
+        """记录一个成功批次的处理计数和延迟"""
+        now = time.time()
+        lag = max(now - event['occurred_at'] for event in events) if events else 0.0
+        with self.lock:
+            self.stats['processed'] += len(events)
+            self.stats['batches'] += 1
+            self.stats['last_batch_size'] = len(events)
+            self.stats['last_lag_seconds'] = round(lag, 4)
+            self.stats['max_lag_seconds'] = round(max(self.stats['max_lag_seconds'], lag), 4)
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats['queue_depth'] = self.queue.qsize()
+        stats['event_type'] = self.event_type
+        stats['batch_size'] = self.batch_size
+        return stats
+
+
+class EventBus:
+    """
+    领域事件总线
+
+    消费者在模块导入时通过 subscribe 注册（leave_api.signals 在 AppConfig.ready 中导入），
+    Web 进程和 Celery worker 进程都会完成注册
+    """
+
+    def __init__(self):
+        self._consumers = {}
+        self._by_type = {}
+        self._lock = threading.Lock()
+
+    # ========== 注册 ==========
+
+    def subscribe(self, event_type, name=None, batch_size=100, max_retries=3):
+        """
+        注册批处理消费者（装饰器）
+
+        Args:
+            event_type (str): 订阅的事件类型
+            name (str, optional): 消费者名称，默认使用函数的模块路径
+            batch_size (int): 每批最大事件数
+            max_retries (int): 每批失败后的最大重试次数
+        """
+        def decorator(handler):
+            consumer_name = name or f"{handler.__module__}.{handler.__name__}"
+            consumer = Consumer(consumer_name, event_type, handler, batch_size, max_retries)
+            with self._lock:
+                self._consumers[consumer_name] = consumer
+                self._by_type.setdefault(event_type, []).append(consumer)
+            return handler
+        return decorator
+
+    def get_consumer(self, name):
+        return self._consumers[name]
+
+    # ========== 发布 ==========
+
+    def publish(self, event_type, payload):
+        """
+        发布事件
+
+        在事务内调用时，事件在事务提交后才会分发，回滚时丢弃；
+        不在事务内时立即分发
+
+        Args:
+            event_type (str): 事件类型
+            payload (dict): 事件数据（必须可 JSON 序列化，celery 模式下会跨进程传递）
+
+        Returns:
+            dict: 事件字典，包含 id, type, payload, occurred_at
+        """
+        event = {
+            'id': uuid.uuid4().hex,
+            'type': event_type,
+            'payload': payload,
+            'occurred_at': time.time(),
+        }
+        transaction.on_commit(lambda: self._dispatch(event))
+        return event
+
+    def _dispatch(self, event):
+        backend = get_event_bus_settings()['BACKEND']
+        for consumer in self._by_type.get(event['type'], []):
+            with consumer.lock:
+                consumer.stats['published'] += 1
+            if backend == 'sync':
+                self._run_with_retries(consumer, [event])
+            else:
+                consumer.queue.put(event)
+                self._ensure_worker(consumer)
+
+    # ========== 分发 ==========
+
+    def _ensure_worker(self, consumer):
+        # 工作线程在首次分发时才启动，gunicorn/celery prefork 的子进程各自拥有自己的线程
+        if consumer.worker is not None and consumer.worker.is_alive():
+            return
+        with consumer.lock:
+            if consumer.worker is not None and consumer.worker.is_alive():
+                return
+            consumer.worker = threading.Thread(
+                target=self._worker_loop,
+                args=(consumer,),
+                name=f"event-bus-{consumer.name}",
+                daemon=True
+            )
+            consumer.worker.start()
+
+    def _worker_loop(self, consumer):
+        while True:
+            batch = [consumer.queue.get()]
+            batch_wait = get_event_bus_settings()['BATCH_WAIT']
+            deadline = time.monotonic() + batch_wait
+            while len(batch) < consumer.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(consumer.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                if get_event_bus_settings()['BACKEND'] == 'celery':
+                    self._send_to_celery(consumer, batch)
+                else:
+                    self._run_with_retries(consumer, batch)
+            except Exception as e:
+                logger.error(f"事件分发失败: 消费者 {consumer.name}, 事件数 {len(batch)}: {e}", exc_info=True)
+            finally:
+                for _ in batch:
+                    consumer.queue.task_done()
+
+    def _send_to_celery(self, consumer, events):
+        from leave_api.tasks import dispatch_domain_events
+        dispatch_domain_events.delay(consumer.name, events)
+
+    def _run_with_retries(self, consumer, events):
+        backoff = get_event_bus_settings()['RETRY_BACKOFF']
+        attempt = 0
+        while True:
+            try:
+                self.process_batch(consumer.name, events)
+                return
+            except Exception as e:
+                if attempt >= consumer.max_retries:
+                    with consumer.lock:
+                        consumer.stats['failed'] += len(events)
+                    logger.error(
+                        f"消费者 {consumer.name} 处理失败，已重试 {attempt} 次，"
+                        f"丢弃 {len(events)} 个事件: {e}",
+                        exc_info=True
+                    )
+                    return
+                attempt += 1
+                with consumer.lock:
+                    consumer.stats['retries'] += 1
+                logger.warning(f"消费者 {consumer.name} 处理失败，第 {attempt} 次重试: {e}")
+                time.sleep(backoff * 2 ** (attempt - 1))
+
+    def process_batch(self, consumer_name, events):
+        """
+        执行一批事件（线程模式和 Celery 任务共用）
+
+        Args:
+            consumer_name (str): 消费者名称
+            events (list): 事件字典列表
+
+        Raises:
+            Exception: 消费者抛出的异常，由调用方决定是否重试
+        """
+        consumer = self._consumers[consumer_name]
+        close_old_connections()
+        try:
+            consumer.handler(events)
+        finally:
+            close_old_connections()
+        consumer.record_batch(events)
+
+    # ========== 运维 ==========
+
+    def drain(self, timeout=5.0):
+        """
+        等待所有队列中的事件处理完毕
+
+        Args:
+            timeout (float): 最长等待时间（秒）
+
+        Returns:
+            bool: 是否在超时前处理完毕
+        """
+        deadline = time.monotonic() + timeout
+        for consumer in list(self._consumers.values()):
+            while consumer.queue.unfinished_tasks:
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.01)
+        return True
+
+    def get_stats(self):
+        """
+        获取各消费者的统计信息
+
+        Returns:
+            dict: 消费者名称 -> 统计字典（published, processed, failed, retries, batches,
+                  last_batch_size, last_lag_seconds, max_lag_seconds, queue_depth）
+        """
+        return {name: consumer.get_stats() for name, consumer in self._consumers.items()}
+
+
+# ========== 全局单例 ==========
+event_bus = EventBus()
+
+# 进程退出前尽量处理完已提交的事件
+atexit.register(event_bus.drain)
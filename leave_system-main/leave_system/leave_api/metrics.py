@@ -0,0 +1,67 @@
+"""
+审批流程指标
+
+工作流引擎、审批操作、代理人查找和积压情况的指标定义，
+通过 /metrics 暴露（见 leave_system.metrics）
+"""
+
+from leave_system.metrics import Counter, Gauge, Histogram, BYTES_BUCKETS
+
+# ========== 工作流引擎 ==========
+SPIFF_OPERATION_SECONDS = Histogram(
+    'spiff_operation_seconds', 'SpiffWorkflow 操作耗时（秒）', ('operation', 'result')
+)
+SPIFF_STATE_BYTES = Histogram(
+    'spiff_workflow_state_bytes', '序列化工作流状态大小（字节）', ('operation',), buckets=BYTES_BUCKETS
+)
+
+# ========== 审批操作 ==========
+APPROVAL_ACTIONS = Counter('approval_actions_total', '审批操作次数', ('action', 'result'))
+APPROVAL_ACTION_SECONDS = Histogram('approval_action_seconds', '审批操作耗时（秒，含事务提交）', ('action',))
+
+# ========== 代理人与组织架构查找 ==========
+PROXY_LOOKUPS = Counter(
+    'proxy_lookups_total', '有效审批人查找次数（direct / proxy / escalated / error）', ('outcome',)
+)
+PROXY_LOOKUP_SECONDS = Histogram('proxy_lookup_seconds', '有效审批人查找耗时（秒）')
+ORG_LOOKUPS = Counter(
+    'org_lookups_total', '工作流脚本中的组织架构查找次数', ('lookup', 'result')
+)
+
+# ========== 事件日志保留 ==========
+EVENT_LOGS_PRUNED = Counter('workflow_event_logs_pruned_total', '汇总后删除的工作流事件日志条数', ('status',))
+
+# ========== 积压 ==========
+PENDING_LEAVE_REQUESTS = Gauge(
+    'leave_requests_pending', '审批中的请假申请数量', ('status',), scrape_only=True
+)
+EVENT_BUS_QUEUE_DEPTH = Gauge('event_bus_queue_depth', '事件总线消费者队列中待处理的事件数', ('consumer',))
+
+# 审批中的状态（工作流运行中会写入 running）
+PENDING_STATUSES = ('pending', 'running')
+
+
+def _pending_leave_requests():
+    from django.db.models import Count
+    from leave_api.models import LeaveRequest
+
+    counts = dict(
+        LeaveRequest.objects.filter(status__in=PENDING_STATUSES)
+        .order_by()
+        .values_list('status')
+        .annotate(count=Count('id'))
+    )
+    return [({'status': status}, counts.get(status, 0)) for status in PENDING_STATUSES]
+
+
+def _event_bus_queue_depth():
+    from leave_api.event_bus import event_bus
+
+    return [
+        ({'consumer': name}, stats['queue_depth'])
+        for name, stats in event_bus.get_stats().items()
+    ]
+
+
+PENDING_LEAVE_REQUESTS.set_function(_pending_leave_requests)
+EVENT_BUS_QUEUE_DEPTH.set_function(_event_bus_queue_depth)
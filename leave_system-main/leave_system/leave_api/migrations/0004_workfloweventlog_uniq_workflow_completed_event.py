@@ -0,0 +1,36 @@
+# Generated by Django 4.2.9 on 2026-10-19 03:37
+
+from django.db import migrations, models
+
+
+def dedupe_completed_events(apps, schema_editor):
+    """删除同一实例重复的成功 workflow_completed 日志，只保留最早的一条，否则唯一约束无法建立"""
+    WorkflowEventLog = apps.get_model('leave_api', 'WorkflowEventLog')
+    seen = set()
+    duplicate_ids = []
+    rows = WorkflowEventLog.objects.filter(
+        event_type='workflow_completed',
+        status='success'
+    ).order_by('id').values_list('id', 'workflow_instance_id')
+    for log_id, instance_id in rows.iterator(chunk_size=1000):
+        if instance_id in seen:
+            duplicate_ids.append(log_id)
+        else:
+            seen.add(instance_id)
+    for start in range(0, len(duplicate_ids), 500):
+        WorkflowEventLog.objects.filter(id__in=duplicate_ids[start:start + 500]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leave_api', '0003_leaverequest_completed_at_leaverequest_duration_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_completed_events, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='workfloweventlog',
+            constraint=models.UniqueConstraint(condition=models.Q(('event_type', 'workflow_completed'), ('status', 'success')), fields=('workflow_instance_id', 'event_type'), name='uniq_workflow_completed_event'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.9 on 2026-10-19 03:38
+
+from django.db import migrations, models
+
+
+def backfill_event_keys(apps, schema_editor):
+    """为历史成功事件回填 event_key，重复事件只保留最早的一条"""
+    WorkflowEventLog = apps.get_model('leave_api', 'WorkflowEventLog')
+    seen = set()
+    batch = []
+    rows = WorkflowEventLog.objects.filter(
+        status='success',
+        event_type__in=['workflow_completed', 'task_ready']
+    ).order_by('id').only('id', 'event_type', 'workflow_instance_id', 'task_id')
+    for log in rows.iterator(chunk_size=1000):
+        key = f"{log.event_type}:{log.workflow_instance_id}:{log.task_id or ''}"
+        if key in seen:
+            continue
+        seen.add(key)
+        log.event_key = key
+        batch.append(log)
+        if len(batch) >= 1000:
+            WorkflowEventLog.objects.bulk_update(batch, ['event_key'])
+            batch = []
+    if batch:
+        WorkflowEventLog.objects.bulk_update(batch, ['event_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leave_api', '0004_workfloweventlog_uniq_workflow_completed_event'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='workfloweventlog',
+            name='uniq_workflow_completed_event',
+        ),
+        migrations.AddField(
+            model_name='workfloweventlog',
+            name='event_key',
+            field=models.CharField(blank=True, help_text='由事件类型、工作流实例 ID 和任务 ID 生成的确定性键，唯一索引保证同一事件只记录一次成功', max_length=255, null=True, unique=True, verbose_name='事件幂等键'),
+        ),
+        migrations.RunPython(backfill_event_keys, migrations.RunPython.noop),
+    ]
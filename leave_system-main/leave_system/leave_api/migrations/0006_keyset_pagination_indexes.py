@@ -0,0 +1,25 @@
+# Generated by Django 4.2.9 on 2026-10-19 03:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leave_api', '0005_workfloweventlog_event_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ccrecord',
+            index=models.Index(fields=['cc_to_email', 'created_at', 'id'], name='leave_api_c_cc_to_e_56aebd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ccrecord',
+            index=models.Index(fields=['leave_request', 'created_at', 'id'], name='leave_api_c_leave_r_c5f010_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['user_email', 'created_at', 'id'], name='leave_api_l_user_em_36ef56_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.9 on 2026-10-19 04:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leave_api', '0006_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaveRequestArchive',
+            fields=[
+                ('leave_request', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='archive', serialize=False, to='leave_api.leaverequest', verbose_name='请假申请')),
+                ('format_version', models.PositiveSmallIntegerField(default=1, verbose_name='格式版本')),
+                ('payload', models.BinaryField(help_text='zlib 压缩的 JSON：workflow_state、history、cc_records、event_logs', verbose_name='归档数据')),
+                ('history_count', models.PositiveIntegerField(default=0, verbose_name='审批历史条数')),
+                ('cc_count', models.PositiveIntegerField(default=0, verbose_name='抄送记录条数')),
+                ('event_count', models.PositiveIntegerField(default=0, verbose_name='事件日志条数')),
+                ('raw_bytes', models.PositiveIntegerField(default=0, verbose_name='压缩前大小')),
+                ('compressed_bytes', models.PositiveIntegerField(default=0, verbose_name='压缩后大小')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='归档时间')),
+            ],
+            options={
+                'verbose_name': '申请归档',
+                'verbose_name_plural': '申请归档',
+            },
+        ),
+        migrations.AddField(
+            model_name='leaverequest',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, help_text='归档后审批历史、抄送记录、事件日志和工作流状态移入 LeaveRequestArchive', null=True, verbose_name='归档时间'),
+        ),
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['status', 'updated_at'], name='leave_api_l_status_319092_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.9 on 2026-10-19 04:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leave_api', '0007_archive_tier'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkflowEventRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(help_text='事件创建日期（settings.TIME_ZONE）', verbose_name='日期')),
+                ('event_type', models.CharField(max_length=50, verbose_name='事件类型')),
+                ('status', models.CharField(choices=[('pending', '待处理'), ('success', '成功'), ('failed', '失败')], max_length=20, verbose_name='处理状态')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='事件数')),
+                ('first_event_at', models.DateTimeField(verbose_name='最早事件时间')),
+                ('last_event_at', models.DateTimeField(verbose_name='最晚事件时间')),
+            ],
+            options={
+                'verbose_name': '工作流事件汇总',
+                'verbose_name_plural': '工作流事件汇总',
+                'ordering': ['-day', 'event_type', 'status'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='workfloweventrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'event_type', 'status'), name='uniq_workflow_event_rollup'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.9 on 2026-10-19 04:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leave_api', '0008_workflow_event_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BpmnProcessCatalog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('process_id', models.CharField(help_text='相对 process_models 的路径（不含 .bpmn 后缀）', max_length=255, unique=True, verbose_name='流程 ID')),
+                ('name', models.CharField(max_length=200, verbose_name='流程名称')),
+                ('description', models.TextField(blank=True, default='', verbose_name='流程描述')),
+                ('relative_path', models.CharField(max_length=500, verbose_name='相对路径')),
+                ('metadata', models.JSONField(blank=True, default=dict, help_text='process_model.json 的内容', verbose_name='元数据')),
+                ('bpmn_mtime_ns', models.BigIntegerField(verbose_name='BPMN 文件修改时间（纳秒）')),
+                ('bpmn_size', models.BigIntegerField(verbose_name='BPMN 文件大小')),
+                ('metadata_mtime_ns', models.BigIntegerField(blank=True, help_text='没有 process_model.json 时为空', null=True, verbose_name='元数据文件修改时间（纳秒）')),
+                ('content_hash', models.CharField(help_text='BPMN 文件内容的 SHA-256', max_length=64, verbose_name='内容哈希')),
+                ('indexed_at', models.DateTimeField(auto_now=True, verbose_name='索引时间')),
+            ],
+            options={
+                'verbose_name': 'BPMN 流程目录',
+                'verbose_name_plural': 'BPMN 流程目录',
+                'ordering': ['process_id'],
+            },
+        ),
+    ]
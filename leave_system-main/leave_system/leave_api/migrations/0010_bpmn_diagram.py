@@ -0,0 +1,52 @@
+# Generated by Django 4.2.9 on 2026-10-19 04:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leave_api', '0009_process_catalog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BpmnDiagram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('process_id', models.CharField(help_text='与 BpmnProcessCatalog.process_id 一致', max_length=255, unique=True, verbose_name='流程 ID')),
+                ('process_ref', models.CharField(help_text='生成的 bpmn:process 元素的 id', max_length=255, verbose_name='BPMN 流程 ID')),
+                ('revision', models.PositiveIntegerField(default=0, help_text='每次有变化的保存加 1，用于检测并发保存', verbose_name='版本号')),
+                ('content_hash', models.CharField(blank=True, default='', help_text='最近一次写入的 BPMN 文件内容的 SHA-1', max_length=40, verbose_name='BPMN 内容哈希')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': 'BPMN 流程图',
+                'verbose_name_plural': 'BPMN 流程图',
+            },
+        ),
+        migrations.CreateModel(
+            name='BpmnDiagramElement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('element_id', models.CharField(help_text='设计器中的 ID，同时作为 BPMN 元素 id', max_length=255, verbose_name='元素 ID')),
+                ('kind', models.CharField(choices=[('node', '节点'), ('edge', '连线')], max_length=10, verbose_name='类型')),
+                ('element_type', models.CharField(help_text='如 bpmn:userTask', max_length=50, verbose_name='BPMN 类型')),
+                ('data', models.JSONField(verbose_name='设计器数据')),
+                ('content_hash', models.CharField(max_length=40, verbose_name='内容哈希')),
+                ('semantic_xml', models.TextField(verbose_name='BPMN 语义片段')),
+                ('di_xml', models.TextField(verbose_name='BPMN 图形片段')),
+                ('diagram', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='elements', to='leave_api.bpmndiagram', verbose_name='流程图')),
+            ],
+            options={
+                'verbose_name': 'BPMN 流程图元素',
+                'verbose_name_plural': 'BPMN 流程图元素',
+                'ordering': ['diagram', 'kind', 'element_id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='bpmndiagramelement',
+            constraint=models.UniqueConstraint(fields=('diagram', 'element_id'), name='uniq_bpmn_diagram_element'),
+        ),
+    ]
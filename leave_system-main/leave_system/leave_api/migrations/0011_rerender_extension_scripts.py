@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+def rerender_extension_scripts(apps, schema_editor):
+    """
+    重新生成带 preScript / postScript 的节点片段
+
+    之前这两个属性被写成了 spiffworkflow:property，已保存的片段沿用到下次保存时会丢失脚本；
+    重新生成后，下次保存拼接出的文件包含 spiffworkflow:preScript / postScript
+    """
+    from leave_api.bpmn_diagram import DiagramError, render_node
+
+    BpmnDiagramElement = apps.get_model('leave_api', 'BpmnDiagramElement')
+    batch = []
+    for element in BpmnDiagramElement.objects.filter(kind='node').iterator(chunk_size=500):
+        properties = (element.data or {}).get('properties') or {}
+        if not isinstance(properties, dict) or not ({'preScript', 'postScript'} & properties.keys()):
+            continue
+        try:
+            element.semantic_xml, element.di_xml = render_node(element.data)
+        except DiagramError:
+            continue
+        batch.append(element)
+    BpmnDiagramElement.objects.bulk_update(batch, ['semantic_xml', 'di_xml'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leave_api', '0010_bpmn_diagram'),
+    ]
+
+    operations = [
+        migrations.RunPython(rerender_extension_scripts, migrations.RunPython.noop),
+    ]
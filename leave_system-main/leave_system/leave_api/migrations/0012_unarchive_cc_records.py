@@ -0,0 +1,64 @@
+import zlib
+
+import orjson
+from django.db import migrations, models
+
+
+def unarchive_cc_records(apps, schema_editor):
+    """
+    把 1 版归档中的抄送记录移回热表，payload 改写为 2 版
+
+    抄送记录保留原来的 ID 和创建时间；“我的抄送”、标记已读和添加抄送只查热表
+    """
+    LeaveRequestArchive = apps.get_model('leave_api', 'LeaveRequestArchive')
+    CCRecord = apps.get_model('leave_api', 'CCRecord')
+    fields = {field.attname: field for field in CCRecord._meta.concrete_fields}
+
+    ids = list(LeaveRequestArchive.objects.filter(format_version=1).values_list('pk', flat=True))
+    for archive in LeaveRequestArchive.objects.filter(pk__in=ids):
+        payload = orjson.loads(zlib.decompress(bytes(archive.payload)))
+        rows = [
+            {name: fields[name].to_python(value) for name, value in row.items()}
+            for row in payload.pop('cc_records', [])
+        ]
+        objs = CCRecord.objects.bulk_create([CCRecord(**row) for row in rows])
+        # auto_now_add 在插入时会覆盖 created_at，插入后写回原值
+        for obj, row in zip(objs, rows):
+            obj.created_at = row['created_at']
+        CCRecord.objects.bulk_update(objs, ['created_at'])
+
+        raw = orjson.dumps(payload)
+        archive.payload = zlib.compress(raw, 6)
+        archive.format_version = 2
+        archive.cc_count = 0
+        archive.raw_bytes = len(raw)
+        archive.compressed_bytes = len(archive.payload)
+        archive.save(update_fields=[
+            'payload', 'format_version', 'cc_count', 'raw_bytes', 'compressed_bytes'
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leave_api', '0011_rerender_extension_scripts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='leaverequest',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, help_text='归档后审批历史、事件日志和工作流状态移入 LeaveRequestArchive', null=True, verbose_name='归档时间'),
+        ),
+        migrations.AlterField(
+            model_name='leaverequestarchive',
+            name='cc_count',
+            field=models.PositiveIntegerField(default=0, help_text='只有 1 版归档包含抄送记录，2 版起为 0', verbose_name='抄送记录条数'),
+        ),
+        migrations.AlterField(
+            model_name='leaverequestarchive',
+            name='payload',
+            field=models.BinaryField(help_text='zlib 压缩的 JSON：workflow_state、history、event_logs', verbose_name='归档数据'),
+        ),
+        migrations.RunPython(unarchive_cc_records, migrations.RunPython.noop),
+    ]
@@ -202,6 +202,13 @@ class LeaveRequest(models.Model):
         help_text='提交审批的时间'
     )
     
+    archived_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='归档时间',
+        help_text='归档后审批历史、事件日志和工作流状态移入 LeaveRequestArchive'
+    )
+    
     class Meta:
         """模型元数据配置"""
         verbose_name = '请假申请'
@@ -214,6 +221,10 @@ class LeaveRequest(models.Model):
             models.Index(fields=['status', 'created_at']),
             # 单字段索引：按流程实例 ID 查询（用于关联工作流）
             models.Index(fields=['process_instance_id']),
+            # 复合索引：我的申请列表按 (created_at, id) 键集分页
+            models.Index(fields=['user_email', 'created_at', 'id']),
+            # 复合索引：归档任务按状态和最后更新时间筛选已结束的申请
+            models.Index(fields=['status', 'updated_at']),
         ]
     
     def __str__(self):
@@ -221,6 +232,72 @@ class LeaveRequest(models.Model):
         return f"{self.staff_full_name or self.user_email} - {self.reason[:20]}"
 
 
+class LeaveRequestArchive(models.Model):
+    """
+    已归档申请的冷数据
+    
+    一个申请的工作流状态、审批历史和事件日志压缩为一条记录，
+    热表中保留 LeaveRequest 本身（archived_at 非空，workflow_state 清空）和抄送记录。
+    payload 为 zlib 压缩的 JSON，格式由 format_version 标识，
+    读写见 leave_api.services.archive_service
+    """
+    leave_request = models.OneToOneField(
+        LeaveRequest,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='archive',
+        verbose_name='请假申请'
+    )
+    
+    format_version = models.PositiveSmallIntegerField(
+        default=1,
+        verbose_name='格式版本'
+    )
+    
+    payload = models.BinaryField(
+        verbose_name='归档数据',
+        help_text='zlib 压缩的 JSON：workflow_state、history、event_logs'
+    )
+    
+    history_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='审批历史条数'
+    )
+    
+    cc_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='抄送记录条数',
+        help_text='只有 1 版归档包含抄送记录，2 版起为 0'
+    )
+    
+    event_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='事件日志条数'
+    )
+    
+    raw_bytes = models.PositiveIntegerField(
+        default=0,
+        verbose_name='压缩前大小'
+    )
+    
+    compressed_bytes = models.PositiveIntegerField(
+        default=0,
+        verbose_name='压缩后大小'
+    )
+    
+    archived_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='归档时间'
+    )
+    
+    class Meta:
+        verbose_name = '申请归档'
+        verbose_name_plural = '申请归档'
+    
+    def __str__(self):
+        return f"归档 - {self.leave_request_id}"
+
+
 class ApprovalHistory(models.Model):
     """审批历史记录"""
     ACTION_CHOICES = [
@@ -388,6 +465,9 @@ class CCRecord(models.Model):
         indexes = [
             models.Index(fields=['leave_request']),
             models.Index(fields=['cc_to_email', 'is_read']),
+            # 抄送列表按 (created_at, id) 键集分页
+            models.Index(fields=['cc_to_email', 'created_at', 'id']),
+            models.Index(fields=['leave_request', 'created_at', 'id']),
         ]
     
     def __str__(self):
@@ -495,6 +575,15 @@ class WorkflowEventLog(models.Model):
         ('failed', '失败'),
     ]
     
+    event_key = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        unique=True,
+        verbose_name='事件幂等键',
+        help_text='由事件类型、工作流实例 ID 和任务 ID 生成的确定性键，唯一索引保证同一事件只记录一次成功'
+    )
+    
     workflow_instance_id = models.CharField(
         max_length=100,
         verbose_name='工作流实例ID'
@@ -550,3 +639,255 @@ class WorkflowEventLog(models.Model):
     
     def __str__(self):
         return f"{self.event_type} - {self.workflow_instance_id}"
+    
+    @staticmethod
+    def build_event_key(event_type, workflow_instance_id, task_id=None):
+        """
+        生成事件幂等键
+        
+        Args:
+            event_type: 事件类型
+            workflow_instance_id: 工作流实例 ID
+            task_id: 任务 ID（可选）
+            
+        Returns:
+            str: 形如 "task_ready:<实例ID>:<任务ID>" 的确定性键
+        """
+        return f"{event_type}:{workflow_instance_id}:{task_id or ''}"
+
+
+class WorkflowEventRollup(models.Model):
+    """
+    工作流事件日志按天汇总
+    
+    超过保留期的 WorkflowEventLog 删除前按（日期、事件类型、处理状态）累加到这里，
+    删除原始记录后仍可统计历史事件量，见 leave_api.services.event_retention_service
+    """
+    day = models.DateField(
+        verbose_name='日期',
+        help_text='事件创建日期（settings.TIME_ZONE）'
+    )
+    
+    event_type = models.CharField(
+        max_length=50,
+        verbose_name='事件类型'
+    )
+    
+    status = models.CharField(
+        max_length=20,
+        choices=WorkflowEventLog.STATUS_CHOICES,
+        verbose_name='处理状态'
+    )
+    
+    count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='事件数'
+    )
+    
+    first_event_at = models.DateTimeField(
+        verbose_name='最早事件时间'
+    )
+    
+    last_event_at = models.DateTimeField(
+        verbose_name='最晚事件时间'
+    )
+    
+    class Meta:
+        verbose_name = '工作流事件汇总'
+        verbose_name_plural = '工作流事件汇总'
+        ordering = ['-day', 'event_type', 'status']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'event_type', 'status'], name='uniq_workflow_event_rollup'),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.event_type} {self.status}: {self.count}"
+
+
+class BpmnProcessCatalog(models.Model):
+    """
+    BPMN 流程目录索引
+
+    process_models 目录下每个 .bpmn 文件一条记录，保存流程列表需要的元数据（来自同目录的
+    process_model.json）以及文件的修改时间、大小和内容哈希。流程列表直接查询本表，
+    不再逐个扫描文件；由 leave_api.services.process_catalog 在流程增删改时更新，
+    并定期按 (修改时间, 大小) 与目录对账
+    """
+    process_id = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name='流程 ID',
+        help_text='相对 process_models 的路径（不含 .bpmn 后缀）'
+    )
+
+    name = models.CharField(
+        max_length=200,
+        verbose_name='流程名称'
+    )
+
+    description = models.TextField(
+        blank=True,
+        default='',
+        verbose_name='流程描述'
+    )
+
+    relative_path = models.CharField(
+        max_length=500,
+        verbose_name='相对路径'
+    )
+
+    metadata = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='元数据',
+        help_text='process_model.json 的内容'
+    )
+
+    bpmn_mtime_ns = models.BigIntegerField(
+        verbose_name='BPMN 文件修改时间（纳秒）'
+    )
+
+    bpmn_size = models.BigIntegerField(
+        verbose_name='BPMN 文件大小'
+    )
+
+    metadata_mtime_ns = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='元数据文件修改时间（纳秒）',
+        help_text='没有 process_model.json 时为空'
+    )
+
+    content_hash = models.CharField(
+        max_length=64,
+        verbose_name='内容哈希',
+        help_text='BPMN 文件内容的 SHA-256'
+    )
+
+    indexed_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='索引时间'
+    )
+
+    class Meta:
+        verbose_name = 'BPMN 流程目录'
+        verbose_name_plural = 'BPMN 流程目录'
+        ordering = ['process_id']
+
+    def __str__(self):
+        return f"{self.process_id} ({self.name})"
+
+
+class BpmnDiagram(models.Model):
+    """
+    设计器（LogicFlow）保存的流程图
+
+    节点和连线逐条保存在 BpmnDiagramElement 中，保存时只为新增或变化的元素重新生成 BPMN 片段，
+    见 leave_api.services.diagram_service
+    """
+    process_id = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name='流程 ID',
+        help_text='与 BpmnProcessCatalog.process_id 一致'
+    )
+
+    process_ref = models.CharField(
+        max_length=255,
+        verbose_name='BPMN 流程 ID',
+        help_text='生成的 bpmn:process 元素的 id'
+    )
+
+    revision = models.PositiveIntegerField(
+        default=0,
+        verbose_name='版本号',
+        help_text='每次有变化的保存加 1，用于检测并发保存'
+    )
+
+    content_hash = models.CharField(
+        max_length=40,
+        blank=True,
+        default='',
+        verbose_name='BPMN 内容哈希',
+        help_text='最近一次写入的 BPMN 文件内容的 SHA-1'
+    )
+
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='更新时间'
+    )
+
+    class Meta:
+        verbose_name = 'BPMN 流程图'
+        verbose_name_plural = 'BPMN 流程图'
+
+    def __str__(self):
+        return f"{self.process_id} r{self.revision}"
+
+
+class BpmnDiagramElement(models.Model):
+    """
+    流程图中的一个节点或连线
+
+    data 保存设计器提交的原始数据，content_hash 为其规范化 JSON 的哈希；
+    semantic_xml / di_xml 是由 data 生成的 BPMN 语义元素和图形元素片段
+    """
+    KIND_NODE = 'node'
+    KIND_EDGE = 'edge'
+    KIND_CHOICES = [
+        (KIND_NODE, '节点'),
+        (KIND_EDGE, '连线'),
+    ]
+
+    diagram = models.ForeignKey(
+        BpmnDiagram,
+        on_delete=models.CASCADE,
+        related_name='elements',
+        verbose_name='流程图'
+    )
+
+    element_id = models.CharField(
+        max_length=255,
+        verbose_name='元素 ID',
+        help_text='设计器中的 ID，同时作为 BPMN 元素 id'
+    )
+
+    kind = models.CharField(
+        max_length=10,
+        choices=KIND_CHOICES,
+        verbose_name='类型'
+    )
+
+    element_type = models.CharField(
+        max_length=50,
+        verbose_name='BPMN 类型',
+        help_text='如 bpmn:userTask'
+    )
+
+    data = models.JSONField(
+        verbose_name='设计器数据'
+    )
+
+    content_hash = models.CharField(
+        max_length=40,
+        verbose_name='内容哈希'
+    )
+
+    semantic_xml = models.TextField(
+        verbose_name='BPMN 语义片段'
+    )
+
+    di_xml = models.TextField(
+        verbose_name='BPMN 图形片段'
+    )
+
+    class Meta:
+        verbose_name = 'BPMN 流程图元素'
+        verbose_name_plural = 'BPMN 流程图元素'
+        ordering = ['diagram', 'kind', 'element_id']
+        constraints = [
+            models.UniqueConstraint(fields=['diagram', 'element_id'], name='uniq_bpmn_diagram_element'),
+        ]
+
+    def __str__(self):
+        return f"{self.diagram_id}:{self.element_id} ({self.element_type})"
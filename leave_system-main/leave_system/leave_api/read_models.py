@@ -0,0 +1,231 @@
+"""
+只读列表的读模型
+
+列表接口只需要少数几列，直接实例化 LeaveRequest 会连同体积很大的 workflow_state
+一起加载，并为每行调用 get_xxx_display()。本模块用 values() 只查询需要的列，
+通过预先计算的选项映射表转换显示名称，直接生成响应行
+
+每组读模型由两部分组成：
+- XXX_FIELDS: 传给 values() 的列名（包含键集分页需要的排序字段）
+- xxx_row(row): 把 values() 返回的字典转换为响应行，输出与原有视图逐字段一致
+
+用法：
+    rows = LeaveRequest.objects.filter(...).values(*LEAVE_REQUEST_LIST_FIELDS)
+    data = [leave_request_list_row(row) for row in rows]
+"""
+
+from django.db.models import OuterRef, Subquery
+from rest_framework import serializers
+from .models import LeaveRequest, ApprovalHistory
+
+# ========== 预先计算的选项映射 ==========
+# 与 get_xxx_display() 一致：未知取值原样返回
+STATUS_LABELS = dict(LeaveRequest.STATUS_CHOICES)
+LEAVE_TYPE_LABELS = dict(LeaveRequest.LEAVE_TYPE_CHOICES)
+ACTION_LABELS = dict(ApprovalHistory.ACTION_CHOICES)
+
+# 与 LeaveRequestSerializer 相同的字段表示，只创建一次
+_datetime_field = serializers.DateTimeField()
+_date_field = serializers.DateField()
+_duration_field = serializers.DecimalField(max_digits=5, decimal_places=1)
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _drf(field, value):
+    return field.to_representation(value) if value is not None else None
+
+
+# ========== 我的申请列表 ==========
+
+LEAVE_REQUEST_LIST_FIELDS = (
+    'id', 'user_email', 'staff_full_name', 'staff_dept', 'reason', 'leave_hours',
+    'leave_type', 'duration', 'start_date', 'end_date', 'status',
+    'process_instance_id', 'workflow_spec_name', 'created_at', 'submitted_at', 'completed_at',
+)
+
+
+def leave_request_list_row(row):
+    """我的申请列表的一行"""
+    return {
+        'id': row['id'],
+        'user_email': row['user_email'],
+        'staff_full_name': row['staff_full_name'],
+        'staff_dept': row['staff_dept'],
+        'reason': row['reason'],
+        'leave_hours': row['leave_hours'],
+        'leave_type': row['leave_type'],
+        'duration': float(row['duration']) if row['duration'] else None,
+        'start_date': _iso(row['start_date']),
+        'end_date': _iso(row['end_date']),
+        'status': row['status'],
+        'status_display': STATUS_LABELS.get(row['status'], row['status']),
+        'process_instance_id': row['process_instance_id'],
+        'workflow_spec_name': row['workflow_spec_name'],
+        'created_at': row['created_at'].isoformat(),
+        'submitted_at': _iso(row['submitted_at']),
+        'completed_at': _iso(row['completed_at']),
+    }
+
+
+# ========== 申请摘要（审批历史等详情页的表头） ==========
+
+LEAVE_REQUEST_SUMMARY_FIELDS = (
+    'id', 'user_email', 'staff_full_name', 'staff_dept', 'reason', 'leave_hours',
+    'leave_type', 'status', 'created_at', 'submitted_at', 'completed_at',
+)
+
+
+def leave_request_summary_row(row):
+    """申请摘要"""
+    return {
+        'id': row['id'],
+        'user_email': row['user_email'],
+        'staff_full_name': row['staff_full_name'],
+        'staff_dept': row['staff_dept'],
+        'reason': row['reason'],
+        'leave_hours': row['leave_hours'],
+        'leave_type': row['leave_type'],
+        'status': row['status'],
+        'status_display': STATUS_LABELS.get(row['status'], row['status']),
+        'created_at': row['created_at'].isoformat(),
+        'submitted_at': _iso(row['submitted_at']),
+        'completed_at': _iso(row['completed_at']),
+    }
+
+
+# ========== 审批历史 ==========
+
+APPROVAL_HISTORY_FIELDS = (
+    'id', 'action', 'operator_email', 'operator_name', 'operator_role', 'comment',
+    'is_proxy', 'proxy_for_email', 'task_id', 'task_name', 'created_at',
+)
+
+
+def approval_history_row(row):
+    """审批历史的一行"""
+    return {
+        'id': row['id'],
+        'action': row['action'],
+        'action_display': ACTION_LABELS.get(row['action'], row['action']),
+        'operator_email': row['operator_email'],
+        'operator_name': row['operator_name'],
+        'operator_role': row['operator_role'],
+        'comment': row['comment'],
+        'is_proxy': row['is_proxy'],
+        'proxy_for_email': row['proxy_for_email'],
+        'task_id': row['task_id'],
+        'task_name': row['task_name'],
+        'created_at': row['created_at'].isoformat(),
+    }
+
+
+# ========== 抄送记录 ==========
+
+CC_RECORD_FIELDS = (
+    'id', 'cc_to_email', 'cc_by_email', 'is_read', 'created_at', 'read_at',
+)
+
+# 我的抄送列表额外带出申请摘要（通过 JOIN 列取值，不实例化 LeaveRequest）
+MY_CC_RECORD_FIELDS = CC_RECORD_FIELDS + (
+    'leave_request__id', 'leave_request__user_email', 'leave_request__staff_full_name',
+    'leave_request__staff_dept', 'leave_request__reason', 'leave_request__leave_hours',
+    'leave_request__leave_type', 'leave_request__status', 'leave_request__created_at',
+)
+
+
+def cc_record_row(row):
+    """抄送记录的一行"""
+    return {
+        'id': row['id'],
+        'cc_to_email': row['cc_to_email'],
+        'cc_by_email': row['cc_by_email'],
+        'is_read': row['is_read'],
+        'created_at': row['created_at'].isoformat(),
+        'read_at': _iso(row['read_at']),
+    }
+
+
+def my_cc_record_row(row):
+    """我的抄送列表的一行"""
+    status = row['leave_request__status']
+    return {
+        'id': row['id'],
+        'leave_request': {
+            'id': row['leave_request__id'],
+            'user_email': row['leave_request__user_email'],
+            'staff_full_name': row['leave_request__staff_full_name'],
+            'staff_dept': row['leave_request__staff_dept'],
+            'reason': row['leave_request__reason'],
+            'leave_hours': row['leave_request__leave_hours'],
+            'leave_type': row['leave_request__leave_type'],
+            'status': status,
+            'status_display': STATUS_LABELS.get(status, status),
+            'created_at': row['leave_request__created_at'].isoformat()
+        },
+        'cc_by_email': row['cc_by_email'],
+        'is_read': row['is_read'],
+        'created_at': row['created_at'].isoformat(),
+        'read_at': _iso(row['read_at']),
+    }
+
+
+# ========== 待办任务中的申请（与 LeaveRequestSerializer 输出一致） ==========
+
+LEAVE_REQUEST_API_FIELDS = (
+    'id', 'user_email', 'staff_full_name', 'staff_dept', 'reason', 'leave_hours',
+    'leave_type', 'start_date', 'end_date', 'duration', 'status',
+    'process_instance_id', 'workflow_spec_name', 'created_at', 'submitted_at', 'completed_at',
+)
+
+
+def leave_request_api_row(row):
+    """
+    与 LeaveRequestSerializer(leave_request).data 相同的表示
+
+    日期、时间和小数使用与序列化器相同的 DRF 字段转换，避免逐行构建序列化器
+    """
+    return {
+        'id': row['id'],
+        'user_email': row['user_email'],
+        'staff_full_name': row['staff_full_name'],
+        'staff_dept': row['staff_dept'],
+        'reason': row['reason'],
+        'leave_hours': row['leave_hours'],
+        'leave_type': row['leave_type'],
+        'leave_type_display': LEAVE_TYPE_LABELS.get(row['leave_type'], row['leave_type']),
+        'start_date': _drf(_date_field, row['start_date']),
+        'end_date': _drf(_date_field, row['end_date']),
+        'duration': _drf(_duration_field, row['duration']),
+        'status': row['status'],
+        'status_display': STATUS_LABELS.get(row['status'], row['status']),
+        'process_instance_id': row['process_instance_id'],
+        'workflow_spec_name': row['workflow_spec_name'],
+        'created_at': _drf(_datetime_field, row['created_at']),
+        'submitted_at': _drf(_datetime_field, row['submitted_at']),
+        'completed_at': _drf(_datetime_field, row['completed_at']),
+    }
+
+
+def pending_requests_with_latest_history(queryset=None):
+    """
+    待审批申请及其最近一条审批历史（单条查询）
+
+    以子查询带出最近审批记录的操作人和时间，替代逐条查询审批历史
+
+    Args:
+        queryset: LeaveRequest 查询集，默认所有待审批申请
+
+    Returns:
+        QuerySet: values() 查询集，包含 LEAVE_REQUEST_API_FIELDS 以及
+                  latest_operator_email, latest_history_at
+    """
+    if queryset is None:
+        queryset = LeaveRequest.objects.filter(status='pending')
+    latest = ApprovalHistory.objects.filter(leave_request=OuterRef('pk')).order_by('-created_at')
+    return queryset.annotate(
+        latest_operator_email=Subquery(latest.values('operator_email')[:1]),
+        latest_history_at=Subquery(latest.values('created_at')[:1]),
+    ).values(*LEAVE_REQUEST_API_FIELDS, 'latest_operator_email', 'latest_history_at')
@@ -0,0 +1,249 @@
+"""
+BPMN 脚本引擎模块
+
+提供进程级共享、线程安全的 SpiffWorkflow 脚本引擎
+
+主要功能：
+1. 全进程复用同一个 PythonScriptEngine 实例，避免每次反序列化/启动时重建
+2. 按流程规范版本缓存 conditionExpression 与脚本任务的编译结果（code object）
+3. 加载流程规范时预编译全部条件表达式和脚本
+4. 通过计数器暴露缓存命中情况
+
+说明：
+- 规范版本由 BPMN 文件内容哈希决定，文件变化后旧版本的编译结果会被整体淘汰
+- 脚本环境中的函数只读共享，每次求值都使用独立的 globals 副本，因此可跨线程复用
+"""
+
+import logging
+import threading
+from SpiffWorkflow.exceptions import SpiffWorkflowException
+from SpiffWorkflow.bpmn.exceptions import WorkflowTaskException
+from SpiffWorkflow.bpmn.PythonScriptEngine import PythonScriptEngine
+from SpiffWorkflow.bpmn.PythonScriptEngineEnvironment import TaskDataEnvironment
+from leave_system.metrics import CACHE_REQUESTS
+from leave_system.tracing import start_span
+
+logger = logging.getLogger(__name__)
+
+# 未注册版本的流程规范使用的缓存命名空间
+UNVERSIONED = ''
+
+
+class CompiledCodeCache:
+    """
+    编译结果缓存
+
+    以 (规范版本, 编译模式, 源码) 为键缓存 code object
+
+    属性:
+        hits (int): 命中次数
+        misses (int): 未命中（即时编译）次数
+        precompiled (int): 加载规范时预编译的数量
+        evictions (int): 因规范版本变化而淘汰的数量
+        errors (int): 编译失败次数
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        # 规范名称 -> 当前版本
+        self._spec_versions = {}
+        self.hits = 0
+        self.misses = 0
+        self.precompiled = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def register_spec(self, spec_name, version):
+        """
+        登记流程规范的当前版本
+
+        同名规范的旧版本编译结果会被淘汰
+
+        Args:
+            spec_name (str): 流程规范名称（BPMN process id）
+            version (str): 规范版本（内容哈希）
+        """
+        with self._lock:
+            old_version = self._spec_versions.get(spec_name)
+            self._spec_versions[spec_name] = version
+            if old_version is None or old_version == version:
+                return
+            # 其他规范仍在使用的版本不能淘汰
+            if old_version in self._spec_versions.values():
+                return
+            stale = [key for key in self._entries if key[0] == old_version]
+            for key in stale:
+                del self._entries[key]
+            self.evictions += len(stale)
+        logger.info(f"流程规范 {spec_name} 版本变化: {old_version} -> {version}, 淘汰 {len(stale)} 条编译缓存")
+
+    def version_for(self, spec_name):
+        """获取流程规范的当前版本，未登记时返回 UNVERSIONED"""
+        return self._spec_versions.get(spec_name, UNVERSIONED)
+
+    def get(self, version, source, mode):
+        """
+        获取编译结果，未命中时即时编译并缓存
+
+        Args:
+            version (str): 规范版本
+            source (str): 表达式或脚本源码
+            mode (str): 'eval' 或 'exec'
+
+        Returns:
+            code: 编译后的 code object
+
+        Raises:
+            SyntaxError: 源码无法编译
+        """
+        key = (version, mode, source)
+        code = self._entries.get(key)
+        if code is not None:
+            self.hits += 1
+            CACHE_REQUESTS.inc(cache='script_code', result='hit')
+            return code
+
+        code = self._compile(source, mode)
+        with self._lock:
+            self._entries[key] = code
+            self.misses += 1
+        CACHE_REQUESTS.inc(cache='script_code', result='miss')
+        return code
+
+    def precompile(self, version, source, mode):
+        """
+        预编译并缓存，已存在时跳过
+
+        Returns:
+            bool: 是否编译成功
+        """
+        key = (version, mode, source)
+        if key in self._entries:
+            return True
+        try:
+            code = self._compile(source, mode)
+        except SyntaxError as e:
+            self.errors += 1
+            logger.warning(f"预编译失败（版本 {version}）: {source!r}: {e}")
+            return False
+        with self._lock:
+            self._entries[key] = code
+            self.precompiled += 1
+        return True
+
+    def _compile(self, source, mode):
+        # 文件名保持 '<string>'，与 PythonScriptEngine 的错误行号定位逻辑一致
+        return compile(source, '<string>', mode)
+
+    def clear(self):
+        """清空全部缓存和计数"""
+        with self._lock:
+            self._entries.clear()
+            self._spec_versions.clear()
+            self.hits = self.misses = self.precompiled = self.evictions = self.errors = 0
+
+    def get_stats(self):
+        """
+        获取缓存统计
+
+        Returns:
+            dict: 包含 entries, specs, hits, misses, precompiled, evictions, errors, hit_rate 的字典
+        """
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'specs': dict(self._spec_versions),
+            'hits': self.hits,
+            'misses': self.misses,
+            'precompiled': self.precompiled,
+            'evictions': self.evictions,
+            'errors': self.errors,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class CachingScriptEngine(PythonScriptEngine):
+    """
+    带编译缓存的脚本引擎
+
+    在 PythonScriptEngine 的基础上，把表达式和脚本源码替换为缓存中的 code object
+    再交给 TaskDataEnvironment 执行；错误信息仍使用原始源码生成
+    """
+
+    def __init__(self, environment_globals, code_cache):
+        super().__init__(environment=TaskDataEnvironment(environment_globals))
+        self.code_cache = code_cache
+
+    def _version_for_task(self, task):
+        workflow = getattr(task, 'workflow', None)
+        spec = getattr(workflow, 'spec', None)
+        return self.code_cache.version_for(getattr(spec, 'name', None))
+
+    def _span_attributes(self, task):
+        task_spec = getattr(task, 'task_spec', None)
+        return {'bpmn.task': getattr(task_spec, 'name', None) or ''}
+
+    def evaluate(self, task, expression, external_methods=None):
+        if not isinstance(expression, str):
+            return super().evaluate(task, expression, external_methods)
+        with start_span('bpmn.script.evaluate', attributes=self._span_attributes(task)):
+            try:
+                code = self.code_cache.get(self._version_for_task(task), expression, 'eval')
+                return self._evaluate(code, task.data, external_methods)
+            except SpiffWorkflowException as se:
+                se.add_note(f"Error evaluating expression '{expression}'")
+                raise se
+            except Exception as e:
+                raise WorkflowTaskException(f"Error evaluating expression '{expression}'", task=task, exception=e)
+
+    def execute(self, task, script, external_methods=None):
+        with start_span('bpmn.script.execute', attributes=self._span_attributes(task)):
+            try:
+                code = self.code_cache.get(self._version_for_task(task), script, 'exec')
+            except SyntaxError as err:
+                raise self.create_task_exec_exception(task, script, err)
+            try:
+                return self._execute(code, task.data, external_methods or {})
+            except Exception as err:
+                raise self.create_task_exec_exception(task, script, err)
+
+
+def iter_task_sources(task_spec):
+    """
+    遍历单个任务规范中需要编译的源码
+
+    Args:
+        task_spec: 任务规范对象
+
+    Yields:
+        tuple: (源码, 编译模式)
+    """
+    for condition, _ in getattr(task_spec, 'cond_task_specs', None) or []:
+        args = getattr(condition, 'args', None)
+        if args and isinstance(args[0], str):
+            yield args[0], 'eval'
+    for attr in ('script', 'prescript', 'postscript'):
+        script = getattr(task_spec, attr, None)
+        if isinstance(script, str) and script.strip():
+            yield script, 'exec'
+
+
+def iter_spec_sources(spec):
+    """
+    遍历流程规范中所有需要编译的源码
+
+    包括网关条件（conditionExpression）、脚本任务以及 Spiff 扩展的前置/后置脚本
+
+    Args:
+        spec: BpmnProcessSpec 流程规范对象
+
+    Yields:
+        tuple: (源码, 编译模式)
+    """
+    for task_spec in spec.task_specs.values():
+        yield from iter_task_sources(task_spec)
+
+
+# ========== 进程级共享实例 ==========
+code_cache = CompiledCodeCache()
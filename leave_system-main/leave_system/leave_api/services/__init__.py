@@ -5,5 +5,12 @@ leave_api 服务层
 from .approval_service import ApprovalService
 from .rule_service import ApprovalRuleService
 from .proxy_service import ProxyService
+from .archive_service import ArchiveService
+from .event_retention_service import EventLogRetentionService
+from .process_catalog import ProcessCatalogService
+from .bpmn_validation import BpmnValidationService
+from .diagram_service import BpmnDiagramService
 
-__all__ = ['ApprovalService', 'ApprovalRuleService', 'ProxyService']
+__all__ = ['ApprovalService', 'ApprovalRuleService', 'ProxyService', 'ArchiveService', 'EventLogRetentionService',
+           'ProcessCatalogService', 'BpmnValidationService',
+           'BpmnDiagramService']
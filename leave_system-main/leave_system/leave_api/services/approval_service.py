@@ -3,10 +3,15 @@
 实现审批流程的核心业务逻辑
 """
 
+import functools
 import logging
+import time
 from django.db import transaction
 from django.utils import timezone
 from leave_api.models import LeaveRequest, ApprovalHistory
+from leave_api.metrics import APPROVAL_ACTIONS, APPROVAL_ACTION_SECONDS
+from leave_system.sqlite import serialized_write
+from leave_system.tracing import trace_methods
 from leave_api.services.rule_service import ApprovalRuleService
 from leave_api.spiff_client_v2 import spiff_client
 from leave_api.signals import trigger_workflow_completed, trigger_task_ready
@@ -15,6 +20,29 @@ from notifications.tasks import send_email_notification, send_in_app_notificatio
 logger = logging.getLogger(__name__)
 
 
+def instrumented_action(action):
+    """
+    记录审批操作的次数和耗时
+
+    放在 serialized_write 和 transaction.atomic 外层，耗时包含排队、重试和事务提交
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = 'error'
+            try:
+                value = func(*args, **kwargs)
+                result = 'success'
+                return value
+            finally:
+                APPROVAL_ACTION_SECONDS.observe(time.perf_counter() - start, action=action)
+                APPROVAL_ACTIONS.inc(action=action, result=result)
+        return wrapper
+    return decorator
+
+
+@trace_methods
 class ApprovalService:
     """
     审批服务类
@@ -29,6 +57,8 @@ class ApprovalService:
     def __init__(self):
         self.rule_service = ApprovalRuleService()
     
+    @instrumented_action('submit')
+    @serialized_write()
     @transaction.atomic
     def submit_leave_request(self, leave_request):
         """
@@ -91,6 +121,8 @@ class ApprovalService:
             logger.error(f"提交请假申请失败: {e}", exc_info=True)
             raise
     
+    @instrumented_action('approve')
+    @serialized_write()
     @transaction.atomic
     def approve_task(self, leave_request, task_id, approver_email, approver_name, comment=''):
         """
@@ -127,7 +159,8 @@ class ApprovalService:
             if not result:
                 raise Exception("完成任务失败")
             
-            # 3. 更新申请状态
+            # 3. 更新申请状态（工作流完成时最终状态在同一次 UPDATE 中写入，
+            #    完成事件处理器不再重复查询和保存）
             leave_request.workflow_state = result['workflow_state']
             leave_request.status = result['status']
             
@@ -137,7 +170,7 @@ class ApprovalService:
                 final_result = result.get('data', {}).get('final_result', 'approved')
                 leave_request.status = final_result
             
-            leave_request.save()
+            leave_request.save(update_fields=['workflow_state', 'status', 'completed_at', 'updated_at'])
             
             # 4. 记录历史
             ApprovalHistory.objects.create(
@@ -161,6 +194,8 @@ class ApprovalService:
             logger.error(f"批准任务失败: {e}", exc_info=True)
             raise
     
+    @instrumented_action('reject')
+    @serialized_write()
     @transaction.atomic
     def reject_task(self, leave_request, task_id, approver_email, approver_name, comment=''):
         """
@@ -201,7 +236,7 @@ class ApprovalService:
             leave_request.workflow_state = result['workflow_state']
             leave_request.status = 'rejected'
             leave_request.completed_at = timezone.now()
-            leave_request.save()
+            leave_request.save(update_fields=['workflow_state', 'status', 'completed_at', 'updated_at'])
             
             # 4. 记录历史
             ApprovalHistory.objects.create(
@@ -225,6 +260,8 @@ class ApprovalService:
             logger.error(f"拒绝任务失败: {e}", exc_info=True)
             raise
     
+    @instrumented_action('return')
+    @serialized_write()
     @transaction.atomic
     def return_task(self, leave_request, task_id, approver_email, approver_name, return_to='applicant', comment=''):
         """
@@ -332,11 +369,33 @@ class ApprovalService:
         
         return tasks
     
+    def get_task_data(self, leave_request, task_id):
+        """
+        获取任务的完整数据
+        
+        待办列表中的任务数据只包含白名单字段，需要完整数据时调用此方法
+        
+        Args:
+            leave_request: LeaveRequest 实例
+            task_id: 任务 ID
+            
+        Returns:
+            dict: 任务完整数据，找不到任务时返回 None
+        """
+        if not leave_request.workflow_state:
+            return None
+        
+        return spiff_client.get_task_data(
+            leave_request.workflow_state,
+            leave_request.workflow_spec_name or leave_request.process_model_id,
+            task_id
+        )
+    
     def _handle_workflow_events(self, leave_request, result):
         """
         处理工作流事件
         
-        根据工作流执行结果触发相应的信号和通知
+        根据工作流执行结果发布相应的领域事件并发送通知
         
         Args:
             leave_request: LeaveRequest 实例
@@ -345,19 +404,21 @@ class ApprovalService:
         try:
             # 检查工作流是否完成
             if result.get('completed', False):
-                # 触发工作流完成信号
+                # 发布工作流完成事件（事务提交后异步处理）
                 workflow_data = result.get('data', {})
                 trigger_workflow_completed(
                     workflow_instance_id=leave_request.process_instance_id,
-                    workflow_data=workflow_data
+                    workflow_data=workflow_data,
+                    process_model_id=leave_request.workflow_spec_name or leave_request.process_model_id,
+                    leave_request=leave_request
                 )
-                logger.info(f"触发工作流完成信号: {leave_request.process_instance_id}")
+                logger.info(f"发布工作流完成事件: {leave_request.process_instance_id}")
                 
                 # 发送完成通知给申请人
                 self._send_completion_notification(leave_request)
                 
             else:
-                # 触发任务就绪信号（如果有新的待办任务）
+                # 发布任务就绪事件（如果有新的待办任务）
                 ready_tasks = result.get('ready_tasks', [])
                 for task in ready_tasks:
                     trigger_task_ready(
@@ -366,7 +427,7 @@ class ApprovalService:
                         task_data=task
                     )
                     logger.info(
-                        f"触发任务就绪信号: {task.get('id')}, "
+                        f"发布任务就绪事件: {task.get('id')}, "
                         f"分配给 {task.get('assigned_to')}"
                     )
                     
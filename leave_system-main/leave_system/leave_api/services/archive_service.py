@@ -0,0 +1,261 @@
+"""
+归档服务
+已结束的请假申请冷热分离：归档、恢复和归档数据读取
+"""
+
+import logging
+import zlib
+from collections import defaultdict
+from datetime import timedelta
+
+import orjson
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from leave_api.models import (
+    LeaveRequest, LeaveRequestArchive, ApprovalHistory, CCRecord, WorkflowEventLog
+)
+from leave_api.signals import FINAL_STATUSES
+from leave_system.sqlite import serialized_write
+from leave_system.tracing import trace_methods
+
+logger = logging.getLogger(__name__)
+
+# payload 格式版本，格式变化时递增并在 _decode 中兼容旧版本
+# 1: 包含 cc_records；2: 抄送记录不再归档（迁移 0012 已把 1 版的抄送记录移回热表）
+ARCHIVE_FORMAT_VERSION = 2
+
+DEFAULT_ARCHIVE_SETTINGS = {
+    'AFTER_DAYS': 180,
+    'BATCH_SIZE': 200,
+    'COMPRESSION_LEVEL': 6,
+}
+
+# 归档的子表：payload 中的键 -> 模型
+ARCHIVED_MODELS = {
+    'history': ApprovalHistory,
+    'event_logs': WorkflowEventLog,
+}
+
+# 旧版本 payload 额外包含的子表，恢复时一并写回热表
+LEGACY_MODELS = {
+    1: {'cc_records': CCRecord},
+}
+
+
+def get_archive_settings():
+    return {**DEFAULT_ARCHIVE_SETTINGS, **getattr(settings, 'ARCHIVE', {})}
+
+
+@trace_methods
+class ArchiveService:
+    """
+    归档服务类
+
+    已结束（approved / rejected / cancelled）且超过 AFTER_DAYS 天没有更新的申请：
+    - 工作流状态、审批历史和事件日志压缩后写入 LeaveRequestArchive
+    - 热表中删除这些子表记录，LeaveRequest 保留（workflow_state 清空，archived_at 记录归档时间），
+      申请列表和通知中的申请信息不受影响
+    - 抄送记录留在热表：“我的抄送”、标记已读和添加抄送都按抄送人或记录 ID 查询，
+      归档后这些接口的结果不变
+
+    归档和恢复都按 id 分批执行，每批一个事务；中断后重新执行会从未处理的申请继续。
+    审批历史和时间轴接口通过 history_rows / history_records 透明读取归档数据。
+    """
+
+    # ========== 归档 ==========
+
+    def archive_completed(self, older_than_days=None, batch_size=None, max_batches=None):
+        """
+        归档所有符合条件的申请
+
+        Args:
+            older_than_days (int, optional): 最后更新超过多少天，默认 ARCHIVE['AFTER_DAYS']
+            batch_size (int, optional): 每批申请数，默认 ARCHIVE['BATCH_SIZE']
+            max_batches (int, optional): 最多执行的批数，None 表示直到处理完
+
+        Returns:
+            dict: {'archived': 归档的申请数, 'batches': 执行的批数}
+        """
+        config = get_archive_settings()
+        days = config['AFTER_DAYS'] if older_than_days is None else older_than_days
+        cutoff = timezone.now() - timedelta(days=days)
+        batch_size = batch_size or config['BATCH_SIZE']
+
+        archived = batches = 0
+        while max_batches is None or batches < max_batches:
+            count = self.archive_batch(cutoff, batch_size)
+            if not count:
+                break
+            archived += count
+            batches += 1
+
+        logger.info(f"归档完成: {archived} 个申请，{batches} 批")
+        return {'archived': archived, 'batches': batches}
+
+    @serialized_write()
+    @transaction.atomic
+    def archive_batch(self, cutoff, batch_size):
+        """
+        归档一批申请（一个事务）
+
+        Args:
+            cutoff (datetime): 最后更新早于该时间的申请才归档
+            batch_size (int): 本批最多归档的申请数
+
+        Returns:
+            int: 本批归档的申请数
+        """
+        leave_requests = list(
+            LeaveRequest.objects.filter(
+                status__in=FINAL_STATUSES,
+                archived_at__isnull=True,
+                updated_at__lt=cutoff,
+            ).order_by('id').only('id', 'process_instance_id', 'workflow_state')[:batch_size]
+        )
+        if not leave_requests:
+            return 0
+
+        ids = [leave_request.id for leave_request in leave_requests]
+        instance_ids = {
+            leave_request.process_instance_id: leave_request.id
+            for leave_request in leave_requests if leave_request.process_instance_id
+        }
+
+        children = {key: defaultdict(list) for key in ARCHIVED_MODELS}
+        for row in ApprovalHistory.objects.filter(leave_request_id__in=ids).values():
+            children['history'][row['leave_request_id']].append(row)
+        for row in WorkflowEventLog.objects.filter(workflow_instance_id__in=instance_ids).values():
+            children['event_logs'][instance_ids[row['workflow_instance_id']]].append(row)
+
+        level = get_archive_settings()['COMPRESSION_LEVEL']
+        archives = []
+        for leave_request in leave_requests:
+            payload = {'workflow_state': leave_request.workflow_state}
+            payload.update({key: rows[leave_request.id] for key, rows in children.items()})
+            raw = orjson.dumps(payload)
+            compressed = zlib.compress(raw, level)
+            archives.append(LeaveRequestArchive(
+                leave_request_id=leave_request.id,
+                format_version=ARCHIVE_FORMAT_VERSION,
+                payload=compressed,
+                history_count=len(payload['history']),
+                event_count=len(payload['event_logs']),
+                raw_bytes=len(raw),
+                compressed_bytes=len(compressed),
+            ))
+        LeaveRequestArchive.objects.bulk_create(archives)
+
+        ApprovalHistory.objects.filter(leave_request_id__in=ids).delete()
+        WorkflowEventLog.objects.filter(workflow_instance_id__in=instance_ids).delete()
+        # update() 不修改 updated_at，归档不算业务更新
+        LeaveRequest.objects.filter(id__in=ids).update(workflow_state=None, archived_at=timezone.now())
+
+        logger.info(f"归档 {len(ids)} 个申请: {ids[0]}..{ids[-1]}")
+        return len(ids)
+
+    # ========== 恢复 ==========
+
+    def restore(self, leave_request_ids=None, batch_size=None, max_batches=None):
+        """
+        把归档数据恢复到热表
+
+        Args:
+            leave_request_ids (list, optional): 要恢复的申请 ID，None 表示全部
+            batch_size (int, optional): 每批申请数，默认 ARCHIVE['BATCH_SIZE']
+            max_batches (int, optional): 最多执行的批数，None 表示直到处理完
+
+        Returns:
+            dict: {'restored': 恢复的申请数, 'batches': 执行的批数}
+        """
+        batch_size = batch_size or get_archive_settings()['BATCH_SIZE']
+
+        restored = batches = 0
+        while max_batches is None or batches < max_batches:
+            count = self.restore_batch(leave_request_ids, batch_size)
+            if not count:
+                break
+            restored += count
+            batches += 1
+
+        logger.info(f"恢复完成: {restored} 个申请，{batches} 批")
+        return {'restored': restored, 'batches': batches}
+
+    @serialized_write()
+    @transaction.atomic
+    def restore_batch(self, leave_request_ids, batch_size):
+        """
+        恢复一批申请（一个事务），子表记录保留原来的 ID 和创建时间
+
+        Returns:
+            int: 本批恢复的申请数
+        """
+        archives = LeaveRequestArchive.objects.order_by('leave_request_id')
+        if leave_request_ids is not None:
+            archives = archives.filter(leave_request_id__in=leave_request_ids)
+        archives = list(archives[:batch_size])
+        if not archives:
+            return 0
+
+        leave_requests = []
+        for archive in archives:
+            payload = self._decode(archive)
+            for key, model in self._models(archive.format_version).items():
+                objs = model.objects.bulk_create([model(**row) for row in payload[key]])
+                # auto_now_add 在插入时会覆盖 created_at，插入后写回原值
+                for obj, row in zip(objs, payload[key]):
+                    obj.created_at = row['created_at']
+                model.objects.bulk_update(objs, ['created_at'])
+            leave_requests.append(LeaveRequest(
+                id=archive.leave_request_id, workflow_state=payload['workflow_state'], archived_at=None
+            ))
+
+        LeaveRequest.objects.bulk_update(leave_requests, ['workflow_state', 'archived_at'])
+        ids = [archive.leave_request_id for archive in archives]
+        LeaveRequestArchive.objects.filter(leave_request_id__in=ids).delete()
+
+        logger.info(f"恢复 {len(ids)} 个申请: {ids[0]}..{ids[-1]}")
+        return len(ids)
+
+    # ========== 读取 ==========
+
+    def load(self, leave_request_id):
+        """
+        读取申请的归档数据
+
+        Returns:
+            dict: {'workflow_state', 'history', 'event_logs'}（1 版还有 'cc_records'），
+                  子表记录为按模型字段类型转换后的 values() 字典；没有归档时返回 None
+        """
+        archive = LeaveRequestArchive.objects.filter(leave_request_id=leave_request_id).first()
+        return self._decode(archive) if archive else None
+
+    def history_rows(self, leave_request_id):
+        """已归档申请的审批历史（values() 字典列表，未排序）"""
+        payload = self.load(leave_request_id)
+        return payload['history'] if payload else []
+
+    def history_records(self, leave_request_id):
+        """已归档申请的审批历史（未保存的 ApprovalHistory 实例，按时间正序）"""
+        rows = sorted(self.history_rows(leave_request_id), key=lambda row: (row['created_at'], row['id']))
+        return [ApprovalHistory(**row) for row in rows]
+
+    def _models(self, format_version):
+        """该格式版本 payload 中的子表：键 -> 模型"""
+        if format_version == ARCHIVE_FORMAT_VERSION:
+            return ARCHIVED_MODELS
+        if format_version in LEGACY_MODELS:
+            return {**ARCHIVED_MODELS, **LEGACY_MODELS[format_version]}
+        raise ValueError(f"不支持的归档格式版本: {format_version}")
+
+    def _decode(self, archive):
+        """解压归档数据，并把 JSON 值转换回模型字段类型"""
+        models = self._models(archive.format_version)
+        payload = orjson.loads(zlib.decompress(bytes(archive.payload)))
+        for key, model in models.items():
+            fields = {field.attname: field for field in model._meta.concrete_fields}
+            payload[key] = [
+                {name: fields[name].to_python(value) for name, value in row.items()}
+                for row in payload[key]
+            ]
+        return payload
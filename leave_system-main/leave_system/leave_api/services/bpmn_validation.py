@@ -0,0 +1,218 @@
+"""
+BPMN 流程校验服务
+按工作流引擎加载流程的同一路径解析 BPMN 并构建流程规范，再做结构检查；结果按内容哈希缓存
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from lxml import etree
+from SpiffWorkflow.bpmn.parser.ValidationException import ValidationException
+from SpiffWorkflow.bpmn.parser.util import BPMN_MODEL_NS
+from SpiffWorkflow.bpmn.specs.defaults import EndEvent, ExclusiveGateway, InclusiveGateway
+from leave_api.script_engine import iter_task_sources
+from leave_api.spiff_client_v2 import parse_bpmn_spec, spec_version
+from leave_system.metrics import CACHE_REQUESTS
+from leave_system.tracing import trace_methods
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VALIDATION_SETTINGS = {
+    'CACHE_SIZE': 128,
+}
+
+
+def get_validation_settings():
+    return {**DEFAULT_VALIDATION_SETTINGS, **getattr(settings, 'BPMN_VALIDATION', {})}
+
+
+# bpmn:process 下不是流程节点的子元素
+NON_FLOW_ELEMENTS = {
+    'sequenceFlow', 'laneSet', 'dataObject', 'dataObjectReference', 'dataStoreReference',
+    'textAnnotation', 'association', 'extensionElements', 'documentation', 'ioSpecification', 'property',
+}
+
+
+def _label(bpmn_name, bpmn_id):
+    return f"{bpmn_name} ({bpmn_id})" if bpmn_name else bpmn_id
+
+
+# Spiff 扩展的前置/后置脚本（spiffworkflow:preScript / postScript）
+SPIFF_NS = 'http://spiffworkflow.org/bpmn/schema/1.0/core'
+EXTENSION_SCRIPT_TAGS = (f'{{{SPIFF_NS}}}preScript', f'{{{SPIFF_NS}}}postScript')
+
+
+def _extension_scripts(root, process_id):
+    """
+    流程中各节点的前置/后置脚本 {bpmn_id: [源码]}
+
+    BpmnParser 不解析 Spiff 扩展元素，任务规范上没有 prescript / postscript，直接从 XML 读取
+    """
+    scripts = {}
+    for process in root.iter(f'{{{BPMN_MODEL_NS}}}process'):
+        if process.get('id') != process_id:
+            continue
+        for element in process.iter(*EXTENSION_SCRIPT_TAGS):
+            node = element.getparent().getparent()
+            if node is not None and node.get('id') and element.text and element.text.strip():
+                scripts.setdefault(node.get('id'), []).append(element.text)
+    return scripts
+
+
+def _flow_nodes(root, process_id):
+    """流程中所有顶层流程节点 {id: name}（事件子流程由事件触发，不通过连线到达，不计入）"""
+    nodes = {}
+    for process in root.iter(f'{{{BPMN_MODEL_NS}}}process'):
+        if process.get('id') != process_id:
+            continue
+        for element in process:
+            if not isinstance(element.tag, str):
+                continue
+            tag = etree.QName(element).localname
+            if tag in NON_FLOW_ELEMENTS or element.get('triggeredByEvent') == 'true' or not element.get('id'):
+                continue
+            nodes[element.get('id')] = element.get('name')
+    return nodes
+
+
+def check_spec(spec, root):
+    """
+    流程规范的结构检查
+
+    - 从开始事件沿连线无法到达的节点（错误）：BpmnParser 只为可到达的节点构建任务规范，
+      XML 中有而流程规范中没有的节点即不可达
+    - 条件表达式、脚本和前置/后置脚本无法编译（错误）
+    - 有多条出口但没有默认分支的排他/包容网关（警告：所有条件都不满足时流程会出错）
+    - 没有后续连线的非结束节点（警告）
+
+    Args:
+        spec: BpmnProcessSpec 流程规范对象
+        root: BPMN XML 根元素
+
+    Returns:
+        tuple: (错误列表, 警告列表)
+    """
+    errors, warnings = [], []
+
+    reached = {
+        task_spec.bpmn_id for task_spec in spec.task_specs.values() if getattr(task_spec, 'bpmn_id', None)
+    }
+    for bpmn_id, bpmn_name in _flow_nodes(root, spec.name).items():
+        if bpmn_id not in reached:
+            errors.append(f"{_label(bpmn_name, bpmn_id)}: 节点不可达")
+
+    extension_scripts = _extension_scripts(root, spec.name)
+    for task_spec in spec.task_specs.values():
+        # 没有 bpmn_id 的是引擎内部节点（Root、Start、End 等）
+        if not getattr(task_spec, 'bpmn_id', None):
+            continue
+        label = _label(task_spec.bpmn_name, task_spec.bpmn_id)
+        if isinstance(task_spec, (ExclusiveGateway, InclusiveGateway)) \
+                and len(task_spec.outputs) > 1 and task_spec.default_task_spec is None:
+            warnings.append(f"{label}: 网关没有默认分支，所有条件都不满足时流程会出错")
+        if not task_spec.outputs and not isinstance(task_spec, EndEvent):
+            warnings.append(f"{label}: 节点没有后续连线")
+        sources = dict.fromkeys(iter_task_sources(task_spec))
+        sources.update(dict.fromkeys((script, 'exec') for script in extension_scripts.get(task_spec.bpmn_id, ())))
+        for source, mode in sources:
+            try:
+                compile(source, '<string>', mode)
+            except SyntaxError as e:
+                kind = '条件表达式' if mode == 'eval' else '脚本'
+                errors.append(f"{label}: {kind}无法编译: {source!r}: {e.msg}")
+
+    return errors, warnings
+
+
+@trace_methods
+class BpmnValidationService:
+    """
+    BPMN 流程校验服务类
+
+    - 使用 spiff_client_v2.parse_bpmn_spec（与 SpiffWorkflowClient._load_bpmn_spec 相同）解析并构建流程规范，
+      解析失败的 XML 格式错误、BPMN 元素错误都作为校验错误返回
+    - 构建成功后执行 check_spec() 结构检查
+    - 结果和流程规范按 (内容哈希, 优先流程 ID) 缓存在进程内（LRU，最多 CACHE_SIZE 条）：
+      设计器反复校验同一内容时直接返回，部署时复用已解析的流程规范
+    """
+
+    _cache = OrderedDict()
+    _lock = threading.Lock()
+
+    def validate(self, content, filename='<designer>', process_id=None):
+        """
+        校验 BPMN 内容
+
+        Args:
+            content (bytes | str): BPMN XML
+            filename (str): 文件名（用于错误信息）
+            process_id (str, optional): 优先使用的 BPMN process id
+
+        Returns:
+            dict: {valid, errors, warnings, process_id, version, cached}
+        """
+        result, _ = self.validated_spec(content, filename, process_id)
+        return result
+
+    def validated_spec(self, content, filename='<designer>', process_id=None):
+        """
+        校验 BPMN 内容并返回构建好的流程规范
+
+        Returns:
+            tuple: (校验结果, 流程规范)；校验未通过时流程规范为 None
+        """
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        key = (hashlib.sha1(content).hexdigest(), process_id)
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+        if cached is not None:
+            CACHE_REQUESTS.inc(cache='bpmn_validation', result='hit')
+            result, spec = cached
+            return {**result, 'cached': True}, spec
+        CACHE_REQUESTS.inc(cache='bpmn_validation', result='miss')
+
+        result, spec = self._validate(content, filename, process_id)
+        with self._lock:
+            self._cache[key] = (result, spec)
+            while len(self._cache) > get_validation_settings()['CACHE_SIZE']:
+                self._cache.popitem(last=False)
+        return {**result, 'cached': False}, spec
+
+    def clear_cache(self):
+        """清空校验结果缓存"""
+        with self._lock:
+            self._cache.clear()
+
+    def _validate(self, content, filename, process_id):
+        errors, warnings = [], []
+        spec = None
+        try:
+            spec = parse_bpmn_spec(content, filename, process_id)
+        except etree.XMLSyntaxError as e:
+            errors.append(f"XML 格式错误: {e}")
+        except ValidationException as e:
+            location = f"第 {e.line_number} 行 " if e.line_number else ''
+            element = f"{e.name or e.id}: " if (e.name or e.id) else ''
+            errors.append(f"{location}{element}{e}")
+        except Exception as e:
+            errors.append(f"流程规范构建失败: {e}")
+        else:
+            errors, warnings = check_spec(spec, etree.fromstring(content))
+
+        if errors:
+            logger.info(f"BPMN 校验未通过: {filename}, {len(errors)} 个错误")
+        result = {
+            'valid': not errors,
+            'errors': errors,
+            'warnings': warnings,
+            'process_id': spec.name if spec is not None else None,
+            'version': spec_version(content),
+        }
+        return result, spec if not errors else None
@@ -0,0 +1,249 @@
+"""
+流程图保存服务
+设计器的节点和连线逐条保存，按差异只为变化的元素重新生成 BPMN 片段，并只刷新受影响流程的缓存
+"""
+
+import functools
+import hashlib
+import logging
+
+from django.db import transaction
+from leave_api.bpmn_diagram import (
+    ENGINE_RESERVED_IDS, DiagramError, RevisionConflict,
+    assemble_document, is_valid_id, record_hash, render_edge, render_node,
+)
+from leave_api.models import BpmnDiagram, BpmnDiagramElement
+from leave_api.services.bpmn_validation import BpmnValidationService
+from leave_api.services.process_catalog import ProcessCatalogService, bpmn_path_for, model_id_for
+from leave_api.spiff_client_v2 import spiff_client
+from leave_system.sqlite import serialized_write
+from leave_system.tracing import trace_methods
+
+logger = logging.getLogger(__name__)
+
+_KIND_ORDER = {BpmnDiagramElement.KIND_NODE: 0, BpmnDiagramElement.KIND_EDGE: 1}
+
+
+@trace_methods
+class BpmnDiagramService:
+    """
+    流程图保存服务类
+
+    保存一次流程图：
+    1. 一次查询读出已保存元素的 (内容哈希, BPMN 片段)，与提交的数据逐条比对
+    2. 只为新增和变化的元素生成 BPMN 片段，未变化的元素沿用已保存的片段；
+       元素记录按差异批量新增、更新、删除
+    3. 拼接完整文件，内容变化时按内容哈希校验（结果缓存）并在结果中返回。
+       元素记录总是保存（草稿中未连线的节点也能自动保存）；只有通过校验时，
+       事务提交后才写入 BPMN 文件并调用 refresh_process()：更新流程目录索引，
+       工作流引擎已加载该流程时替换为新的流程规范；其他流程的规范和编译缓存不受影响
+    """
+
+    def load(self, process_id):
+        """
+        获取已保存的流程图
+
+        Returns:
+            dict | None: {process_id, process_ref, revision, nodes, edges}
+        """
+        diagram = BpmnDiagram.objects.filter(process_id=process_id).first()
+        if diagram is None:
+            return None
+        nodes, edges = [], []
+        for kind, data in diagram.elements.values_list('kind', 'data'):
+            (nodes if kind == BpmnDiagramElement.KIND_NODE else edges).append(data)
+        return {
+            'process_id': diagram.process_id,
+            'process_ref': diagram.process_ref,
+            'revision': diagram.revision,
+            'nodes': nodes,
+            'edges': edges,
+        }
+
+    def save(self, process_id, nodes, edges, base_revision=None, process_ref=None, name=None):
+        """
+        按差异保存流程图
+
+        Args:
+            process_id (str): 流程 ID（流程需已通过 /api/bpmn/processes/ 创建）
+            nodes (list): LogicFlow 节点
+            edges (list): LogicFlow 连线
+            base_revision (int, optional): 设计器加载时的版本号，与当前版本不一致时拒绝保存
+            process_ref (str, optional): bpmn:process 的 id，默认沿用已保存的值
+            name (str, optional): 流程名称，默认使用流程目录中的名称
+
+        Returns:
+            dict: {revision, changes: {added, updated, removed, unchanged}, written, validation}，
+                  validation 为拼接出的 BPMN 的校验结果，内容未变化时为 None；
+                  未通过校验时 written 为 False，流程文件保持原样
+
+        Raises:
+            FileNotFoundError: 流程不存在
+            DiagramError: 流程图数据无效
+            RevisionConflict: 版本号冲突
+        """
+        bpmn_path = bpmn_path_for(process_id)
+        if not bpmn_path.exists():
+            raise FileNotFoundError(f"流程文件不存在: {process_id}")
+
+        records = self._index_records(nodes, edges)
+        if name is None:
+            entry = ProcessCatalogService().get(process_id)
+            name = entry.name if entry is not None else None
+        return self._save(process_id, bpmn_path, records, base_revision, process_ref, name)
+
+    def refresh_process(self, process_id, content):
+        """
+        BPMN 文件内容变化后刷新该流程的索引和缓存
+
+        Args:
+            process_id (str): 流程 ID
+            content (bytes): 新的文件内容
+
+        Returns:
+            dict: 校验结果（见 BpmnValidationService.validate）
+        """
+        ProcessCatalogService().refresh(process_id)
+
+        model_id = model_id_for(process_id)
+        result, spec = self._validate(process_id, content)
+        # 只替换已加载的流程规范；未加载的流程下次使用时从文件加载。
+        # 校验未通过时保留原规范，新启动的实例不会使用无法运行的流程
+        if spec is not None and model_id in spiff_client.specs_cache:
+            spiff_client.deploy_spec(model_id, spec, result['version'])
+        return result
+
+    # ========== 内部方法 ==========
+
+    def _index_records(self, nodes, edges):
+        """校验提交的数据并按元素 ID 索引：{元素 ID: (类型, 数据, 哈希)}"""
+        records = {}
+        for kind, items in ((BpmnDiagramElement.KIND_NODE, nodes), (BpmnDiagramElement.KIND_EDGE, edges)):
+            for record in items or []:
+                if not isinstance(record, dict) or not is_valid_id(record.get('id')):
+                    raise DiagramError(f"元素 ID 无效: {record.get('id') if isinstance(record, dict) else record!r}")
+                if record['id'] in ENGINE_RESERVED_IDS:
+                    raise DiagramError(f"{record['id']}: 与工作流引擎内部节点重名，请使用其他 ID")
+                if record['id'] in records:
+                    raise DiagramError(f"{record['id']}: 元素 ID 重复")
+                records[record['id']] = (kind, record, record_hash(record))
+
+        node_ids = {element_id for element_id, (kind, _, _) in records.items() if kind == BpmnDiagramElement.KIND_NODE}
+        for element_id, (kind, record, _) in records.items():
+            if kind == BpmnDiagramElement.KIND_EDGE:
+                for end in ('sourceNodeId', 'targetNodeId'):
+                    if record.get(end) not in node_ids:
+                        raise DiagramError(f"{element_id}: {end} 指向不存在的节点 {record.get(end)!r}")
+        return records
+
+    @serialized_write()
+    @transaction.atomic
+    def _save(self, process_id, bpmn_path, records, base_revision, process_ref, name):
+        diagram, _ = BpmnDiagram.objects.select_for_update().get_or_create(
+            process_id=process_id,
+            defaults={'process_ref': process_ref or self._default_process_ref(process_id)},
+        )
+        if base_revision is not None and int(base_revision) != diagram.revision:
+            raise RevisionConflict(f"流程图已被修改（当前版本 {diagram.revision}，提交基于版本 {base_revision}）")
+        if process_ref and process_ref != diagram.process_ref:
+            if not is_valid_id(process_ref):
+                raise DiagramError(f"BPMN 流程 ID 无效: {process_ref!r}")
+            diagram.process_ref = process_ref
+
+        existing = {
+            row[0]: row[1:]
+            for row in diagram.elements.values_list('element_id', 'id', 'content_hash', 'semantic_xml', 'di_xml')
+        }
+
+        to_create, to_update = [], []
+        fragments = {}
+        for element_id, (kind, record, content_hash) in records.items():
+            current = existing.get(element_id)
+            if current is not None and current[1] == content_hash:
+                fragments[element_id] = (kind, current[2], current[3])
+                continue
+            render = render_node if kind == BpmnDiagramElement.KIND_NODE else render_edge
+            semantic, di = render(record)
+            element = BpmnDiagramElement(
+                diagram=diagram,
+                element_id=element_id,
+                kind=kind,
+                element_type=record.get('type') or 'bpmn:sequenceFlow',
+                data=record,
+                content_hash=content_hash,
+                semantic_xml=semantic,
+                di_xml=di,
+            )
+            if current is None:
+                to_create.append(element)
+            else:
+                element.pk = current[0]
+                to_update.append(element)
+            fragments[element_id] = (kind, semantic, di)
+        removed = [row[0] for element_id, row in existing.items() if element_id not in records]
+
+        if to_create:
+            BpmnDiagramElement.objects.bulk_create(to_create)
+        if to_update:
+            BpmnDiagramElement.objects.bulk_update(
+                to_update, ['kind', 'element_type', 'data', 'content_hash', 'semantic_xml', 'di_xml']
+            )
+        if removed:
+            BpmnDiagramElement.objects.filter(pk__in=removed).delete()
+
+        ordered = sorted(fragments.items(), key=lambda item: (_KIND_ORDER[item[1][0]], item[0]))
+        content = assemble_document(diagram.process_ref, name, [(semantic, di) for _, (_, semantic, di) in ordered])
+        content_hash = hashlib.sha1(content).hexdigest()
+
+        validation = None
+        written = False
+        if content_hash != diagram.content_hash or not self._file_matches(bpmn_path, content):
+            # 未通过校验时只保存元素记录，不写文件，其他 worker 不会加载到无法运行的流程文件；
+            # content_hash 仍是文件中的内容，下次保存时重新比较
+            validation, _ = self._validate(process_id, content)
+            written = validation['valid']
+        if to_create or to_update or removed or written:
+            diagram.revision += 1
+        if written:
+            diagram.content_hash = content_hash
+            # 提交后再写文件：事务回滚时文件不变
+            transaction.on_commit(functools.partial(self._publish, process_id, bpmn_path, content))
+        diagram.save()
+        logger.info(f"流程图已保存: {process_id} r{diagram.revision}, 新增 {len(to_create)}, "
+                    f"更新 {len(to_update)}, 删除 {len(removed)}, "
+                    f"{'写入流程文件' if written else '未写入流程文件'}")
+
+        return {
+            'revision': diagram.revision,
+            'changes': {
+                'added': len(to_create),
+                'updated': len(to_update),
+                'removed': len(removed),
+                'unchanged': len(records) - len(to_create) - len(to_update),
+            },
+            'written': written,
+            'validation': validation,
+        }
+
+    def _publish(self, process_id, bpmn_path, content):
+        """写入通过校验的流程文件并刷新该流程的索引和缓存（事务提交后执行）"""
+        bpmn_path.write_bytes(content)
+        self.refresh_process(process_id, content)
+
+    def _validate(self, process_id, content):
+        """按内容哈希校验流程文件内容，返回 (校验结果, 流程规范)"""
+        return BpmnValidationService().validated_spec(
+            content, str(bpmn_path_for(process_id)), model_id_for(process_id).split('/')[-1]
+        )
+
+    def _file_matches(self, bpmn_path, content):
+        """文件被其他途径（如 PUT /api/bpmn/processes/）修改过时需要重新写入"""
+        try:
+            return bpmn_path.stat().st_size == len(content) and bpmn_path.read_bytes() == content
+        except FileNotFoundError:
+            return False
+
+    def _default_process_ref(self, process_id):
+        name = model_id_for(process_id).split('/')[-1]
+        ref = 'Process_' + ''.join(c if c.isalnum() or c == '_' else '_' for c in name)
+        return ref if is_valid_id(ref) else 'Process_1'
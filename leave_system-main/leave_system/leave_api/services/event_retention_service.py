@@ -0,0 +1,161 @@
+"""
+事件日志保留服务
+超过保留期的工作流事件日志按天汇总后分批删除
+"""
+
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum, Min, Max, Count
+from django.db.models.functions import Greatest, Least, TruncDate
+from django.utils import timezone
+from leave_api.metrics import EVENT_LOGS_PRUNED
+from leave_api.models import WorkflowEventLog, WorkflowEventRollup
+from leave_system.sqlite import serialized_write
+from leave_system.tracing import trace_methods
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_SETTINGS = {
+    'SUCCESS_DAYS': 30,
+    'FAILED_DAYS': 90,
+    'BATCH_SIZE': 500,
+    'BATCH_PAUSE': 0.05,
+}
+
+# 超时提醒去重依赖最近 24 小时的事件日志，保留期不能短于此
+MIN_RETENTION_DAYS = 2
+
+
+def get_retention_settings():
+    return {**DEFAULT_RETENTION_SETTINGS, **getattr(settings, 'EVENT_LOG_RETENTION', {})}
+
+
+@trace_methods
+class EventLogRetentionService:
+    """
+    事件日志保留服务类
+
+    - 成功事件保留 SUCCESS_DAYS 天；失败和未处理的事件保留 FAILED_DAYS 天，便于排查
+    - 超过保留期的记录按（日期、事件类型、处理状态）累加到 WorkflowEventRollup 后删除
+    - 每批 BATCH_SIZE 条一个事务，汇总和删除在同一事务中提交，中断后重新执行不会重复计数；
+      批之间暂停 BATCH_PAUSE 秒，避免长时间占用写锁
+    - 按 (status, created_at) 索引从最旧的记录开始删除，表和索引的大小保持在保留期内的数据量
+    """
+
+    def prune(self, max_batches=None):
+        """
+        删除所有超过保留期的事件日志
+
+        Args:
+            max_batches (int, optional): 最多执行的批数，None 表示直到处理完
+
+        Returns:
+            dict: {状态: 删除条数}
+        """
+        config = get_retention_settings()
+        now = timezone.now()
+        cutoffs = {
+            'success': now - timedelta(days=max(config['SUCCESS_DAYS'], MIN_RETENTION_DAYS)),
+            'failed': now - timedelta(days=max(config['FAILED_DAYS'], MIN_RETENTION_DAYS)),
+            'pending': now - timedelta(days=max(config['FAILED_DAYS'], MIN_RETENTION_DAYS)),
+        }
+
+        deleted = defaultdict(int)
+        batches = 0
+        for status, cutoff in cutoffs.items():
+            while max_batches is None or batches < max_batches:
+                count = self.prune_batch(status, cutoff, config['BATCH_SIZE'])
+                if not count:
+                    break
+                deleted[status] += count
+                batches += 1
+                EVENT_LOGS_PRUNED.inc(count, status=status)
+                time.sleep(config['BATCH_PAUSE'])
+
+        logger.info(f"事件日志清理完成: {dict(deleted)}，{batches} 批")
+        return dict(deleted)
+
+    @serialized_write()
+    @transaction.atomic
+    def prune_batch(self, status, cutoff, batch_size):
+        """
+        汇总并删除一批事件日志（一个事务）
+
+        Args:
+            status (str): 处理状态
+            cutoff (datetime): 删除早于该时间的记录
+            batch_size (int): 本批最多删除的条数
+
+        Returns:
+            int: 本批删除的条数
+        """
+        ids = list(
+            WorkflowEventLog.objects.filter(status=status, created_at__lt=cutoff)
+            .order_by('created_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+
+        groups = (
+            WorkflowEventLog.objects.filter(id__in=ids)
+            .annotate(day=TruncDate('created_at'))
+            .values('day', 'event_type')
+            .annotate(count=Count('id'), first_event_at=Min('created_at'), last_event_at=Max('created_at'))
+            .order_by()
+        )
+        for group in groups:
+            updated = WorkflowEventRollup.objects.filter(
+                day=group['day'], event_type=group['event_type'], status=status
+            ).update(
+                count=F('count') + group['count'],
+                first_event_at=Least('first_event_at', group['first_event_at']),
+                last_event_at=Greatest('last_event_at', group['last_event_at']),
+            )
+            if not updated:
+                WorkflowEventRollup.objects.create(
+                    day=group['day'], event_type=group['event_type'], status=status,
+                    count=group['count'],
+                    first_event_at=group['first_event_at'],
+                    last_event_at=group['last_event_at'],
+                )
+
+        WorkflowEventLog.objects.filter(id__in=ids).delete()
+        return len(ids)
+
+    def daily_counts(self, since):
+        """
+        按天统计事件数（已汇总的部分和仍保留的原始记录合并）
+
+        Args:
+            since (date): 起始日期（含）
+
+        Returns:
+            list: [{'day', 'event_type', 'status', 'count'}]，按日期、事件类型、状态排序
+        """
+        counts = defaultdict(int)
+        rollups = (
+            WorkflowEventRollup.objects.filter(day__gte=since)
+            .values('day', 'event_type', 'status')
+            .annotate(total=Sum('count'))
+            .order_by()
+        )
+        start = timezone.make_aware(datetime.combine(since, datetime.min.time()))
+        raw = (
+            WorkflowEventLog.objects.filter(created_at__gte=start)
+            .annotate(day=TruncDate('created_at'))
+            .values('day', 'event_type', 'status')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        for row in (*rollups, *raw):
+            counts[(row['day'], row['event_type'], row['status'])] += row['total']
+        return [
+            {'day': day, 'event_type': event_type, 'status': status, 'count': count}
+            for (day, event_type, status), count in sorted(counts.items())
+        ]
@@ -0,0 +1,282 @@
+"""
+BPMN 流程目录服务
+process_models 目录下的流程定义索引到 BpmnProcessCatalog，流程列表只需一次查询
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from leave_api.models import BpmnProcessCatalog
+from leave_system.sqlite import serialized_write
+from leave_system.tracing import trace_methods
+
+logger = logging.getLogger(__name__)
+
+# BPMN 流程模型根目录
+PROCESS_MODELS_DIR = Path(settings.BASE_DIR).parent / 'process_models'
+
+METADATA_FILENAME = 'process_model.json'
+
+DEFAULT_CATALOG_SETTINGS = {
+    'WATCH_INTERVAL': 10,
+}
+
+
+def get_catalog_settings():
+    return {**DEFAULT_CATALOG_SETTINGS, **getattr(settings, 'PROCESS_CATALOG', {})}
+
+
+def bpmn_path_for(process_id, root=PROCESS_MODELS_DIR):
+    """流程 ID 对应的 .bpmn 文件路径"""
+    return Path(root) / f"{process_id}.bpmn"
+
+
+def process_id_for(bpmn_path, root=PROCESS_MODELS_DIR):
+    """.bpmn 文件对应的流程 ID（相对路径去掉后缀）"""
+    relative_path = Path(bpmn_path).relative_to(root)
+    return str(relative_path).replace('\\', '/')[:-len('.bpmn')]
+
+
+def model_id_for(process_id):
+    """
+    流程 ID（相对路径，如 "leave-approval/leave-approval/leave-approval"）
+    对应的工作流引擎流程模型 ID（目录，如 "leave-approval/leave-approval"）
+    """
+    return process_id.rsplit('/', 1)[0]
+
+
+def _stat_or_none(path):
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
+
+def _scan(root):
+    """
+    只调用 stat 遍历目录，不读取文件内容
+
+    Returns:
+        dict: {流程 ID: (BPMN 修改时间, BPMN 大小, 元数据修改时间或 None)}
+    """
+    found = {}
+    pending = [str(root)]
+    while pending:
+        directory = pending.pop()
+        bpmn_entries = []
+        metadata_mtime = None
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.name.endswith('.bpmn'):
+                        bpmn_entries.append(entry)
+                    elif entry.name == METADATA_FILENAME:
+                        metadata_mtime = entry.stat().st_mtime_ns
+        except FileNotFoundError:
+            continue
+        for entry in bpmn_entries:
+            stat = entry.stat()
+            found[process_id_for(entry.path, root)] = (stat.st_mtime_ns, stat.st_size, metadata_mtime)
+    return found
+
+
+@trace_methods
+class ProcessCatalogService:
+    """
+    BPMN 流程目录服务类
+
+    - 流程列表和流程详情的元数据从 BpmnProcessCatalog 读取，不再逐个扫描和解析文件
+    - 视图创建、更新、删除流程后调用 refresh() / remove() 立即更新索引
+    - 直接修改目录中的文件（部署新版本、手工编辑）由 reconcile() 发现：只对目录做 stat，
+      (修改时间, 大小) 与索引不一致的文件才重新读取；进程内首次使用时同步执行一次，
+      之后由后台线程每 WATCH_INTERVAL 秒执行一次（0 表示不启动）
+    """
+
+    _lock = threading.Lock()
+    _ready_roots = set()
+
+    def __init__(self, root=None):
+        self.root = Path(root or PROCESS_MODELS_DIR)
+
+    # ========== 查询 ==========
+
+    def list_processes(self):
+        """
+        获取所有流程（一次查询）
+
+        Returns:
+            list: [{id, name, description, path, relative_path, metadata}]
+        """
+        self.ensure_ready()
+        rows = BpmnProcessCatalog.objects.values('process_id', 'name', 'description', 'relative_path', 'metadata')
+        return [
+            {
+                'id': row['process_id'],
+                'name': row['name'],
+                'description': row['description'],
+                'path': str(self.root / row['relative_path']),
+                'relative_path': row['relative_path'],
+                'metadata': row['metadata'],
+            }
+            for row in rows
+        ]
+
+    def get(self, process_id):
+        """
+        获取单个流程的索引记录
+
+        索引中没有时检查一次文件（后台线程尚未发现的新文件），文件也不存在时返回 None
+        """
+        self.ensure_ready()
+        entry = BpmnProcessCatalog.objects.filter(process_id=process_id).first()
+        if entry is None:
+            entry = self.refresh(process_id)
+        return entry
+
+    # ========== 更新 ==========
+
+    def refresh(self, process_id):
+        """
+        重新索引单个流程文件；文件已不存在时删除索引记录
+
+        Returns:
+            BpmnProcessCatalog | None
+        """
+        bpmn_path = bpmn_path_for(process_id, self.root)
+        stat = _stat_or_none(bpmn_path)
+        if stat is None:
+            self.remove(process_id)
+            return None
+        metadata_stat = _stat_or_none(bpmn_path.parent / METADATA_FILENAME)
+        stamps = (stat.st_mtime_ns, stat.st_size, metadata_stat.st_mtime_ns if metadata_stat else None)
+        return self._save_entries([self._read_entry(process_id, stamps)])[0]
+
+    def remove(self, process_id):
+        """删除流程的索引记录"""
+        return self._delete_entries([process_id])
+
+    def reconcile(self):
+        """
+        按文件的 (修改时间, 大小) 与索引对账
+
+        Returns:
+            dict: {'added': n, 'updated': n, 'removed': n, 'unchanged': n}
+        """
+        found = _scan(self.root)
+        indexed = {
+            process_id: (mtime, size, metadata_mtime)
+            for process_id, mtime, size, metadata_mtime in BpmnProcessCatalog.objects.values_list(
+                'process_id', 'bpmn_mtime_ns', 'bpmn_size', 'metadata_mtime_ns'
+            )
+        }
+
+        changed = [process_id for process_id, stamps in found.items() if indexed.get(process_id) != stamps]
+        removed = [process_id for process_id in indexed if process_id not in found]
+        entries = []
+        for process_id in changed:
+            try:
+                entries.append(self._read_entry(process_id, found[process_id]))
+            except FileNotFoundError:
+                # 扫描后被删除，下次对账时处理
+                continue
+        if entries:
+            self._save_entries(entries)
+        if removed:
+            self._delete_entries(removed)
+
+        added = sum(1 for process_id in changed if process_id not in indexed)
+        return {
+            'added': added,
+            'updated': len(changed) - added,
+            'removed': len(removed),
+            'unchanged': len(found) - len(changed),
+        }
+
+    # ========== 后台对账 ==========
+
+    def ensure_ready(self):
+        """进程内首次使用时同步对账一次，并启动后台对账线程"""
+        root = str(self.root)
+        if root in self._ready_roots:
+            return
+        with self._lock:
+            if root in self._ready_roots:
+                return
+            self.reconcile()
+            interval = get_catalog_settings()['WATCH_INTERVAL']
+            if interval:
+                # gunicorn/celery prefork 的子进程各自拥有自己的线程
+                threading.Thread(
+                    target=self._watch_loop,
+                    args=(interval,),
+                    name='process-catalog-watcher',
+                    daemon=True
+                ).start()
+            self._ready_roots.add(root)
+
+    def _watch_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            close_old_connections()
+            try:
+                result = self.reconcile()
+                if result['added'] or result['updated'] or result['removed']:
+                    logger.info(f"流程目录已更新: {result}")
+            except Exception as e:
+                logger.warning(f"流程目录对账失败: {e}")
+            finally:
+                close_old_connections()
+
+    # ========== 内部方法 ==========
+
+    def _read_entry(self, process_id, stamps):
+        """读取 BPMN 文件和同目录的 process_model.json，生成（未保存的）索引记录"""
+        bpmn_path = bpmn_path_for(process_id, self.root)
+        content_hash = hashlib.sha256(bpmn_path.read_bytes()).hexdigest()
+
+        metadata = {}
+        metadata_path = bpmn_path.parent / METADATA_FILENAME
+        if stamps[2] is not None:
+            try:
+                with open(metadata_path, 'r', encoding='utf-8') as f:
+                    metadata = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"读取 {metadata_path} 失败: {e}")
+
+        return BpmnProcessCatalog(
+            process_id=process_id,
+            name=metadata.get('display_name', bpmn_path.stem),
+            description=metadata.get('description', ''),
+            relative_path=str(bpmn_path.relative_to(self.root)),
+            metadata=metadata,
+            bpmn_mtime_ns=stamps[0],
+            bpmn_size=stamps[1],
+            metadata_mtime_ns=stamps[2],
+            content_hash=content_hash,
+        )
+
+    @serialized_write()
+    @transaction.atomic
+    def _save_entries(self, entries):
+        existing = dict(BpmnProcessCatalog.objects.filter(
+            process_id__in=[entry.process_id for entry in entries]
+        ).values_list('process_id', 'id'))
+        for entry in entries:
+            entry.pk = existing.get(entry.process_id)
+            entry.save()
+        return entries
+
+    @serialized_write()
+    @transaction.atomic
+    def _delete_entries(self, process_ids):
+        deleted, _ = BpmnProcessCatalog.objects.filter(process_id__in=process_ids).delete()
+        return deleted
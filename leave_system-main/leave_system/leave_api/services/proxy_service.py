@@ -4,12 +4,16 @@
 """
 
 import logging
+import time
 from django.utils import timezone
 from leave_api.models import ApprovalProxy
+from leave_api.metrics import PROXY_LOOKUPS, PROXY_LOOKUP_SECONDS
+from leave_system.tracing import trace_methods
 
 logger = logging.getLogger(__name__)
 
 
+@trace_methods
 class ProxyService:
     """
     代理人服务类
@@ -51,6 +55,8 @@ class ProxyService:
         
         需求：10.2, 10.3, 10.4, 10.7
         """
+        start = time.perf_counter()
+        outcome = 'direct'
         try:
             # 1. 检查是否有有效的代理设置
             proxy = self._find_active_proxy(approver_email)
@@ -74,9 +80,11 @@ class ProxyService:
                 
                 if conflict['has_conflict']:
                     # 3. 处理冲突：升级到更高一级审批人
+                    outcome = 'escalated'
                     escalated_approver = self._escalate_approver(
                         approver_email,
-                        conflict['reason']
+                        conflict['reason'],
+                        workflow_context
                     )
                     
                     logger.warning(
@@ -95,6 +103,7 @@ class ProxyService:
                     }
             
             # 4. 无冲突，使用代理人
+            outcome = 'proxy'
             logger.info(
                 f"使用代理人: 原审批人={approver_email}, "
                 f"代理人={proxy.proxy_email}, "
@@ -110,6 +119,7 @@ class ProxyService:
             }
             
         except Exception as e:
+            outcome = 'error'
             logger.error(f"获取有效审批人失败: {e}", exc_info=True)
             # 出错时返回原审批人，确保流程不中断
             return {
@@ -119,6 +129,9 @@ class ProxyService:
                 'conflict_detected': False,
                 'escalated_to': None
             }
+        finally:
+            PROXY_LOOKUP_SECONDS.observe(time.perf_counter() - start)
+            PROXY_LOOKUPS.inc(outcome=outcome)
     
     def _find_active_proxy(self, principal_email):
         """
@@ -198,19 +211,20 @@ class ProxyService:
             'reason': None
         }
     
-    def _escalate_approver(self, original_approver_email, conflict_reason):
+    def _escalate_approver(self, original_approver_email, conflict_reason, workflow_context=None):
         """
         升级审批人到更高一级
         
         当检测到代理人权限冲突时，将审批任务升级到更高一级审批人。
-        升级策略：
-        1. 查找原审批人的直属上级
-        2. 如果没有直属上级，查找部门负责人
+        升级策略（跳过原审批人、申请人和已审批过的人员）：
+        1. 沿原审批人的汇报链逐级向上查找第一个可用的上级
+        2. 如果汇报链上没有，从所在部门开始逐级向上查找部门负责人
         3. 如果都没有，返回原审批人（记录警告）
         
         Args:
             original_approver_email: 原审批人邮箱
             conflict_reason: 冲突原因
+            workflow_context: 工作流上下文（可选），格式同 get_effective_approver
         
         Returns:
             str: 升级后的审批人邮箱
@@ -220,12 +234,17 @@ class ProxyService:
         try:
             from organization.models import Employee
             
+            workflow_context = workflow_context or {}
+            excluded = {
+                original_approver_email,
+                workflow_context.get('applicant_email'),
+                *workflow_context.get('previous_approvers', []),
+            }
+            excluded.discard(None)
+            
             # 1. 查找原审批人
             try:
-                employee = Employee.objects.select_related(
-                    'direct_manager',
-                    'department'
-                ).get(email=original_approver_email)
+                employee = Employee.objects.select_related('department').get(email=original_approver_email)
             except Employee.DoesNotExist:
                 logger.warning(
                     f"未找到员工信息: {original_approver_email}, "
@@ -233,17 +252,21 @@ class ProxyService:
                 )
                 return original_approver_email
             
-            # 2. 尝试升级到直属上级
-            if employee.direct_manager:
-                escalated_email = employee.direct_manager.email
+            # 2. 尝试升级到汇报链上的上级（一次查询）
+            manager = employee.get_management_chain().exclude(email__in=excluded).first()
+            if manager:
+                escalated_email = manager.email
                 logger.info(
-                    f"升级到直属上级: {original_approver_email} -> {escalated_email}"
+                    f"升级到上级: {original_approver_email} -> {escalated_email}"
                 )
                 return escalated_email
             
-            # 3. 尝试升级到部门负责人
-            if employee.department and employee.department.manager:
-                escalated_email = employee.department.manager.email
+            # 3. 尝试升级到部门负责人（本部门没有可用负责人时逐级向上查找）
+            department_manager = employee.department.get_nearest_manager(
+                exclude_emails=excluded
+            ) if employee.department else None
+            if department_manager:
+                escalated_email = department_manager.email
                 logger.info(
                     f"升级到部门负责人: {original_approver_email} -> {escalated_email}"
                 )
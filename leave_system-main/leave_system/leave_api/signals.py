@@ -1,245 +1,242 @@
 """
-工作流事件处理信号
-使用 Django 信号机制处理工作流事件
+工作流事件处理
+
+工作流事件通过领域事件总线（leave_api.event_bus）在审批事务提交后异步、批量处理，
+事件日志写入不再计入审批请求的响应时间
 """
 
 import logging
 from django.db import transaction
 from django.utils import timezone
-from django.dispatch import Signal, receiver
+from leave_api.event_bus import event_bus
 from leave_api.models import LeaveRequest, WorkflowEventLog
+from leave_api.task_projection import project_data
 
 logger = logging.getLogger(__name__)
 
-# 定义自定义信号
-workflow_completed = Signal()  # 工作流完成信号
-task_ready = Signal()  # 任务就绪信号
+
+# 业务最终状态，处于这些状态的申请不能再被工作流完成事件更新
+FINAL_STATUSES = ('approved', 'rejected', 'cancelled')
 
 
-@receiver(workflow_completed)
-@transaction.atomic
-def handle_workflow_completed(sender, workflow_instance_id, workflow_data, **kwargs):
+def build_event_log(workflow_instance_id, event_type, event_data, status='success',
+                    task_id=None, error_message='', deduplicate=True, processed_at=None):
     """
-    处理工作流完成事件
+    构建一条未保存的工作流事件日志
     
-    当工作流完成时触发此信号处理器，更新业务状态并记录事件日志
+    成功事件携带确定性的 event_key，重复事件由唯一索引在数据库层拦截，
+    多进程/多 worker 并发处理同一事件时也只会保留一条。失败事件不带 event_key，
+    以便重试后仍能写入成功记录
     
     Args:
-        sender: 信号发送者
         workflow_instance_id: 工作流实例 ID
-        workflow_data: 工作流数据字典
-        **kwargs: 其他参数
+        event_type: 事件类型
+        event_data: 事件数据字典
+        status: 处理状态（'success' 或 'failed'）
+        task_id: 任务 ID（可选）
+        error_message: 错误信息（失败时）
+        deduplicate: 是否按 event_key 去重
+        processed_at: 处理时间（默认当前时间）
+    
+    Returns:
+        WorkflowEventLog: 未保存的实例
     """
-    try:
-        # 1. 幂等性检查 - 检查是否已处理过此事件
-        event_key = f"workflow_completed_{workflow_instance_id}"
-        existing_log = WorkflowEventLog.objects.filter(
-            workflow_instance_id=workflow_instance_id,
-            event_type='workflow_completed',
-            status='success'
-        ).first()
-        
-        if existing_log:
-            logger.info(f"工作流完成事件已处理，跳过: {workflow_instance_id}")
-            return
-        
-        # 2. 创建事件日志（待处理状态）
-        event_log = WorkflowEventLog.objects.create(
-            workflow_instance_id=workflow_instance_id,
-            event_type='workflow_completed',
-            event_data={
+    event_key = None
+    if deduplicate and status == 'success':
+        event_key = WorkflowEventLog.build_event_key(event_type, workflow_instance_id, task_id)
+    
+    return WorkflowEventLog(
+        event_key=event_key,
+        workflow_instance_id=workflow_instance_id,
+        task_id=task_id,
+        event_type=event_type,
+        event_data=event_data,
+        status=status,
+        error_message=error_message,
+        processed_at=processed_at or timezone.now()
+    )
+
+
+def record_event(workflow_instance_id, event_type, event_data, status='success',
+                 task_id=None, error_message='', deduplicate=True):
+    """
+    写入一条工作流事件日志（单次 INSERT，冲突时忽略）
+    
+    参数同 build_event_log
+    """
+    WorkflowEventLog.objects.bulk_create([
+        build_event_log(workflow_instance_id, event_type, event_data, status=status,
+                        task_id=task_id, error_message=error_message, deduplicate=deduplicate)
+    ], ignore_conflicts=True)
+
+
+@event_bus.subscribe('workflow_completed', name='workflow_completed_log', batch_size=50)
+def handle_workflow_completed(events):
+    """
+    处理工作流完成事件（批量）
+    
+    在审批事务提交后由事件总线异步调用，兜底更新业务状态并记录事件日志
+    
+    写入路径（每批一个事务）：
+    1. 发布时申请已处于最终状态（ApprovalService 已在同一次保存中写入最终状态）的事件
+       不再更新；否则用一条带状态条件的 UPDATE 完成状态迁移
+    2. 整批日志以 event_key 一次性插入，重复事件由唯一索引忽略
+    
+    Args:
+        events: 事件字典列表，payload 包含 workflow_instance_id, final_result,
+                workflow_data（已投影，仅用于日志）, leave_request_id, leave_request_status
+    """
+    now = timezone.now()
+    logs = []
+    seen_keys = set()
+    
+    with transaction.atomic():
+        for event in events:
+            payload = event['payload']
+            workflow_instance_id = payload['workflow_instance_id']
+            workflow_data = payload.get('workflow_data') or {}
+            # 最终结果取自发布时的完整工作流数据，投影后的 workflow_data 可能不含该字段
+            final_result = payload.get('final_result') or workflow_data.get('final_result', 'approved')
+            event_key = WorkflowEventLog.build_event_key('workflow_completed', workflow_instance_id)
+            event_data = {
                 'workflow_data': workflow_data,
-                'timestamp': timezone.now().isoformat()
-            },
-            status='pending'
-        )
-        
-        # 3. 查找对应的请假申请
-        try:
-            leave_request = LeaveRequest.objects.get(
-                process_instance_id=workflow_instance_id
+                'timestamp': now.isoformat()
+            }
+            
+            if payload.get('leave_request_status') in FINAL_STATUSES:
+                # 1a. 调用方已写入最终状态，无需再次更新
+                updated = 1
+            else:
+                # 1b. 带状态条件的单条 UPDATE，已处于最终状态的申请不会被覆盖
+                queryset = LeaveRequest.objects.exclude(status__in=FINAL_STATUSES)
+                if payload.get('leave_request_id'):
+                    queryset = queryset.filter(pk=payload['leave_request_id'])
+                else:
+                    queryset = queryset.filter(process_instance_id=workflow_instance_id)
+                updated = queryset.update(status=final_result, completed_at=now, updated_at=now)
+            
+            if not updated:
+                # 没有可更新的申请：可能是重复投递，也可能申请不存在（仅异常路径多一次查询）
+                if event_key in seen_keys or WorkflowEventLog.objects.filter(event_key=event_key).exists():
+                    logger.info(f"工作流完成事件已处理，跳过: {workflow_instance_id}")
+                    continue
+                error_msg = f"未找到可更新的请假申请（不存在或已处于最终状态）: {workflow_instance_id}"
+                logger.warning(error_msg)
+                logs.append(build_event_log(workflow_instance_id, 'workflow_completed', event_data,
+                                            status='failed', error_message=error_msg, processed_at=now))
+                continue
+            
+            seen_keys.add(event_key)
+            logs.append(build_event_log(workflow_instance_id, 'workflow_completed', event_data,
+                                        processed_at=now))
+            logger.info(
+                f"工作流完成事件处理成功: {workflow_instance_id}, 状态为 {final_result}"
             )
-        except LeaveRequest.DoesNotExist:
-            error_msg = f"未找到对应的请假申请: {workflow_instance_id}"
-            logger.error(error_msg)
-            event_log.status = 'failed'
-            event_log.error_message = error_msg
-            event_log.processed_at = timezone.now()
-            event_log.save()
-            return
-        
-        # 4. 更新业务状态
-        final_result = workflow_data.get('final_result', 'approved')
-        
-        # 状态合法性检查
-        if leave_request.status in ['approved', 'rejected', 'cancelled']:
-            logger.warning(
-                f"请假申请 {leave_request.id} 已处于最终状态 {leave_request.status}，"
-                f"不能更新为 {final_result}"
-            )
-            event_log.status = 'failed'
-            event_log.error_message = f"状态冲突: 当前状态 {leave_request.status}"
-            event_log.processed_at = timezone.now()
-            event_log.save()
-            return
-        
-        # 更新状态
-        leave_request.status = final_result
-        leave_request.completed_at = timezone.now()
-        leave_request.save()
         
-        # 5. 标记事件处理成功
-        event_log.status = 'success'
-        event_log.processed_at = timezone.now()
-        event_log.save()
-        
-        logger.info(
-            f"工作流完成事件处理成功: {workflow_instance_id}, "
-            f"申请 {leave_request.id} 状态更新为 {final_result}"
-        )
-        
-        # 6. 发送通知（可选，如果有通知服务）
-        # TODO: 集成通知服务
-        # from notifications.services import NotificationService
-        # notification_service = NotificationService()
-        # notification_service.send_approval_result_notification(leave_request, final_result)
-        
-    except Exception as e:
-        logger.error(f"处理工作流完成事件失败: {e}", exc_info=True)
-        if 'event_log' in locals():
-            event_log.status = 'failed'
-            event_log.error_message = str(e)
-            event_log.processed_at = timezone.now()
-            event_log.save()
-        raise
-
-
-@receiver(task_ready)
-@transaction.atomic
-def handle_task_ready(sender, workflow_instance_id, task_id, task_data, **kwargs):
+        # 2. 整批记录日志，重复事件由唯一索引忽略
+        if logs:
+            WorkflowEventLog.objects.bulk_create(logs, ignore_conflicts=True)
+    
+    # 3. 发送通知（可选，如果有通知服务）
+    # TODO: 集成通知服务
+    # from notifications.services import NotificationService
+    # notification_service = NotificationService()
+    # notification_service.send_approval_result_notification(leave_request, final_result)
+
+
+@event_bus.subscribe('task_ready', name='task_ready_log', batch_size=200)
+def handle_task_ready(events):
     """
-    处理任务就绪事件
+    处理任务就绪事件（批量）
     
-    当新任务就绪时触发此信号处理器，记录事件日志并发送通知
+    在审批事务提交后由事件总线异步调用，整批事件日志以一条 INSERT 写入，
+    重复事件由唯一索引忽略
     
     Args:
-        sender: 信号发送者
-        workflow_instance_id: 工作流实例 ID
-        task_id: 任务 ID
-        task_data: 任务数据字典
-        **kwargs: 其他参数
+        events: 事件字典列表，payload 包含 workflow_instance_id, task_id, task_data（已投影）
     """
-    try:
-        # 1. 幂等性检查 - 检查是否已处理过此任务
-        existing_log = WorkflowEventLog.objects.filter(
-            workflow_instance_id=workflow_instance_id,
-            task_id=task_id,
-            event_type='task_ready',
-            status='success'
-        ).first()
-        
-        if existing_log:
-            logger.info(f"任务就绪事件已处理，跳过: {task_id}")
-            return
-        
-        # 2. 创建事件日志（待处理状态）
-        event_log = WorkflowEventLog.objects.create(
-            workflow_instance_id=workflow_instance_id,
-            task_id=task_id,
-            event_type='task_ready',
-            event_data={
-                'task_data': task_data,
-                'timestamp': timezone.now().isoformat()
-            },
-            status='pending'
-        )
-        
-        # 3. 查找对应的请假申请
-        try:
-            leave_request = LeaveRequest.objects.get(
-                process_instance_id=workflow_instance_id
-            )
-        except LeaveRequest.DoesNotExist:
-            error_msg = f"未找到对应的请假申请: {workflow_instance_id}"
-            logger.error(error_msg)
-            event_log.status = 'failed'
-            event_log.error_message = error_msg
-            event_log.processed_at = timezone.now()
-            event_log.save()
-            return
-        
-        # 4. 提取任务信息
+    now = timezone.now()
+    logs = []
+    
+    for event in events:
+        payload = event['payload']
+        workflow_instance_id = payload['workflow_instance_id']
+        task_id = payload.get('task_id')
+        task_data = payload.get('task_data') or {}
+        event_data = {
+            'task_data': task_data,
+            'timestamp': now.isoformat()
+        }
+        
+        # 1. 提取任务信息
         assigned_to = task_data.get('assigned_to')
-        task_name = task_data.get('name', '未命名任务')
         
         if not assigned_to:
             logger.warning(f"任务 {task_id} 未分配审批人")
-            event_log.status = 'failed'
-            event_log.error_message = "任务未分配审批人"
-            event_log.processed_at = timezone.now()
-            event_log.save()
-            return
-        
-        # 5. 标记事件处理成功
-        event_log.status = 'success'
-        event_log.processed_at = timezone.now()
-        event_log.save()
+            logs.append(build_event_log(workflow_instance_id, 'task_ready', event_data, status='failed',
+                                        task_id=task_id, error_message="任务未分配审批人",
+                                        processed_at=now))
+            continue
         
+        logs.append(build_event_log(workflow_instance_id, 'task_ready', event_data,
+                                    task_id=task_id, processed_at=now))
         logger.info(
             f"任务就绪事件处理成功: {task_id}, "
-            f"申请 {leave_request.id}, 分配给 {assigned_to}"
+            f"实例 {workflow_instance_id}, 分配给 {assigned_to}"
         )
-        
-        # 6. 发送任务通知（可选，如果有通知服务）
-        # TODO: 集成通知服务
-        # from notifications.services import NotificationService
-        # notification_service = NotificationService()
-        # notification_service.send_task_assigned_notification(
-        #     task={'id': task_id, 'name': task_name, 'leave_request_id': leave_request.id},
-        #     assignee_email=assigned_to
-        # )
-        
-    except Exception as e:
-        logger.error(f"处理任务就绪事件失败: {e}", exc_info=True)
-        if 'event_log' in locals():
-            event_log.status = 'failed'
-            event_log.error_message = str(e)
-            event_log.processed_at = timezone.now()
-            event_log.save()
-        raise
+    
+    # 2. 整批记录日志，重复事件由唯一索引忽略
+    if logs:
+        WorkflowEventLog.objects.bulk_create(logs, ignore_conflicts=True)
+    
+    # 3. 发送任务通知（可选，如果有通知服务）
+    # TODO: 集成通知服务
+    # from notifications.services import NotificationService
+    # notification_service = NotificationService()
+    # notification_service.send_task_assigned_notification(
+    #     task={'id': task_id, 'name': task_name},
+    #     assignee_email=assigned_to
+    # )
 
 
-def trigger_workflow_completed(workflow_instance_id, workflow_data):
+def trigger_workflow_completed(workflow_instance_id, workflow_data, process_model_id=None, leave_request=None):
     """
-    触发工作流完成信号
+    发布工作流完成事件
+    
+    在事务内调用时，事件在事务提交后才分发给消费者
     
-    这是一个辅助函数，用于在工作流完成时触发信号
+    final_result 从完整的工作流数据中单独取出发布，只有写入日志的副本按白名单投影
     
     Args:
         workflow_instance_id: 工作流实例 ID
-        workflow_data: 工作流数据字典
+        workflow_data: 完整的工作流数据字典
+        process_model_id: 流程模型 ID（可选），用于选择日志中事件数据的字段白名单
+        leave_request: 已加载的 LeaveRequest 实例（可选），其 ID 和当前状态随事件发布，
+                       避免消费者重新查询
     """
-    workflow_completed.send(
-        sender=None,
-        workflow_instance_id=workflow_instance_id,
-        workflow_data=workflow_data
-    )
+    workflow_data = workflow_data or {}
+    event_bus.publish('workflow_completed', {
+        'workflow_instance_id': workflow_instance_id,
+        'final_result': workflow_data.get('final_result', 'approved'),
+        'workflow_data': project_data(workflow_data, process_model_id),
+        'leave_request_id': leave_request.pk if leave_request is not None else None,
+        'leave_request_status': leave_request.status if leave_request is not None else None,
+    })
 
 
 def trigger_task_ready(workflow_instance_id, task_id, task_data):
     """
-    触发任务就绪信号
+    发布任务就绪事件
     
-    这是一个辅助函数，用于在任务就绪时触发信号
+    在事务内调用时，事件在事务提交后才分发给消费者
     
     Args:
         workflow_instance_id: 工作流实例 ID
         task_id: 任务 ID
-        task_data: 任务数据字典
+        task_data: 任务数据字典（已按白名单投影）
     """
-    task_ready.send(
-        sender=None,
-        workflow_instance_id=workflow_instance_id,
-        task_id=task_id,
-        task_data=task_data
-    )
+    event_bus.publish('task_ready', {
+        'workflow_instance_id': workflow_instance_id,
+        'task_id': task_id,
+        'task_data': task_data,
+    })
@@ -17,23 +17,94 @@ SpiffWorkflow 客户端模块 V2 - 支持持久化
 - 支持从数据库恢复工作流实例
 - 添加组织架构查询函数
 - 支持脚本引擎环境配置
+- 进程级共享脚本引擎，按规范版本预编译网关条件和脚本
+- 任务数据按白名单投影返回，完整数据通过 get_task_data 按需获取
 """
 
 import os
 import logging
+import time
 import uuid
+import hashlib
+import functools
 from pathlib import Path
 from lxml import etree
 from SpiffWorkflow.bpmn.workflow import BpmnWorkflow
 from SpiffWorkflow.bpmn.parser.BpmnParser import BpmnParser
 from SpiffWorkflow.bpmn.serializer.workflow import BpmnWorkflowSerializer
-from SpiffWorkflow.bpmn.PythonScriptEngine import PythonScriptEngine
+from leave_api.script_engine import CachingScriptEngine, code_cache, iter_spec_sources
+from leave_api.task_projection import project_task
+from leave_api.metrics import SPIFF_OPERATION_SECONDS, SPIFF_STATE_BYTES, ORG_LOOKUPS
+from leave_system.metrics import CACHE_REQUESTS
+from leave_system.profiling import profile_methods
+from leave_system.tracing import trace_methods, start_span
 import json
 
 # 获取日志记录器
 logger = logging.getLogger(__name__)
 
 
+def timed_operation(operation):
+    """
+    记录引擎操作耗时
+
+    客户端方法出错时返回 None，据此区分 result 标签
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            finally:
+                SPIFF_OPERATION_SECONDS.observe(
+                    time.perf_counter() - start,
+                    operation=operation,
+                    result='error' if result is None else 'success'
+                )
+        return wrapper
+    return decorator
+
+
+def spec_version(content):
+    """流程规范版本：BPMN 文件内容哈希"""
+    return hashlib.sha1(content).hexdigest()[:12]
+
+
+def parse_bpmn_spec(content, filename, process_id=None):
+    """
+    解析 BPMN XML 并构建流程规范
+
+    Args:
+        content (bytes): BPMN 文件内容
+        filename (str): 文件名（用于错误信息）
+        process_id (str, optional): 优先使用的 BPMN process id，不存在时使用文件中的第一个流程
+
+    Returns:
+        BpmnProcessSpec: BPMN 流程规范对象
+
+    Raises:
+        lxml.etree.XMLSyntaxError: XML 格式错误
+        ValidationException: BPMN 元素无法解析
+        ValueError: 如果 BPMN 文件中没有可用的流程定义
+    """
+    parser = BpmnParser()
+    parser.add_bpmn_xml(etree.fromstring(content).getroottree(), filename)
+
+    try:
+        return parser.get_spec(process_id)
+    except Exception:
+        available_specs = list(parser.get_process_ids())
+        if available_specs:
+            logger.info(f"使用流程 ID: {available_specs[0]}")
+            return parser.get_spec(available_specs[0])
+        raise ValueError("BPMN 文件中没有找到可用的流程")
+
+
+@profile_methods
+@trace_methods
 class SpiffWorkflowClient:
     """
     SpiffWorkflow 客户端类
@@ -45,6 +116,9 @@ class SpiffWorkflowClient:
         process_dir (Path): BPMN 流程文件目录
         serializer (BpmnWorkflowSerializer): 工作流序列化器
         specs_cache (dict): 流程规范缓存
+        spec_versions (dict): 流程规范版本（BPMN 文件内容哈希）
+        spec_files (dict): 缓存规范时 BPMN 文件的 (路径, 修改时间, 大小)，用于发现其他进程部署的新版本
+        script_engine (CachingScriptEngine): 进程内共享的脚本引擎
     """
     
     def __init__(self):
@@ -71,11 +145,47 @@ class SpiffWorkflowClient:
         
         # ========== 初始化流程规范缓存 ==========
         self.specs_cache = {}
+        self.spec_versions = {}
+        self.spec_files = {}
+        
+        # ========== 初始化共享脚本引擎 ==========
+        # 环境中的函数只读，引擎可被多个线程中的工作流实例同时使用
+        script_env = {
+            'get_direct_manager': self._get_direct_manager,
+            'get_nth_manager': self._get_nth_manager,
+            'get_manager_above_level': self._get_manager_above_level,
+            'get_all_reports': self._get_all_reports,
+            'get_department_manager': self._get_department_manager,
+            'get_role_members': self._get_role_members,
+            'get_effective_approver': self._get_effective_approver,
+        }
+        self.script_engine = CachingScriptEngine(script_env, code_cache)
+    
+    def _bpmn_file(self, process_model_id):
+        """
+        流程模型对应的 BPMN 文件
+
+        Raises:
+            FileNotFoundError: 如果找不到 BPMN 文件
+        """
+        parts = process_model_id.split('/')
+        bpmn_file = self.process_dir / parts[0] / parts[1] / f"{parts[1]}.bpmn"
+        
+        if not bpmn_file.exists():
+            bpmn_file = self.process_dir / parts[0] / parts[1] / f"{parts[1]}-phase1.bpmn"
+        
+        if not bpmn_file.exists():
+            raise FileNotFoundError(f"找不到 BPMN 文件: {bpmn_file}")
+        return bpmn_file
     
     def _load_bpmn_spec(self, process_model_id):
         """
         加载 BPMN 流程定义
         
+        部署（deploy_process、保存流程图）只更新当前进程的缓存，并把新版本写入 BPMN 文件；
+        其他工作进程每次加载时比较文件的修改时间和大小，变化后按内容哈希判断是否需要重新解析。
+        新文件解析失败时继续使用已缓存的规范（与部署时校验不通过不更新规范一致）
+        
         Args:
             process_model_id (str): 流程模型标识符，格式如 "admin/admin"
             
@@ -86,61 +196,90 @@ class SpiffWorkflowClient:
             FileNotFoundError: 如果找不到 BPMN 文件
             ValueError: 如果 BPMN 文件中没有可用的流程定义
         """
-        # 检查缓存
-        if process_model_id in self.specs_cache:
-            return self.specs_cache[process_model_id]
+        bpmn_file = self._bpmn_file(process_model_id)
+        stat = bpmn_file.stat()
+        signature = (str(bpmn_file), stat.st_mtime_ns, stat.st_size)
+        cached = self.specs_cache.get(process_model_id)
         
-        # 构建 BPMN 文件路径
-        parts = process_model_id.split('/')
-        bpmn_file = self.process_dir / parts[0] / parts[1] / f"{parts[1]}.bpmn"
+        # 检查缓存：文件没有变化
+        if cached is not None and self.spec_files.get(process_model_id) == signature:
+            CACHE_REQUESTS.inc(cache='bpmn_spec', result='hit')
+            return cached
         
-        if not bpmn_file.exists():
-            bpmn_file = self.process_dir / parts[0] / parts[1] / f"{parts[1]}-phase1.bpmn"
+        with open(str(bpmn_file), 'rb') as f:
+            content = f.read()
+        version = spec_version(content)
         
-        if not bpmn_file.exists():
-            raise FileNotFoundError(f"找不到 BPMN 文件: {bpmn_file}")
+        # 文件被重写但内容与缓存的版本相同（如本进程部署后首次加载）
+        if cached is not None and self.spec_versions.get(process_model_id) == version:
+            self.spec_files[process_model_id] = signature
+            CACHE_REQUESTS.inc(cache='bpmn_spec', result='hit')
+            return cached
+        CACHE_REQUESTS.inc(cache='bpmn_spec', result='miss')
         
         logger.info(f"加载 BPMN 文件: {bpmn_file}")
         
-        # 解析 BPMN 文件
-        parser = BpmnParser()
-        with open(str(bpmn_file), 'r', encoding='utf-8') as f:
-            parser.add_bpmn_xml(etree.parse(f), str(bpmn_file))
-        
-        # 获取流程规范
-        try:
-            spec = parser.get_spec(parts[1])
-        except Exception:
-            available_specs = list(parser.get_process_ids())
-            if available_specs:
-                logger.info(f"使用流程 ID: {available_specs[0]}")
-                spec = parser.get_spec(available_specs[0])
-            else:
-                raise ValueError("BPMN 文件中没有找到可用的流程")
-        
-        # 缓存流程规范
-        self.specs_cache[process_model_id] = spec
+        with start_span('spiff.parse_bpmn', attributes={'bpmn.process_model_id': process_model_id}):
+            # 以文件内容哈希作为规范版本
+            try:
+                spec = parse_bpmn_spec(content, str(bpmn_file), process_model_id.split('/')[1])
+            except Exception as e:
+                if cached is None:
+                    raise
+                logger.warning(
+                    f"BPMN 文件 {bpmn_file} 解析失败，继续使用版本 {self.spec_versions[process_model_id]}: {e}"
+                )
+                self.spec_files[process_model_id] = signature
+                return cached
+            self.deploy_spec(process_model_id, spec, version)
+            self.spec_files[process_model_id] = signature
         
         return spec
     
+    def deploy_spec(self, process_model_id, spec, version):
+        """
+        登记已解析的流程规范，之后启动的实例使用该规范
+        
+        已运行的实例不受影响（序列化状态中包含各自的流程规范）
+        
+        Args:
+            process_model_id (str): 流程模型标识符
+            spec (BpmnProcessSpec): 流程规范对象
+            version (str): 规范版本（spec_version() 的结果）
+        """
+        # 登记规范版本并预编译条件表达式和脚本
+        code_cache.register_spec(spec.name, version)
+        compiled = sum(
+            code_cache.precompile(version, source, mode)
+            for source, mode in iter_spec_sources(spec)
+        )
+        logger.info(f"流程规范 {spec.name} 版本 {version}, 预编译 {compiled} 段条件/脚本")
+        
+        # 缓存流程规范；文件签名在下次加载时按内容哈希重新确认
+        self.specs_cache[process_model_id] = spec
+        self.spec_versions[process_model_id] = version
+        self.spec_files.pop(process_model_id, None)
+    
     def _get_script_engine(self):
         """
         获取脚本引擎
         
-        配置 BPMN 脚本任务可以使用的函数
+        引擎在客户端初始化时创建一次，所有工作流实例共享，
+        编译结果由 code_cache 按规范版本缓存
         
         Returns:
-            PythonScriptEngine: 配置好的脚本引擎
+            CachingScriptEngine: 配置好的脚本引擎
         """
-        # 定义可在 BPMN 脚本中使用的函数
-        script_env = {
-            'get_direct_manager': self._get_direct_manager,
-            'get_department_manager': self._get_department_manager,
-            'get_role_members': self._get_role_members,
-            'get_effective_approver': self._get_effective_approver,
-        }
+        return self.script_engine
+    
+    def get_script_cache_stats(self):
+        """
+        获取脚本编译缓存统计
         
-        return PythonScriptEngine(environment=script_env)
+        Returns:
+            dict: 命中/未命中/预编译/淘汰计数及各规范版本
+        """
+        return code_cache.get_stats()
     
     def _get_direct_manager(self, employee_email):
         """
@@ -156,11 +295,88 @@ class SpiffWorkflowClient:
             from organization.models import Employee
             employee = Employee.objects.filter(email=employee_email).first()
             if employee and employee.direct_manager:
+                ORG_LOOKUPS.inc(lookup='direct_manager', result='found')
                 return employee.direct_manager.email
+            ORG_LOOKUPS.inc(lookup='direct_manager', result='not_found')
         except Exception as e:
+            ORG_LOOKUPS.inc(lookup='direct_manager', result='error')
             logger.error(f"查找直属上级失败: {e}")
         return None
     
+    def _get_nth_manager(self, employee_email, n):
+        """
+        查找第 n 级上级（1 为直属上级，2 为上级的上级），按汇报关系闭包表一次查询
+        
+        Args:
+            employee_email (str): 员工邮箱
+            n (int): 上级层级
+            
+        Returns:
+            str: 第 n 级上级邮箱，如果没有返回 None
+        """
+        try:
+            from organization.models import Employee
+            email = Employee.objects.filter(
+                descendant_links__descendant__email=employee_email,
+                descendant_links__depth=int(n),
+            ).values_list('email', flat=True).first()
+            ORG_LOOKUPS.inc(lookup='nth_manager', result='found' if email else 'not_found')
+            return email
+        except Exception as e:
+            ORG_LOOKUPS.inc(lookup='nth_manager', result='error')
+            logger.error(f"查找第 {n} 级上级失败: {e}")
+        return None
+    
+    def _get_manager_above_level(self, employee_email, level):
+        """
+        沿汇报链向上查找第一个职级高于 level 的上级，按汇报关系闭包表一次查询
+        
+        Args:
+            employee_email (str): 员工邮箱
+            level (int): 职级
+            
+        Returns:
+            str: 上级邮箱，如果没有返回 None
+        """
+        try:
+            from organization.models import Employee
+            email = Employee.objects.filter(
+                descendant_links__descendant__email=employee_email,
+                descendant_links__depth__gte=1,
+                level__gt=int(level),
+            ).order_by('descendant_links__depth').values_list('email', flat=True).first()
+            ORG_LOOKUPS.inc(lookup='manager_above_level', result='found' if email else 'not_found')
+            return email
+        except Exception as e:
+            ORG_LOOKUPS.inc(lookup='manager_above_level', result='error')
+            logger.error(f"查找职级高于 {level} 的上级失败: {e}")
+        return None
+    
+    def _get_all_reports(self, employee_email):
+        """
+        查找所有直接和间接下属，按汇报关系闭包表一次查询
+        
+        Args:
+            employee_email (str): 员工邮箱
+            
+        Returns:
+            list: 下属邮箱列表，按汇报层级由近到远排列
+        """
+        try:
+            from organization.models import Employee
+            emails = list(
+                Employee.objects.filter(
+                    ancestor_links__ancestor__email=employee_email,
+                    ancestor_links__depth__gte=1,
+                ).order_by('ancestor_links__depth', 'employee_id').values_list('email', flat=True)
+            )
+            ORG_LOOKUPS.inc(lookup='all_reports', result='found' if emails else 'not_found')
+            return emails
+        except Exception as e:
+            ORG_LOOKUPS.inc(lookup='all_reports', result='error')
+            logger.error(f"查找下属失败: {e}")
+        return []
+    
     def _get_department_manager(self, department_name):
         """
         查找部门负责人
@@ -175,8 +391,11 @@ class SpiffWorkflowClient:
             from organization.models import Department
             department = Department.objects.filter(name=department_name).first()
             if department and department.manager:
+                ORG_LOOKUPS.inc(lookup='department_manager', result='found')
                 return department.manager.email
+            ORG_LOOKUPS.inc(lookup='department_manager', result='not_found')
         except Exception as e:
+            ORG_LOOKUPS.inc(lookup='department_manager', result='error')
             logger.error(f"查找部门负责人失败: {e}")
         return None
     
@@ -194,8 +413,11 @@ class SpiffWorkflowClient:
             from organization.models import Role
             role = Role.objects.filter(name=role_name).first()
             if role:
+                ORG_LOOKUPS.inc(lookup='role_members', result='found')
                 return [emp.email for emp in role.employees.all()]
+            ORG_LOOKUPS.inc(lookup='role_members', result='not_found')
         except Exception as e:
+            ORG_LOOKUPS.inc(lookup='role_members', result='error')
             logger.error(f"查找角色成员失败: {e}")
         return []
     
@@ -236,6 +458,7 @@ class SpiffWorkflowClient:
             # 出错时返回原审批人
             return approver_email
     
+    @timed_operation('start_process')
     def start_process(self, process_model_id, variables=None):
         """
         启动工作流实例
@@ -267,15 +490,11 @@ class SpiffWorkflowClient:
             # 序列化工作流状态
             workflow_state = self.serialize_workflow(workflow)
             
-            # 获取就绪的任务
-            ready_tasks = []
-            for task in workflow.get_ready_user_tasks():
-                ready_tasks.append({
-                    'id': str(task.id),
-                    'name': task.task_spec.name,
-                    'assigned_to': task.data.get('assigned_to'),
-                    'data': task.data
-                })
+            # 获取就绪的任务（任务数据按白名单投影）
+            ready_tasks = [
+                project_task(task, process_model_id)
+                for task in workflow.get_ready_user_tasks()
+            ]
             
             logger.info(f"流程启动成功: {instance_id}, 就绪任务数: {len(ready_tasks)}")
             
@@ -293,6 +512,7 @@ class SpiffWorkflowClient:
             logger.error(f"启动流程失败: {e}", exc_info=True)
             return None
     
+    @timed_operation('serialize_workflow')
     def serialize_workflow(self, workflow):
         """
         序列化工作流状态
@@ -304,11 +524,14 @@ class SpiffWorkflowClient:
             str: 序列化后的 JSON 字符串
         """
         try:
-            return self.serializer.serialize_json(workflow)
+            workflow_state = self.serializer.serialize_json(workflow)
+            SPIFF_STATE_BYTES.observe(len(workflow_state), operation='serialize')
+            return workflow_state
         except Exception as e:
             logger.error(f"序列化工作流失败: {e}", exc_info=True)
             return None
     
+    @timed_operation('deserialize_workflow')
     def deserialize_workflow(self, workflow_state, process_model_id):
         """
         反序列化工作流状态
@@ -326,6 +549,7 @@ class SpiffWorkflowClient:
             
             # 反序列化工作流
             workflow = self.serializer.deserialize_json(workflow_state)
+            SPIFF_STATE_BYTES.observe(len(workflow_state), operation='deserialize')
             
             # 设置脚本引擎
             workflow.script_engine = self._get_script_engine()
@@ -364,14 +588,7 @@ class SpiffWorkflowClient:
                 if user_email and assigned_to != user_email:
                     continue
                 
-                tasks.append({
-                    'id': str(task.id),
-                    'name': task.task_spec.name,
-                    'task_guid': str(task.id),
-                    'state': task.state,
-                    'data': task.data,
-                    'assigned_to': assigned_to
-                })
+                tasks.append(project_task(task, process_model_id))
             
             return tasks
             
@@ -379,6 +596,7 @@ class SpiffWorkflowClient:
             logger.error(f"获取用户任务失败: {e}", exc_info=True)
             return []
     
+    @timed_operation('complete_task')
     def complete_task(self, workflow_state, process_model_id, task_guid, data=None):
         """
         完成任务
@@ -422,15 +640,11 @@ class SpiffWorkflowClient:
             # 序列化新状态
             new_workflow_state = self.serialize_workflow(workflow)
             
-            # 获取就绪的任务
-            ready_tasks = []
-            for ready_task in workflow.get_ready_user_tasks():
-                ready_tasks.append({
-                    'id': str(ready_task.id),
-                    'name': ready_task.task_spec.name,
-                    'assigned_to': ready_task.data.get('assigned_to'),
-                    'data': ready_task.data
-                })
+            # 获取就绪的任务（任务数据按白名单投影）
+            ready_tasks = [
+                project_task(ready_task, process_model_id)
+                for ready_task in workflow.get_ready_user_tasks()
+            ]
             
             logger.info(f"任务完成: {task_guid}, 新就绪任务数: {len(ready_tasks)}")
             
@@ -447,6 +661,35 @@ class SpiffWorkflowClient:
             logger.error(f"完成任务失败: {e}", exc_info=True)
             return None
     
+    def get_task_data(self, workflow_state, process_model_id, task_guid):
+        """
+        按需获取任务的完整数据
+        
+        start_process / get_user_tasks / complete_task 只返回白名单字段，
+        需要完整 task.data 时（如表单详情）调用此方法
+        
+        Args:
+            workflow_state (str): 序列化的工作流状态
+            process_model_id (str): 流程模型 ID
+            task_guid (str): 任务 GUID
+            
+        Returns:
+            dict: 任务完整数据，找不到任务时返回 None
+        """
+        try:
+            workflow = self.deserialize_workflow(workflow_state, process_model_id)
+            if not workflow:
+                return None
+            
+            for task in workflow.get_tasks():
+                if str(task.id) == task_guid:
+                    return dict(task.data)
+            
+            logger.error(f"找不到任务: {task_guid}")
+        except Exception as e:
+            logger.error(f"获取任务数据失败: {e}", exc_info=True)
+        return None
+    
     def is_workflow_completed(self, workflow_state, process_model_id):
         """
         检查工作流是否完成
@@ -0,0 +1,90 @@
+"""
+任务数据投影模块
+
+工作流任务的 task.data 是整个流程数据的完整副本，直接返回给客户端或写入事件日志
+会导致响应体和日志行过大。本模块按流程模型配置的字段白名单对任务数据做投影，
+只保留客户端和事件日志需要的字段；完整数据通过 SpiffWorkflowClient.get_task_data 按需获取。
+
+配置方式（settings.py）：
+    WORKFLOW_TASK_DATA_FIELDS = {
+        'default': ['assigned_to', 'leave_request_id', ...],
+        'leave-approval/leave-approval': ['assigned_to', 'leave_hours', ...],
+    }
+"""
+
+from django.conf import settings
+
+# 未配置时使用的默认白名单
+DEFAULT_TASK_DATA_FIELDS = (
+    'assigned_to',
+    'leave_request_id',
+    'user_email',
+    'staff_full_name',
+    'staff_dept',
+    'leave_type',
+    'leave_hours',
+    'duration',
+    'action',
+    'approver_email',
+    'approver_name',
+    'final_result',
+)
+
+
+def get_task_data_fields(process_model_id):
+    """
+    获取流程模型的任务数据字段白名单
+
+    Args:
+        process_model_id (str): 流程模型 ID（或工作流规范名称）
+
+    Returns:
+        tuple: 允许暴露的字段名
+    """
+    config = getattr(settings, 'WORKFLOW_TASK_DATA_FIELDS', None) or {}
+    fields = config.get(process_model_id)
+    if fields is None:
+        fields = config.get('default', DEFAULT_TASK_DATA_FIELDS)
+    return tuple(fields)
+
+
+def project_data(data, process_model_id):
+    """
+    按白名单投影数据字典
+
+    Args:
+        data (dict): 完整的任务或工作流数据
+        process_model_id (str): 流程模型 ID
+
+    Returns:
+        dict: 只包含白名单字段的新字典
+    """
+    if not data:
+        return {}
+    return {
+        field: data[field]
+        for field in get_task_data_fields(process_model_id)
+        if field in data
+    }
+
+
+def project_task(task, process_model_id):
+    """
+    将 SpiffWorkflow 任务转换为对外暴露的字典
+
+    Args:
+        task: SpiffWorkflow Task 实例
+        process_model_id (str): 流程模型 ID
+
+    Returns:
+        dict: 包含 id, name, task_guid, state, assigned_to, data 的字典
+    """
+    task_id = str(task.id)
+    return {
+        'id': task_id,
+        'name': task.task_spec.name,
+        'task_guid': task_id,
+        'state': task.state,
+        'assigned_to': task.data.get('assigned_to'),
+        'data': project_data(task.data, process_model_id),
+    }
@@ -7,18 +7,21 @@ from celery import shared_task
 from django.utils import timezone
 from datetime import timedelta
 from leave_api.models import LeaveRequest, WorkflowEventLog
+from leave_system.db_router import read_replica
 from notifications.services.notification_service import NotificationService
 
 logger = logging.getLogger(__name__)
 
 
 @shared_task
+@read_replica()
 def check_timeout_tasks():
     """
     检查超时任务并发送提醒
     
     定时任务，每小时执行一次
     检查所有待审批的任务，如果超过24小时未处理，发送超时提醒
+    扫描查询读副本（阈值为 24 小时，可以容忍复制延迟），提醒记录和通知写主库
     """
     try:
         from leave_api.models import ApprovalHistory
@@ -146,3 +149,81 @@ def send_urge_notification(leave_request_id, urge_by_email, urge_by_name='', mes
     except Exception as e:
         logger.error(f"发送催办通知失败: {e}", exc_info=True)
         return {'success': False, 'error': str(e)}
+
+
+@shared_task(bind=True, max_retries=3)
+def dispatch_domain_events(self, consumer_name, events):
+    """
+    执行一批领域事件（事件总线 celery 模式）
+    
+    Args:
+        consumer_name: 消费者名称
+        events: 事件字典列表
+    """
+    from leave_api.event_bus import event_bus
+    
+    try:
+        event_bus.process_batch(consumer_name, events)
+        return {'success': True, 'consumer': consumer_name, 'count': len(events)}
+    except Exception as e:
+        logger.error(f"领域事件处理失败: {consumer_name}, 事件数 {len(events)}: {e}", exc_info=True)
+        consumer = event_bus.get_consumer(consumer_name)
+        raise self.retry(exc=e, countdown=2 ** self.request.retries, max_retries=consumer.max_retries)
+
+
+@shared_task
+def archive_completed_requests(older_than_days=None, batch_size=None, max_batches=None):
+    """
+    归档已结束的请假申请
+    
+    定时任务，每天执行一次。按批归档，每批一个事务，中断后再次执行会继续处理剩余的申请
+    
+    Args:
+        older_than_days: 最后更新超过多少天才归档，默认 settings.ARCHIVE['AFTER_DAYS']
+        batch_size: 每批申请数，默认 settings.ARCHIVE['BATCH_SIZE']
+        max_batches: 本次最多执行的批数，默认直到处理完
+    """
+    from leave_api.services.archive_service import ArchiveService
+    
+    try:
+        return {'success': True, **ArchiveService().archive_completed(older_than_days, batch_size, max_batches)}
+    except Exception as e:
+        logger.error(f"归档任务失败: {e}", exc_info=True)
+        return {'success': False, 'error': str(e)}
+
+
+@shared_task
+def restore_archived_requests(leave_request_ids=None, batch_size=None):
+    """
+    把归档的请假申请恢复到热表
+    
+    Args:
+        leave_request_ids: 要恢复的申请 ID 列表，默认全部
+        batch_size: 每批申请数，默认 settings.ARCHIVE['BATCH_SIZE']
+    """
+    from leave_api.services.archive_service import ArchiveService
+    
+    try:
+        return {'success': True, **ArchiveService().restore(leave_request_ids, batch_size)}
+    except Exception as e:
+        logger.error(f"恢复归档失败: {e}", exc_info=True)
+        return {'success': False, 'error': str(e)}
+
+
+@shared_task
+def prune_workflow_event_logs(max_batches=None):
+    """
+    汇总并删除超过保留期的工作流事件日志
+    
+    定时任务，每天执行一次，保留期见 settings.EVENT_LOG_RETENTION
+    
+    Args:
+        max_batches: 本次最多执行的批数，默认直到处理完
+    """
+    from leave_api.services.event_retention_service import EventLogRetentionService
+    
+    try:
+        return {'success': True, 'deleted': EventLogRetentionService().prune(max_batches)}
+    except Exception as e:
+        logger.error(f"事件日志清理失败: {e}", exc_info=True)
+        return {'success': False, 'error': str(e)}
@@ -0,0 +1,629 @@
+"""
+leave_api 测试
+"""
+
+import os
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from leave_api import signals, views_v2
+from leave_api.event_bus import EventBus
+from leave_api.models import (
+    LeaveRequest, LeaveRequestArchive, ApprovalHistory, CCRecord, WorkflowEventLog
+)
+from leave_api.services import diagram_service
+from leave_api.services.archive_service import ArchiveService
+from leave_api.services.diagram_service import BpmnDiagramService
+from leave_api.spiff_client_v2 import SpiffWorkflowClient, parse_bpmn_spec, spec_version
+from leave_system.db_router import ReplicaPinningMiddleware, read_replica
+from leave_system.profiling import QueryBudgetExceeded, assert_query_budget, query_budget
+from notifications.models import Notification
+
+
+class ArchiveServiceTest(TestCase):
+    """归档与恢复：子表记录原样往返，分页结果不受归档影响，分批中断后重跑不丢不重"""
+
+    def setUp(self):
+        self.service = ArchiveService()
+        self.factory = APIRequestFactory()
+        base = timezone.now() - timedelta(days=400)
+        self.leave_requests = []
+        for i in range(5):
+            leave_request = LeaveRequest.objects.create(
+                user_email=f'user{i}@example.com',
+                staff_full_name=f'员工{i}',
+                reason='年假',
+                leave_hours=8,
+                status='approved' if i % 2 == 0 else 'rejected',
+                process_instance_id=f'wf-{i}',
+                workflow_state={'serializer_version': '1.0', 'step': i},
+            )
+            self.leave_requests.append(leave_request)
+            for j in range(7):
+                history = ApprovalHistory.objects.create(
+                    leave_request=leave_request,
+                    action='approve' if j % 2 else 'submit',
+                    operator_email=f'op{j}@example.com',
+                    operator_name=f'审批人{j}',
+                    comment=f'意见 {j}',
+                    task_id=f'task-{j}',
+                )
+                cc_record = CCRecord.objects.create(
+                    leave_request=leave_request,
+                    cc_to_email=f'cc{j}@example.com',
+                    cc_by_email=leave_request.user_email,
+                    is_read=j % 3 == 0,
+                )
+                # 部分记录使用相同的 created_at，覆盖排序键中 id 的比较
+                created_at = base + timedelta(days=i, minutes=j // 2, microseconds=123)
+                ApprovalHistory.objects.filter(pk=history.pk).update(created_at=created_at)
+                CCRecord.objects.filter(pk=cc_record.pk).update(created_at=created_at)
+            WorkflowEventLog.objects.create(
+                event_key=f'workflow_completed:wf-{i}:',
+                workflow_instance_id=f'wf-{i}',
+                event_type='workflow_completed',
+                event_data={'workflow_data': {'final_result': 'approved'}},
+                status='success',
+                processed_at=base,
+            )
+        LeaveRequest.objects.update(updated_at=base)
+
+    def snapshot(self):
+        return {
+            'history': list(ApprovalHistory.objects.order_by('id').values()),
+            'cc_records': list(CCRecord.objects.order_by('id').values()),
+            'event_logs': list(WorkflowEventLog.objects.order_by('id').values()),
+            'workflow_state': dict(LeaveRequest.objects.values_list('id', 'workflow_state')),
+        }
+
+    def collect_pages(self, view, leave_request_id, key, page_size=3):
+        """按游标翻完所有页，返回每页的记录列表"""
+        pages = []
+        cursor = None
+        while True:
+            params = {'page_size': page_size}
+            if cursor:
+                params['cursor'] = cursor
+            request = self.factory.get('/', params)
+            response = view(request, leave_request_id=leave_request_id)
+            self.assertEqual(response.status_code, 200, response.data)
+            pages.append(response.data[key])
+            cursor = response.data['next_cursor']
+            if not cursor:
+                return pages
+
+    def test_archive_then_restore_reproduces_rows(self):
+        before = self.snapshot()
+
+        result = self.service.archive_completed(older_than_days=30)
+
+        self.assertEqual(result['archived'], 5)
+        self.assertFalse(ApprovalHistory.objects.exists())
+        self.assertFalse(WorkflowEventLog.objects.exists())
+        # 抄送记录不归档
+        self.assertEqual(list(CCRecord.objects.order_by('id').values()), before['cc_records'])
+        self.assertFalse(LeaveRequest.objects.filter(archived_at__isnull=True).exists())
+        self.assertEqual(LeaveRequestArchive.objects.count(), 5)
+
+        self.service.restore()
+
+        self.assertEqual(self.snapshot(), before)
+        self.assertFalse(LeaveRequestArchive.objects.exists())
+        self.assertFalse(LeaveRequest.objects.filter(archived_at__isnull=False).exists())
+
+    def test_cursor_pages_unchanged_by_archiving(self):
+        leave_request_id = self.leave_requests[1].id
+        history_before = self.collect_pages(views_v2.get_approval_history, leave_request_id, 'history')
+        cc_before = self.collect_pages(views_v2.get_cc_records, leave_request_id, 'cc_records')
+        self.assertGreater(len(history_before), 1)
+        self.assertGreater(len(cc_before), 1)
+
+        self.service.archive_completed(older_than_days=30)
+        self.assertTrue(LeaveRequestArchive.objects.filter(leave_request_id=leave_request_id).exists())
+
+        self.assertEqual(
+            self.collect_pages(views_v2.get_approval_history, leave_request_id, 'history'), history_before
+        )
+        self.assertEqual(
+            self.collect_pages(views_v2.get_cc_records, leave_request_id, 'cc_records'), cc_before
+        )
+
+    def test_cc_endpoints_unchanged_by_archiving(self):
+        cc_email = 'cc3@example.com'
+
+        def my_cc_requests(**params):
+            response = self.client.get('/api/leave/my-cc-requests/', {'user_email': cc_email, **params})
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            return body['cc_requests'], body['unread_count']
+
+        before = my_cc_requests()
+        self.assertEqual(len(before[0]), 5)
+
+        self.service.archive_completed(older_than_days=30)
+        self.assertEqual(LeaveRequestArchive.objects.count(), 5)
+
+        self.assertEqual(my_cc_requests(), before)
+        self.assertEqual(my_cc_requests(is_read='false'), ([], 0))
+
+        # 已归档申请的抄送记录仍可标记已读，重复抄送仍被拒绝
+        cc_record = CCRecord.objects.filter(cc_to_email='cc1@example.com').first()
+        response = self.client.post(f'/api/leave/cc-records/{cc_record.id}/mark-read/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(CCRecord.objects.get(pk=cc_record.pk).is_read)
+
+        leave_request_id = cc_record.leave_request_id
+        with self.assertLogs('django.request', 'WARNING'):
+            response = self.client.post(
+                f'/api/leave/requests/{leave_request_id}/cc/',
+                {'cc_to_email': cc_email, 'cc_by_email': 'user0@example.com'},
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 400)
+
+    def test_rerun_after_max_batches_neither_duplicates_nor_loses_rows(self):
+        before = self.snapshot()
+
+        first = self.service.archive_completed(older_than_days=30, batch_size=2, max_batches=1)
+        self.assertEqual(first, {'archived': 2, 'batches': 1})
+        rest = self.service.archive_completed(older_than_days=30, batch_size=2)
+        self.assertEqual(rest, {'archived': 3, 'batches': 2})
+
+        archives = LeaveRequestArchive.objects.order_by('leave_request_id')
+        self.assertEqual(
+            list(archives.values_list('leave_request_id', flat=True)),
+            [leave_request.id for leave_request in self.leave_requests]
+        )
+        self.assertEqual(sum(archive.history_count for archive in archives), len(before['history']))
+        self.assertEqual(sum(archive.cc_count for archive in archives), 0)
+        self.assertEqual(sum(archive.event_count for archive in archives), len(before['event_logs']))
+
+        first = self.service.restore(batch_size=2, max_batches=1)
+        self.assertEqual(first, {'restored': 2, 'batches': 1})
+        rest = self.service.restore(batch_size=2)
+        self.assertEqual(rest, {'restored': 3, 'batches': 2})
+
+        self.assertEqual(self.snapshot(), before)
+        self.assertFalse(LeaveRequestArchive.objects.exists())
+
+
+class BpmnDiagramServiceTest(TestCase):
+    """设计器保存：前置/后置脚本写成 Spiff 扩展元素，未通过校验的流程图只保存草稿、不写入文件"""
+
+    process_id = 'demo/demo/demo'
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.bpmn_path = Path(tmp.name) / 'demo.bpmn'
+        self.bpmn_path.write_bytes(b'<original />')
+        for target, value in (
+            ('bpmn_path_for', lambda process_id: self.bpmn_path),
+            ('ProcessCatalogService', mock.MagicMock()),
+        ):
+            patcher = mock.patch.object(diagram_service, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.service = BpmnDiagramService()
+
+    def diagram(self, condition='days > 3', pre_script='assignee = "manager@example.com"'):
+        nodes = [
+            {'id': 'StartEvent_1', 'type': 'bpmn:startEvent', 'x': 100, 'y': 100},
+            {'id': 'Task_Approve', 'type': 'bpmn:userTask', 'x': 200, 'y': 100, 'text': '经理审批',
+             'properties': {'assignee': 'dept_manager', 'preScript': pre_script,
+                            'postScript': 'approved = days < 10 and "<ok>"'}},
+            {'id': 'Gateway_1', 'type': 'bpmn:exclusiveGateway', 'x': 300, 'y': 100,
+             'properties': {'default': 'Flow_Short'}},
+            {'id': 'EndEvent_Long', 'type': 'bpmn:endEvent', 'x': 400, 'y': 50},
+            {'id': 'EndEvent_Short', 'type': 'bpmn:endEvent', 'x': 400, 'y': 150},
+        ]
+        edges = [
+            {'id': 'Flow_1', 'sourceNodeId': 'StartEvent_1', 'targetNodeId': 'Task_Approve'},
+            {'id': 'Flow_2', 'sourceNodeId': 'Task_Approve', 'targetNodeId': 'Gateway_1'},
+            {'id': 'Flow_Long', 'sourceNodeId': 'Gateway_1', 'targetNodeId': 'EndEvent_Long',
+             'properties': {'conditionExpression': condition}},
+            {'id': 'Flow_Short', 'sourceNodeId': 'Gateway_1', 'targetNodeId': 'EndEvent_Short'},
+        ]
+        return nodes, edges
+
+    def save(self, nodes, edges):
+        # 流程文件在事务提交后写入
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.service.save(self.process_id, nodes, edges, name='演示')
+
+    def test_pre_and_post_scripts_render_as_extension_elements(self):
+        result = self.save(*self.diagram())
+
+        self.assertTrue(result['written'])
+        self.assertTrue(result['validation']['valid'], result['validation'])
+        content = self.bpmn_path.read_text(encoding='utf-8')
+        self.assertIn('<spiffworkflow:preScript>assignee = "manager@example.com"</spiffworkflow:preScript>', content)
+        self.assertIn('<spiffworkflow:postScript>approved = days &lt; 10 and "&lt;ok&gt;"</spiffworkflow:postScript>',
+                      content)
+        self.assertIn('<spiffworkflow:property name="assignee" value="dept_manager" />', content)
+        self.assertNotIn('name="preScript"', content)
+        self.assertNotIn('name="postScript"', content)
+
+    def test_invalid_diagram_is_saved_but_not_written(self):
+        saved = self.save(*self.diagram())
+        content = self.bpmn_path.read_bytes()
+
+        nodes, edges = self.diagram()
+        # 草稿：新拖入、尚未连线的节点
+        draft = (nodes + [{'id': 'Task_Draft', 'type': 'bpmn:userTask', 'x': 500, 'y': 100}], edges)
+        revision = saved['revision']
+        for nodes, edges in (self.diagram(condition='days >'), self.diagram(pre_script='assignee = ('), draft):
+            with mock.patch.object(self.service, 'refresh_process') as refresh:
+                result = self.save(nodes, edges)
+            self.assertFalse(result['written'])
+            self.assertFalse(result['validation']['valid'])
+            self.assertTrue(result['validation']['errors'])
+            refresh.assert_not_called()
+            self.assertEqual(self.bpmn_path.read_bytes(), content)
+
+            revision += 1
+            diagram = self.service.load(self.process_id)
+            self.assertEqual(result['revision'], revision)
+            self.assertEqual(diagram['revision'], revision)
+            self.assertEqual(sorted(diagram['nodes'], key=lambda node: node['id']),
+                             sorted(nodes, key=lambda node: node['id']))
+
+        # 修正后写入文件
+        result = self.save(*self.diagram(condition='days > 5'))
+        self.assertTrue(result['written'])
+        self.assertIn(b'days &gt; 5', self.bpmn_path.read_bytes())
+
+    def test_file_is_written_only_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            result = self.service.save(self.process_id, *self.diagram(), name='演示')
+        self.assertTrue(result['written'])
+        self.assertEqual(self.bpmn_path.read_bytes(), b'<original />')
+
+        with mock.patch.object(self.service, 'refresh_process') as refresh:
+            for callback in callbacks:
+                callback()
+        self.assertIn(b'spiffworkflow:preScript', self.bpmn_path.read_bytes())
+        refresh.assert_called_once_with(self.process_id, self.bpmn_path.read_bytes())
+
+
+@override_settings(EVENT_BUS={'BACKEND': 'sync', 'BATCH_WAIT': 0.05, 'RETRY_BACKOFF': 0})
+class EventBusTest(TestCase):
+    """领域事件总线：提交后分发、按消费者攒批、失败重试和延迟统计"""
+
+    def setUp(self):
+        self.bus = EventBus()
+        self.batches = []
+
+    def subscribe(self, handler=None, **kwargs):
+        handler = handler or self.batches.append
+        self.bus.subscribe('demo', name='demo_consumer', **kwargs)(handler)
+        return self.bus.get_consumer('demo_consumer')
+
+    def test_events_dispatch_on_commit_and_drop_on_rollback(self):
+        self.subscribe()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.bus.publish('demo', {'n': 1})
+            self.assertEqual(self.batches, [])
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual([[event['payload'] for event in batch] for batch in self.batches], [[{'n': 1}]])
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    self.bus.publish('demo', {'n': 2})
+                    raise RuntimeError('rollback')
+        self.assertEqual(callbacks, [])
+        self.assertEqual(len(self.batches), 1)
+
+    @override_settings(EVENT_BUS={'BACKEND': 'thread', 'BATCH_WAIT': 0.5, 'RETRY_BACKOFF': 0})
+    def test_thread_backend_batches_per_consumer(self):
+        consumer = self.subscribe(batch_size=2)
+        other = []
+        self.bus.subscribe('demo', name='other_consumer', batch_size=10)(other.append)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for n in range(5):
+                self.bus.publish('demo', {'n': n})
+        self.assertTrue(self.bus.drain(timeout=5))
+
+        self.assertEqual([len(batch) for batch in self.batches], [2, 2, 1])
+        self.assertEqual([len(batch) for batch in other], [5])
+        self.assertEqual(
+            [event['payload']['n'] for batch in self.batches for event in batch], [0, 1, 2, 3, 4]
+        )
+        stats = consumer.get_stats()
+        self.assertEqual((stats['published'], stats['processed'], stats['batches']), (5, 5, 3))
+        self.assertEqual(stats['queue_depth'], 0)
+
+    def test_failing_consumer_is_retried(self):
+        calls = []
+
+        def flaky(events):
+            calls.append(len(events))
+            if len(calls) < 3:
+                raise RuntimeError('temporary failure')
+
+        consumer = self.subscribe(flaky, max_retries=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bus.publish('demo', {'n': 1})
+
+        self.assertEqual(calls, [1, 1, 1])
+        stats = consumer.get_stats()
+        self.assertEqual((stats['retries'], stats['processed'], stats['failed']), (2, 1, 0))
+
+    def test_consumer_failing_past_max_retries_counts_failed(self):
+        calls = []
+
+        def broken(events):
+            calls.append(len(events))
+            raise RuntimeError('permanent failure')
+
+        consumer = self.subscribe(broken, max_retries=2)
+        with self.assertLogs('leave_api.event_bus', 'ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.bus.publish('demo', {'n': 1})
+
+        self.assertEqual(len(calls), 3)
+        stats = consumer.get_stats()
+        self.assertEqual((stats['retries'], stats['processed'], stats['failed']), (2, 0, 1))
+
+    def test_lag_stats(self):
+        consumer = self.subscribe()
+        with self.captureOnCommitCallbacks(execute=True):
+            event = self.bus.publish('demo', {'n': 1})
+            event['occurred_at'] -= 5
+
+        stats = consumer.get_stats()
+        self.assertEqual((stats['processed'], stats['batches'], stats['last_batch_size']), (1, 1, 1))
+        self.assertGreaterEqual(stats['last_lag_seconds'], 5)
+        self.assertGreaterEqual(stats['max_lag_seconds'], stats['last_lag_seconds'])
+
+
+@override_settings(EVENT_BUS={'BACKEND': 'sync', 'BATCH_WAIT': 0.05, 'RETRY_BACKOFF': 0})
+class WorkflowEventIdempotencyTest(TestCase):
+    """重复的工作流完成事件只记录一条成功日志"""
+
+    def setUp(self):
+        self.leave_request = LeaveRequest.objects.create(
+            user_email='user@example.com', reason='年假', leave_hours=8,
+            status='pending', process_instance_id='wf-dup',
+        )
+
+    def completed_logs(self):
+        return WorkflowEventLog.objects.filter(
+            workflow_instance_id='wf-dup', event_type='workflow_completed', status='success'
+        )
+
+    def test_duplicate_published_event_records_one_log(self):
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                signals.trigger_workflow_completed(
+                    'wf-dup', {'final_result': 'rejected'}, leave_request=self.leave_request
+                )
+
+        self.assertEqual(self.completed_logs().count(), 1)
+        self.leave_request.refresh_from_db()
+        self.assertEqual(self.leave_request.status, 'rejected')
+
+    def test_duplicate_events_in_one_batch_hit_unique_key(self):
+        # 发布时申请已处于最终状态：两条事件都直接记录日志，由 event_key 唯一索引去重
+        event = {'payload': {
+            'workflow_instance_id': 'wf-dup', 'final_result': 'approved', 'workflow_data': {},
+            'leave_request_id': self.leave_request.pk, 'leave_request_status': 'approved',
+        }}
+        signals.handle_workflow_completed([event, event])
+        signals.handle_workflow_completed([event])
+
+        self.assertEqual(self.completed_logs().count(), 1)
+
+
+@override_settings(QUERY_PROFILER={**settings.QUERY_PROFILER, 'RESPONSE_HEADERS': True, 'LOG_SAMPLE_RATE': 0})
+class QueryBudgetTest(TestCase):
+    """列表接口的查询次数不超过 settings.QUERY_PROFILER['BUDGETS'] 中的预算，且不随记录数增长"""
+
+    email = 'budget@example.com'
+    approver = 'approver@example.com'
+
+    def setUp(self):
+        self.leave_requests = []
+        for i in range(6):
+            leave_request = LeaveRequest.objects.create(
+                user_email=self.email, staff_full_name='预算', reason=f'原因 {i}', leave_hours=8,
+                status='pending', process_instance_id=f'wf-budget-{i}',
+            )
+            self.leave_requests.append(leave_request)
+            for j in range(3):
+                ApprovalHistory.objects.create(
+                    leave_request=leave_request, action='submit', operator_email=self.approver,
+                    operator_name='审批人', task_id=f'task-{j}',
+                )
+                CCRecord.objects.create(
+                    leave_request=leave_request, cc_to_email=f'cc{j}@example.com', cc_by_email=self.email,
+                )
+            CCRecord.objects.create(leave_request=leave_request, cc_to_email=self.email, cc_by_email=self.approver)
+            Notification.objects.create(
+                recipient_email=self.email, notification_type='task_assigned',
+                title=f'通知 {i}', content='内容', leave_request_id=leave_request.id,
+            )
+
+    def get(self, url, count_key, expected):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(len(body[count_key]), expected, body)
+        assert_query_budget(response)
+        return response
+
+    def test_get_my_leave_requests(self):
+        self.get(f'/api/leave/my-requests/?user_email={self.email}', 'requests', 6)
+
+    def test_get_approval_history(self):
+        self.get(f'/api/leave/requests/{self.leave_requests[0].id}/history/', 'history', 3)
+
+    def test_get_cc_records(self):
+        # GET 与 POST 共用同一路径，直接调用视图
+        request = APIRequestFactory().get('/')
+        with query_budget(settings.QUERY_PROFILER['BUDGETS']['get_cc_records']):
+            response = views_v2.get_cc_records(request, leave_request_id=self.leave_requests[0].id)
+        self.assertEqual(len(response.data['cc_records']), 4)
+
+    def test_get_my_cc_requests(self):
+        self.get(f'/api/leave/my-cc-requests/?user_email={self.email}', 'cc_requests', 6)
+
+    def test_get_my_approval_tasks(self):
+        self.get(f'/api/approval-tasks/my-tasks/?user_email={self.approver}', 'tasks', 6)
+
+    def test_get_my_notifications(self):
+        self.get(f'/api/notifications/my-notifications/?user_email={self.email}', 'notifications', 6)
+
+    def test_budget_exceeded_is_reported(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with query_budget(2):
+                for leave_request in self.leave_requests:
+                    list(leave_request.history.all())
+
+
+@override_settings(DATABASE_REPLICA={**settings.DATABASE_REPLICA, 'ALIAS': 'replica'})
+class ReplicaRouterTest(TestCase):
+    """读写分离路由：read_replica 读副本，写操作和读己之写走主库"""
+
+    databases = {'default', 'replica'}
+
+    def capture(self, func):
+        """执行 func，返回 (主库查询数, 副本查询数)"""
+        with CaptureQueriesContext(connections['default']) as default, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            func()
+        return len(default), len(replica)
+
+    def run_middleware(self, view, cookies=None):
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies or {})
+        return ReplicaPinningMiddleware(view)(request)
+
+    def read(self):
+        with read_replica():
+            list(LeaveRequest.objects.all())
+
+    def write(self):
+        # 测试中副本与主库共享内存数据库（表级锁），写入与 read() 不同的表
+        with read_replica():
+            Notification.objects.create(
+                recipient_email='replica@example.com', notification_type='task_assigned',
+                title='通知', content='内容',
+            )
+
+    def test_read_replica_routes_reads_to_replica(self):
+        self.assertEqual(router.db_for_read(LeaveRequest), 'default')
+        with read_replica():
+            self.assertEqual(router.db_for_read(LeaveRequest), 'replica')
+        self.assertEqual(self.capture(self.read), (0, 1))
+        self.assertEqual(self.capture(lambda: list(LeaveRequest.objects.all())), (1, 0))
+
+        response = self.client.get('/api/leave/my-requests/?user_email=replica@example.com')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(settings.DATABASE_REPLICA['COOKIE_NAME'], response.cookies)
+
+    def test_writes_never_use_replica(self):
+        with read_replica():
+            self.assertEqual(router.db_for_write(Notification), 'default')
+        default, replica = self.capture(self.write)
+        self.assertEqual(replica, 0)
+        self.assertGreaterEqual(default, 1)
+
+    def test_write_pins_client_to_default(self):
+        cookie_name = settings.DATABASE_REPLICA['COOKIE_NAME']
+
+        def write_view(request):
+            self.write()
+            # 同一请求内写过之后的读走主库
+            self.assertEqual(self.capture(self.read), (1, 0))
+            return HttpResponse()
+
+        response = self.run_middleware(write_view)
+        self.assertIn(cookie_name, response.cookies)
+        cookie = response.cookies[cookie_name]
+        self.assertEqual(cookie['max-age'], settings.DATABASE_REPLICA['STICKY_SECONDS'])
+
+        counts = []
+
+        def read_view(request):
+            counts.append(self.capture(self.read))
+            return HttpResponse()
+
+        # 带着未过期 Cookie 的读请求走主库，且不再续期
+        response = self.run_middleware(read_view, {cookie_name: cookie.value})
+        self.assertEqual(counts.pop(), (1, 0))
+        self.assertNotIn(cookie_name, response.cookies)
+
+        # Cookie 过期或无效后恢复读副本
+        for value in ('0', 'invalid'):
+            self.run_middleware(read_view, {cookie_name: value})
+            self.assertEqual(counts.pop(), (0, 1))
+
+
+class SpecReloadTest(TestCase):
+    """一个工作进程部署新版本后，其他工作进程按 BPMN 文件的变化重新加载流程规范"""
+
+    model_id = 'leave-approval/leave-approval'
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        shipped = settings.BASE_DIR.parent / 'process_models' / self.model_id / 'leave-approval.bpmn'
+        self.original = shipped.read_bytes()
+        self.bpmn_path = Path(tmp.name) / self.model_id / 'leave-approval.bpmn'
+        self.bpmn_path.parent.mkdir(parents=True)
+        self.bpmn_path.write_bytes(self.original)
+        self.workers = [SpiffWorkflowClient(), SpiffWorkflowClient()]
+        for worker in self.workers:
+            worker.process_dir = Path(tmp.name)
+
+    def rewrite(self, content):
+        self.bpmn_path.write_bytes(content)
+        # 文件系统时间戳精度有限，确保修改时间变化
+        stat = self.bpmn_path.stat()
+        os.utime(self.bpmn_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    def task_name(self, spec):
+        return spec.task_specs['Task_DeptManagerApproval'].bpmn_name
+
+    def test_deploy_in_one_worker_is_picked_up_by_others(self):
+        deployer, other = self.workers
+        spec = other._load_bpmn_spec(self.model_id)
+        self.assertEqual(self.task_name(spec), '部门经理审批')
+        self.assertIs(other._load_bpmn_spec(self.model_id), spec)
+
+        # 与 deploy_process 相同：写入文件后部署校验时构建的规范
+        content = self.original.replace('部门经理审批'.encode(), '直属经理审批'.encode())
+        self.rewrite(content)
+        deployed = parse_bpmn_spec(content, str(self.bpmn_path), 'leave-approval')
+        deployer.deploy_spec(self.model_id, deployed, spec_version(content))
+
+        self.assertIs(deployer._load_bpmn_spec(self.model_id), deployed)
+        reloaded = other._load_bpmn_spec(self.model_id)
+        self.assertEqual(self.task_name(reloaded), '直属经理审批')
+        self.assertEqual(other.spec_versions[self.model_id], deployer.spec_versions[self.model_id])
+        self.assertIs(other._load_bpmn_spec(self.model_id), reloaded)
+
+    def test_unparseable_file_keeps_cached_spec(self):
+        worker = self.workers[0]
+        spec = worker._load_bpmn_spec(self.model_id)
+
+        self.rewrite(b'<bpmn:definitions')
+        with self.assertLogs('leave_api.spiff_client_v2', 'WARNING'):
+            self.assertIs(worker._load_bpmn_spec(self.model_id), spec)
+        # 同一个文件不重复解析
+        with self.assertNoLogs('leave_api.spiff_client_v2', 'WARNING'):
+            self.assertIs(worker._load_bpmn_spec(self.model_id), spec)
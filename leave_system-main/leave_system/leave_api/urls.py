@@ -12,6 +12,7 @@ URL 路由配置模块
 - /api/leave/reject/ - 拒绝请假申请
 - /api/leave/return/ - 退回请假申请
 - /api/leave/requests/<id>/history/ - 查询审批历史
+- /api/leave/requests/<id>/tasks/<task_id>/data/ - 查询任务完整数据
 - /api/approval-tasks/my-tasks/ - 查询我的待办任务（新）
 - /api/approval-tasks/<task_id>/approve/ - 批准任务（新）
 - /api/approval-tasks/<task_id>/reject/ - 拒绝任务（新）
@@ -60,6 +61,11 @@ urlpatterns = [
     # 功能：查询所有待审批的任务（从工作流引擎获取并关联业务数据）
     path('leave/pending-approvals/', views.get_pending_approvals, name='get_pending_approvals'),
     
+    # 查询任务完整数据
+    # GET /api/leave/requests/<id>/tasks/<task_id>/data/
+    # 功能：待办列表只返回白名单字段，按需获取任务的完整数据
+    path('leave/requests/<int:leave_request_id>/tasks/<str:task_id>/data/', views.get_task_data, name='get_task_data'),
+    
     # 批准请假申请
     # POST /api/leave/approve/
     # 功能：完成工作流任务并更新业务状态为批准
@@ -180,21 +186,23 @@ urlpatterns = [
     # POST /api/bpmn/processes/ - 创建新流程
     path('bpmn/processes/', bpmn_views.processes_list_create, name='bpmn_processes'),
     
-    # 流程详情、更新和删除
-    # GET /api/bpmn/processes/<process_id>/ - 获取流程详情
-    # PUT /api/bpmn/processes/<process_id>/ - 更新流程
-    # DELETE /api/bpmn/processes/<process_id>/ - 删除流程
-    path('bpmn/processes/<path:process_id>/', bpmn_views.process_detail, name='bpmn_process_detail'),
-    
     # 部署流程
     # POST /api/bpmn/processes/<process_id>/deploy/
     path('bpmn/processes/<path:process_id>/deploy/', bpmn_views.deploy_process, name='deploy_bpmn_process'),
     
     # 验证流程
-    # GET /api/bpmn/processes/<process_id>/validate/
+    # GET /api/bpmn/processes/<process_id>/validate/ - 验证已保存的流程文件
+    # POST /api/bpmn/processes/<process_id>/validate/ - 验证设计器中尚未保存的 XML
     path('bpmn/processes/<path:process_id>/validate/', bpmn_views.validate_process, name='validate_bpmn_process'),
+    
+    # 流程详情、更新和删除（<path:process_id> 会匹配任意后缀，必须放在部署、验证之后）
+    # GET /api/bpmn/processes/<process_id>/ - 获取流程详情
+    # PUT /api/bpmn/processes/<process_id>/ - 更新流程
+    # DELETE /api/bpmn/processes/<process_id>/ - 删除流程
+    path('bpmn/processes/<path:process_id>/', bpmn_views.process_detail, name='bpmn_process_detail'),
 
-    # 保存 LogicFlow 流程图
+    # 保存 LogicFlow 流程图（节点和连线按差异保存，只为变化的元素重新生成 BPMN）
+    # GET /api/bpmn/save/?process_id=<process_id> - 读取已保存的流程图
     # POST /api/bpmn/save/
     path('bpmn/save/', bpmn_views.save_logicflow_diagram, name='save_logicflow_diagram'),
 ]
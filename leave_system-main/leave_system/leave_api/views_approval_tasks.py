@@ -11,6 +11,7 @@ from django.utils import timezone
 
 from .models import LeaveRequest, ApprovalHistory
 from .serializers import ApprovalTaskSerializer, LeaveRequestSerializer
+from .read_models import leave_request_api_row, pending_requests_with_latest_history
 from .services.approval_service import ApprovalService
 
 logger = logging.getLogger(__name__)
@@ -55,27 +56,20 @@ def get_my_approval_tasks(request):
                 'error': '缺少必填参数: user_email'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # 查询待审批的申请
-        pending_requests = LeaveRequest.objects.filter(status='pending')
-        
-        tasks = []
-        for leave_request in pending_requests:
-            # 获取最近的审批历史，判断当前审批人
-            latest_history = ApprovalHistory.objects.filter(
-                leave_request=leave_request
-            ).order_by('-created_at').first()
-            
-            # 简化处理：如果有审批历史且审批人匹配，则添加到任务列表
-            if latest_history and latest_history.operator_email == user_email:
-                task_data = {
-                    'task_id': f'task_{leave_request.id}',
-                    'task_name': '审批任务',
-                    'leave_request_id': leave_request.id,
-                    'leave_request': LeaveRequestSerializer(leave_request).data,
-                    'assignee_email': user_email,
-                    'created_at': latest_history.created_at
-                }
-                tasks.append(task_data)
+        # 查询待审批的申请，最近一条审批历史通过子查询一并带出
+        # 简化处理：最近审批历史的操作人即当前审批人
+        pending_requests = pending_requests_with_latest_history().filter(
+            latest_operator_email=user_email
+        )
+        
+        tasks = [{
+            'task_id': f"task_{row['id']}",
+            'task_name': '审批任务',
+            'leave_request_id': row['id'],
+            'leave_request': leave_request_api_row(row),
+            'assignee_email': user_email,
+            'created_at': row['latest_history_at']
+        } for row in pending_requests]
         
         logger.info(f"查询待办任务: 用户 {user_email}, 任务数 {len(tasks)}")
         
@@ -6,53 +6,19 @@ BPMN 流程管理视图
 
 import os
 import json
-from pathlib import Path
-from django.http import JsonResponse
+from leave_system.renderers import JsonResponse, loads
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
-from django.conf import settings
+from leave_api.bpmn_diagram import DiagramError, RevisionConflict
+from leave_api.services.bpmn_validation import BpmnValidationService
+from leave_api.services.diagram_service import BpmnDiagramService
+from leave_api.services.process_catalog import PROCESS_MODELS_DIR, ProcessCatalogService, model_id_for, process_id_for
+from leave_api.spiff_client_v2 import spiff_client
 
 
-# BPMN 流程模型根目录
-PROCESS_MODELS_DIR = Path(settings.BASE_DIR).parent / 'process_models'
-
-
-def get_all_bpmn_files():
-    """
-    扫描并返回所有 BPMN 文件信息
-    """
-    bpmn_files = []
-    
-    if not PROCESS_MODELS_DIR.exists():
-        return bpmn_files
-    
-    # 递归扫描所有 .bpmn 文件
-    for bpmn_file in PROCESS_MODELS_DIR.rglob('*.bpmn'):
-        # 读取同目录下的 process_model.json 获取元数据
-        process_json = bpmn_file.parent / 'process_model.json'
-        metadata = {}
-        
-        if process_json.exists():
-            try:
-                with open(process_json, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
-            except Exception as e:
-                print(f"读取 {process_json} 失败: {e}")
-        
-        # 生成流程 ID（使用相对路径）
-        relative_path = bpmn_file.relative_to(PROCESS_MODELS_DIR)
-        process_id = str(relative_path).replace('\\', '/').replace('.bpmn', '')
-        
-        bpmn_files.append({
-            'id': process_id,
-            'name': metadata.get('display_name', bpmn_file.stem),
-            'description': metadata.get('description', ''),
-            'path': str(bpmn_file),
-            'relative_path': str(relative_path),
-            'metadata': metadata
-        })
-    
-    return bpmn_files
+def _validated_spec(process_id, content, filename):
+    """按工作流引擎加载时的优先流程 ID（模型目录名）校验，部署和验证共用同一条缓存"""
+    return BpmnValidationService().validated_spec(content, filename, model_id_for(process_id).split('/')[-1])
 
 
 @csrf_exempt
@@ -74,7 +40,7 @@ def processes_list_create(request):
 def list_processes(request):
     """获取所有 BPMN 流程列表"""
     try:
-        processes = get_all_bpmn_files()
+        processes = ProcessCatalogService().list_processes()
         return JsonResponse({
             'processes': processes,
             'count': len(processes)
@@ -88,7 +54,7 @@ def list_processes(request):
 def create_process(request):
     """创建新的 BPMN 流程"""
     try:
-        data = json.loads(request.body)
+        data = loads(request.body)
         name = data.get('name')
         description = data.get('description', '')
         group = data.get('group', 'custom')
@@ -120,9 +86,8 @@ def create_process(request):
         with open(metadata_path, 'w', encoding='utf-8') as f:
             json.dump(metadata, f, ensure_ascii=False, indent=2)
         
-        # 生成流程 ID
-        relative_path = bpmn_path.relative_to(PROCESS_MODELS_DIR)
-        process_id = str(relative_path).replace('\\', '/').replace('.bpmn', '')
+        process_id = process_id_for(bpmn_path)
+        ProcessCatalogService().refresh(process_id)
         
         return JsonResponse({
             'id': process_id,
@@ -156,31 +121,29 @@ def process_detail(request, process_id):
 def get_process(request, process_id):
     """获取指定 BPMN 流程的 XML 内容"""
     try:
-        # 构建 BPMN 文件路径
-        bpmn_path = PROCESS_MODELS_DIR / f"{process_id}.bpmn"
-        
-        if not bpmn_path.exists():
+        # 元数据来自流程目录索引，只读取 BPMN 文件本身
+        entry = ProcessCatalogService().get(process_id)
+        if entry is None:
             return JsonResponse({
                 'error': '流程文件不存在'
             }, status=404)
         
-        # 读取 BPMN XML
-        with open(bpmn_path, 'r', encoding='utf-8') as f:
-            xml_content = f.read()
-        
-        # 读取元数据
-        process_json = bpmn_path.parent / 'process_model.json'
-        metadata = {}
-        if process_json.exists():
-            with open(process_json, 'r', encoding='utf-8') as f:
-                metadata = json.load(f)
+        bpmn_path = PROCESS_MODELS_DIR / entry.relative_path
+        try:
+            with open(bpmn_path, 'r', encoding='utf-8') as f:
+                xml_content = f.read()
+        except FileNotFoundError:
+            ProcessCatalogService().remove(process_id)
+            return JsonResponse({
+                'error': '流程文件不存在'
+            }, status=404)
         
         return JsonResponse({
             'id': process_id,
-            'name': metadata.get('display_name', bpmn_path.stem),
-            'description': metadata.get('description', ''),
+            'name': entry.name,
+            'description': entry.description,
             'xml': xml_content,
-            'metadata': metadata
+            'metadata': entry.metadata
         })
     except Exception as e:
         return JsonResponse({
@@ -191,7 +154,7 @@ def get_process(request, process_id):
 def update_process(request, process_id):
     """更新 BPMN 流程"""
     try:
-        data = json.loads(request.body)
+        data = loads(request.body)
         xml = data.get('xml')
         
         if not xml:
@@ -228,8 +191,12 @@ def update_process(request, process_id):
             with open(metadata_path, 'w', encoding='utf-8') as f:
                 json.dump(metadata, f, ensure_ascii=False, indent=2)
         
+        # 更新流程目录索引；工作流引擎已加载该流程时替换为新的流程规范
+        validation = BpmnDiagramService().refresh_process(process_id, xml.encode('utf-8'))
+        
         return JsonResponse({
-            'message': '流程更新成功'
+            'message': '流程更新成功',
+            'validation': validation
         })
     except Exception as e:
         return JsonResponse({
@@ -260,6 +227,8 @@ def delete_process(request, process_id):
         if not any(bpmn_path.parent.iterdir()):
             bpmn_path.parent.rmdir()
         
+        ProcessCatalogService().remove(process_id)
+        
         return JsonResponse({
             'message': '流程删除成功'
         })
@@ -277,10 +246,14 @@ def deploy_process(request, process_id):
     
     POST /api/bpmn/processes/<process_id>/deploy/
     
+    校验通过后，工作流引擎直接使用校验时构建的流程规范，之后启动的实例使用新版本；
+    其他工作进程在下次加载时按 BPMN 文件的变化重新加载。已运行的实例不受影响
+    
     返回:
     {
         "message": "流程部署成功",
-        "deployment_id": "xxx"
+        "deployment_id": "xxx",
+        "version": "内容哈希"
     }
     """
     try:
@@ -292,13 +265,24 @@ def deploy_process(request, process_id):
                 'error': '流程文件不存在'
             }, status=404)
         
-        # TODO: 这里应该调用 SpiffWorkflow 或其他工作流引擎的部署 API
-        # 目前只是返回成功消息
+        content = bpmn_path.read_bytes()
+        result, spec = _validated_spec(process_id, content, str(bpmn_path))
+        if spec is None:
+            return JsonResponse({
+                'error': '流程校验未通过',
+                'errors': result['errors'],
+                'warnings': result['warnings']
+            }, status=400)
+        
+        model_id = model_id_for(process_id)
+        spiff_client.deploy_spec(model_id, spec, result['version'])
         
         return JsonResponse({
             'message': '流程部署成功',
-            'deployment_id': process_id,
-            'note': '当前为模拟部署，实际部署需要集成工作流引擎'
+            'deployment_id': model_id,
+            'process_id': result['process_id'],
+            'version': result['version'],
+            'warnings': result['warnings']
         })
     except Exception as e:
         return JsonResponse({
@@ -307,80 +291,134 @@ def deploy_process(request, process_id):
 
 
 @csrf_exempt
-@require_http_methods(["POST"])
+@require_http_methods(["GET", "POST"])
 def save_logicflow_diagram(request):
     """
-    保存 LogicFlow 流程图数据
+    保存 / 读取 LogicFlow 流程图数据
+
+    GET /api/bpmn/save/?process_id=<process_id> - 读取已保存的节点和连线
 
     POST /api/bpmn/save/
 
     请求体:
     {
+        "process_id": "custom/demo/demo",
         "nodes": [...],
-        "edges": [...]
+        "edges": [...],
+        "base_revision": 3,       // 可选，与当前版本不一致时返回 409
+        "process_ref": "Process_Demo"  // 可选，bpmn:process 的 id
+    }
+
+    节点和连线逐条保存，只为变化的元素重新生成 BPMN，内容变化时才写入流程文件并刷新该流程的缓存；
+    拼接出的 BPMN 未通过校验时（如草稿中还有未连线的节点）仍保存节点和连线，
+    但不写入流程文件，written 为 false，validation 中给出错误
+
+    返回:
+    {
+        "message": "流程图保存成功",
+        "revision": 4,
+        "changes": {"added": 1, "updated": 2, "removed": 0, "unchanged": 120},
+        "written": true,
+        "validation": {...}      // 内容未变化时为 null
     }
     """
     try:
-        data = json.loads(request.body)
+        if request.method == 'GET':
+            process_id = request.GET.get('process_id')
+            if not process_id:
+                return JsonResponse({
+                    'error': '缺少必要参数: process_id'
+                }, status=400)
+            diagram = BpmnDiagramService().load(process_id)
+            if diagram is None:
+                return JsonResponse({
+                    'error': '流程图不存在'
+                }, status=404)
+            return JsonResponse(diagram)
 
-        # 这里可以将 LogicFlow 数据保存到数据库或文件
-        # 目前只是返回成功消息
+        data = loads(request.body)
+        process_id = data.get('process_id')
+        if not process_id:
+            return JsonResponse({
+                'error': '缺少必要参数: process_id'
+            }, status=400)
 
+        result = BpmnDiagramService().save(
+            process_id,
+            data.get('nodes') or [],
+            data.get('edges') or [],
+            base_revision=data.get('base_revision'),
+            process_ref=data.get('process_ref'),
+            name=data.get('name'),
+        )
         return JsonResponse({
-            'message': '流程图保存成功',
-            'data': data
+            'message': '流程图保存成功' if result['validation'] is None or result['written']
+                else '流程图已保存，流程未通过校验，流程文件未更新',
+            'process_id': process_id,
+            **result
         })
+    except FileNotFoundError:
+        return JsonResponse({
+            'error': '流程文件不存在'
+        }, status=404)
+    except RevisionConflict as e:
+        return JsonResponse({
+            'error': str(e)
+        }, status=409)
+    except DiagramError as e:
+        return JsonResponse({
+            'error': str(e)
+        }, status=400)
     except Exception as e:
         return JsonResponse({
             'error': str(e)
         }, status=500)
 
 
-@require_http_methods(["GET"])
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
 def validate_process(request, process_id):
     """
     验证 BPMN 流程的正确性
     
-    GET /api/bpmn/processes/<process_id>/validate/
+    GET /api/bpmn/processes/<process_id>/validate/ - 验证已保存的流程文件
+    POST /api/bpmn/processes/<process_id>/validate/ - 验证请求体中的 {"xml": "..."}（设计器中尚未保存的内容）
+    
+    按工作流引擎的加载方式解析并构建流程规范，再检查不可达节点、无默认分支的网关和无法编译的条件表达式；
+    相同内容的校验结果直接从缓存返回
     
     返回:
     {
         "valid": true,
         "errors": [],
-        "warnings": []
+        "warnings": [],
+        "process_id": "BPMN process id",
+        "version": "内容哈希",
+        "cached": false
     }
     """
     try:
-        # 构建 BPMN 文件路径
-        bpmn_path = PROCESS_MODELS_DIR / f"{process_id}.bpmn"
-        
-        if not bpmn_path.exists():
-            return JsonResponse({
-                'error': '流程文件不存在'
-            }, status=404)
-        
-        # TODO: 这里应该使用 BPMN 验证库进行验证
-        # 目前只是简单检查文件是否为有效的 XML
-        
-        with open(bpmn_path, 'r', encoding='utf-8') as f:
-            xml_content = f.read()
-        
-        # 简单的 XML 格式检查
-        import xml.etree.ElementTree as ET
-        try:
-            ET.fromstring(xml_content)
-            return JsonResponse({
-                'valid': True,
-                'errors': [],
-                'warnings': [],
-                'message': 'BPMN 流程格式正确'
-            })
-        except ET.ParseError as e:
-            return JsonResponse({
-                'valid': False,
-                'errors': [str(e)],
-                'warnings': []
-            })
+        if request.method == 'POST':
+            xml = loads(request.body).get('xml')
+            if not xml:
+                return JsonResponse({
+                    'error': '缺少必要参数: xml'
+                }, status=400)
+            content, filename = xml.encode('utf-8'), f"{process_id}.bpmn"
+        else:
+            # 构建 BPMN 文件路径
+            bpmn_path = PROCESS_MODELS_DIR / f"{process_id}.bpmn"
+            
+            if not bpmn_path.exists():
+                return JsonResponse({
+                    'error': '流程文件不存在'
+                }, status=404)
+            content, filename = bpmn_path.read_bytes(), str(bpmn_path)
+        
+        result, _ = _validated_spec(process_id, content, filename)
+        if result['valid']:
+            result['message'] = 'BPMN 流程校验通过'
+        return JsonResponse(result)
     except Exception as e:
         return JsonResponse({
             'error': str(e)
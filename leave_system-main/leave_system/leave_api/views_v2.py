@@ -8,8 +8,19 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.utils import timezone
 from django.shortcuts import render
-from .models import LeaveRequest
+from leave_system.db_router import read_replica
+from leave_system.pagination import KeysetPaginator, InvalidCursor
+from leave_system.tracing import traced
+from .models import LeaveRequest, ApprovalHistory
+from .read_models import (
+    LEAVE_REQUEST_LIST_FIELDS, leave_request_list_row,
+    LEAVE_REQUEST_SUMMARY_FIELDS, leave_request_summary_row,
+    APPROVAL_HISTORY_FIELDS, approval_history_row,
+    CC_RECORD_FIELDS, cc_record_row,
+    MY_CC_RECORD_FIELDS, my_cc_record_row,
+)
 from .services.approval_service import ApprovalService
+from .services.archive_service import ArchiveService
 import logging
 
 # 获取日志记录器
@@ -17,6 +28,11 @@ logger = logging.getLogger(__name__)
 
 # 初始化审批服务
 approval_service = ApprovalService()
+archive_service = ArchiveService()
+
+# 列表接口的键集分页器（排序与对应的复合索引一致）
+newest_first_paginator = KeysetPaginator(('-created_at', '-id'))
+oldest_first_paginator = KeysetPaginator(('created_at', 'id'))
 
 
 def index(request):
@@ -30,7 +46,7 @@ def index(request):
     Returns:
         JsonResponse: 返回 API 信息
     """
-    from django.http import JsonResponse
+    from leave_system.renderers import JsonResponse
     
     return JsonResponse({
         'message': '欢迎使用请假审批系统 API',
@@ -46,6 +62,7 @@ def index(request):
 
 
 @api_view(['POST'])
+@traced()
 def create_leave_request(request):
     """
     创建请假申请并启动审批流程
@@ -148,25 +165,33 @@ def create_leave_request(request):
 
 
 @api_view(['GET'])
+@traced()
+@read_replica()
 def get_my_leave_requests(request):
     """
     查询我的请假申请列表
     
-    根据用户邮箱查询该用户的所有请假申请记录
+    根据用户邮箱查询该用户的请假申请记录，按创建时间倒序分页返回
     
     请求参数:
         user_email (str): 用户邮箱，必填，通过 URL 参数传递
+        cursor (str): 分页游标，可选，取上一页返回的 next_cursor
+        page_size (int): 每页数量，可选，默认 50，最大 200
         
     返回数据:
         success (bool): 操作是否成功
-        requests (list): 请假申请列表
+        requests (list): 请假申请列表（当前页）
+        next_cursor (str): 下一页游标，没有更多数据时为 null
+        has_more (bool): 是否还有下一页
+        page_size (int): 每页数量
             
     HTTP 状态码:
         200: 查询成功
-        400: 缺少必填参数
+        400: 缺少必填参数或分页参数无效
         
     示例:
         GET /api/leave/my-requests/?user_email=user@example.com
+        GET /api/leave/my-requests/?user_email=user@example.com&cursor=<next_cursor>
     """
     user_email = request.query_params.get('user_email')
     
@@ -176,33 +201,26 @@ def get_my_leave_requests(request):
             'error': '缺少 user_email 参数'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    requests_list = LeaveRequest.objects.filter(user_email=user_email).order_by('-created_at')
+    try:
+        page = newest_first_paginator.paginate_params(
+            LeaveRequest.objects.filter(user_email=user_email).values(*LEAVE_REQUEST_LIST_FIELDS),
+            request.query_params
+        )
+    except InvalidCursor as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
     
     return Response({
         'success': True,
-        'requests': [{
-            'id': r.id,
-            'user_email': r.user_email,
-            'staff_full_name': r.staff_full_name,
-            'staff_dept': r.staff_dept,
-            'reason': r.reason,
-            'leave_hours': r.leave_hours,
-            'leave_type': r.leave_type,
-            'duration': float(r.duration) if r.duration else None,
-            'start_date': r.start_date.isoformat() if r.start_date else None,
-            'end_date': r.end_date.isoformat() if r.end_date else None,
-            'status': r.status,
-            'status_display': r.get_status_display(),
-            'process_instance_id': r.process_instance_id,
-            'workflow_spec_name': r.workflow_spec_name,
-            'created_at': r.created_at.isoformat(),
-            'submitted_at': r.submitted_at.isoformat() if r.submitted_at else None,
-            'completed_at': r.completed_at.isoformat() if r.completed_at else None,
-        } for r in requests_list]
+        **page.to_dict(),
+        'requests': [leave_request_list_row(row) for row in page.items]
     })
 
 
 @api_view(['GET'])
+@traced()
 def get_pending_approvals(request):
     """
     查询待审批任务列表
@@ -251,7 +269,63 @@ def get_pending_approvals(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@traced()
+def get_task_data(request, leave_request_id, task_id):
+    """
+    查询任务完整数据
+    
+    待办任务列表只返回白名单字段（见 settings.WORKFLOW_TASK_DATA_FIELDS），
+    需要查看完整任务数据时调用此接口
+    
+    请求参数:
+        leave_request_id (int): 请假申请 ID，通过 URL 传递
+        task_id (str): 任务 ID，通过 URL 传递
+        
+    返回数据:
+        success (bool): 操作是否成功
+        task_id (str): 任务 ID
+        data (dict): 任务完整数据
+        
+    HTTP 状态码:
+        200: 查询成功
+        404: 请假申请或任务不存在
+        500: 服务器内部错误
+        
+    示例:
+        GET /api/leave/requests/1/tasks/<task_id>/data/
+    """
+    try:
+        leave_request = LeaveRequest.objects.get(id=leave_request_id)
+        data = approval_service.get_task_data(leave_request, task_id)
+        
+        if data is None:
+            return Response({
+                'success': False,
+                'error': '任务不存在'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({
+            'success': True,
+            'task_id': task_id,
+            'data': data
+        })
+    
+    except LeaveRequest.DoesNotExist:
+        return Response({
+            'success': False,
+            'error': '请假申请不存在'
+        }, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        logger.error(f"查询任务数据失败: {e}", exc_info=True)
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(['POST'])
+@traced()
 def approve_leave_request(request):
     """
     批准请假申请
@@ -334,6 +408,7 @@ def approve_leave_request(request):
 
 
 @api_view(['POST'])
+@traced()
 def reject_leave_request(request):
     """
     拒绝请假申请
@@ -420,6 +495,7 @@ def reject_leave_request(request):
 
 
 @api_view(['POST'])
+@traced()
 def return_leave_request(request):
     """
     退回请假申请
@@ -510,21 +586,30 @@ def return_leave_request(request):
 
 
 @api_view(['GET'])
+@traced()
+@read_replica()
 def get_approval_history(request, leave_request_id):
     """
     查询审批历史
     
+    审批历史按时间正序分页返回
+    
     请求参数:
         leave_request_id (int): 请假申请 ID，通过 URL 传递
+        cursor (str): 分页游标，可选
+        page_size (int): 每页数量，可选，默认 50，最大 200
         
     返回数据:
         success (bool): 操作是否成功
         leave_request (dict): 请假申请基本信息
-        history (list): 审批历史列表
-        count (int): 历史记录数量
+        history (list): 审批历史列表（当前页）
+        count (int): 当前页记录数量
+        next_cursor (str): 下一页游标，没有更多数据时为 null
+        has_more (bool): 是否还有下一页
         
     HTTP 状态码:
         200: 查询成功
+        400: 分页参数无效
         404: 请假申请不存在
         500: 服务器内部错误
         
@@ -532,42 +617,34 @@ def get_approval_history(request, leave_request_id):
         GET /api/leave/requests/1/history/
     """
     try:
-        leave_request = LeaveRequest.objects.get(id=leave_request_id)
-        history = leave_request.history.all().order_by('created_at')
+        leave_request = LeaveRequest.objects.values(
+            *LEAVE_REQUEST_SUMMARY_FIELDS, 'archived_at'
+        ).get(id=leave_request_id)
+        if leave_request['archived_at']:
+            # 已归档：从归档数据中读取，分页方式与热表一致
+            page = oldest_first_paginator.paginate_rows(
+                archive_service.history_rows(leave_request_id), ApprovalHistory, request.query_params
+            )
+        else:
+            page = oldest_first_paginator.paginate_params(
+                ApprovalHistory.objects.filter(leave_request_id=leave_request_id).values(*APPROVAL_HISTORY_FIELDS),
+                request.query_params
+            )
+        history = page.items
         
         return Response({
             'success': True,
-            'leave_request': {
-                'id': leave_request.id,
-                'user_email': leave_request.user_email,
-                'staff_full_name': leave_request.staff_full_name,
-                'staff_dept': leave_request.staff_dept,
-                'reason': leave_request.reason,
-                'leave_hours': leave_request.leave_hours,
-                'leave_type': leave_request.leave_type,
-                'status': leave_request.status,
-                'status_display': leave_request.get_status_display(),
-                'created_at': leave_request.created_at.isoformat(),
-                'submitted_at': leave_request.submitted_at.isoformat() if leave_request.submitted_at else None,
-                'completed_at': leave_request.completed_at.isoformat() if leave_request.completed_at else None,
-            },
-            'history': [{
-                'id': h.id,
-                'action': h.action,
-                'action_display': h.get_action_display(),
-                'operator_email': h.operator_email,
-                'operator_name': h.operator_name,
-                'operator_role': h.operator_role,
-                'comment': h.comment,
-                'is_proxy': h.is_proxy,
-                'proxy_for_email': h.proxy_for_email,
-                'task_id': h.task_id,
-                'task_name': h.task_name,
-                'created_at': h.created_at.isoformat()
-            } for h in history],
-            'count': history.count()
+            'leave_request': leave_request_summary_row(leave_request),
+            'history': [approval_history_row(row) for row in history],
+            'count': len(history),
+            **page.to_dict()
         })
     
+    except InvalidCursor as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
     except LeaveRequest.DoesNotExist:
         return Response({
             'success': False,
@@ -583,6 +660,8 @@ def get_approval_history(request, leave_request_id):
 
 
 @api_view(['GET'])
+@traced()
+@read_replica()
 def get_approval_timeline(request, leave_request_id):
     """
     获取审批轨迹可视化数据
@@ -621,8 +700,11 @@ def get_approval_timeline(request, leave_request_id):
         # 查询请假申请
         leave_request = LeaveRequest.objects.get(id=leave_request_id)
         
-        # 查询审批历史
-        history = leave_request.history.all().order_by('created_at')
+        # 查询审批历史（已归档的申请从归档数据中读取）
+        if leave_request.archived_at:
+            history = archive_service.history_records(leave_request.id)
+        else:
+            history = leave_request.history.all().order_by('created_at')
         
         # 构建时间轴数据
         timeline = []
@@ -693,6 +775,7 @@ def get_approval_timeline(request, leave_request_id):
 
 
 @api_view(['POST'])
+@traced()
 def add_cc_record(request, leave_request_id):
     """
     添加抄送人
@@ -771,6 +854,8 @@ def add_cc_record(request, leave_request_id):
 
 
 @api_view(['GET'])
+@traced()
+@read_replica()
 def get_cc_records(request, leave_request_id):
     """
     查询抄送记录
@@ -780,33 +865,40 @@ def get_cc_records(request, leave_request_id):
         
     返回数据:
         success (bool): 操作是否成功
-        cc_records (list): 抄送记录列表
-        count (int): 抄送记录数量
+        cc_records (list): 抄送记录列表（当前页，按时间倒序）
+        count (int): 当前页记录数量
+        next_cursor (str): 下一页游标，没有更多数据时为 null
+        has_more (bool): 是否还有下一页
         
     HTTP 状态码:
         200: 查询成功
+        400: 分页参数无效
         404: 请假申请不存在
         500: 服务器内部错误
     """
     from .models import CCRecord
     
     try:
-        leave_request = LeaveRequest.objects.get(id=leave_request_id)
-        cc_records = CCRecord.objects.filter(leave_request=leave_request).order_by('-created_at')
+        # 抄送记录不归档，已归档的申请也从热表读取
+        leave_request = LeaveRequest.objects.only('id').get(id=leave_request_id)
+        page = newest_first_paginator.paginate_params(
+            CCRecord.objects.filter(leave_request=leave_request).values(*CC_RECORD_FIELDS),
+            request.query_params
+        )
+        cc_records = page.items
         
         return Response({
             'success': True,
-            'cc_records': [{
-                'id': cc.id,
-                'cc_to_email': cc.cc_to_email,
-                'cc_by_email': cc.cc_by_email,
-                'is_read': cc.is_read,
-                'created_at': cc.created_at.isoformat(),
-                'read_at': cc.read_at.isoformat() if cc.read_at else None
-            } for cc in cc_records],
-            'count': cc_records.count()
+            'cc_records': [cc_record_row(row) for row in cc_records],
+            'count': len(cc_records),
+            **page.to_dict()
         })
     
+    except InvalidCursor as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
     except LeaveRequest.DoesNotExist:
         return Response({
             'success': False,
@@ -821,6 +913,8 @@ def get_cc_records(request, leave_request_id):
 
 
 @api_view(['GET'])
+@traced()
+@read_replica()
 def get_my_cc_requests(request):
     """
     查询我的抄送列表
@@ -828,16 +922,20 @@ def get_my_cc_requests(request):
     请求参数:
         user_email (str): 用户邮箱，必填
         is_read (str): 是否已读，可选（'true'/'false'）
+        cursor (str): 分页游标，可选
+        page_size (int): 每页数量，可选，默认 50，最大 200
         
     返回数据:
         success (bool): 操作是否成功
-        cc_requests (list): 抄送列表
-        count (int): 抄送数量
+        cc_requests (list): 抄送列表（当前页，按时间倒序）
+        count (int): 当前页数量
         unread_count (int): 未读数量
+        next_cursor (str): 下一页游标，没有更多数据时为 null
+        has_more (bool): 是否还有下一页
         
     HTTP 状态码:
         200: 查询成功
-        400: 缺少必填参数
+        400: 缺少必填参数或分页参数无效
         500: 服务器内部错误
     """
     from .models import CCRecord
@@ -860,7 +958,11 @@ def get_my_cc_requests(request):
             is_read = is_read_param.lower() == 'true'
             cc_records = cc_records.filter(is_read=is_read)
         
-        cc_records = cc_records.select_related('leave_request').order_by('-created_at')
+        page = newest_first_paginator.paginate_params(
+            cc_records.values(*MY_CC_RECORD_FIELDS),
+            request.query_params
+        )
+        cc_records = page.items
         
         # 统计未读数量
         unread_count = CCRecord.objects.filter(
@@ -870,29 +972,17 @@ def get_my_cc_requests(request):
         
         return Response({
             'success': True,
-            'cc_requests': [{
-                'id': cc.id,
-                'leave_request': {
-                    'id': cc.leave_request.id,
-                    'user_email': cc.leave_request.user_email,
-                    'staff_full_name': cc.leave_request.staff_full_name,
-                    'staff_dept': cc.leave_request.staff_dept,
-                    'reason': cc.leave_request.reason,
-                    'leave_hours': cc.leave_request.leave_hours,
-                    'leave_type': cc.leave_request.leave_type,
-                    'status': cc.leave_request.status,
-                    'status_display': cc.leave_request.get_status_display(),
-                    'created_at': cc.leave_request.created_at.isoformat()
-                },
-                'cc_by_email': cc.cc_by_email,
-                'is_read': cc.is_read,
-                'created_at': cc.created_at.isoformat(),
-                'read_at': cc.read_at.isoformat() if cc.read_at else None
-            } for cc in cc_records],
-            'count': cc_records.count(),
-            'unread_count': unread_count
+            'cc_requests': [my_cc_record_row(row) for row in cc_records],
+            'count': len(cc_records),
+            'unread_count': unread_count,
+            **page.to_dict()
         })
     
+    except InvalidCursor as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"查询抄送列表失败: {e}", exc_info=True)
         return Response({
@@ -902,6 +992,7 @@ def get_my_cc_requests(request):
 
 
 @api_view(['POST'])
+@traced()
 def mark_cc_read(request, cc_record_id):
     """
     标记抄送已读
@@ -949,6 +1040,7 @@ def mark_cc_read(request, cc_record_id):
 
 
 @api_view(['POST'])
+@traced()
 def urge_approval_task(request, leave_request_id):
     """
     催办审批任务
@@ -4,13 +4,31 @@ Celery 配置文件
 """
 
 import os
-from celery import Celery
+import time
+from celery import Celery, Task
 from celery.schedules import crontab
+from celery.signals import before_task_publish, after_task_publish, task_prerun, task_postrun
+from kombu.utils.uuid import uuid
 
 # 设置 Django settings 模块
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'leave_system.settings')
 
-app = Celery('leave_system')
+
+class TracedTask(Task):
+    """投递失败时结束追踪的 producer span（失败时 Celery 不发 after_task_publish 信号）"""
+
+    def apply_async(self, args=None, kwargs=None, task_id=None, **options):
+        from leave_system.tracing import fail_publish_span
+
+        task_id = task_id or uuid()
+        try:
+            return super().apply_async(args, kwargs, task_id=task_id, **options)
+        except Exception as exc:
+            fail_publish_span(task_id, exc)
+            raise
+
+
+app = Celery('leave_system', task_cls=TracedTask)
 
 # 从 Django settings 加载配置，使用 CELERY 命名空间
 app.config_from_object('django.conf:settings', namespace='CELERY')
@@ -27,6 +45,49 @@ app.conf.beat_schedule = {
 }
 
 
+# ========== 任务指标 ==========
+# 任务开始时间，按任务 ID 记录（prefork 下每个子进程各自记录）
+_task_started = {}
+
+
+@task_prerun.connect
+def record_task_start(task_id=None, task=None, **kwargs):
+    from leave_system.tracing import start_task_span
+
+    _task_started[task_id] = time.perf_counter()
+    start_task_span(task_id, task)
+
+
+@task_postrun.connect
+def record_task_runtime(task_id=None, task=None, state=None, **kwargs):
+    from leave_system.metrics import CELERY_TASK_SECONDS, CELERY_TASKS
+    from leave_system.tracing import end_task_span
+
+    started = _task_started.pop(task_id, None)
+    name = getattr(task, 'name', 'unknown')
+    if started is not None:
+        CELERY_TASK_SECONDS.observe(time.perf_counter() - started, task=name)
+    CELERY_TASKS.inc(task=name, state=state or 'UNKNOWN')
+    end_task_span(task_id, state)
+
+
+# ========== 追踪上下文传播 ==========
+# 投递时把 traceparent 写入消息头，worker 执行时以其为父 span（见 leave_system.tracing）
+
+@before_task_publish.connect
+def inject_trace_context(sender=None, headers=None, **kwargs):
+    from leave_system.tracing import inject_task_headers
+
+    inject_task_headers(sender, headers)
+
+
+@after_task_publish.connect
+def finish_publish_span(headers=None, **kwargs):
+    from leave_system.tracing import end_publish_span
+
+    end_publish_span(headers)
+
+
 @app.task(bind=True)
 def debug_task(self):
     """调试任务"""
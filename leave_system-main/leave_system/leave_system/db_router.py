@@ -0,0 +1,137 @@
+"""
+读写分离数据库路由
+
+- 写操作始终使用 default（主库）
+- 标记了 read_replica() 的视图和代码块中的读操作使用只读副本（settings.DATABASE_REPLICA['ALIAS']）
+- 未配置副本时所有读写都使用主库
+
+读己之写（read-your-writes）：
+ReplicaPinningMiddleware 在请求执行过写操作后设置 Cookie，STICKY_SECONDS 秒内该客户端的读请求
+仍然走主库，避免刚提交的申请或审批因复制延迟在列表中看不到。同一请求内写过之后的读也走主库。
+
+用法：
+    @api_view(['GET'])
+    @read_replica()
+    def get_my_leave_requests(request):
+        ...
+
+    with read_replica():
+        pending = list(LeaveRequest.objects.filter(status='pending'))
+
+本地可以用第二个 SQLite 文件作为副本（主库文件的拷贝），设置环境变量 DATABASE_REPLICA_NAME 即可；
+测试中副本以 TEST['MIRROR'] 指向 default。
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+DEFAULT_REPLICA_SETTINGS = {
+    'ALIAS': 'replica',
+    'STICKY_SECONDS': 5,
+    'COOKIE_NAME': 'db_primary_until',
+}
+
+# 当前代码块是否允许读副本
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+# 当前请求的路由状态：{'pinned': 是否固定到主库, 'wrote': 是否执行过写操作}
+_request_state = contextvars.ContextVar('replica_request_state', default=None)
+
+
+def get_replica_settings():
+    return {**DEFAULT_REPLICA_SETTINGS, **getattr(settings, 'DATABASE_REPLICA', {})}
+
+
+def replica_alias():
+    """已配置的副本别名，未配置时返回 None"""
+    alias = get_replica_settings()['ALIAS']
+    if alias != DEFAULT_DB_ALIAS and alias in settings.DATABASES:
+        return alias
+    return None
+
+
+@contextmanager
+def read_replica():
+    """
+    代码块（或被装饰的视图）中的读操作使用副本
+
+    只用于能容忍复制延迟的只读查询；写操作仍然走主库
+    """
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    """
+    数据库路由（settings.DATABASE_ROUTERS）
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _use_replica.get():
+            return None
+        state = _request_state.get()
+        if state and (state['pinned'] or state['wrote']):
+            return DEFAULT_DB_ALIAS
+        return replica_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 副本的表结构来自主库复制
+        if db == replica_alias():
+            return False
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """
+    读己之写：执行过写操作的客户端在 STICKY_SECONDS 秒内固定读主库
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = get_replica_settings()
+        state = {'pinned': self._pinned(request, config), 'wrote': False}
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+
+        if state['wrote'] and replica_alias():
+            response.set_cookie(
+                config['COOKIE_NAME'],
+                f"{time.time() + config['STICKY_SECONDS']:.3f}",
+                max_age=config['STICKY_SECONDS'],
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    @staticmethod
+    def _pinned(request, config):
+        value = request.COOKIES.get(config['COOKIE_NAME'])
+        if not value:
+            return False
+        try:
+            return float(value) > time.time()
+        except ValueError:
+            return False
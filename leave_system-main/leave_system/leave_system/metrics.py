@@ -0,0 +1,438 @@
+"""
+进程内指标注册表与文本暴露接口
+
+提供计数器（Counter）、直方图（Histogram）和仪表（Gauge），通过 /metrics 以
+Prometheus 文本格式（0.0.4）暴露
+
+多进程（gunicorn / Celery prefork）：
+    设置环境变量 METRICS_MULTIPROC_DIR（或 settings.METRICS['MULTIPROCESS_DIR']）后，
+    每个进程定期把自己的指标快照写入 <目录>/metrics-<pid>.json（原子替换），
+    /metrics 读取所有快照合并：计数器和直方图跨进程求和（已退出进程的累计值保留），
+    仪表只合并仍存活的进程。fork 出的子进程会清空继承自父进程的数值，避免重复计数
+
+用法：
+    from leave_system.metrics import Counter, Histogram
+
+    approval_actions = Counter('approval_actions_total', '审批操作次数', ('action', 'result'))
+    approval_actions.inc(action='approve', result='success')
+
+    latency = Histogram('spiff_operation_seconds', '工作流引擎操作耗时', ('operation',))
+    with latency.time(operation='start_process'):
+        ...
+"""
+
+import atexit
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from django.conf import settings
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+# 默认直方图分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 字节数分桶
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def get_metrics_settings():
+    config = {
+        'MULTIPROCESS_DIR': os.environ.get('METRICS_MULTIPROC_DIR'),
+        'FLUSH_INTERVAL': 5.0,
+    }
+    config.update(getattr(settings, 'METRICS', None) or {})
+    return config
+
+
+# ========== 指标类型 ==========
+
+class Metric:
+    """指标基类，数值按标签值元组存放"""
+
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        self._registry = registry or REGISTRY
+        self._registry.register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标 {self.name} 的标签应为 {self.labelnames}，实际 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def snapshot(self):
+        """可 JSON 序列化的数值快照：[[标签值列表, 数值], ...]"""
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+
+class Counter(Metric):
+    """单调递增计数器"""
+
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._registry.ensure_flusher()
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    """
+    仪表
+
+    可以直接 set()，也可以用 set_function() 在导出时计算；
+    scrape_only=True 时只在提供 /metrics 的进程中计算（如数据库中的积压数量），
+    否则每个进程各自计算，合并时对存活进程求和
+    """
+
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None, scrape_only=False):
+        super().__init__(name, documentation, labelnames, registry)
+        self.scrape_only = scrape_only
+        self._function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function):
+        """
+        设置导出时调用的函数
+
+        Args:
+            function (callable): 无参数，返回数值，或返回 [(标签字典, 数值), ...]
+        """
+        self._function = function
+
+    def collect(self):
+        if self._function is None:
+            return
+        try:
+            result = self._function()
+        except Exception as e:
+            logger.warning(f"计算指标 {self.name} 失败: {e}")
+            return
+        with self._lock:
+            self._values.clear()
+            if isinstance(result, (int, float)):
+                self._values[()] = result
+            else:
+                for labels, value in result:
+                    self._values[self._key(labels)] = value
+
+    def snapshot(self):
+        if self.scrape_only:
+            return []
+        self.collect()
+        return super().snapshot()
+
+
+class Histogram(Metric):
+    """直方图：每个标签组合记录各分桶计数、总和与次数"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        self._registry.ensure_flusher()
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry['buckets'][index] += 1
+                    break
+            entry['sum'] += value
+            entry['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """记录代码块耗时（秒）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, **labels):
+        """记录函数耗时的装饰器"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        with self._lock:
+            return [
+                [list(key), {'buckets': list(v['buckets']), 'sum': v['sum'], 'count': v['count']}]
+                for key, v in self._values.items()
+            ]
+
+
+# ========== 注册表 ==========
+
+class MetricsRegistry:
+    """
+    指标注册表
+
+    单进程时直接导出内存中的数值；配置多进程目录后，由后台线程定期写入快照文件
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._flusher_started = False
+        self._pid = os.getpid()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"指标 {metric.name} 已注册")
+            self._metrics[metric.name] = metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    # ========== 多进程 ==========
+
+    def _after_fork(self):
+        # 子进程不继承父进程的数值，也不继承父进程的写入线程
+        self._pid = os.getpid()
+        self._flusher_started = False
+        self._lock = threading.Lock()
+        for metric in self._metrics.values():
+            metric._lock = threading.Lock()
+            metric.reset()
+
+    def _snapshot_path(self, directory, pid=None):
+        return Path(directory) / f"metrics-{pid or self._pid}.json"
+
+    def snapshot(self):
+        return {
+            'pid': self._pid,
+            'metrics': {name: metric.snapshot() for name, metric in self._metrics.items()},
+        }
+
+    def flush(self):
+        """把当前进程的快照写入多进程目录（未配置目录时不做任何事）"""
+        directory = get_metrics_settings()['MULTIPROCESS_DIR']
+        if not directory:
+            return
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        path = self._snapshot_path(directory)
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.snapshot()), encoding='utf-8')
+        os.replace(tmp_path, path)
+
+    def ensure_flusher(self):
+        """
+        启动定期写入快照的后台线程
+
+        记录指标时调用，每个进程（包括 fork 出的子进程）只启动一次；未配置多进程目录时不启动
+        """
+        if self._flusher_started:
+            return
+        with self._lock:
+            if self._flusher_started:
+                return
+            self._flusher_started = True
+            config = get_metrics_settings()
+            if not config['MULTIPROCESS_DIR']:
+                return
+
+            def loop():
+                while True:
+                    time.sleep(config['FLUSH_INTERVAL'])
+                    try:
+                        self.flush()
+                    except Exception as e:
+                        logger.warning(f"写入指标快照失败: {e}")
+
+            threading.Thread(target=loop, name='metrics-flusher', daemon=True).start()
+
+    def _load_snapshots(self, directory):
+        """读取其他进程的快照，返回 [(pid, 是否存活, metrics)]"""
+        snapshots = []
+        for path in Path(directory).glob('metrics-*.json'):
+            try:
+                data = json.loads(path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                continue
+            pid = data.get('pid')
+            if pid == self._pid:
+                continue
+            snapshots.append((pid, _pid_alive(pid), data.get('metrics', {})))
+        return snapshots
+
+    # ========== 导出 ==========
+
+    def collect(self):
+        """
+        合并所有进程的数值
+
+        Returns:
+            dict: 指标名 -> {标签值元组: 数值}
+        """
+        own = self.snapshot()['metrics']
+        sources = [(self._pid, True, own)]
+        directory = get_metrics_settings()['MULTIPROCESS_DIR']
+        if directory and Path(directory).exists():
+            sources.extend(self._load_snapshots(directory))
+
+        merged = {}
+        for name, metric in self._metrics.items():
+            values = {}
+            if isinstance(metric, Gauge) and metric.scrape_only:
+                metric.collect()
+                sources_for_metric = [(self._pid, True, {name: Metric.snapshot(metric)})]
+            else:
+                sources_for_metric = sources
+            for _, alive, metrics in sources_for_metric:
+                if isinstance(metric, Gauge) and not alive:
+                    continue
+                for key, value in metrics.get(name, []):
+                    key = tuple(key)
+                    if isinstance(metric, Histogram):
+                        entry = values.setdefault(key, {'buckets': [0] * len(metric.buckets), 'sum': 0.0, 'count': 0})
+                        for index, count in enumerate(value['buckets']):
+                            entry['buckets'][index] += count
+                        entry['sum'] += value['sum']
+                        entry['count'] += value['count']
+                    else:
+                        values[key] = values.get(key, 0) + value
+            merged[name] = values
+        return merged
+
+    def expose(self):
+        """
+        生成 Prometheus 文本格式
+
+        Returns:
+            str: 文本
+        """
+        merged = self.collect()
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f"# HELP {name} {_escape_help(metric.documentation)}")
+            lines.append(f"# TYPE {name} {metric.type_name}")
+            for key, value in sorted(merged.get(name, {}).items()):
+                labels = list(zip(metric.labelnames, key))
+                if isinstance(metric, Histogram):
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets, value['buckets']):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels + [('le', _format_value(bound))])} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(labels + [('le', '+Inf')])} {value['count']}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value['sum'])}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape_help(text):
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    parts = []
+    for name, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if value == float('inf'):
+            return '+Inf'
+        return repr(value)
+    return str(value)
+
+
+# ========== 全局注册表 ==========
+REGISTRY = MetricsRegistry()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=REGISTRY._after_fork)
+
+
+def _flush_at_exit():
+    try:
+        REGISTRY.flush()
+    except Exception:
+        pass
+
+
+atexit.register(_flush_at_exit)
+
+# ========== 公共指标 ==========
+# 各模块的缓存共用同一个指标，按 cache 标签区分（bpmn_spec / script_code / ...）
+CACHE_REQUESTS = Counter('cache_requests_total', '缓存访问次数', ('cache', 'result'))
+
+# Celery 任务（由 leave_system.celery 中的 task_prerun / task_postrun 信号记录）
+CELERY_TASK_SECONDS = Histogram(
+    'celery_task_seconds', 'Celery 任务执行耗时（秒）', ('task',),
+    buckets=DEFAULT_BUCKETS + (30.0, 60.0, 300.0)
+)
+CELERY_TASKS = Counter('celery_tasks_total', 'Celery 任务执行次数', ('task', 'state'))
+
+# SQLite 写操作队列（leave_system.sqlite.serialized_write）
+DB_WRITE_QUEUE_SECONDS = Histogram('db_write_queue_seconds', '写操作在进程内队列中的等待时间（秒）')
+DB_WRITE_RETRIES = Counter('db_write_retries_total', '因 "database is locked" 重试的写操作次数', ('function',))
+
+
+def metrics_view(request):
+    """
+    指标暴露接口
+
+    GET /metrics
+    """
+    return HttpResponse(REGISTRY.expose(), content_type=CONTENT_TYPE)
@@ -0,0 +1,248 @@
+"""
+键集（keyset）分页
+
+列表接口按索引字段排序，用上一页最后一条记录的排序键作为游标定位下一页，
+不使用 OFFSET，也不统计总数，因此每页的查询代价和内存占用与数据总量无关
+
+游标是对排序键的签名编码，客户端只能原样回传；游标与排序方式绑定，
+在其他接口或排序下使用会被拒绝
+
+用法：
+    paginator = KeysetPaginator(('-created_at', '-id'))
+    try:
+        page = paginator.paginate_params(queryset, request.query_params)
+    except InvalidCursor as e:
+        return Response({'success': False, 'error': str(e)}, status=400)
+
+    items = page.items           # 当前页记录（已求值的列表）
+    page.next_cursor             # 下一页游标，没有更多数据时为 None
+
+请求参数：
+    cursor (str): 上一页返回的 next_cursor，可选
+    page_size (int): 每页数量，可选，默认 50，最大 200
+"""
+
+import functools
+from datetime import date, datetime
+from django.core import signing
+from django.db.models import Q
+
+# 默认每页数量
+DEFAULT_PAGE_SIZE = 50
+
+# 每页数量上限
+MAX_PAGE_SIZE = 200
+
+# 游标签名的 salt，避免与其他签名数据混用
+CURSOR_SALT = 'leave_system.pagination.cursor'
+
+
+class InvalidCursor(ValueError):
+    """游标或分页参数无效"""
+
+
+class KeysetPage:
+    """
+    一页数据
+
+    属性:
+        items (list): 当前页记录
+        next_cursor (str): 下一页游标，没有更多数据时为 None
+        page_size (int): 本次请求的每页数量
+    """
+
+    def __init__(self, items, next_cursor, page_size):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.page_size = page_size
+
+    @property
+    def has_more(self):
+        return self.next_cursor is not None
+
+    def to_dict(self):
+        """分页元数据，合并到接口响应中"""
+        return {
+            'next_cursor': self.next_cursor,
+            'has_more': self.has_more,
+            'page_size': self.page_size,
+        }
+
+
+class KeysetPaginator:
+    """
+    键集分页器
+
+    Args:
+        ordering (tuple): 排序字段，'-' 前缀表示倒序；最后一个字段必须唯一（通常为 id），
+                          保证排序键全序
+        default_page_size (int): 默认每页数量
+        max_page_size (int): 每页数量上限
+    """
+
+    def __init__(self, ordering, default_page_size=DEFAULT_PAGE_SIZE, max_page_size=MAX_PAGE_SIZE):
+        self.ordering = tuple(ordering)
+        self.fields = tuple(field.lstrip('-') for field in self.ordering)
+        self.descending = tuple(field.startswith('-') for field in self.ordering)
+        self.default_page_size = default_page_size
+        self.max_page_size = max_page_size
+
+    # ========== 游标编解码 ==========
+
+    def encode_cursor(self, obj):
+        """
+        用记录的排序键生成游标
+
+        Args:
+            obj: 模型实例或 values() 字典
+
+        Returns:
+            str: 签名后的游标
+        """
+        values = []
+        for field in self.fields:
+            value = obj[field] if isinstance(obj, dict) else getattr(obj, field)
+            if isinstance(value, (datetime, date)):
+                value = value.isoformat()
+            values.append(value)
+        return signing.dumps({'o': self.ordering, 'v': values}, salt=CURSOR_SALT, compress=True)
+
+    def decode_cursor(self, cursor, model):
+        """
+        解析游标，返回按模型字段类型转换后的排序键
+
+        Raises:
+            InvalidCursor: 游标被篡改、格式错误或与当前排序不匹配
+        """
+        try:
+            payload = signing.loads(cursor, salt=CURSOR_SALT)
+        except signing.BadSignature:
+            raise InvalidCursor('无效的分页游标')
+
+        if list(payload.get('o', ())) != list(self.ordering) or len(payload.get('v', ())) != len(self.fields):
+            raise InvalidCursor('分页游标与当前查询不匹配')
+
+        try:
+            return [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, payload['v'])
+            ]
+        except Exception:
+            raise InvalidCursor('无效的分页游标')
+
+    # ========== 分页 ==========
+
+    def _after(self, values):
+        """
+        构造“排在游标之后”的条件
+
+        (a, b, c) 之后 = a 之后 OR (a 相等 AND b 之后) OR (a、b 相等 AND c 之后)
+        """
+        condition = Q()
+        equal = {}
+        for field, descending, value in zip(self.fields, self.descending, values):
+            lookup = f"{field}__lt" if descending else f"{field}__gt"
+            condition |= Q(**equal, **{lookup: value})
+            equal[field] = value
+        return condition
+
+    def get_page_size(self, value):
+        """
+        解析每页数量
+
+        Raises:
+            InvalidCursor: 不是正整数
+        """
+        if value in (None, ''):
+            return self.default_page_size
+        try:
+            page_size = int(value)
+        except (TypeError, ValueError):
+            raise InvalidCursor('page_size 必须是正整数')
+        if page_size < 1:
+            raise InvalidCursor('page_size 必须是正整数')
+        return min(page_size, self.max_page_size)
+
+    def paginate(self, queryset, cursor=None, page_size=None):
+        """
+        获取一页数据
+
+        Args:
+            queryset: 已过滤的查询集（排序由分页器决定）
+            cursor (str, optional): 上一页的 next_cursor
+            page_size (int, optional): 每页数量
+
+        Returns:
+            KeysetPage: 当前页
+
+        Raises:
+            InvalidCursor: 游标无效
+        """
+        page_size = page_size or self.default_page_size
+        queryset = queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode_cursor(cursor, queryset.model)))
+
+        # 多取一条用于判断是否还有下一页
+        items = list(queryset[:page_size + 1])
+        next_cursor = None
+        if len(items) > page_size:
+            items = items[:page_size]
+            next_cursor = self.encode_cursor(items[-1])
+        return KeysetPage(items, next_cursor, page_size)
+
+    def paginate_params(self, queryset, params, page_size_param='page_size'):
+        """
+        按请求参数（cursor, page_size）获取一页数据
+
+        Args:
+            queryset: 已过滤的查询集
+            params: request.query_params 或 request.GET
+            page_size_param (str): 每页数量的参数名
+
+        Returns:
+            KeysetPage: 当前页
+
+        Raises:
+            InvalidCursor: 游标或每页数量无效
+        """
+        page_size = self.get_page_size(params.get(page_size_param))
+        return self.paginate(queryset, cursor=params.get('cursor'), page_size=page_size)
+
+    def _compare(self, a, b):
+        """按排序字段比较两条 values() 字典，a 排在 b 之前时返回负数"""
+        for field, descending in zip(self.fields, self.descending):
+            x, y = a[field], b[field]
+            if x != y:
+                result = -1 if x < y else 1
+                return -result if descending else result
+        return 0
+
+    def paginate_rows(self, rows, model, params, page_size_param='page_size'):
+        """
+        对内存中的记录分页（如归档数据），排序和游标与 paginate_params 一致
+
+        Args:
+            rows (list): values() 风格的字典列表，包含所有排序字段
+            model: 排序字段所属的模型，用于解析游标
+            params: request.query_params 或 request.GET
+            page_size_param (str): 每页数量的参数名
+
+        Returns:
+            KeysetPage: 当前页
+
+        Raises:
+            InvalidCursor: 游标或每页数量无效
+        """
+        page_size = self.get_page_size(params.get(page_size_param))
+        rows = sorted(rows, key=functools.cmp_to_key(self._compare))
+        cursor = params.get('cursor')
+        if cursor:
+            after = dict(zip(self.fields, self.decode_cursor(cursor, model)))
+            rows = [row for row in rows if self._compare(row, after) > 0]
+
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = self.encode_cursor(rows[-1])
+        return KeysetPage(rows, next_cursor, page_size)
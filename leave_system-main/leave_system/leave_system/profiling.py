@@ -0,0 +1,344 @@
+"""
+请求级查询剖析与 N+1 检测
+
+QueryProfilerMiddleware 为每个请求记录：
+- SQL 查询次数与数据库耗时
+- 重复查询指纹（同一条 SQL 模板被执行多次，通常意味着 N+1）
+- SpiffWorkflowClient 方法的调用次数与耗时
+
+每条查询只按原始 SQL 计数；SQL 指纹（重复查询、N+1 检测）在请求结束后按不同的 SQL 计算，
+且只对配置了查询预算、被采样记录日志或需要输出响应头的请求计算。
+结果写入响应头（X-Query-Count 等），并按采样率写日志；
+超出接口查询预算，或上述请求中出现疑似 N+1 时记录警告
+
+测试辅助：
+    from leave_system.profiling import query_budget, assert_query_budget
+
+    with query_budget(3):
+        client.get('/api/leave/my-requests/?user_email=a@example.com')
+
+    response = client.get(...)
+    assert_query_budget(response)  # 按 settings.QUERY_PROFILER['BUDGETS'] 检查
+
+配置（settings.py）：
+    QUERY_PROFILER = {
+        'ENABLED': True,
+        'RESPONSE_HEADERS': True,
+        'LOG_SAMPLE_RATE': 0.01,
+        'N_PLUS_ONE_THRESHOLD': 5,
+        'BUDGETS': {'get_my_leave_requests': 2},  # URL 名称 -> 最大查询次数
+    }
+"""
+
+import contextvars
+import functools
+import hashlib
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUERY_PROFILER_SETTINGS = {
+    'ENABLED': True,
+    'RESPONSE_HEADERS': True,
+    'LOG_SAMPLE_RATE': 0.0,
+    'N_PLUS_ONE_THRESHOLD': 5,
+    'BUDGETS': {},
+}
+
+# 当前请求（或 query_budget 代码块）的剖析记录
+_current_profile = contextvars.ContextVar('query_profile', default=None)
+
+# 指纹归一化：字符串/数字字面量替换为 ?，IN (...) 列表折叠
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+
+
+def get_profiler_settings():
+    """合并默认配置和 settings.QUERY_PROFILER"""
+    config = dict(DEFAULT_QUERY_PROFILER_SETTINGS)
+    config.update(getattr(settings, 'QUERY_PROFILER', None) or {})
+    return config
+
+
+def fingerprint_sql(sql):
+    """
+    计算 SQL 模板指纹
+
+    参数值和字面量不参与指纹，同一模板的多次执行得到相同指纹
+
+    Returns:
+        tuple: (指纹, 归一化后的 SQL)
+    """
+    normalized = _STRING_LITERAL.sub('?', sql)
+    normalized = _NUMBER_LITERAL.sub('?', normalized)
+    normalized = _PLACEHOLDER_LIST.sub('(...)', normalized)
+    normalized = ' '.join(normalized.split())
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:10], normalized
+
+
+class RequestProfile:
+    """
+    一次请求的剖析记录
+
+    属性:
+        query_count (int): SQL 查询次数
+        db_time (float): 数据库耗时（秒）
+        statements (Counter): 原始 SQL -> 执行次数
+        fingerprints (Counter): 指纹 -> 执行次数（按需计算）
+        spiff_calls (int): SpiffWorkflowClient 方法调用次数（只计最外层）
+        spiff_time (float): SpiffWorkflowClient 耗时（秒，包含其中的数据库时间）
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+        self._fingerprinted = None
+        self.spiff_calls = 0
+        self.spiff_time = 0.0
+        self._spiff_depth = 0
+
+    # ========== 数据库 ==========
+
+    def _execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.query_count += 1
+            self.statements[sql] += 1
+
+    @contextmanager
+    def activate(self):
+        """在代码块内记录所有数据库连接的查询和 Spiff 调用"""
+        token = _current_profile.set(self)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(self._execute_wrapper))
+                yield self
+        finally:
+            _current_profile.reset(token)
+
+    # ========== 统计 ==========
+
+    def _fingerprint(self):
+        # 按不同的原始 SQL 计算指纹并缓存，查询次数变化后重新计算
+        if self._fingerprinted is None or self._fingerprinted[0] != self.query_count:
+            fingerprints, samples = Counter(), {}
+            for sql, count in self.statements.items():
+                key, normalized = fingerprint_sql(sql)
+                fingerprints[key] += count
+                samples.setdefault(key, normalized)
+            self._fingerprinted = (self.query_count, fingerprints, samples)
+        return self._fingerprinted[1:]
+
+    @property
+    def fingerprints(self):
+        return self._fingerprint()[0]
+
+    @property
+    def samples(self):
+        return self._fingerprint()[1]
+
+    @property
+    def duplicate_count(self):
+        """重复执行的次数（同一指纹第二次及以后的执行）"""
+        return sum(count - 1 for count in self.fingerprints.values() if count > 1)
+
+    def suspected_n_plus_one(self, threshold):
+        """
+        执行次数达到阈值的指纹
+
+        Returns:
+            list: [(执行次数, 归一化 SQL)]，按次数倒序
+        """
+        return [
+            (count, self.samples[key])
+            for key, count in self.fingerprints.most_common()
+            if count >= threshold
+        ]
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started_at
+
+    def headers(self):
+        """响应头"""
+        return {
+            'X-Query-Count': str(self.query_count),
+            'X-Query-Duplicates': str(self.duplicate_count),
+            'X-DB-Time-Ms': f"{self.db_time * 1000:.1f}",
+            'X-Spiff-Calls': str(self.spiff_calls),
+            'X-Spiff-Time-Ms': f"{self.spiff_time * 1000:.1f}",
+            'X-Request-Time-Ms': f"{self.elapsed * 1000:.1f}",
+        }
+
+    def report(self, limit=5):
+        """可读的摘要，用于日志和断言信息"""
+        lines = [
+            f"查询 {self.query_count} 次（重复 {self.duplicate_count} 次），"
+            f"数据库 {self.db_time * 1000:.1f} ms，"
+            f"Spiff {self.spiff_calls} 次 / {self.spiff_time * 1000:.1f} ms"
+        ]
+        for count, sql in self.suspected_n_plus_one(2)[:limit]:
+            lines.append(f"  x{count}: {sql[:200]}")
+        return '\n'.join(lines)
+
+
+def current_profile():
+    """当前请求的剖析记录，没有时返回 None"""
+    return _current_profile.get()
+
+
+# ========== SpiffWorkflowClient 计时 ==========
+
+def profiled(func):
+    """
+    方法计时装饰器
+
+    把方法耗时计入当前请求的 Spiff 时间；方法之间嵌套调用时只计最外层
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = _current_profile.get()
+        if profile is None:
+            return func(*args, **kwargs)
+        profile._spiff_depth += 1
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile._spiff_depth -= 1
+            if profile._spiff_depth == 0:
+                profile.spiff_calls += 1
+                profile.spiff_time += time.perf_counter() - start
+    return wrapper
+
+
+def profile_methods(cls):
+    """
+    类装饰器：为所有公开方法加上 profiled
+
+    用于 SpiffWorkflowClient
+    """
+    for name, attr in list(vars(cls).items()):
+        if not name.startswith('_') and callable(attr):
+            setattr(cls, name, profiled(attr))
+    return cls
+
+
+# ========== 中间件 ==========
+
+class QueryProfilerMiddleware:
+    """
+    请求级查询剖析中间件
+
+    应放在 MIDDLEWARE 靠前的位置，以覆盖其他中间件产生的查询
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = get_profiler_settings()
+        if not config['ENABLED']:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        with profile.activate():
+            response = self.get_response(request)
+
+        url_name = getattr(getattr(request, 'resolver_match', None), 'url_name', None)
+        budget = config['BUDGETS'].get(url_name)
+        sampled = bool(config['LOG_SAMPLE_RATE']) and random.random() < config['LOG_SAMPLE_RATE']
+
+        if config['RESPONSE_HEADERS']:
+            for header, value in profile.headers().items():
+                response[header] = value
+            if budget is not None:
+                response['X-Query-Budget'] = str(budget)
+
+        # 只对有预算、被采样或输出响应头的请求计算指纹，其余请求只计查询次数
+        suspects = []
+        if budget is not None or sampled or config['RESPONSE_HEADERS']:
+            suspects = profile.suspected_n_plus_one(config['N_PLUS_ONE_THRESHOLD'])
+        over_budget = budget is not None and profile.query_count > budget
+        if suspects or over_budget:
+            reasons = []
+            if suspects:
+                reasons.append('疑似 N+1')
+            if over_budget:
+                reasons.append(f'超出查询预算 {budget}')
+            logger.warning(
+                f"{request.method} {request.path} [{url_name}] {'，'.join(reasons)}\n{profile.report()}"
+            )
+        elif sampled:
+            logger.info(f"{request.method} {request.path} [{url_name}] {profile.report()}")
+
+        return response
+
+
+# ========== 测试辅助 ==========
+
+class QueryBudgetExceeded(AssertionError):
+    """查询次数超出预算"""
+
+
+@contextmanager
+def query_budget(max_queries, max_duplicates=None):
+    """
+    断言代码块内的查询次数不超过预算
+
+    Args:
+        max_queries (int): 最大查询次数
+        max_duplicates (int, optional): 最大重复查询次数
+
+    Yields:
+        RequestProfile: 剖析记录
+
+    Raises:
+        QueryBudgetExceeded: 超出预算，异常信息包含重复最多的 SQL
+    """
+    profile = RequestProfile()
+    with profile.activate():
+        yield profile
+    if profile.query_count > max_queries:
+        raise QueryBudgetExceeded(f"查询预算 {max_queries}，实际 {profile.report()}")
+    if max_duplicates is not None and profile.duplicate_count > max_duplicates:
+        raise QueryBudgetExceeded(f"重复查询预算 {max_duplicates}，实际 {profile.report()}")
+
+
+def assert_query_budget(response, max_queries=None):
+    """
+    按响应头断言接口的查询次数
+
+    Args:
+        response: 测试客户端返回的响应（需启用 QueryProfilerMiddleware 和响应头）
+        max_queries (int, optional): 最大查询次数，默认取 settings.QUERY_PROFILER['BUDGETS']
+                                     中该 URL 名称的预算
+
+    Raises:
+        QueryBudgetExceeded: 超出预算
+        AssertionError: 响应中没有剖析信息或接口未配置预算
+    """
+    assert 'X-Query-Count' in response, '响应中没有 X-Query-Count，请检查 QueryProfilerMiddleware 配置'
+    if max_queries is None:
+        url_name = getattr(getattr(response, 'resolver_match', None), 'url_name', None)
+        max_queries = get_profiler_settings()['BUDGETS'].get(url_name)
+        assert max_queries is not None, f"接口 {url_name} 未配置查询预算"
+    count = int(response['X-Query-Count'])
+    if count > max_queries:
+        raise QueryBudgetExceeded(
+            f"查询预算 {max_queries}，实际 {count} 次（重复 {response['X-Query-Duplicates']} 次）"
+        )
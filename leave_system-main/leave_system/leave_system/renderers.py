@@ -0,0 +1,145 @@
+"""
+JSON 编解码
+
+基于 orjson 的 DRF 渲染器/解析器以及 JsonResponse 替代实现，
+原生支持 datetime/date/UUID，比标准库 json 更快，适合体积较大的任务数据
+
+- OrjsonRenderer: 替代 rest_framework.renderers.JSONRenderer，输出与之一致
+  （UTC 时间以 Z 结尾，Decimal 转为数字，紧凑格式，不转义中文）
+- OrjsonParser: 替代 rest_framework.parsers.JSONParser
+- JsonResponse: 替代 django.http.JsonResponse，参数相同
+  （Decimal 转为字符串、时间精度到毫秒，与 DjangoJSONEncoder 一致）
+- dumps / loads: 通用编解码函数
+
+orjson 未安装时自动回退到标准库实现
+"""
+
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder as DRFJSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    # orjson 未安装时使用标准库
+    orjson = None
+
+# JSON 中合法、但在 JavaScript 字符串中非法的行分隔符（与 DRF 的处理一致）
+_LINE_SEPARATOR = '\u2028'.encode('utf-8')
+_PARAGRAPH_SEPARATOR = '\u2029'.encode('utf-8')
+
+_drf_encoder = DRFJSONEncoder()
+_django_encoder = DjangoJSONEncoder()
+
+if orjson is not None:
+    # 非字符串键（如 int）与标准库一样转为字符串
+    BASE_OPTIONS = orjson.OPT_NON_STR_KEYS
+    # DRF 输出：UTC 时间以 Z 结尾
+    DRF_OPTIONS = BASE_OPTIONS | orjson.OPT_UTC_Z
+    # DjangoJSONEncoder 输出：时间交给 default 处理（毫秒精度）
+    DJANGO_OPTIONS = BASE_OPTIONS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def dumps(data, default=None, option=None):
+    """
+    编码为 UTF-8 字节串
+
+    Args:
+        data: 待编码数据
+        default (callable, optional): 处理 orjson 不支持的类型，默认使用 DRF 的编码规则
+        option (int, optional): orjson 选项，默认 DRF_OPTIONS
+
+    Returns:
+        bytes: JSON 字节串
+    """
+    default = default or _drf_encoder.default
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=default, option=DRF_OPTIONS if option is None else option)
+        except orjson.JSONEncodeError:
+            # 超出 64 位的整数等 orjson 不支持的情况，回退到标准库
+            pass
+    return json.dumps(data, default=default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data):
+    """
+    解码 JSON（bytes 或 str）
+
+    Raises:
+        json.JSONDecodeError: 格式错误（orjson.JSONDecodeError 是其子类）
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class OrjsonRenderer(JSONRenderer):
+    """
+    orjson 渲染器
+
+    输出与 JSONRenderer 默认配置一致；请求了缩进（可浏览 API、Accept 中的 indent 参数）
+    或 orjson 不可用时交给 JSONRenderer 处理
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=DRF_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if _LINE_SEPARATOR in ret or _PARAGRAPH_SEPARATOR in ret:
+            ret = ret.replace(_LINE_SEPARATOR, b'\\u2028').replace(_PARAGRAPH_SEPARATOR, b'\\u2029')
+        return ret
+
+
+class OrjsonParser(JSONParser):
+    """orjson 解析器"""
+
+    renderer_class = OrjsonRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+        try:
+            body = stream.read() if stream is not None else b''
+            if encoding.lower().replace('-', '') not in ('utf8', 'ascii'):
+                body = body.decode(encoding)
+            return orjson.loads(body)
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class JsonResponse(HttpResponse):
+    """
+    django.http.JsonResponse 的 orjson 实现
+
+    参数与 django.http.JsonResponse 相同；传入自定义 encoder 或 json_dumps_params 时
+    使用标准库编码，保证行为不变
+    """
+
+    def __init__(self, data, encoder=DjangoJSONEncoder, safe=True, json_dumps_params=None, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                'In order to allow non-dict objects to be serialized set the '
+                'safe parameter to False.'
+            )
+        kwargs.setdefault('content_type', 'application/json')
+        if orjson is not None and encoder is DjangoJSONEncoder and not json_dumps_params:
+            content = dumps(data, default=_django_encoder.default, option=DJANGO_OPTIONS)
+        else:
+            content = json.dumps(data, cls=encoder, **(json_dumps_params or {}))
+        super().__init__(content=content, **kwargs)
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -60,7 +61,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'leave_system.tracing.TracingMiddleware',
+    'leave_system.db_router.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'leave_system.profiling.QueryProfilerMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -96,13 +100,66 @@ WSGI_APPLICATION = 'leave_system.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# SQLite 生产配置（leave_system.sqlite 数据库后端）
+# JOURNAL_MODE: 'wal' 时读不阻塞写、写不阻塞读；None 保持数据库文件当前的日志模式
+# SYNCHRONOUS: WAL 下 'normal' 只在检查点时 fsync，断电最多丢失最近提交的事务，不会损坏数据库
+# CACHE_SIZE_KB / MMAP_SIZE: 每个连接的页缓存和内存映射大小
+# BUSY_TIMEOUT: 等待其他进程释放写锁的秒数
+# TRANSACTION_MODE: 'IMMEDIATE' 时事务开始即获取写锁，避免 WAL 下读锁升级为写锁时直接报
+#                   "database is locked"（不等待 busy timeout）；None 使用 SQLite 默认的 DEFERRED
+# WRITE_QUEUE: 进程内串行执行写操作（leave_system.sqlite.serialized_write），
+#              遇到 "database is locked" 时按 WRITE_RETRY_BACKOFF 指数退避重试 WRITE_RETRIES 次
+SQLITE = {
+    'JOURNAL_MODE': os.environ.get('SQLITE_JOURNAL_MODE', 'wal'),
+    'SYNCHRONOUS': os.environ.get('SQLITE_SYNCHRONOUS', 'normal'),
+    'CACHE_SIZE_KB': 64 * 1024,
+    'MMAP_SIZE': 256 * 1024 * 1024,
+    'TEMP_STORE': 'memory',
+    'BUSY_TIMEOUT': float(os.environ.get('SQLITE_BUSY_TIMEOUT', '10')),
+    'TRANSACTION_MODE': 'IMMEDIATE',
+    'WRITE_QUEUE': os.environ.get('SQLITE_WRITE_QUEUE', '1') == '1',
+    'WRITE_RETRIES': 3,
+    'WRITE_RETRY_BACKOFF': 0.05,
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'leave_system.sqlite',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'timeout': SQLITE['BUSY_TIMEOUT'],
+        },
     }
 }
 
+# 只读副本（leave_system.db_router）
+# 设置 DATABASE_REPLICA_NAME 时启用：列表、历史、抄送、通知和组织架构等只读接口读副本，
+# 写操作和其他读操作使用 default。本地可用主库文件的拷贝作为副本；测试中副本镜像 default
+# 运行测试时总是配置 replica 连接，供路由测试（databases 包含 'replica'）使用；
+# 只有设置了 DATABASE_REPLICA_NAME 时 ALIAS 才指向它，其他测试的读操作仍走 default
+# STICKY_SECONDS: 客户端执行写操作后固定读主库的时间（应大于复制延迟）
+DATABASE_REPLICA_NAME = os.environ.get('DATABASE_REPLICA_NAME')
+TESTING = sys.argv[1:2] == ['test']
+
+if DATABASE_REPLICA_NAME or TESTING:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': DATABASE_REPLICA_NAME or BASE_DIR / 'db.replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+    if TESTING:
+        # 镜像与 default 共享同一个内存数据库；副本只读，事务用默认的 BEGIN（DEFERRED），
+        # 避免 TestCase 在两个连接上各开一个 BEGIN IMMEDIATE 互相锁住
+        DATABASES['replica']['ENGINE'] = 'django.db.backends.sqlite3'
+
+DATABASE_ROUTERS = ['leave_system.db_router.ReplicaRouter']
+
+DATABASE_REPLICA = {
+    'ALIAS': 'replica' if DATABASE_REPLICA_NAME else None,
+    'STICKY_SECONDS': int(os.environ.get('DATABASE_REPLICA_STICKY_SECONDS', '5')),
+    'COOKIE_NAME': 'db_primary_until',
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -149,6 +206,21 @@ STATICFILES_DIRS = [
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Django REST Framework
+# JSON 编解码使用 orjson（leave_system.renderers），其余与 DRF 默认配置一致
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'leave_system.renderers.OrjsonRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'leave_system.renderers.OrjsonParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+
 # Celery Configuration
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
@@ -167,6 +239,14 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'leave_api.tasks.check_timeout_tasks',
         'schedule': crontab(minute=0),  # 每小时执行一次
     },
+    'archive-completed-requests': {
+        'task': 'leave_api.tasks.archive_completed_requests',
+        'schedule': crontab(hour=3, minute=30),  # 每天凌晨执行
+    },
+    'prune-workflow-event-logs': {
+        'task': 'leave_api.tasks.prune_workflow_event_logs',
+        'schedule': crontab(hour=4, minute=0),  # 每天凌晨执行
+    },
 }
 
 # Email Configuration (用于通知系统)
@@ -176,6 +256,128 @@ DEFAULT_FROM_EMAIL = 'noreply@leavesystem.com'
 # Default Workflow Spec
 DEFAULT_WORKFLOW_SPEC = 'basic_approval'
 
+# 任务数据字段白名单（按流程模型 ID 配置，未配置时使用 'default'）
+# 待办任务、任务就绪事件和事件日志只包含这些字段，完整数据通过
+# /api/leave/requests/<id>/tasks/<task_id>/data/ 按需获取
+WORKFLOW_TASK_DATA_FIELDS = {
+    'default': [
+        'assigned_to', 'leave_request_id', 'user_email', 'staff_full_name',
+        'staff_dept', 'leave_type', 'leave_hours', 'duration',
+        'action', 'approver_email', 'approver_name', 'final_result',
+    ],
+}
+
+# 冷热分离归档（leave_api.services.archive_service）
+# 已结束且超过 AFTER_DAYS 天没有更新的申请，审批历史、抄送记录、事件日志和工作流状态
+# 压缩后移入 LeaveRequestArchive；审批历史、时间轴和抄送记录接口透明读取归档数据
+ARCHIVE = {
+    'AFTER_DAYS': int(os.environ.get('ARCHIVE_AFTER_DAYS', '180')),
+    'BATCH_SIZE': 200,
+    'COMPRESSION_LEVEL': 6,
+}
+
+# 工作流事件日志保留（leave_api.services.event_retention_service）
+# 超过保留期的事件按（日期、类型、状态）汇总到 WorkflowEventRollup 后分批删除；
+# 失败和未处理的事件保留更久以便排查。每批 BATCH_SIZE 条一个事务，批间暂停 BATCH_PAUSE 秒
+EVENT_LOG_RETENTION = {
+    'SUCCESS_DAYS': int(os.environ.get('EVENT_LOG_SUCCESS_DAYS', '30')),
+    'FAILED_DAYS': int(os.environ.get('EVENT_LOG_FAILED_DAYS', '90')),
+    'BATCH_SIZE': 500,
+    'BATCH_PAUSE': 0.05,
+}
+
+# 组织架构同步（organization.sync）
+# FEED_PATH 为 HR 系统导出的员工数据文件（.csv / .jsonl），配置后每天凌晨同步一次；
+# 只写入变化的部分，每批 CHUNK_SIZE 条；DELETE_MISSING 为 True 时删除数据文件中没有的员工
+ORG_SYNC = {
+    'FEED_PATH': os.environ.get('ORG_SYNC_FEED_PATH', ''),
+    'CHUNK_SIZE': 1000,
+    'DELETE_MISSING': os.environ.get('ORG_SYNC_DELETE_MISSING', '0') == '1',
+}
+if ORG_SYNC['FEED_PATH']:
+    CELERY_BEAT_SCHEDULE['sync-organization-data'] = {
+        'task': 'organization.tasks.sync_organization_data',
+        'schedule': crontab(hour=2, minute=0),  # 每天凌晨执行
+    }
+
+# 组织架构列表缓存（organization.directory_cache）
+# 员工、部门、角色列表按数据版本返回 ETag / Last-Modified 和 304，
+# 响应体（以及不小于 GZIP_MIN_BYTES 字节时的 gzip 压缩结果）在 CACHE_ALIAS 缓存中保存 TIMEOUT 秒
+ORG_DIRECTORY_CACHE = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 3600,
+    'GZIP_MIN_BYTES': 1024,
+    'GZIP_LEVEL': 6,
+}
+
+# BPMN 流程目录（leave_api.services.process_catalog）
+# 流程列表从 BpmnProcessCatalog 索引读取；后台线程每 WATCH_INTERVAL 秒按文件修改时间和大小
+# 与 process_models 目录对账，发现直接修改的文件（0 表示不启动，只在流程增删改时更新）
+PROCESS_CATALOG = {
+    'WATCH_INTERVAL': int(os.environ.get('PROCESS_CATALOG_WATCH_INTERVAL', '10')),
+}
+
+# BPMN 流程校验（leave_api.services.bpmn_validation）
+# 校验结果和构建好的流程规范按内容哈希缓存在进程内，最多 CACHE_SIZE 条（LRU）
+BPMN_VALIDATION = {
+    'CACHE_SIZE': 128,
+}
+
+# 领域事件总线（leave_api.event_bus）
+# BACKEND: 'thread' 进程内工作线程批量处理；'celery' 攒批后交给 Celery worker；
+#          'sync' 事务提交后在当前线程立即处理（测试使用）
+EVENT_BUS = {
+    'BACKEND': os.environ.get('EVENT_BUS_BACKEND', 'thread'),
+    'BATCH_WAIT': 0.05,
+    'RETRY_BACKOFF': 0.5,
+}
+
+
+# 请求级查询剖析（leave_system.profiling.QueryProfilerMiddleware）
+# BUDGETS: URL 名称 -> 最大查询次数，超出时记录警告，测试中用 assert_query_budget 检查
+QUERY_PROFILER = {
+    'ENABLED': True,
+    'RESPONSE_HEADERS': DEBUG,
+    'LOG_SAMPLE_RATE': 0.01,
+    'N_PLUS_ONE_THRESHOLD': 5,
+    'BUDGETS': {
+        'get_my_leave_requests': 2,
+        'get_approval_history': 3,
+        'get_cc_records': 3,
+        'get_my_cc_requests': 3,
+        'get_my_approval_tasks': 2,
+        'get_my_notifications': 3,
+        'api_list_employees': 2,
+        'api_list_departments': 2,
+        'api_list_roles': 3,
+    },
+}
+
+
+# 指标（leave_system.metrics，GET /metrics）
+# MULTIPROCESS_DIR: gunicorn / Celery prefork 多进程部署时设置为共享目录，
+#                   各进程每 FLUSH_INTERVAL 秒把指标快照写入该目录，/metrics 合并所有进程
+#                   （目录应在服务启动前清空）
+METRICS = {
+    'MULTIPROCESS_DIR': os.environ.get('METRICS_MULTIPROC_DIR'),
+    'FLUSH_INTERVAL': 5.0,
+}
+
+
+# 分布式追踪（leave_system.tracing，OpenTelemetry 兼容的 traceparent 传播和 OTLP/JSON 导出）
+# SAMPLE_RATE: 根 span 采样比例，上游 traceparent 已有采样决定时沿用上游
+# EXPORTER: 'none'（默认）不导出；'otlp' 发送到 OTLP_ENDPOINT；
+#           'file' 追加写入 FILE_PATH（每行一批 OTLP/JSON），超过 FILE_MAX_BYTES 时轮转为 FILE_PATH.1
+TRACING = {
+    'ENABLED': os.environ.get('TRACING_ENABLED', '1') == '1',
+    'SAMPLE_RATE': float(os.environ.get('TRACING_SAMPLE_RATE', '1.0' if DEBUG else '0.05')),
+    'EXPORTER': os.environ.get('TRACING_EXPORTER', 'none'),
+    'FILE_PATH': os.environ.get('TRACING_FILE_PATH', str(BASE_DIR / 'traces.jsonl')),
+    'FILE_MAX_BYTES': int(os.environ.get('TRACING_FILE_MAX_BYTES', str(10 * 1024 * 1024))),
+    'OTLP_ENDPOINT': os.environ.get('TRACING_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces'),
+    'SERVICE_NAME': 'leave_system',
+}
+
 
 # Logging Configuration
 LOGGING = {
@@ -0,0 +1,173 @@
+"""
+SQLite 生产配置
+
+- 数据库后端（ENGINE = 'leave_system.sqlite'，见 base.py）：新连接按 settings.SQLITE 设置
+  WAL、synchronous、缓存等 PRAGMA，事务以 BEGIN IMMEDIATE 开始
+- serialized_write：进程内串行执行写操作，遇到 "database is locked" 时退避重试
+
+SQLite 同一时刻只允许一个写事务。多个 gunicorn worker 之间依靠 busy timeout 等待写锁；
+同一进程内的多个线程先在 serialized_write 的队列中排队，不必同时争抢写锁。
+"""
+
+import functools
+import logging
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.db.models import Model
+
+from leave_system.metrics import DB_WRITE_QUEUE_SECONDS, DB_WRITE_RETRIES
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'JOURNAL_MODE': None,
+    'SYNCHRONOUS': None,
+    'CACHE_SIZE_KB': None,
+    'MMAP_SIZE': None,
+    'TEMP_STORE': None,
+    'TRANSACTION_MODE': None,
+    'WRITE_QUEUE': False,
+    'WRITE_RETRIES': 0,
+    'WRITE_RETRY_BACKOFF': 0.05,
+}
+
+LOCK_ERRORS = ('database is locked', 'database table is locked', 'database is busy')
+
+
+def get_sqlite_settings():
+    """读取 settings.SQLITE，未配置的项使用 SQLite 默认行为"""
+    return {**DEFAULTS, **getattr(settings, 'SQLITE', {})}
+
+
+def apply_pragmas(conn, config):
+    """
+    为新连接设置 PRAGMA
+
+    journal_mode 记录在数据库文件中，只在与当前模式不同时修改
+
+    Args:
+        conn: sqlite3.Connection
+        config (dict): get_sqlite_settings() 的结果
+    """
+    journal_mode = config['JOURNAL_MODE']
+    if journal_mode:
+        current = conn.execute('PRAGMA journal_mode').fetchone()[0]
+        # 内存数据库只支持 memory / off
+        if current.lower() not in (journal_mode.lower(), 'memory'):
+            try:
+                conn.execute(f'PRAGMA journal_mode = {journal_mode}')
+            except sqlite3.OperationalError as e:
+                # 切换日志模式需要独占数据库，其他连接正在使用时由之后的新连接再次尝试
+                logger.warning(f"设置 journal_mode = {journal_mode} 失败: {e}")
+    if config['SYNCHRONOUS']:
+        conn.execute(f"PRAGMA synchronous = {config['SYNCHRONOUS']}")
+    if config['CACHE_SIZE_KB']:
+        # 负数表示以 KiB 为单位
+        conn.execute(f"PRAGMA cache_size = -{int(config['CACHE_SIZE_KB'])}")
+    if config['MMAP_SIZE']:
+        conn.execute(f"PRAGMA mmap_size = {int(config['MMAP_SIZE'])}")
+    if config['TEMP_STORE']:
+        conn.execute(f"PRAGMA temp_store = {config['TEMP_STORE']}")
+
+
+def is_lock_error(exc):
+    """是否为等待写锁超时的错误（可以重试）"""
+    return isinstance(exc, OperationalError) and any(text in str(exc) for text in LOCK_ERRORS)
+
+
+class WriteQueue:
+    """
+    进程内写操作队列
+
+    写操作按到达顺序依次执行（公平锁：排队的线程按 FIFO 获得执行权），同一线程可重入
+    """
+
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._waiters = []
+        self._owner = None
+        self._depth = 0
+
+    def acquire(self):
+        me = threading.get_ident()
+        with self._mutex:
+            if self._owner == me:
+                self._depth += 1
+                return
+            if self._owner is None:
+                self._owner, self._depth = me, 1
+                return
+            turn = threading.Event()
+            self._waiters.append((me, turn))
+        # release() 直接把执行权交给队首线程，新到达的线程不会插队
+        turn.wait()
+
+    def release(self):
+        with self._mutex:
+            self._depth -= 1
+            if self._depth:
+                return
+            if self._waiters:
+                self._owner, turn = self._waiters.pop(0)
+                self._depth = 1
+                turn.set()
+            else:
+                self._owner = None
+
+    @property
+    def waiting(self):
+        return len(self._waiters)
+
+
+write_queue = WriteQueue()
+
+
+def _refresh_instances(args, kwargs):
+    """事务回滚后内存中的模型实例可能已被修改，重试前从数据库重新加载"""
+    for value in (*args, *kwargs.values()):
+        if isinstance(value, Model) and value.pk is not None:
+            value.refresh_from_db()
+
+
+def serialized_write(using=DEFAULT_DB_ALIAS):
+    """
+    串行执行写操作，遇到 "database is locked" 时重试
+
+    放在 transaction.atomic 外层：重试的是整个事务。已经处于外层事务中时直接执行，
+    由最外层的调用负责重试。数据库不是 SQLite 或 WRITE_QUEUE 关闭时不做任何处理。
+
+    重试前会重新加载参数中的模型实例。TRANSACTION_MODE = 'IMMEDIATE' 时写锁在事务开始时获取，
+    锁错误发生在执行任何语句之前，不会重复产生事务内的副作用。
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            connection = connections[using]
+            config = get_sqlite_settings()
+            if connection.vendor != 'sqlite' or not config['WRITE_QUEUE'] or connection.in_atomic_block:
+                return func(*args, **kwargs)
+
+            attempt = 0
+            while True:
+                start = time.perf_counter()
+                write_queue.acquire()
+                DB_WRITE_QUEUE_SECONDS.observe(time.perf_counter() - start)
+                try:
+                    return func(*args, **kwargs)
+                except OperationalError as e:
+                    if not is_lock_error(e) or attempt >= config['WRITE_RETRIES']:
+                        raise
+                finally:
+                    write_queue.release()
+
+                attempt += 1
+                DB_WRITE_RETRIES.inc(function=func.__qualname__)
+                logger.warning(f"{func.__qualname__} 等待写锁超时，第 {attempt} 次重试")
+                time.sleep(config['WRITE_RETRY_BACKOFF'] * 2 ** (attempt - 1))
+                _refresh_instances(args, kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,23 @@
+"""
+SQLite 数据库后端
+
+在 Django 自带后端的基础上：
+- 新连接按 settings.SQLITE 设置 PRAGMA（WAL、synchronous、cache_size 等）
+- 事务按 TRANSACTION_MODE 开始（BEGIN IMMEDIATE）
+"""
+
+from django.db.backends.sqlite3 import base
+
+from leave_system.sqlite import apply_pragmas, get_sqlite_settings
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        apply_pragmas(conn, get_sqlite_settings())
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = get_sqlite_settings()['TRANSACTION_MODE']
+        self.cursor().execute(f"BEGIN {mode}" if mode else "BEGIN")
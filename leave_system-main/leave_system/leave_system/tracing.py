@@ -0,0 +1,626 @@
+"""
+轻量级分布式追踪
+
+与 OpenTelemetry 兼容：
+- 上下文传播使用 W3C Trace Context（traceparent 请求头 / Celery 消息头）
+- 导出格式为 OTLP/JSON（resourceSpans），文件导出器每批写一行，
+  与 OpenTelemetry Collector 的 file 导出器格式一致，可直接被 Collector 的 otlpjsonfile 接收器读取；
+  也可以通过 OTLP/HTTP 直接发送到 Collector
+
+链路覆盖：
+    HTTP 请求（TracingMiddleware）
+      -> views_v2 视图 -> ApprovalService -> SpiffWorkflowClient（BPMN 解析、脚本求值）
+                                          -> ProxyService
+      -> Celery 任务投递（celery.publish）-> Celery 任务执行（celery.run）-> NotificationService
+
+    服务端 / Celery 任务 span 会把其间执行的 SQL 计入当前 span 的 db.query_count / db.time_ms
+    （只计本 span，不含子 span），便于区分数据库耗时和引擎耗时
+
+采样：
+    根 span 按 trace ID 比例采样（SAMPLE_RATE），子 span 跟随父 span；
+    上游请求头携带 traceparent 时沿用上游的采样决定。未采样的 span 不记录也不导出，只传播上下文
+
+配置（settings.py）：
+    TRACING = {
+        'ENABLED': True,
+        'SAMPLE_RATE': 0.05,
+        'EXPORTER': 'none',            # 'none' / 'otlp' / 'file'
+        'FILE_PATH': BASE_DIR / 'traces.jsonl',
+        'FILE_MAX_BYTES': 10 * 1024 * 1024,   # 超过后轮转为 FILE_PATH.1
+        'OTLP_ENDPOINT': 'http://localhost:4318/v1/traces',
+        'SERVICE_NAME': 'leave_system',
+    }
+
+用法：
+    from leave_system.tracing import start_span, traced
+
+    with start_span('spiff.parse_bpmn', attributes={'bpmn.file': path}):
+        ...
+
+    @traced()
+    def approve_leave_request(request):
+        ...
+"""
+
+import atexit
+import contextvars
+import functools
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = 'traceparent'
+
+DEFAULT_TRACING_SETTINGS = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 1.0,
+    'EXPORTER': 'none',
+    'FILE_PATH': 'traces.jsonl',
+    'FILE_MAX_BYTES': 10 * 1024 * 1024,
+    'OTLP_ENDPOINT': 'http://localhost:4318/v1/traces',
+    'SERVICE_NAME': 'leave_system',
+    'MAX_QUEUE_SIZE': 2048,
+    'BATCH_SIZE': 256,
+    'EXPORT_INTERVAL': 2.0,
+}
+
+# OTLP SpanKind
+SPAN_KINDS = {'internal': 1, 'server': 2, 'client': 3, 'producer': 4, 'consumer': 5}
+
+# OTLP StatusCode
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+_TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+def get_tracing_settings():
+    """合并默认配置和 settings.TRACING"""
+    config = dict(DEFAULT_TRACING_SETTINGS)
+    config.update(getattr(settings, 'TRACING', None) or {})
+    return config
+
+
+# ========== 上下文 ==========
+
+class SpanContext:
+    """
+    span 上下文（可跨进程传播的部分）
+
+    属性:
+        trace_id (str): 32 位十六进制 trace ID
+        span_id (str): 16 位十六进制 span ID
+        sampled (bool): 是否采样
+    """
+
+    __slots__ = ('trace_id', 'span_id', 'sampled')
+
+    def __init__(self, trace_id, span_id, sampled):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def to_traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @classmethod
+    def from_traceparent(cls, value):
+        """
+        解析 traceparent，格式不正确时返回 None
+        """
+        match = _TRACEPARENT.match((value or '').strip().lower())
+        if not match:
+            return None
+        trace_id, span_id, flags = match.groups()
+        if trace_id == '0' * 32 or span_id == '0' * 16:
+            return None
+        return cls(trace_id, span_id, bool(int(flags, 16) & 1))
+
+
+def _new_id(bits):
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def _should_sample(trace_id, rate):
+    """按 trace ID 比例采样：同一 trace 在各进程中的决定一致"""
+    if rate >= 1:
+        return True
+    if rate <= 0:
+        return False
+    return int(trace_id[16:], 16) < rate * (1 << 64)
+
+
+# ========== Span ==========
+
+class Span:
+    """
+    一个 span
+
+    未采样（recording 为 False）时所有记录操作都是空操作，只保留上下文用于传播
+    """
+
+    def __init__(self, name, context, parent_span_id=None, kind='internal', attributes=None):
+        self.name = name
+        self.context = context
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.recording = context.sampled
+        self.attributes = dict(attributes) if (attributes and self.recording) else {}
+        self.events = []
+        self.status = STATUS_UNSET
+        self.status_message = ''
+        self.db_query_count = 0
+        self.db_time = 0.0
+        self.start_time = time.time_ns()
+        self.end_time = None
+
+    def set_attribute(self, key, value):
+        if self.recording and value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def add_event(self, name, attributes=None):
+        if self.recording:
+            self.events.append((name, time.time_ns(), dict(attributes or {})))
+
+    def record_exception(self, exc):
+        if not self.recording:
+            return
+        self.add_event('exception', {
+            'exception.type': type(exc).__name__,
+            'exception.message': str(exc),
+        })
+        self.set_status(STATUS_ERROR, str(exc))
+
+    def set_status(self, status, message=''):
+        self.status = status
+        self.status_message = message
+
+    def end(self):
+        if self.end_time is not None:
+            return
+        self.end_time = time.time_ns()
+        if not self.recording:
+            return
+        if self.db_query_count:
+            self.attributes['db.query_count'] = self.db_query_count
+            self.attributes['db.time_ms'] = round(self.db_time * 1000, 3)
+        exporter = get_exporter()
+        if exporter is not None:
+            exporter.export(self)
+
+    def to_otlp(self):
+        """OTLP/JSON 格式的 span"""
+        span = {
+            'traceId': self.context.trace_id,
+            'spanId': self.context.span_id,
+            'name': self.name,
+            'kind': SPAN_KINDS.get(self.kind, 1),
+            'startTimeUnixNano': str(self.start_time),
+            'endTimeUnixNano': str(self.end_time),
+            'attributes': _otlp_attributes(self.attributes),
+            'status': {'code': self.status},
+        }
+        if self.parent_span_id:
+            span['parentSpanId'] = self.parent_span_id
+        if self.status_message:
+            span['status']['message'] = self.status_message
+        if self.events:
+            span['events'] = [
+                {'name': name, 'timeUnixNano': str(ts), 'attributes': _otlp_attributes(attrs)}
+                for name, ts, attrs in self.events
+            ]
+        return span
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_attributes(attributes):
+    return [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items()]
+
+
+def current_span():
+    """当前 span，没有时返回 None"""
+    return _current_span.get()
+
+
+def _create_span(name, kind='internal', attributes=None, parent=None):
+    """
+    创建 span（不设为当前 span）
+
+    Args:
+        parent (SpanContext, optional): 父上下文，默认取当前 span
+    """
+    if parent is None:
+        parent_span = _current_span.get()
+        parent = parent_span.context if parent_span is not None else None
+    if parent is not None:
+        context = SpanContext(parent.trace_id, _new_id(64), parent.sampled)
+        return Span(name, context, parent.span_id, kind, attributes)
+    trace_id = _new_id(128)
+    sampled = _should_sample(trace_id, get_tracing_settings()['SAMPLE_RATE'])
+    return Span(name, SpanContext(trace_id, _new_id(64), sampled), None, kind, attributes)
+
+
+@contextmanager
+def start_span(name, kind='internal', attributes=None, parent=None):
+    """
+    在代码块内开启一个 span 并设为当前 span
+
+    代码块抛出的异常会记录到 span 上并继续抛出
+
+    Args:
+        name (str): span 名称
+        kind (str): 'internal' / 'server' / 'client' / 'producer' / 'consumer'
+        attributes (dict, optional): 属性
+        parent (SpanContext, optional): 父上下文（跨进程传播时使用），默认取当前 span
+
+    Yields:
+        Span: span（追踪未启用时为 None）
+    """
+    if not get_tracing_settings()['ENABLED']:
+        yield None
+        return
+    span = _create_span(name, kind, attributes, parent)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+
+def traced(name=None, kind='internal'):
+    """
+    函数追踪装饰器
+
+    Args:
+        name (str, optional): span 名称，默认为 模块.函数限定名
+    """
+    def decorator(func):
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with start_span(span_name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def trace_methods(cls):
+    """
+    类装饰器：为所有公开方法（包括静态方法和类方法）加上 traced
+
+    span 名称为 类名.方法名，用于服务层和 SpiffWorkflowClient
+    """
+    for attr_name, attr in list(vars(cls).items()):
+        if attr_name.startswith('_'):
+            continue
+        span_name = f"{cls.__name__}.{attr_name}"
+        if isinstance(attr, staticmethod):
+            setattr(cls, attr_name, staticmethod(traced(span_name)(attr.__func__)))
+        elif isinstance(attr, classmethod):
+            setattr(cls, attr_name, classmethod(traced(span_name)(attr.__func__)))
+        elif callable(attr):
+            setattr(cls, attr_name, traced(span_name)(attr))
+    return cls
+
+
+# ========== 数据库耗时归属 ==========
+
+def _db_execute_wrapper(execute, sql, params, many, context):
+    span = _current_span.get()
+    if span is None or not span.recording:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        span.db_query_count += 1
+        span.db_time += time.perf_counter() - start
+
+
+def db_accounting():
+    """
+    把 SQL 计入执行时的当前 span
+
+    Returns:
+        ExitStack: 在所有数据库连接上安装了 execute_wrapper 的上下文，退出时卸载
+    """
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(_db_execute_wrapper))
+    return stack
+
+
+# ========== 导出 ==========
+
+class BatchSpanExporter:
+    """
+    批量导出器
+
+    span 结束时放入队列，后台线程按批写出；队列满时丢弃并计数，不阻塞业务线程
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.queue = queue.Queue(maxsize=config['MAX_QUEUE_SIZE'])
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def export(self, span):
+        try:
+            self.queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name='span-exporter', daemon=True)
+                    self._worker.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.config['EXPORT_INTERVAL'])
+            self.flush()
+
+    def _take_batch(self):
+        batch = []
+        while len(batch) < self.config['BATCH_SIZE']:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self):
+        """写出队列中的全部 span"""
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            try:
+                self.write(self._encode(batch))
+            except Exception as e:
+                logger.warning(f"导出 {len(batch)} 个 span 失败: {e}")
+
+    def _encode(self, batch):
+        from leave_system.renderers import dumps
+
+        return dumps({
+            'resourceSpans': [{
+                'resource': {'attributes': _otlp_attributes({
+                    'service.name': self.config['SERVICE_NAME'],
+                    'process.pid': os.getpid(),
+                })},
+                'scopeSpans': [{
+                    'scope': {'name': 'leave_system.tracing'},
+                    'spans': [span.to_otlp() for span in batch],
+                }],
+            }],
+        })
+
+    def write(self, body):
+        raise NotImplementedError
+
+
+class FileSpanExporter(BatchSpanExporter):
+    """
+    每批追加一行 OTLP/JSON 到文件
+
+    文件超过 FILE_MAX_BYTES 时改名为 FILE_PATH.1（覆盖上一个备份）后重新开始写，
+    磁盘占用最多约为上限的两倍
+    """
+
+    def write(self, body):
+        path = self.config['FILE_PATH']
+        max_bytes = self.config['FILE_MAX_BYTES']
+        if max_bytes:
+            try:
+                if os.path.getsize(path) + len(body) > max_bytes:
+                    os.replace(path, f"{path}.1")
+            except OSError:
+                pass
+        with open(path, 'ab') as f:
+            f.write(body + b'\n')
+
+
+class OtlpHttpSpanExporter(BatchSpanExporter):
+    """通过 OTLP/HTTP（JSON 编码）发送到 Collector"""
+
+    def write(self, body):
+        request = urllib.request.Request(
+            self.config['OTLP_ENDPOINT'],
+            data=body,
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        with urllib.request.urlopen(request, timeout=5):
+            pass
+
+
+EXPORTERS = {
+    'file': FileSpanExporter,
+    'otlp': OtlpHttpSpanExporter,
+}
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter():
+    """当前进程的导出器（按配置懒加载），EXPORTER 为 'none' 时返回 None"""
+    global _exporter
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                config = get_tracing_settings()
+                exporter_class = EXPORTERS.get(config['EXPORTER'])
+                _exporter = exporter_class(config) if exporter_class else False
+    return _exporter or None
+
+
+def _reset_exporter():
+    # fork 出的子进程重新创建导出器（父进程的队列和线程不可用）
+    global _exporter, _exporter_lock
+    _exporter = None
+    _exporter_lock = threading.Lock()
+
+
+def _flush_at_exit():
+    exporter = _exporter or None
+    if exporter is not None:
+        exporter.flush()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_exporter)
+
+atexit.register(_flush_at_exit)
+
+
+# ========== 中间件 ==========
+
+class TracingMiddleware:
+    """
+    为每个请求创建服务端 span
+
+    沿用请求头中的 traceparent；响应头 traceresponse 返回本次请求的 trace ID，便于按 ID 查找链路。
+    应放在 MIDDLEWARE 最前面
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not get_tracing_settings()['ENABLED']:
+            return self.get_response(request)
+
+        parent = SpanContext.from_traceparent(request.headers.get(TRACEPARENT_HEADER))
+        with start_span(f"HTTP {request.method}", 'server', {
+            'http.method': request.method,
+            # 只记录路径，查询字符串可能包含邮箱等个人信息
+            'http.target': request.path,
+        }, parent=parent) as span, db_accounting():
+            response = self.get_response(request)
+
+            match = getattr(request, 'resolver_match', None)
+            if match is not None:
+                span.name = f"HTTP {request.method} /{match.route}"
+                span.set_attribute('http.route', match.route)
+            span.set_attribute('http.status_code', response.status_code)
+            if response.status_code >= 500:
+                span.set_status(STATUS_ERROR)
+            response['traceresponse'] = span.context.to_traceparent()
+            return response
+
+
+# ========== Celery 传播 ==========
+# 由 leave_system.celery 连接到 Celery 信号
+
+# 已投递、尚未收到 after_task_publish 的 producer span（任务 ID -> span）。
+# 投递失败时 Celery 不发 after_task_publish：由 TracedTask.apply_async 调用 fail_publish_span 结束；
+# 绕过 apply_async 的投递（如 send_task）失败时，超出上限后按投递顺序淘汰最早的 span
+MAX_PENDING_PUBLISH = 1024
+
+_publishing = OrderedDict()
+_publishing_lock = threading.Lock()
+_running = {}
+
+
+def inject_task_headers(task_name, headers):
+    """
+    投递任务前：创建 producer span，并把上下文写入消息头
+
+    Celery eager 模式不投递消息，任务在当前线程执行，直接继承当前 span
+    """
+    if not get_tracing_settings()['ENABLED'] or headers is None:
+        return
+    span = _create_span(f"celery.publish {task_name}", 'producer', {'celery.task_name': task_name})
+    headers[TRACEPARENT_HEADER] = span.context.to_traceparent()
+    evicted = []
+    with _publishing_lock:
+        _publishing[headers.get('id')] = span
+        while len(_publishing) > MAX_PENDING_PUBLISH:
+            evicted.append(_publishing.popitem(last=False)[1])
+    for stale in evicted:
+        stale.set_status(STATUS_ERROR, '未确认投递结果')
+        stale.end()
+
+
+def _pop_publish_span(task_id):
+    with _publishing_lock:
+        return _publishing.pop(task_id, None)
+
+
+def end_publish_span(headers):
+    """投递完成：结束 producer span"""
+    span = _pop_publish_span((headers or {}).get('id'))
+    if span is not None:
+        span.end()
+
+
+def fail_publish_span(task_id, exc):
+    """投递失败：记录异常并结束 producer span（没有对应的 span 时不做任何事）"""
+    span = _pop_publish_span(task_id)
+    if span is not None:
+        span.record_exception(exc)
+        span.end()
+
+
+def start_task_span(task_id, task):
+    """任务开始：以消息头中的上下文为父 span 创建 consumer span"""
+    if not get_tracing_settings()['ENABLED']:
+        return
+    request = getattr(task, 'request', None)
+    parent = SpanContext.from_traceparent(request.get(TRACEPARENT_HEADER) if request else None)
+    span = _create_span(f"celery.run {task.name}", 'consumer', {
+        'celery.task_name': task.name,
+        'celery.task_id': task_id,
+        'celery.retries': getattr(request, 'retries', 0) or 0,
+    }, parent=parent)
+    token = _current_span.set(span)
+    _running[task_id] = (span, token, db_accounting())
+
+
+def end_task_span(task_id, state):
+    """任务结束：结束 consumer span"""
+    entry = _running.pop(task_id, None)
+    if entry is None:
+        return
+    span, token, stack = entry
+    stack.close()
+    _current_span.reset(token)
+    span.set_attribute('celery.state', state)
+    if state == 'FAILURE':
+        span.set_status(STATUS_ERROR)
+    span.end()
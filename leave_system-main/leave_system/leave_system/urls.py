@@ -18,7 +18,8 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from django.http import JsonResponse
+from leave_system.renderers import JsonResponse
+from leave_system.metrics import metrics_view
 from django.shortcuts import render, redirect
 
 def index_view(request):
@@ -60,6 +61,7 @@ urlpatterns = [
     path('bpmn-designer/', bpmn_designer_view, name='bpmn_designer'),
     path('test-workflow/', test_workflow_view, name='test_workflow'),
     path('api-info/', api_info_view, name='api_info'),
+    path('metrics', metrics_view, name='metrics'),
     path('admin/', admin.site.urls),
     path('api/', include('leave_api.urls')),
     path('api/organization/', include('organization.urls')),
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.9 on 2026-10-19 03:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient_email', 'created_at', 'id'], name='notificatio_recipie_8a4182_idx'),
+        ),
+    ]
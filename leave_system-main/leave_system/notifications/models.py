@@ -65,6 +65,8 @@ class Notification(models.Model):
         indexes = [
             models.Index(fields=['recipient_email', 'is_read']),
             models.Index(fields=['created_at']),
+            # 通知列表按 (created_at, id) 键集分页
+            models.Index(fields=['recipient_email', 'created_at', 'id']),
         ]
     
     def __str__(self):
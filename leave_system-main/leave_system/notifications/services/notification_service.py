@@ -8,10 +8,12 @@ from django.core.mail import send_mail
 from django.conf import settings
 from django.template.loader import render_to_string
 from notifications.models import Notification
+from leave_system.tracing import trace_methods
 
 logger = logging.getLogger(__name__)
 
 
+@trace_methods
 class NotificationService:
     """
     通知服务类
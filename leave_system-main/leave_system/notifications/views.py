@@ -6,14 +6,20 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 from django.utils import timezone
+from leave_system.db_router import read_replica
+from leave_system.pagination import KeysetPaginator, InvalidCursor
 from .models import Notification
 from .serializers import NotificationSerializer
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 通知列表按创建时间倒序分页
+notification_paginator = KeysetPaginator(('-created_at', '-id'))
+
 
 @api_view(['GET'])
+@read_replica()
 def get_my_notifications(request):
     """
     查询我的通知列表
@@ -22,23 +28,25 @@ def get_my_notifications(request):
         user_email (str): 用户邮箱，必填
         is_read (str): 是否已读，可选（'true'/'false'）
         notification_type (str): 通知类型，可选
-        limit (int): 返回数量限制，可选，默认50
+        cursor (str): 分页游标，可选，取上一页返回的 next_cursor
+        page_size (int): 每页数量，可选，默认50，最大200（兼容旧参数 limit）
         
     返回数据:
         success (bool): 操作是否成功
-        notifications (list): 通知列表
-        count (int): 通知数量
+        notifications (list): 通知列表（当前页）
+        count (int): 当前页通知数量
         unread_count (int): 未读数量
+        next_cursor (str): 下一页游标，没有更多数据时为 null
+        has_more (bool): 是否还有下一页
         
     HTTP 状态码:
         200: 查询成功
-        400: 缺少必填参数
+        400: 缺少必填参数或分页参数无效
         500: 服务器内部错误
     """
     user_email = request.query_params.get('user_email')
     is_read_param = request.query_params.get('is_read')
     notification_type = request.query_params.get('notification_type')
-    limit = int(request.query_params.get('limit', 50))
     
     if not user_email:
         return Response({
@@ -46,6 +54,16 @@ def get_my_notifications(request):
             'error': '缺少 user_email 参数'
         }, status=status.HTTP_400_BAD_REQUEST)
     
+    try:
+        page_size = notification_paginator.get_page_size(
+            request.query_params.get('page_size') or request.query_params.get('limit')
+        )
+    except InvalidCursor as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
     try:
         # 查询通知
         notifications = Notification.objects.filter(recipient_email=user_email)
@@ -59,8 +77,12 @@ def get_my_notifications(request):
         if notification_type:
             notifications = notifications.filter(notification_type=notification_type)
         
-        # 限制数量
-        notifications = notifications.order_by('-created_at')[:limit]
+        # 分页
+        page = notification_paginator.paginate(
+            notifications,
+            cursor=request.query_params.get('cursor'),
+            page_size=page_size
+        )
         
         # 统计未读数量
         unread_count = Notification.objects.filter(
@@ -69,15 +91,21 @@ def get_my_notifications(request):
         ).count()
         
         # 序列化
-        serializer = NotificationSerializer(notifications, many=True)
+        serializer = NotificationSerializer(page.items, many=True)
         
         return Response({
             'success': True,
             'notifications': serializer.data,
             'count': len(serializer.data),
-            'unread_count': unread_count
+            'unread_count': unread_count,
+            **page.to_dict()
         })
     
+    except InvalidCursor as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"查询通知列表失败: {e}", exc_info=True)
         return Response({
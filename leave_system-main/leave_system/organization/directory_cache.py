@@ -0,0 +1,107 @@
+"""
+组织架构列表的条件请求和响应缓存
+
+组织架构数据很少变化，列表接口（员工、部门、角色、角色成员）按 DirectoryVersion 中的数据版本：
+- 生成强 ETag（数据版本 + 查询参数 + 内容编码）和 Last-Modified，
+  客户端带 If-None-Match / If-Modified-Since 且数据未变化时返回 304，不查询数据也不传输响应体
+- 响应体编码后按版本缓存（settings.ORG_DIRECTORY_CACHE['CACHE_ALIAS']），
+  客户端支持时同时缓存 gzip 压缩后的响应体；数据变化后版本号改变，旧缓存自然失效
+
+用法：
+    @require_http_methods(["GET"])
+    @read_replica()
+    @conditional_directory(DirectoryVersion.EMPLOYEE, DirectoryVersion.DEPARTMENT)
+    def list_employees(request):
+        ...
+"""
+
+import functools
+import gzip
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+from .models import DirectoryVersion
+
+DEFAULT_DIRECTORY_CACHE_SETTINGS = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 3600,
+    'GZIP_MIN_BYTES': 1024,
+    'GZIP_LEVEL': 6,
+}
+
+
+def get_directory_cache_settings():
+    return {**DEFAULT_DIRECTORY_CACHE_SETTINGS, **getattr(settings, 'ORG_DIRECTORY_CACHE', {})}
+
+
+def _accepts_gzip(request):
+    return 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+
+def _not_modified(request, etag, last_modified):
+    """按 RFC 9110：有 If-None-Match 时只比较 ETag，否则比较 If-Modified-Since"""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in etags
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return bool(if_modified_since and last_modified and int(last_modified.timestamp()) <= if_modified_since)
+
+
+def conditional_directory(*entities):
+    """
+    视图装饰器：按 entities 的数据版本返回 304 或缓存的响应体
+
+    只缓存 200 响应；错误响应（如无效的 cursor）原样返回
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            config = get_directory_cache_settings()
+            versions = DirectoryVersion.current(entities)
+            stamps = [dt for _, dt in versions.values() if dt is not None]
+            last_modified = max(stamps) if stamps else None
+
+            fingerprint = hashlib.sha1(repr((
+                view.__module__, view.__qualname__, sorted(versions.items()),
+                sorted(request.GET.lists()), args, sorted(kwargs.items()),
+            )).encode('utf-8')).hexdigest()[:20]
+            use_gzip = _accepts_gzip(request)
+            etag = f'"{fingerprint}{"-gz" if use_gzip else ""}"'
+
+            if _not_modified(request, etag, last_modified):
+                response = HttpResponseNotModified()
+            else:
+                cache = caches[config['CACHE_ALIAS']]
+                key = f'org_directory:{fingerprint}:{"gzip" if use_gzip else "identity"}'
+                cached = cache.get(key)
+                if cached is None:
+                    response = view(request, *args, **kwargs)
+                    if response.status_code != 200:
+                        return response
+                    body = response.content
+                    encoding = None
+                    if use_gzip and len(body) >= config['GZIP_MIN_BYTES']:
+                        body = gzip.compress(body, compresslevel=config['GZIP_LEVEL'], mtime=0)
+                        encoding = 'gzip'
+                    cached = (body, response['Content-Type'], encoding)
+                    cache.set(key, cached, config['TIMEOUT'])
+                body, content_type, encoding = cached
+                response = HttpResponse(body, content_type=content_type)
+                if encoding:
+                    response['Content-Encoding'] = encoding
+
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified.timestamp())
+            # 浏览器可以缓存，但每次使用前都要带 ETag 重新验证
+            response['Cache-Control'] = 'private, no-cache'
+            patch_vary_headers(response, ('Accept-Encoding',))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.9 on 2026-10-19 04:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+from organization.tree import build_tree
+
+
+def build_department_tree(apps, schema_editor):
+    """为已有部门计算完整路径、层级和闭包表"""
+    Department = apps.get_model('organization', 'Department')
+    DepartmentClosure = apps.get_model('organization', 'DepartmentClosure')
+    paths, closure, _ = build_tree(Department.objects.values_list('id', 'parent_id', 'name'))
+    Department.objects.bulk_update([
+        Department(id=department_id, full_path=full_path, depth=depth)
+        for department_id, (full_path, depth) in paths.items()
+    ], ['full_path', 'depth'], batch_size=1000)
+    DepartmentClosure.objects.bulk_create([
+        DepartmentClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=depth)
+        for ancestor_id, descendant_id, depth in closure
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='department',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='根部门为 0，由 save() 维护', verbose_name='层级'),
+        ),
+        migrations.AddField(
+            model_name='department',
+            name='full_path',
+            field=models.CharField(blank=True, default='', editable=False, help_text='从根部门到本部门的名称路径，如"总公司 > 技术部"，由 save() 维护', max_length=1000, verbose_name='完整路径'),
+        ),
+        migrations.CreateModel(
+            name='DepartmentClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField(help_text='0 表示自身，1 表示直接下级', verbose_name='层级差')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='organization.department', verbose_name='上级部门')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='organization.department', verbose_name='下级部门')),
+            ],
+            options={
+                'verbose_name': '部门闭包',
+                'verbose_name_plural': '部门闭包',
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='organizatio_descend_3610f4_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='departmentclosure',
+            constraint=models.UniqueConstraint(fields=('ancestor', 'descendant'), name='uniq_department_closure'),
+        ),
+        migrations.RunPython(build_department_tree, migrations.RunPython.noop),
+    ]
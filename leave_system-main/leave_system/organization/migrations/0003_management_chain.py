@@ -0,0 +1,45 @@
+# Generated by Django 4.2.9 on 2026-10-19 04:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+from organization.tree import build_closure
+
+
+def build_management_chain(apps, schema_editor):
+    """为已有员工计算汇报关系闭包表"""
+    Employee = apps.get_model('organization', 'Employee')
+    EmployeeClosure = apps.get_model('organization', 'EmployeeClosure')
+    closure, _ = build_closure(Employee.objects.values_list('id', 'direct_manager_id'))
+    EmployeeClosure.objects.bulk_create([
+        EmployeeClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=depth)
+        for ancestor_id, descendant_id, depth in closure
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0002_department_tree'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField(help_text='0 表示自身，1 表示直属上级', verbose_name='层级差')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='organization.employee', verbose_name='上级')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='organization.employee', verbose_name='下属')),
+            ],
+            options={
+                'verbose_name': '汇报关系闭包',
+                'verbose_name_plural': '汇报关系闭包',
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='organizatio_descend_5ac40d_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='employeeclosure',
+            constraint=models.UniqueConstraint(fields=('ancestor', 'descendant'), name='uniq_employee_closure'),
+        ),
+        migrations.RunPython(build_management_chain, migrations.RunPython.noop),
+    ]
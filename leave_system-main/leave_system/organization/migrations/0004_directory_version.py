@@ -0,0 +1,26 @@
+# Generated by Django 4.2.9 on 2026-10-19 04:14
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organization', '0003_management_chain'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirectoryVersion',
+            fields=[
+                ('entity', models.CharField(choices=[('employee', '员工'), ('department', '部门'), ('role', '角色')], max_length=20, primary_key=True, serialize=False, verbose_name='数据类型')),
+                ('version', models.PositiveBigIntegerField(default=1, verbose_name='版本号')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '组织架构数据版本',
+                'verbose_name_plural': '组织架构数据版本',
+            },
+        ),
+    ]
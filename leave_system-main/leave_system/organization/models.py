@@ -3,14 +3,75 @@
 定义部门、员工、角色等组织架构相关模型
 """
 
-from django.db import models
+import logging
+
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.utils import timezone
+from django.dispatch import receiver
 from django.contrib.auth.models import User
+from .tree import PATH_SEPARATOR, build_closure, build_tree
+
+logger = logging.getLogger(__name__)
+
+
+# ========== 闭包表维护（DepartmentClosure / EmployeeClosure 共用） ==========
+
+def _closure_creates_cycle(closure, node_id, parent_id):
+    """把 node_id 挂到 parent_id 之下是否会成环（parent_id 是它自己或下级）"""
+    return closure.objects.filter(ancestor_id=node_id, descendant_id=parent_id).exists()
+
+
+def _closure_insert(closure, node_id, parent_id):
+    """新建节点：写入自身记录和所有祖先到该节点的记录"""
+    links = [closure(ancestor_id=node_id, descendant_id=node_id, depth=0)]
+    if parent_id is not None:
+        links += [
+            closure(ancestor_id=ancestor_id, descendant_id=node_id, depth=depth + 1)
+            for ancestor_id, depth in closure.objects.filter(
+                descendant_id=parent_id
+            ).values_list('ancestor_id', 'depth')
+        ]
+    closure.objects.bulk_create(links)
+
+
+def _closure_move(closure, node_id, parent_id):
+    """移动节点：删除子树与旧祖先之间的记录，再与新祖先做笛卡尔积"""
+    subtree = list(
+        closure.objects.filter(ancestor_id=node_id).values_list('descendant_id', 'depth')
+    )
+    subtree_ids = [descendant_id for descendant_id, _ in subtree]
+    closure.objects.filter(descendant_id__in=subtree_ids).exclude(
+        ancestor_id__in=subtree_ids
+    ).delete()
+    if parent_id is None:
+        return
+    ancestors = closure.objects.filter(descendant_id=parent_id).values_list('ancestor_id', 'depth')
+    closure.objects.bulk_create([
+        closure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=up + down + 1)
+        for ancestor_id, up in ancestors
+        for descendant_id, down in subtree
+    ], batch_size=1000)
+
+
+def _closure_replace(closure, links):
+    """用 [(ancestor_id, descendant_id, depth)] 整体替换闭包表"""
+    closure.objects.all().delete()
+    closure.objects.bulk_create([
+        closure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=depth)
+        for ancestor_id, descendant_id, depth in links
+    ], batch_size=1000)
 
 
 class Department(models.Model):
     """
     部门模型
     支持树形结构，可以有父部门和子部门
+    
+    完整路径（full_path）、层级（depth）和闭包表（DepartmentClosure）在 save() 中维护，
+    新建、改名和移动部门时同步更新整棵子树；bulk_create / update() 等绕过 save() 的批量修改
+    之后需要调用 Department.rebuild_tree() 重建
     """
     name = models.CharField(
         max_length=100,
@@ -38,6 +99,22 @@ class Department(models.Model):
         help_text='该部门的负责人'
     )
     
+    full_path = models.CharField(
+        max_length=1000,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name='完整路径',
+        help_text='从根部门到本部门的名称路径，如"总公司 > 技术部"，由 save() 维护'
+    )
+    
+    depth = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='层级',
+        help_text='根部门为 0，由 save() 维护'
+    )
+    
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name='创建时间'
@@ -60,17 +137,161 @@ class Department(models.Model):
     def __str__(self):
         return self.name
     
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding and self.pk is not None:
+                previous = Department.objects.filter(pk=self.pk).values('parent_id', 'name', 'full_path').first()
+            moved = previous is not None and previous['parent_id'] != self.parent_id
+            
+            if moved and self.parent_id is not None and _closure_creates_cycle(
+                DepartmentClosure, self.pk, self.parent_id
+            ):
+                raise ValueError(f"不能把部门 {self.name} 移动到它自己或下级部门之下")
+            
+            parent = self.parent if self.parent_id is not None else None
+            self.full_path = f"{parent.get_full_path()}{PATH_SEPARATOR}{self.name}" if parent else self.name
+            self.depth = parent.depth + 1 if parent else 0
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'full_path', 'depth'}
+            
+            super().save(*args, **kwargs)
+            
+            if previous is None:
+                _closure_insert(DepartmentClosure, self.pk, self.parent_id)
+            elif moved:
+                _closure_move(DepartmentClosure, self.pk, self.parent_id)
+            if previous is not None and previous['full_path'] != self.full_path:
+                self._refresh_subtree_paths()
+    
+    def _refresh_subtree_paths(self):
+        """改名或移动后更新所有下级部门的完整路径和层级"""
+        descendants = list(
+            Department.objects.filter(
+                ancestor_links__ancestor_id=self.pk, ancestor_links__depth__gt=0
+            ).order_by('ancestor_links__depth').only('id', 'parent_id', 'name')
+        )
+        resolved = {self.pk: self}
+        for department in descendants:
+            parent = resolved[department.parent_id]
+            department.full_path = f"{parent.full_path}{PATH_SEPARATOR}{department.name}"
+            department.depth = parent.depth + 1
+            resolved[department.pk] = department
+        Department.objects.bulk_update(descendants, ['full_path', 'depth'], batch_size=1000)
+    
     def get_full_path(self):
         """获取部门的完整路径"""
+        if self.full_path:
+            return self.full_path
+        # 绕过 save() 批量写入、尚未 rebuild_tree() 的部门
         if self.parent:
-            return f"{self.parent.get_full_path()} > {self.name}"
+            return f"{self.parent.get_full_path()}{PATH_SEPARATOR}{self.name}"
         return self.name
+    
+    def get_ancestors(self, include_self=False):
+        """获取所有上级部门（一次查询），从根部门到直接上级排列"""
+        return Department.objects.filter(
+            descendant_links__descendant_id=self.pk,
+            descendant_links__depth__gte=0 if include_self else 1,
+        ).order_by('-descendant_links__depth')
+    
+    def get_descendants(self, include_self=False):
+        """获取子树中的所有部门（一次查询），按层级由近到远排列"""
+        return Department.objects.filter(
+            ancestor_links__ancestor_id=self.pk,
+            ancestor_links__depth__gte=0 if include_self else 1,
+        ).order_by('ancestor_links__depth', 'name')
+    
+    def get_nearest_manager(self, exclude_emails=()):
+        """
+        从本部门开始逐级向上查找第一个有负责人的部门（一次查询）
+        
+        Args:
+            exclude_emails: 跳过这些邮箱的负责人（如审批人本人、申请人）
+        
+        Returns:
+            Employee or None
+        """
+        links = DepartmentClosure.objects.filter(
+            descendant_id=self.pk, ancestor__manager__isnull=False
+        )
+        if exclude_emails:
+            links = links.exclude(ancestor__manager__email__in=exclude_emails)
+        link = links.select_related('ancestor__manager').order_by('depth').first()
+        return link.ancestor.manager if link else None
+    
+    @classmethod
+    def rebuild_tree(cls):
+        """
+        重建所有部门的完整路径、层级和闭包表
+        
+        用于大规模组织调整（批量导入、批量修改 parent）之后，一个事务内完成
+        
+        Returns:
+            dict: {'departments': 部门数, 'links': 闭包表记录数, 'orphans': 成环而跳过的部门 ID}
+        """
+        with transaction.atomic():
+            paths, closure, orphans = build_tree(cls.objects.values_list('id', 'parent_id', 'name'))
+            if orphans:
+                logger.warning(f"部门树存在环，以下部门未重建: {orphans}")
+            
+            departments = [
+                cls(id=department_id, full_path=full_path, depth=depth)
+                for department_id, (full_path, depth) in paths.items()
+            ]
+            cls.objects.bulk_update(departments, ['full_path', 'depth'], batch_size=1000)
+            _closure_replace(DepartmentClosure, closure)
+            DirectoryVersion.bump(DirectoryVersion.DEPARTMENT)
+        
+        logger.info(f"部门树重建完成: {len(paths)} 个部门，{len(closure)} 条闭包记录")
+        return {'departments': len(paths), 'links': len(closure), 'orphans': orphans}
+
+
+class DepartmentClosure(models.Model):
+    """
+    部门闭包表
+    每对（上级部门, 下级部门）一条记录，包含 depth=0 的自身记录，
+    子树和祖先查询都只需要一次按索引的连接
+    """
+    ancestor = models.ForeignKey(
+        Department,
+        on_delete=models.CASCADE,
+        related_name='descendant_links',
+        verbose_name='上级部门'
+    )
+    
+    descendant = models.ForeignKey(
+        Department,
+        on_delete=models.CASCADE,
+        related_name='ancestor_links',
+        verbose_name='下级部门'
+    )
+    
+    depth = models.PositiveIntegerField(
+        verbose_name='层级差',
+        help_text='0 表示自身，1 表示直接下级'
+    )
+    
+    class Meta:
+        verbose_name = '部门闭包'
+        verbose_name_plural = '部门闭包'
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='uniq_department_closure'),
+        ]
+        indexes = [
+            models.Index(fields=['descendant', 'depth']),
+        ]
 
 
 class Employee(models.Model):
     """
     员工模型
     关联 Django User，存储员工的组织架构信息
+    
+    汇报关系闭包表（EmployeeClosure）在 save() 中维护，删除员工时由 pre_delete 信号把其下属
+    从原汇报链上摘下；bulk_create / update() 批量修改 direct_manager 之后需要调用
+    Employee.rebuild_management_chain() 重建
     """
     user = models.OneToOneField(
         User,
@@ -153,6 +374,138 @@ class Employee(models.Model):
     def get_full_name(self):
         """获取员工全名"""
         return self.user.get_full_name() or self.user.username
+    
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding and self.pk is not None:
+                previous = Employee.objects.filter(pk=self.pk).values('direct_manager_id').first()
+            moved = previous is not None and previous['direct_manager_id'] != self.direct_manager_id
+            
+            if moved and self.direct_manager_id is not None and _closure_creates_cycle(
+                EmployeeClosure, self.pk, self.direct_manager_id
+            ):
+                raise ValueError(f"不能把员工 {self.employee_id} 的直属上级设置为本人或其下属")
+            
+            super().save(*args, **kwargs)
+            
+            if previous is None:
+                _closure_insert(EmployeeClosure, self.pk, self.direct_manager_id)
+            elif moved:
+                _closure_move(EmployeeClosure, self.pk, self.direct_manager_id)
+    
+    def get_management_chain(self):
+        """获取汇报链上的所有上级（一次查询），从直属上级开始逐级向上排列"""
+        return Employee.objects.filter(
+            descendant_links__descendant_id=self.pk, descendant_links__depth__gte=1
+        ).order_by('descendant_links__depth')
+    
+    def get_manager_at(self, n):
+        """
+        获取第 n 级上级（1 为直属上级，2 为上级的上级）
+        
+        Returns:
+            Employee or None
+        """
+        return Employee.objects.filter(
+            descendant_links__descendant_id=self.pk, descendant_links__depth=n
+        ).first()
+    
+    def get_first_manager_above_level(self, level):
+        """
+        沿汇报链向上查找第一个职级高于 level 的上级（一次查询）
+        
+        Returns:
+            Employee or None
+        """
+        return self.get_management_chain().filter(level__gt=level).first()
+    
+    def get_all_reports(self, max_depth=None):
+        """
+        获取所有直接和间接下属（一次查询），按汇报层级由近到远排列
+        
+        Args:
+            max_depth (int, optional): 最多向下的层级，None 表示不限
+        """
+        reports = Employee.objects.filter(
+            ancestor_links__ancestor_id=self.pk, ancestor_links__depth__gte=1
+        )
+        if max_depth is not None:
+            reports = reports.filter(ancestor_links__depth__lte=max_depth)
+        return reports.order_by('ancestor_links__depth', 'employee_id')
+    
+    @classmethod
+    def rebuild_management_chain(cls):
+        """
+        重建汇报关系闭包表
+        
+        用于批量导入或批量调整直属上级之后，一个事务内完成
+        
+        Returns:
+            dict: {'links': 闭包表记录数, 'orphans': 汇报关系成环而跳过的员工 ID}
+        """
+        with transaction.atomic():
+            closure, orphans = build_closure(cls.objects.values_list('id', 'direct_manager_id'))
+            if orphans:
+                logger.warning(f"汇报关系存在环，以下员工未重建: {orphans}")
+            _closure_replace(EmployeeClosure, closure)
+        
+        logger.info(f"汇报关系重建完成: {len(closure)} 条闭包记录")
+        return {'links': len(closure), 'orphans': orphans}
+
+
+class EmployeeClosure(models.Model):
+    """
+    汇报关系闭包表
+    每对（上级, 下属）一条记录，包含 depth=0 的自身记录，
+    第 n 级上级、汇报链和全部下属查询都只需要一次按索引的连接
+    """
+    ancestor = models.ForeignKey(
+        Employee,
+        on_delete=models.CASCADE,
+        related_name='descendant_links',
+        verbose_name='上级'
+    )
+    
+    descendant = models.ForeignKey(
+        Employee,
+        on_delete=models.CASCADE,
+        related_name='ancestor_links',
+        verbose_name='下属'
+    )
+    
+    depth = models.PositiveIntegerField(
+        verbose_name='层级差',
+        help_text='0 表示自身，1 表示直属上级'
+    )
+    
+    class Meta:
+        verbose_name = '汇报关系闭包'
+        verbose_name_plural = '汇报关系闭包'
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='uniq_employee_closure'),
+        ]
+        indexes = [
+            models.Index(fields=['descendant', 'depth']),
+        ]
+
+
+@receiver(pre_delete, sender=Employee)
+def detach_reports(sender, instance, **kwargs):
+    """
+    删除员工前把其下属从原汇报链上摘下
+    
+    direct_manager 为 SET_NULL，下属成为新的根；员工自身的闭包记录随外键级联删除
+    """
+    reports = list(
+        EmployeeClosure.objects.filter(ancestor_id=instance.pk, depth__gte=1).values_list('descendant_id', flat=True)
+    )
+    if not reports:
+        return
+    managers = list(
+        EmployeeClosure.objects.filter(descendant_id=instance.pk, depth__gte=1).values_list('ancestor_id', flat=True)
+    )
+    EmployeeClosure.objects.filter(ancestor_id__in=managers, descendant_id__in=reports).delete()
 
 
 class Role(models.Model):
@@ -191,3 +544,97 @@ class Role(models.Model):
     
     def __str__(self):
         return self.name
+
+
+class DirectoryVersion(models.Model):
+    """
+    组织架构数据版本
+    每类数据一行，员工、部门、角色（含成员）变化时递增，
+    组织架构列表接口据此生成 ETag / Last-Modified 并缓存响应
+    """
+    EMPLOYEE = 'employee'
+    DEPARTMENT = 'department'
+    ROLE = 'role'
+    ENTITY_CHOICES = [
+        (EMPLOYEE, '员工'),
+        (DEPARTMENT, '部门'),
+        (ROLE, '角色'),
+    ]
+    
+    entity = models.CharField(
+        max_length=20,
+        primary_key=True,
+        choices=ENTITY_CHOICES,
+        verbose_name='数据类型'
+    )
+    
+    version = models.PositiveBigIntegerField(
+        default=1,
+        verbose_name='版本号'
+    )
+    
+    updated_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='更新时间'
+    )
+    
+    class Meta:
+        verbose_name = '组织架构数据版本'
+        verbose_name_plural = '组织架构数据版本'
+    
+    def __str__(self):
+        return f"{self.entity} v{self.version}"
+    
+    @classmethod
+    def bump(cls, *entities):
+        """递增数据版本（在调用方的事务中执行，随数据一起提交）"""
+        now = timezone.now()
+        for entity in entities:
+            updated = cls.objects.filter(entity=entity).update(version=F('version') + 1, updated_at=now)
+            if not updated:
+                cls.objects.get_or_create(entity=entity, defaults={'updated_at': now})
+    
+    @classmethod
+    def current(cls, entities):
+        """
+        获取数据版本（一次查询）
+        
+        Returns:
+            dict: {entity: (version, updated_at)}，没有记录的类型版本为 0
+        """
+        found = {
+            entity: (version, updated_at)
+            for entity, version, updated_at in cls.objects.filter(entity__in=entities).values_list(
+                'entity', 'version', 'updated_at'
+            )
+        }
+        return {entity: found.get(entity, (0, None)) for entity in entities}
+
+
+# 模型 -> 变化时需要递增版本的数据类型（员工姓名来自用户账号）
+_VERSIONED_MODELS = {
+    Department: DirectoryVersion.DEPARTMENT,
+    Employee: DirectoryVersion.EMPLOYEE,
+    Role: DirectoryVersion.ROLE,
+    User: DirectoryVersion.EMPLOYEE,
+}
+
+
+def bump_directory_version(sender, **kwargs):
+    """员工、部门、角色保存或删除后递增对应的数据版本"""
+    # 登录只更新 last_login，不影响组织架构数据
+    if kwargs.get('update_fields') == frozenset({'last_login'}):
+        return
+    DirectoryVersion.bump(_VERSIONED_MODELS[sender])
+
+
+for _model in _VERSIONED_MODELS:
+    post_save.connect(bump_directory_version, sender=_model, dispatch_uid=f'directory_version_save_{_model.__name__}')
+    post_delete.connect(bump_directory_version, sender=_model, dispatch_uid=f'directory_version_delete_{_model.__name__}')
+
+
+@receiver(m2m_changed, sender=Role.employees.through)
+def bump_role_version(sender, action, **kwargs):
+    """角色成员变化后递增角色数据版本"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        DirectoryVersion.bump(DirectoryVersion.ROLE)
@@ -0,0 +1,136 @@
+"""
+组织架构读模型
+
+员工、部门、角色列表需要关联对象的名称（部门名、直属上级和负责人的姓名、角色成员数），
+逐行访问外键或调用 .count() 会产生 N+1 查询。本模块集中定义这些列表的查询方式，
+views_api 和 DRF ViewSet 共用：
+
+- XXX_FIELDS / xxx_row(row): 传给 values() 的列名（JOIN 列取关联对象的名称）和响应行转换，
+  输出与原有视图逐字段一致；供 views_api 的简化接口使用
+- xxx_queryset(): 显式 select_related / 注解计数 / 只预取主键的查询集，供 DRF 序列化器使用
+
+用法：
+    rows = Employee.objects.values(*EMPLOYEE_LIST_FIELDS)
+    data = [employee_list_row(row) for row in rows]
+"""
+
+from django.db.models import Count, Prefetch
+from .models import Department, Employee, Role
+
+
+def _full_name(row, prefix):
+    """与 Employee.get_full_name() 一致：姓名为空时使用用户名"""
+    name = f"{row[prefix + 'user__first_name']} {row[prefix + 'user__last_name']}".strip()
+    return name or row[prefix + 'user__username']
+
+
+def _name_fields(prefix):
+    return tuple(f"{prefix}user__{field}" for field in ('first_name', 'last_name', 'username'))
+
+
+# ========== 员工列表 ==========
+
+EMPLOYEE_LIST_FIELDS = (
+    'id', 'employee_id', 'email', 'department_id', 'department__name', 'position', 'level',
+    'direct_manager_id',
+) + _name_fields('') + _name_fields('direct_manager__')
+
+
+def employee_list_row(row):
+    """员工列表的一行"""
+    return {
+        'id': row['id'],
+        'employee_id': row['employee_id'],
+        'name': _full_name(row, ''),
+        'email': row['email'],
+        'department': row['department__name'] or '',
+        'department_id': row['department_id'],
+        'position': row['position'],
+        'level': row['level'],
+        'direct_manager_id': row['direct_manager_id'],
+        'direct_manager_name': _full_name(row, 'direct_manager__') if row['direct_manager_id'] else None,
+    }
+
+
+# ========== 部门列表 ==========
+
+# full_path 由 Department.save() / rebuild_tree() 维护，不再逐级查询上级部门
+DEPARTMENT_LIST_FIELDS = (
+    'id', 'name', 'full_path', 'parent_id', 'parent__name', 'manager_id',
+) + _name_fields('manager__')
+
+
+def department_list_row(row):
+    """部门列表的一行"""
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'full_path': row['full_path'],
+        'parent_id': row['parent_id'],
+        'parent_name': row['parent__name'],
+        'manager_id': row['manager_id'],
+        'manager_name': _full_name(row, 'manager__') if row['manager_id'] else None,
+    }
+
+
+# ========== 角色列表 ==========
+
+ROLE_LIST_FIELDS = ('id', 'name', 'description', 'member_count')
+
+
+def role_list_values():
+    """角色列表（成员数由 COUNT 注解给出，一次查询）"""
+    return Role.objects.annotate(member_count=Count('employees')).values(*ROLE_LIST_FIELDS)
+
+
+def role_list_row(row):
+    """角色列表的一行"""
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'description': row['description'],
+        'member_count': row['member_count'],
+    }
+
+
+# ========== 角色成员 ==========
+
+ROLE_MEMBER_FIELDS = (
+    'id', 'employee_id', 'email', 'department__name', 'position',
+) + _name_fields('')
+
+
+def role_member_values(role_id):
+    """角色成员（按工号排序，一次查询）"""
+    return Employee.objects.filter(roles=role_id).order_by('employee_id').values(*ROLE_MEMBER_FIELDS)
+
+
+def role_member_row(row):
+    """角色成员的一行"""
+    return {
+        'id': row['id'],
+        'employee_id': row['employee_id'],
+        'name': _full_name(row, ''),
+        'email': row['email'],
+        'department': row['department__name'] or '',
+        'position': row['position'],
+    }
+
+
+# ========== DRF ViewSet 查询集 ==========
+
+def employee_queryset():
+    """EmployeeSerializer 用到的用户、部门、直属上级（含其用户）一并 JOIN"""
+    return Employee.objects.select_related('user', 'department', 'direct_manager__user')
+
+
+def department_queryset():
+    """DepartmentSerializer 用到的上级部门、负责人（含其用户）一并 JOIN"""
+    return Department.objects.select_related('parent', 'manager__user')
+
+
+def role_queryset():
+    """RoleSerializer 的成员数用 COUNT 注解，成员列表只预取主键"""
+    return Role.objects.annotate(employee_count=Count('employees')).prefetch_related(
+        Prefetch('employees', queryset=Employee.objects.only('id'))
+    )
@@ -15,9 +15,9 @@ class DepartmentSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Department
-        fields = ['id', 'name', 'parent', 'parent_name', 'manager', 'manager_name', 
+        fields = ['id', 'name', 'full_path', 'depth', 'parent', 'parent_name', 'manager', 'manager_name', 
                   'created_at', 'updated_at']
-        read_only_fields = ['created_at', 'updated_at']
+        read_only_fields = ['full_path', 'depth', 'created_at', 'updated_at']
     
     def get_manager_name(self, obj):
         return obj.manager.get_full_name() if obj.manager else None
@@ -57,4 +57,7 @@ class RoleSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
     
     def get_employee_count(self, obj):
+        # 列表查询集已注解 employee_count（organization.read_models.role_queryset）
+        if hasattr(obj, 'employee_count'):
+            return obj.employee_count
         return obj.employees.count()
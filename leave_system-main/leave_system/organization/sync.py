@@ -0,0 +1,512 @@
+"""
+组织架构同步
+读取 HR 系统导出的员工数据（CSV / JSON Lines），与当前的员工、部门、角色比对后只写入变化的部分
+
+数据格式：每行一个员工
+    employee_id            工号（必填，唯一）
+    name                   姓名
+    email / phone          邮箱 / 电话
+    department             部门完整路径（必填），如 "总公司 > 技术部 > 后端组"，不存在的部门自动创建
+    position / level       职位 / 职级（默认 1）
+    manager_employee_id    直属上级工号，为空表示没有直属上级
+    roles                  角色名称，多个用 ; 分隔；不提供该列时不同步角色
+    is_department_manager  是否为所在部门负责人（1 / true / yes / 是）
+
+CSV 第一行为列名；JSON Lines 每行一个对象，字段同上（roles 也可以是列表）
+"""
+
+import csv
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import orjson
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from leave_system.sqlite import serialized_write
+from leave_system.tracing import trace_methods
+
+from .models import Department, DirectoryVersion, Employee, Role
+from .tree import PATH_SEPARATOR, walk_tree
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYNC_SETTINGS = {
+    'FEED_PATH': '',
+    'CHUNK_SIZE': 1000,
+    'DELETE_MISSING': False,
+}
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', '是'}
+
+
+def get_sync_settings():
+    return {**DEFAULT_SYNC_SETTINGS, **getattr(settings, 'ORG_SYNC', {})}
+
+
+@dataclass
+class FeedRecord:
+    """一行 HR 数据（已规范化）"""
+    employee_id: str
+    name: str
+    email: str
+    phone: str
+    department: str
+    position: str
+    level: int
+    manager_employee_id: str
+    roles: frozenset = None
+    is_department_manager: bool = False
+
+    def attribute_hash(self):
+        """员工属性（不含直属上级和角色）的哈希，与 _employee_hash 对同一员工的结果一致"""
+        return _hash(self.name, self.email, self.phone, self.department, self.position, self.level)
+
+
+def _hash(*values):
+    return hashlib.sha1(orjson.dumps(values)).digest()
+
+
+def _employee_hash(first_name, last_name, email, phone, department, position, level):
+    name = f"{first_name} {last_name}".strip()
+    return _hash(name, email, phone, department, position, level)
+
+
+def read_feed(path):
+    """
+    逐行读取 HR 数据文件（按扩展名区分格式：.csv / .jsonl / .ndjson）
+
+    Yields:
+        tuple: (行号, 原始字典)
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == '.csv':
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                yield line_no, row
+    elif suffix in ('.jsonl', '.ndjson'):
+        with open(path, 'rb') as f:
+            for line_no, line in enumerate(f, start=1):
+                if line.strip():
+                    yield line_no, orjson.loads(line)
+    else:
+        raise ValueError(f"不支持的数据文件格式: {path.name}（支持 .csv / .jsonl / .ndjson）")
+
+
+def normalize_row(row):
+    """
+    规范化一行 HR 数据
+
+    Raises:
+        ValueError: 缺少必填字段或字段格式错误
+    """
+    def text(key):
+        value = row.get(key)
+        return '' if value is None else str(value).strip()
+
+    employee_id = text('employee_id')
+    if not employee_id:
+        raise ValueError('缺少 employee_id')
+    parts = [part.strip() for part in text('department').split(PATH_SEPARATOR.strip())]
+    if not all(parts):
+        raise ValueError(f"部门路径无效: {text('department')!r}")
+    level = text('level') or '1'
+    try:
+        level = int(level)
+    except ValueError:
+        raise ValueError(f"职级不是整数: {level!r}")
+
+    roles = row.get('roles')
+    if roles is not None:
+        if isinstance(roles, str):
+            roles = roles.split(';')
+        roles = frozenset(str(role).strip() for role in roles if str(role).strip())
+
+    return FeedRecord(
+        employee_id=employee_id,
+        name=text('name'),
+        email=text('email'),
+        phone=text('phone'),
+        department=PATH_SEPARATOR.join(parts),
+        position=text('position'),
+        level=level,
+        manager_employee_id=text('manager_employee_id'),
+        roles=roles,
+        is_department_manager=text('is_department_manager').lower() in TRUE_VALUES,
+    )
+
+
+@trace_methods
+class OrganizationSync:
+    """
+    组织架构同步服务类
+
+    1. 流式读取数据文件并逐行校验，错误行记录到报告中并跳过
+    2. 比对：员工属性按哈希比较，直属上级、角色和部门负责人分别比较，未变化的员工不写入；
+       数据中的员工不再是负责人时清空其负责的部门
+    3. 在一个事务中按依赖顺序写入（CHUNK_SIZE 条一批）：
+       部门（按层级逐层创建）-> 用户和员工 -> 直属上级 -> 部门负责人 -> 角色成员 -> 删除（DELETE_MISSING）
+    4. 有变化时重建部门树和汇报关系闭包表
+
+    直属上级在所有员工创建之后统一关联，数据中上级出现在下属之后也能正确处理；
+    会形成汇报环的关联被拒绝（该员工的直属上级置空并记录错误）。
+    """
+
+    def sync_file(self, path=None):
+        """
+        同步 HR 数据文件
+
+        Args:
+            path (str, optional): 数据文件路径，默认 ORG_SYNC['FEED_PATH']
+
+        Returns:
+            dict: 同步报告，见 sync_records
+        """
+        path = path or get_sync_settings()['FEED_PATH']
+        if not path:
+            raise ValueError('未配置组织架构数据文件（ORG_SYNC FEED_PATH）')
+
+        start = time.perf_counter()
+        records, errors = [], []
+        seen = set()
+        for line_no, row in read_feed(path):
+            try:
+                record = normalize_row(row)
+            except ValueError as e:
+                errors.append({'line': line_no, 'error': str(e)})
+                continue
+            if record.employee_id in seen:
+                errors.append({'line': line_no, 'error': f"工号重复: {record.employee_id}"})
+                continue
+            seen.add(record.employee_id)
+            records.append(record)
+
+        report = self.sync_records(records)
+        report['rows'] += len(errors)
+        report['errors'] = errors + report['errors']
+        report['seconds'] = round(time.perf_counter() - start, 3)
+        report['rows_per_second'] = round(report['rows'] / report['seconds'], 1) if report['seconds'] else None
+        logger.info(
+            f"组织架构同步完成: {path}, {report['rows']} 行, {report['rows_per_second']} 行/秒, "
+            f"员工 +{report['employees_created']} ~{report['employees_updated']} "
+            f"-{report['employees_deleted']}, 错误 {len(report['errors'])}"
+        )
+        return report
+
+    @serialized_write()
+    @transaction.atomic
+    def sync_records(self, records):
+        """
+        比对并写入一组已规范化的记录（一个事务）
+
+        Args:
+            records (list): FeedRecord 列表，工号不重复
+
+        Returns:
+            dict: {
+                'rows', 'departments_created', 'employees_created', 'employees_updated',
+                'employees_unchanged', 'employees_deleted', 'managers_relinked',
+                'department_managers_changed', 'roles_created', 'memberships_added',
+                'memberships_removed', 'errors'
+            }
+        """
+        chunk_size = get_sync_settings()['CHUNK_SIZE']
+        report = {
+            'rows': len(records),
+            'departments_created': 0,
+            'employees_created': 0,
+            'employees_updated': 0,
+            'employees_unchanged': 0,
+            'employees_deleted': 0,
+            'managers_relinked': 0,
+            'department_managers_changed': 0,
+            'roles_created': 0,
+            'memberships_added': 0,
+            'memberships_removed': 0,
+            'errors': [],
+        }
+
+        if Department.objects.filter(full_path='').exists():
+            Department.rebuild_tree()
+        departments = self._sync_departments(records, chunk_size, report)
+        employees = self._sync_employees(records, departments, chunk_size, report)
+        self._sync_managers(records, employees, chunk_size, report)
+        self._sync_department_managers(records, employees, departments, report)
+        self._sync_roles(records, employees, chunk_size, report)
+
+        if get_sync_settings()['DELETE_MISSING']:
+            missing = Employee.objects.exclude(employee_id__in=[record.employee_id for record in records])
+            report['employees_deleted'] = missing.count()
+            missing.delete()
+
+        # 批量写入不触发 post_save，按变化的数据类型递增版本
+        changed = {
+            DirectoryVersion.DEPARTMENT: report['departments_created'] or report['department_managers_changed'],
+            DirectoryVersion.EMPLOYEE: report['employees_created'] or report['employees_updated']
+                or report['managers_relinked'],
+            DirectoryVersion.ROLE: report['roles_created'] or report['memberships_added']
+                or report['memberships_removed'],
+        }
+        DirectoryVersion.bump(*[entity for entity, count in changed.items() if count])
+
+        if report['departments_created']:
+            Department.rebuild_tree()
+        if report['employees_created'] or report['managers_relinked'] or report['employees_deleted']:
+            Employee.rebuild_management_chain()
+        return report
+
+    def _sync_departments(self, records, chunk_size, report):
+        """
+        创建数据中出现但不存在的部门，按层级逐层 bulk_create
+
+        Returns:
+            dict: {完整路径: 部门 ID}
+        """
+        existing = dict(Department.objects.values_list('full_path', 'id'))
+        wanted = set()
+        for record in records:
+            parts = record.department.split(PATH_SEPARATOR)
+            wanted.update(PATH_SEPARATOR.join(parts[:depth]) for depth in range(1, len(parts) + 1))
+
+        missing = sorted(wanted - existing.keys(), key=lambda path: path.count(PATH_SEPARATOR))
+        by_depth = {}
+        for path in missing:
+            by_depth.setdefault(path.count(PATH_SEPARATOR), []).append(path)
+        for depth in sorted(by_depth):
+            paths = by_depth[depth]
+            created = Department.objects.bulk_create([
+                Department(
+                    name=path.rsplit(PATH_SEPARATOR, 1)[-1],
+                    parent_id=existing[path.rsplit(PATH_SEPARATOR, 1)[0]] if depth else None,
+                    full_path=path,
+                    depth=depth,
+                )
+                for path in paths
+            ], batch_size=chunk_size)
+            existing.update((path, department.id) for path, department in zip(paths, created))
+
+        report['departments_created'] = len(missing)
+        return existing
+
+    def _sync_employees(self, records, departments, chunk_size, report):
+        """
+        创建新员工（及其用户账号），更新属性哈希变化的员工
+
+        Returns:
+            dict: {工号: 员工 ID}（包含数据中没有的现有员工）
+        """
+        snapshot = {}
+        for row in Employee.objects.values_list(
+            'id', 'employee_id', 'user_id', 'user__first_name', 'user__last_name',
+            'email', 'phone', 'department__full_path', 'position', 'level',
+        ).iterator(chunk_size=chunk_size):
+            snapshot[row[1]] = (row[0], row[2], _employee_hash(*row[3:]))
+
+        new_records = [record for record in records if record.employee_id not in snapshot]
+        changed = [
+            record for record in records
+            if record.employee_id in snapshot and snapshot[record.employee_id][2] != record.attribute_hash()
+        ]
+        report['employees_unchanged'] = len(records) - len(new_records) - len(changed)
+
+        if changed:
+            now = timezone.now()
+            employees, users = [], []
+            for record in changed:
+                employee_pk, user_id, _ = snapshot[record.employee_id]
+                employees.append(Employee(
+                    id=employee_pk, email=record.email, phone=record.phone,
+                    department_id=departments[record.department],
+                    position=record.position, level=record.level, updated_at=now,
+                ))
+                users.append(User(id=user_id, first_name=record.name, last_name='', email=record.email))
+            Employee.objects.bulk_update(
+                employees, ['email', 'phone', 'department', 'position', 'level', 'updated_at'], batch_size=chunk_size
+            )
+            User.objects.bulk_update(users, ['first_name', 'last_name', 'email'], batch_size=chunk_size)
+            report['employees_updated'] = len(changed)
+
+        if new_records:
+            # 工号作为用户名；同名用户已存在且未关联员工时直接关联
+            usernames = [record.employee_id for record in new_records]
+            free_users = dict(
+                User.objects.filter(username__in=usernames, employee__isnull=True).values_list('username', 'id')
+            )
+            taken = set(
+                User.objects.filter(username__in=usernames, employee__isnull=False).values_list('username', flat=True)
+            )
+            accepted = []
+            for record in new_records:
+                if record.employee_id in taken:
+                    report['errors'].append({
+                        'employee_id': record.employee_id,
+                        'error': f"用户名 {record.employee_id} 已被其他员工使用",
+                    })
+                    continue
+                accepted.append(record)
+
+            new_users = []
+            for record in accepted:
+                if record.employee_id not in free_users:
+                    user = User(username=record.employee_id, first_name=record.name, email=record.email)
+                    user.set_unusable_password()
+                    new_users.append(user)
+            for user in User.objects.bulk_create(new_users, batch_size=chunk_size):
+                free_users[user.username] = user.id
+
+            created = Employee.objects.bulk_create([
+                Employee(
+                    user_id=free_users[record.employee_id],
+                    employee_id=record.employee_id,
+                    email=record.email,
+                    phone=record.phone,
+                    department_id=departments[record.department],
+                    position=record.position,
+                    level=record.level,
+                )
+                for record in accepted
+            ], batch_size=chunk_size)
+            snapshot.update((employee.employee_id, (employee.id, None, None)) for employee in created)
+            report['employees_created'] = len(created)
+
+        return {employee_id: values[0] for employee_id, values in snapshot.items()}
+
+    def _sync_managers(self, records, employees, chunk_size, report):
+        """
+        所有员工都存在之后统一关联直属上级；会形成汇报环的关联被拒绝
+        """
+        current = dict(Employee.objects.values_list('id', 'direct_manager_id'))
+        desired = {}
+        for record in records:
+            employee_pk = employees.get(record.employee_id)
+            if employee_pk is None:
+                continue
+            manager_pk = None
+            if record.manager_employee_id:
+                manager_pk = employees.get(record.manager_employee_id)
+                if manager_pk is None:
+                    report['errors'].append({
+                        'employee_id': record.employee_id,
+                        'error': f"直属上级不存在: {record.manager_employee_id}",
+                    })
+            desired[employee_pk] = manager_pk
+
+        links = {**current, **desired}
+        _, orphans = walk_tree(links.items())
+        broken = self._break_cycles(links, orphans, desired, current)
+        if broken:
+            employee_ids = {pk: employee_id for employee_id, pk in employees.items()}
+            for employee_pk in broken:
+                desired[employee_pk] = None
+                report['errors'].append({
+                    'employee_id': employee_ids[employee_pk],
+                    'error': '直属上级会形成汇报环，已置空',
+                })
+
+        now = timezone.now()
+        relinked = [
+            Employee(id=employee_pk, direct_manager_id=manager_pk, updated_at=now)
+            for employee_pk, manager_pk in desired.items()
+            if current.get(employee_pk) != manager_pk
+        ]
+        Employee.objects.bulk_update(relinked, ['direct_manager', 'updated_at'], batch_size=chunk_size)
+        report['managers_relinked'] = len(relinked)
+
+    @staticmethod
+    def _break_cycles(links, orphans, desired, current):
+        """
+        找出汇报环并各选一个员工断开（优先选本次修改了直属上级的员工）
+
+        Returns:
+            list: 需要置空直属上级的员工 ID
+        """
+        broken = []
+        settled = set()
+        for start in orphans:
+            path = []
+            node = start
+            while node is not None and node not in settled and node not in path:
+                path.append(node)
+                node = links.get(node)
+            if node is not None and node in path:
+                cycle = path[path.index(node):]
+                changed = [pk for pk in cycle if pk in desired and desired[pk] != current.get(pk)]
+                victim = (changed or cycle)[0]
+                broken.append(victim)
+                links[victim] = None
+            settled.update(path)
+        return broken
+
+    def _sync_department_managers(self, records, employees, departments, report):
+        """
+        按 is_department_manager 设置部门负责人
+
+        数据中的员工不再标记为负责人或调到了其他部门时，清空其原来负责的部门；
+        负责人不在本次数据中的部门保持不变
+        """
+        fed = set()
+        wanted = {}
+        for record in records:
+            employee_pk = employees.get(record.employee_id)
+            if employee_pk is None:
+                continue
+            fed.add(employee_pk)
+            if record.is_department_manager:
+                wanted[departments[record.department]] = employee_pk
+
+        current = dict(Department.objects.filter(manager__isnull=False).values_list('id', 'manager_id'))
+        desired = {department_id: None for department_id, manager_pk in current.items() if manager_pk in fed}
+        desired.update(wanted)
+
+        now = timezone.now()
+        changed = [
+            Department(id=department_id, manager_id=manager_pk, updated_at=now)
+            for department_id, manager_pk in desired.items()
+            if current.get(department_id) != manager_pk
+        ]
+        Department.objects.bulk_update(changed, ['manager', 'updated_at'])
+        report['department_managers_changed'] = len(changed)
+
+    def _sync_roles(self, records, employees, chunk_size, report):
+        """按数据中的 roles 列增删角色成员，不存在的角色自动创建"""
+        records = [record for record in records if record.roles is not None and record.employee_id in employees]
+        if not records:
+            return
+
+        roles = dict(Role.objects.values_list('name', 'id'))
+        missing = sorted({role for record in records for role in record.roles} - roles.keys())
+        for role in Role.objects.bulk_create(
+            [Role(name=name, description=f"{name}（组织架构同步创建）") for name in missing]
+        ):
+            roles[role.name] = role.id
+        report['roles_created'] = len(missing)
+
+        Membership = Role.employees.through
+        employee_pks = [employees[record.employee_id] for record in records]
+        current = set()
+        for start in range(0, len(employee_pks), chunk_size):
+            current.update(
+                Membership.objects.filter(employee_id__in=employee_pks[start:start + chunk_size])
+                .values_list('employee_id', 'role_id')
+            )
+        wanted = {
+            (employees[record.employee_id], roles[role])
+            for record in records for role in record.roles
+        }
+
+        Membership.objects.bulk_create(
+            [Membership(employee_id=employee_pk, role_id=role_id) for employee_pk, role_id in wanted - current],
+            batch_size=chunk_size,
+        )
+        removed = current - wanted
+        for role_id in {role_id for _, role_id in removed}:
+            Membership.objects.filter(
+                role_id=role_id, employee_id__in=[pk for pk, rid in removed if rid == role_id]
+            ).delete()
+        report['memberships_added'] = len(wanted - current)
+        report['memberships_removed'] = len(removed)
@@ -10,13 +10,21 @@ logger = logging.getLogger(__name__)
 
 
 @shared_task
-def sync_organization_data():
+def sync_organization_data(feed_path=None):
     """
     同步组织架构数据
-    从外部系统同步组织架构信息
-    """
-    logger.info("开始同步组织架构数据...")
+    从 HR 系统导出的数据文件同步员工、部门和角色，只写入变化的部分
     
-    # TODO: 实现组织架构同步逻辑
+    定时任务，配置了 ORG_SYNC['FEED_PATH'] 时每天执行一次，数据格式见 organization.sync
     
-    return "组织架构同步完成"
+    Args:
+        feed_path: 数据文件路径，默认 ORG_SYNC['FEED_PATH']
+    """
+    from organization.sync import OrganizationSync
+    
+    logger.info("开始同步组织架构数据...")
+    try:
+        return {'success': True, **OrganizationSync().sync_file(feed_path)}
+    except Exception as e:
+        logger.error(f"组织架构同步失败: {e}", exc_info=True)
+        return {'success': False, 'error': str(e)}
@@ -0,0 +1,429 @@
+"""
+organization 测试
+"""
+
+import random
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from leave_system.profiling import assert_query_budget
+from organization.models import (
+    Department, DepartmentClosure, DirectoryVersion, Employee, EmployeeClosure, Role
+)
+from organization.sync import OrganizationSync, normalize_row
+
+
+def closure_set(closure):
+    return set(closure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+
+
+class DepartmentTreeTest(TestCase):
+    """部门闭包表、完整路径和层级的增量维护与 rebuild_tree() 重建结果一致"""
+
+    def assert_matches_rebuild(self):
+        closure = closure_set(DepartmentClosure)
+        paths = set(Department.objects.values_list('id', 'full_path', 'depth'))
+        result = Department.rebuild_tree()
+        self.assertEqual(result['orphans'], [])
+        self.assertEqual(closure_set(DepartmentClosure), closure)
+        self.assertEqual(set(Department.objects.values_list('id', 'full_path', 'depth')), paths)
+
+    def subtree_ids(self, department):
+        return set(department.get_descendants(include_self=True).values_list('id', flat=True))
+
+    def test_random_moves_renames_and_deletes_match_rebuild(self):
+        rng = random.Random(20261019)
+        departments = []
+        for i in range(12):
+            parent = rng.choice(departments) if departments and rng.random() < 0.8 else None
+            departments.append(Department.objects.create(name=f'部门{i}', parent=parent))
+        self.assert_matches_rebuild()
+
+        for step in range(80):
+            ids = list(Department.objects.values_list('id', flat=True))
+            department = Department.objects.get(pk=rng.choice(ids))
+            op = rng.random()
+            if op < 0.55:
+                candidates = [pk for pk in ids if pk not in self.subtree_ids(department)]
+                department.parent = (
+                    Department.objects.get(pk=rng.choice(candidates))
+                    if candidates and rng.random() < 0.85 else None
+                )
+                department.save()
+            elif op < 0.75:
+                department.name = f'部门{step}-{department.pk}'
+                department.save()
+            elif op < 0.85 and len(ids) - len(self.subtree_ids(department)) >= 4:
+                # 删除部门会级联删除整棵子树
+                department.delete()
+            else:
+                parent = department if rng.random() < 0.8 else None
+                Department.objects.create(name=f'新部门{step}', parent=parent)
+            self.assert_matches_rebuild()
+
+    def test_move_under_own_descendant_is_rejected(self):
+        root = Department.objects.create(name='总公司')
+        child = Department.objects.create(name='技术部', parent=root)
+        grandchild = Department.objects.create(name='后端组', parent=child)
+        before = closure_set(DepartmentClosure)
+
+        root.parent = grandchild
+        with self.assertRaises(ValueError):
+            root.save()
+        child.parent = child
+        with self.assertRaises(ValueError):
+            child.save()
+
+        self.assertEqual(closure_set(DepartmentClosure), before)
+        self.assertIsNone(Department.objects.get(pk=root.pk).parent_id)
+        self.assertEqual(Department.objects.get(pk=grandchild.pk).full_path, '总公司 > 技术部 > 后端组')
+
+
+class ManagementChainTest(TestCase):
+    """汇报关系闭包表的增量维护与 rebuild_management_chain() 重建结果一致"""
+
+    def setUp(self):
+        self.department = Department.objects.create(name='总公司')
+        self.count = 0
+
+    def create_employee(self, level=1, manager=None):
+        self.count += 1
+        user = User.objects.create_user(username=f'user{self.count}')
+        return Employee.objects.create(
+            user=user,
+            employee_id=f'E{self.count:04d}',
+            department=self.department,
+            position='职员',
+            level=level,
+            direct_manager=manager,
+            email=f'user{self.count}@example.com',
+            phone='10000000000',
+        )
+
+    def assert_matches_rebuild(self):
+        closure = closure_set(EmployeeClosure)
+        result = Employee.rebuild_management_chain()
+        self.assertEqual(result['orphans'], [])
+        self.assertEqual(closure_set(EmployeeClosure), closure)
+
+    def test_random_moves_and_deletes_match_rebuild(self):
+        rng = random.Random(20261019)
+        employees = []
+        for _ in range(15):
+            manager = rng.choice(employees) if employees and rng.random() < 0.85 else None
+            employees.append(self.create_employee(level=rng.randint(1, 10), manager=manager))
+        self.assert_matches_rebuild()
+
+        for _ in range(100):
+            ids = list(Employee.objects.values_list('id', flat=True))
+            employee = Employee.objects.get(pk=rng.choice(ids))
+            op = rng.random()
+            if op < 0.65:
+                reports = set(employee.get_all_reports().values_list('id', flat=True))
+                candidates = [pk for pk in ids if pk != employee.pk and pk not in reports]
+                employee.direct_manager_id = (
+                    rng.choice(candidates) if candidates and rng.random() < 0.85 else None
+                )
+                employee.save()
+            elif op < 0.8 and len(ids) > 5:
+                employee.delete()
+            else:
+                manager = employee if rng.random() < 0.8 else None
+                self.create_employee(level=rng.randint(1, 10), manager=manager)
+            self.assert_matches_rebuild()
+
+    def test_manager_cycle_is_rejected(self):
+        ceo = self.create_employee(level=10)
+        director = self.create_employee(level=8, manager=ceo)
+        engineer = self.create_employee(level=3, manager=director)
+        before = closure_set(EmployeeClosure)
+
+        ceo.direct_manager = engineer
+        with self.assertRaises(ValueError):
+            ceo.save()
+        director.direct_manager = director
+        with self.assertRaises(ValueError):
+            director.save()
+
+        self.assertEqual(closure_set(EmployeeClosure), before)
+        self.assertIsNone(Employee.objects.get(pk=ceo.pk).direct_manager_id)
+
+    def test_get_manager_at_and_first_manager_above_level(self):
+        ceo = self.create_employee(level=10)
+        vp = self.create_employee(level=9, manager=ceo)
+        director = self.create_employee(level=6, manager=vp)
+        lead = self.create_employee(level=6, manager=director)
+        engineer = self.create_employee(level=3, manager=lead)
+
+        self.assertEqual(engineer.get_manager_at(1), lead)
+        self.assertEqual(engineer.get_manager_at(2), director)
+        self.assertEqual(engineer.get_manager_at(4), ceo)
+        self.assertIsNone(engineer.get_manager_at(5))
+        self.assertIsNone(ceo.get_manager_at(1))
+
+        self.assertEqual(engineer.get_first_manager_above_level(3), lead)
+        self.assertEqual(engineer.get_first_manager_above_level(6), vp)
+        self.assertEqual(engineer.get_first_manager_above_level(9), ceo)
+        self.assertIsNone(engineer.get_first_manager_above_level(10))
+
+        # 移动后沿新的汇报链查找
+        lead.direct_manager = ceo
+        lead.save()
+        self.assertEqual(engineer.get_manager_at(2), ceo)
+        self.assertEqual(engineer.get_first_manager_above_level(6), ceo)
+
+        # 删除中间上级后，下属的汇报链从该处断开
+        lead.delete()
+        self.assertIsNone(engineer.get_manager_at(1))
+        self.assertIsNone(engineer.get_first_manager_above_level(3))
+
+
+
+class OrganizationSyncTest(TestCase):
+    """HR 数据同步：依赖顺序、汇报环、重复执行和删除缺失员工"""
+
+    def setUp(self):
+        self.sync = OrganizationSync()
+
+    def row(self, employee_id, department, manager='', **fields):
+        return normalize_row({
+            'employee_id': employee_id,
+            'name': f'员工{employee_id}',
+            'email': f'{employee_id.lower()}@example.com',
+            'department': department,
+            'manager_employee_id': manager,
+            **fields,
+        })
+
+    def managers(self):
+        return dict(Employee.objects.values_list('employee_id', 'direct_manager__employee_id'))
+
+    def assert_matches_rebuild(self):
+        departments = closure_set(DepartmentClosure)
+        employees = closure_set(EmployeeClosure)
+        self.assertEqual(Department.rebuild_tree()['orphans'], [])
+        self.assertEqual(Employee.rebuild_management_chain()['orphans'], [])
+        self.assertEqual(closure_set(DepartmentClosure), departments)
+        self.assertEqual(closure_set(EmployeeClosure), employees)
+
+    def org_chart(self):
+        # 下属排在上级之前，子部门路径先于父部门出现
+        return [
+            self.row('E3', '总公司 > 技术部 > 后端组', 'E2', roles='开发'),
+            self.row('E2', '总公司 > 技术部', 'E1', is_department_manager='是', roles='开发;主管'),
+            self.row('E4', '总公司 > 人事部', 'E1', is_department_manager='1', roles='HR'),
+            self.row('E1', '总公司', is_department_manager='true'),
+        ]
+
+    def test_creates_departments_before_employees_and_links_managers_last(self):
+        report = self.sync.sync_records(self.org_chart())
+
+        self.assertEqual(report['errors'], [])
+        self.assertEqual(report['departments_created'], 4)
+        self.assertEqual(report['employees_created'], 4)
+        self.assertEqual(self.managers(), {'E1': None, 'E2': 'E1', 'E3': 'E2', 'E4': 'E1'})
+        self.assertEqual(
+            set(Department.objects.values_list('full_path', 'manager__employee_id')),
+            {
+                ('总公司', 'E1'), ('总公司 > 技术部', 'E2'),
+                ('总公司 > 技术部 > 后端组', None), ('总公司 > 人事部', 'E4'),
+            }
+        )
+        self.assertEqual(
+            sorted(Role.objects.get(name='开发').employees.values_list('employee_id', flat=True)), ['E2', 'E3']
+        )
+        engineer = Employee.objects.get(employee_id='E3')
+        self.assertEqual(engineer.get_manager_at(2).employee_id, 'E1')
+        self.assert_matches_rebuild()
+
+    def test_rerun_with_same_feed_writes_nothing(self):
+        self.sync.sync_records(self.org_chart())
+        versions = DirectoryVersion.current([
+            DirectoryVersion.EMPLOYEE, DirectoryVersion.DEPARTMENT, DirectoryVersion.ROLE
+        ])
+        closure = closure_set(EmployeeClosure)
+
+        with CaptureQueriesContext(connection) as queries:
+            report = self.sync.sync_records(self.org_chart())
+
+        writes = [q['sql'] for q in queries if q['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')]
+        self.assertEqual(writes, [])
+
+        self.assertEqual(report['employees_unchanged'], 4)
+        self.assertEqual(report['errors'], [])
+        for key, value in report.items():
+            if key not in ('rows', 'employees_unchanged', 'errors'):
+                self.assertEqual(value, 0, key)
+        self.assertEqual(DirectoryVersion.current(list(versions)), versions)
+        self.assertEqual(closure_set(EmployeeClosure), closure)
+
+    def test_manager_cycle_is_broken_at_changed_link(self):
+        self.sync.sync_records(self.org_chart())
+
+        # E1 改为向 E3 汇报会形成 E1 -> E3 -> E2 -> E1
+        feed = self.org_chart()
+        feed[3] = self.row('E1', '总公司', 'E3', is_department_manager='true')
+        report = self.sync.sync_records(feed)
+
+        self.assertEqual(report['errors'], [{'employee_id': 'E1', 'error': '直属上级会形成汇报环，已置空'}])
+        self.assertEqual(self.managers(), {'E1': None, 'E2': 'E1', 'E3': 'E2', 'E4': 'E1'})
+        self.assertEqual(report['managers_relinked'], 0)
+        self.assert_matches_rebuild()
+
+    def test_break_cycles_prefers_changed_employee(self):
+        current = {1: None, 2: 1, 3: 2, 4: None}
+        desired = {1: 3, 2: 1, 3: 2}
+        links = {**current, **desired}
+        self.assertEqual(OrganizationSync._break_cycles(dict(links), [1, 2, 3, 4], desired, current), [1])
+
+        # 整个环都是新建的员工时断开环上的第一个
+        desired = {5: 6, 6: 7, 7: 5}
+        self.assertEqual(OrganizationSync._break_cycles(dict(desired), [6, 5, 7], desired, {}), [6])
+
+        # 多个独立的环各断开一次
+        desired = {1: 2, 2: 1, 3: 4, 4: 3, 5: None}
+        broken = OrganizationSync._break_cycles(dict(desired), list(desired), desired, {})
+        self.assertEqual(sorted(broken), [1, 3])
+
+    def test_department_manager_cleared_when_flag_lost_or_employee_moves(self):
+        self.sync.sync_records(self.org_chart())
+
+        feed = self.org_chart()
+        # E2 不再是负责人；E4 调到技术部后端组且仍是负责人
+        feed[1] = self.row('E2', '总公司 > 技术部', 'E1', roles='开发;主管')
+        feed[2] = self.row('E4', '总公司 > 技术部 > 后端组', 'E1', is_department_manager='1', roles='HR')
+        report = self.sync.sync_records(feed)
+
+        self.assertEqual(report['department_managers_changed'], 3)
+        self.assertEqual(
+            dict(Department.objects.values_list('full_path', 'manager__employee_id')),
+            {'总公司': 'E1', '总公司 > 技术部': None, '总公司 > 技术部 > 后端组': 'E4', '总公司 > 人事部': None}
+        )
+
+        # 负责人不在数据中的部门保持不变
+        report = self.sync.sync_records(feed[:3])
+        self.assertEqual(report['department_managers_changed'], 0)
+        self.assertEqual(Department.objects.get(full_path='总公司').manager.employee_id, 'E1')
+
+    def test_delete_missing(self):
+        self.sync.sync_records(self.org_chart())
+        feed = [record for record in self.org_chart() if record.employee_id != 'E2']
+        feed[0] = self.row('E3', '总公司 > 技术部 > 后端组', 'E1', roles='开发')
+
+        report = self.sync.sync_records(feed)
+        self.assertEqual(report['employees_deleted'], 0)
+        self.assertIn('E2', self.managers())
+
+        with override_settings(ORG_SYNC={**settings.ORG_SYNC, 'DELETE_MISSING': True}):
+            report = self.sync.sync_records(feed)
+        self.assertEqual(report['employees_deleted'], 1)
+        self.assertEqual(self.managers(), {'E1': None, 'E3': 'E1', 'E4': 'E1'})
+        self.assertIsNone(Department.objects.get(full_path='总公司 > 技术部').manager)
+        self.assert_matches_rebuild()
+
+@override_settings(QUERY_PROFILER={**settings.QUERY_PROFILER, 'RESPONSE_HEADERS': True, 'LOG_SAMPLE_RATE': 0})
+class DirectoryQueryTest(TestCase):
+    """组织架构列表接口的查询次数：不超过预算，且不随员工数增长"""
+
+    def setUp(self):
+        # 列表响应按数据版本缓存，测试之间数据版本会重复
+        cache.clear()
+        self.root = Department.objects.create(name='总公司')
+        self.role = Role.objects.create(name='HR', description='人力资源')
+        self.count = 0
+        self.manager = self.add_employees(1)[0]
+        self.root.manager = self.manager
+        self.root.save()
+
+    def add_employees(self, n):
+        employees = []
+        for _ in range(n):
+            self.count += 1
+            department = Department.objects.create(name=f'部门{self.count}', parent=self.root)
+            user = User.objects.create_user(username=f'user{self.count}', first_name=f'员工{self.count}')
+            employee = Employee.objects.create(
+                user=user,
+                employee_id=f'E{self.count:04d}',
+                department=department,
+                position='职员',
+                level=1,
+                direct_manager=getattr(self, 'manager', None),
+                email=f'user{self.count}@example.com',
+                phone='10000000000',
+            )
+            department.manager = employee
+            department.save()
+            self.role.employees.add(employee)
+            employees.append(employee)
+        return employees
+
+    def get(self, url, key):
+        cache.clear()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, response.json()[key] if key else response.json()
+
+    def add_roles(self, n):
+        for _ in range(n):
+            employee = self.add_employees(1)[0]
+            role = Role.objects.create(name=f'角色{self.count}', description='')
+            role.employees.add(self.manager, employee)
+
+    def assert_constant_queries(self, url, key=None, grow=None):
+        """数据量增加后（默认员工从 3 人增加到 13 人），接口返回的行数增加而查询次数不变"""
+        grow = grow or self.add_employees
+        counts = []
+        sizes = []
+        for n in (2, 10):
+            grow(n)
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            sizes.append(len(body[key] if key else body))
+            counts.append(len(queries))
+        self.assertGreater(sizes[1], sizes[0])
+        self.assertEqual(counts[0], counts[1], f"{url}: 行数 {sizes} 时查询次数 {counts}")
+
+    def test_list_employees_within_budget(self):
+        self.add_employees(5)
+        response, rows = self.get('/api/organization/api/employees/', 'employees')
+        self.assertEqual(len(rows), 6)
+        assert_query_budget(response)
+
+    def test_list_departments_within_budget(self):
+        self.add_employees(5)
+        response, rows = self.get('/api/organization/api/departments/', 'departments')
+        self.assertEqual(len(rows), 7)
+        assert_query_budget(response)
+
+    def test_list_roles_within_budget(self):
+        self.add_employees(5)
+        Role.objects.create(name='财务', description='财务')
+        response, rows = self.get('/api/organization/api/roles/', 'roles')
+        self.assertEqual(len(rows), 2)
+        assert_query_budget(response)
+
+
+    def test_simple_list_queries_do_not_grow_with_employees(self):
+        self.assert_constant_queries('/api/organization/api/employees/', 'employees')
+        self.assert_constant_queries('/api/organization/api/departments/', 'departments')
+        self.assert_constant_queries(f'/api/organization/api/roles/{self.role.id}/members/', 'members')
+
+    def test_role_list_queries_do_not_grow_with_roles(self):
+        self.assert_constant_queries('/api/organization/api/roles/', 'roles', grow=self.add_roles)
+
+    def test_viewset_queries_do_not_grow_with_employees(self):
+        self.assert_constant_queries('/api/organization/employees/')
+        self.assert_constant_queries('/api/organization/departments/')
+        self.assert_constant_queries(f'/api/organization/roles/{self.role.id}/members/')
+        self.assert_constant_queries(f'/api/organization/employees/{self.manager.id}/subordinates/')
+
+    def test_role_viewset_list_queries_do_not_grow_with_roles(self):
+        self.assert_constant_queries('/api/organization/roles/', grow=self.add_roles)
@@ -0,0 +1,99 @@
+"""
+树形结构计算
+部门树（Department.parent）和汇报关系（Employee.direct_manager）的闭包表、部门完整路径计算，
+重建方法和数据迁移共用
+"""
+
+from collections import defaultdict
+
+# 完整路径中父子部门名称之间的分隔符
+PATH_SEPARATOR = ' > '
+
+
+def walk_tree(edges):
+    """
+    从根节点开始前序遍历
+
+    Args:
+        edges (iterable): (id, parent_id) 二元组，parent_id 为 None 表示根节点
+
+    Returns:
+        tuple: (visited, orphans)
+            visited: [(id, 祖先 ID 列表（根在前）)]，父节点总在子节点之前
+            orphans: 从任何根节点都无法到达的节点 ID（父子关系成环）
+    """
+    nodes = []
+    children = defaultdict(list)
+    for node_id, parent_id in edges:
+        nodes.append(node_id)
+        children[parent_id].append(node_id)
+
+    visited = []
+    stack = [(node_id, []) for node_id in children[None]]
+    while stack:
+        node_id, ancestors = stack.pop()
+        visited.append((node_id, ancestors))
+        lineage = ancestors + [node_id]
+        stack.extend((child_id, lineage) for child_id in children[node_id])
+
+    reached = {node_id for node_id, _ in visited}
+    orphans = [node_id for node_id in nodes if node_id not in reached]
+    return visited, orphans
+
+
+def closure_links(node_id, ancestors):
+    """
+    节点的闭包表记录
+
+    Returns:
+        list: [(ancestor_id, node_id, depth)]，包含 depth=0 的自身记录
+    """
+    links = [(node_id, node_id, 0)]
+    for distance, ancestor_id in enumerate(reversed(ancestors), start=1):
+        links.append((ancestor_id, node_id, distance))
+    return links
+
+
+def build_closure(edges):
+    """
+    计算闭包表
+
+    Args:
+        edges (iterable): (id, parent_id) 二元组
+
+    Returns:
+        tuple: (closure, orphans)，closure 为 [(ancestor_id, descendant_id, depth)]
+    """
+    visited, orphans = walk_tree(edges)
+    closure = [link for node_id, ancestors in visited for link in closure_links(node_id, ancestors)]
+    return closure, orphans
+
+
+def build_tree(nodes):
+    """
+    计算部门树
+
+    Args:
+        nodes (iterable): (id, parent_id, name) 三元组
+
+    Returns:
+        tuple: (paths, closure, orphans)
+            paths: {id: (full_path, depth)}
+            closure: [(ancestor_id, descendant_id, depth)]，包含 depth=0 的自身记录
+            orphans: 从任何根部门都无法到达的部门 ID（父子关系成环）
+    """
+    names = {}
+    edges = []
+    for node_id, parent_id, name in nodes:
+        names[node_id] = name
+        edges.append((node_id, parent_id))
+
+    visited, orphans = walk_tree(edges)
+    paths = {}
+    closure = []
+    for node_id, ancestors in visited:
+        name = names[node_id]
+        full_path = f"{paths[ancestors[-1]][0]}{PATH_SEPARATOR}{name}" if ancestors else name
+        paths[node_id] = (full_path, len(ancestors))
+        closure.extend(closure_links(node_id, ancestors))
+    return paths, closure, orphans
@@ -6,13 +6,14 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Department, Employee, Role
+from .models import Role
 from .serializers import DepartmentSerializer, EmployeeSerializer, RoleSerializer
+from .read_models import department_queryset, employee_queryset, role_queryset
 
 
 class DepartmentViewSet(viewsets.ModelViewSet):
     """部门管理 ViewSet"""
-    queryset = Department.objects.all()
+    queryset = department_queryset()
     serializer_class = DepartmentSerializer
     
     @action(detail=True, methods=['get'])
@@ -27,7 +28,7 @@ class DepartmentViewSet(viewsets.ModelViewSet):
 
 class EmployeeViewSet(viewsets.ModelViewSet):
     """员工管理 ViewSet"""
-    queryset = Employee.objects.select_related('user', 'department', 'direct_manager').all()
+    queryset = employee_queryset()
     serializer_class = EmployeeSerializer
     
     @action(detail=True, methods=['get'])
@@ -43,20 +44,26 @@ class EmployeeViewSet(viewsets.ModelViewSet):
     def subordinates(self, request, pk=None):
         """获取下属列表"""
         employee = self.get_object()
-        subordinates = employee.subordinates.all()
+        subordinates = employee_queryset().filter(direct_manager=employee)
         serializer = EmployeeSerializer(subordinates, many=True)
         return Response(serializer.data)
 
 
 class RoleViewSet(viewsets.ModelViewSet):
     """角色管理 ViewSet"""
-    queryset = Role.objects.prefetch_related('employees').all()
+    queryset = role_queryset()
     serializer_class = RoleSerializer
     
+    def get_queryset(self):
+        # 成员列表单独查询，不需要注解计数和预取成员主键
+        if self.action == 'members':
+            return Role.objects.all()
+        return super().get_queryset()
+    
     @action(detail=True, methods=['get'])
     def members(self, request, pk=None):
         """获取角色成员列表"""
         role = self.get_object()
-        members = role.employees.all()
+        members = employee_queryset().filter(roles=role)
         serializer = EmployeeSerializer(members, many=True)
         return Response(serializer.data)
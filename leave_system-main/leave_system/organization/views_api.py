@@ -3,17 +3,36 @@
 提供员工、部门、角色等数据的 API 接口
 """
 
-from django.http import JsonResponse
+from leave_system.renderers import JsonResponse
+from leave_system.db_router import read_replica
 from django.views.decorators.http import require_http_methods
-from .models import Employee, Department, Role
+from leave_system.pagination import KeysetPaginator, InvalidCursor
+from .directory_cache import conditional_directory
+from .models import Employee, Department, Role, DirectoryVersion
+from .read_models import (
+    EMPLOYEE_LIST_FIELDS, employee_list_row,
+    DEPARTMENT_LIST_FIELDS, department_list_row,
+    role_list_values, role_list_row,
+    role_member_values, role_member_row,
+)
+
+# 键集分页器：员工按唯一的工号排序，部门按名称排序（id 保证全序）
+employee_paginator = KeysetPaginator(('employee_id',))
+department_paginator = KeysetPaginator(('name', 'id'))
 
 
 @require_http_methods(["GET"])
+@read_replica()
+@conditional_directory(DirectoryVersion.EMPLOYEE, DirectoryVersion.DEPARTMENT)
 def list_employees(request):
     """
     获取员工列表
     
-    GET /api/organization/employees/
+    GET /api/organization/employees/?cursor=<next_cursor>&page_size=50
+    
+    按工号排序分页返回，cursor 取上一页返回的 next_cursor，page_size 默认 50，最大 200
+    
+    支持条件请求：响应带 ETag / Last-Modified，数据未变化时返回 304（见 directory_cache）
     
     返回:
     {
@@ -26,31 +45,30 @@ def list_employees(request):
                 "department": "技术部",
                 "position": "工程师"
             }
-        ]
+        ],
+        "count": 1,
+        "next_cursor": null,
+        "has_more": false,
+        "page_size": 50
     }
     """
     try:
-        employees = Employee.objects.select_related('user', 'department').all()
+        page = employee_paginator.paginate_params(
+            Employee.objects.values(*EMPLOYEE_LIST_FIELDS),
+            request.GET
+        )
         
-        employee_list = []
-        for emp in employees:
-            employee_list.append({
-                'id': emp.id,
-                'employee_id': emp.employee_id,
-                'name': emp.get_full_name(),
-                'email': emp.email,
-                'department': emp.department.name if emp.department else '',
-                'department_id': emp.department.id if emp.department else None,
-                'position': emp.position,
-                'level': emp.level,
-                'direct_manager_id': emp.direct_manager.id if emp.direct_manager else None,
-                'direct_manager_name': emp.direct_manager.get_full_name() if emp.direct_manager else None
-            })
+        employee_list = [employee_list_row(row) for row in page.items]
         
         return JsonResponse({
             'employees': employee_list,
-            'count': len(employee_list)
+            'count': len(employee_list),
+            **page.to_dict()
         })
+    except InvalidCursor as e:
+        return JsonResponse({
+            'error': str(e)
+        }, status=400)
     except Exception as e:
         return JsonResponse({
             'error': str(e)
@@ -58,11 +76,17 @@ def list_employees(request):
 
 
 @require_http_methods(["GET"])
+@read_replica()
+@conditional_directory(DirectoryVersion.DEPARTMENT, DirectoryVersion.EMPLOYEE)
 def list_departments(request):
     """
     获取部门列表
     
-    GET /api/organization/departments/
+    GET /api/organization/departments/?cursor=<next_cursor>&page_size=50
+    
+    按部门名称排序分页返回，cursor 取上一页返回的 next_cursor，page_size 默认 50，最大 200
+    
+    支持条件请求：响应带 ETag / Last-Modified，数据未变化时返回 304（见 directory_cache）
     
     返回:
     {
@@ -74,28 +98,30 @@ def list_departments(request):
                 "manager_id": 1,
                 "manager_name": "张三"
             }
-        ]
+        ],
+        "count": 1,
+        "next_cursor": null,
+        "has_more": false,
+        "page_size": 50
     }
     """
     try:
-        departments = Department.objects.select_related('parent', 'manager').all()
+        page = department_paginator.paginate_params(
+            Department.objects.values(*DEPARTMENT_LIST_FIELDS),
+            request.GET
+        )
         
-        dept_list = []
-        for dept in departments:
-            dept_list.append({
-                'id': dept.id,
-                'name': dept.name,
-                'full_path': dept.get_full_path(),
-                'parent_id': dept.parent.id if dept.parent else None,
-                'parent_name': dept.parent.name if dept.parent else None,
-                'manager_id': dept.manager.id if dept.manager else None,
-                'manager_name': dept.manager.get_full_name() if dept.manager else None
-            })
+        dept_list = [department_list_row(row) for row in page.items]
         
         return JsonResponse({
             'departments': dept_list,
-            'count': len(dept_list)
+            'count': len(dept_list),
+            **page.to_dict()
         })
+    except InvalidCursor as e:
+        return JsonResponse({
+            'error': str(e)
+        }, status=400)
     except Exception as e:
         return JsonResponse({
             'error': str(e)
@@ -103,6 +129,8 @@ def list_departments(request):
 
 
 @require_http_methods(["GET"])
+@read_replica()
+@conditional_directory(DirectoryVersion.ROLE, DirectoryVersion.EMPLOYEE)
 def list_roles(request):
     """
     获取角色列表
@@ -122,16 +150,7 @@ def list_roles(request):
     }
     """
     try:
-        roles = Role.objects.prefetch_related('employees').all()
-        
-        role_list = []
-        for role in roles:
-            role_list.append({
-                'id': role.id,
-                'name': role.name,
-                'description': role.description,
-                'member_count': role.employees.count()
-            })
+        role_list = [role_list_row(row) for row in role_list_values()]
         
         return JsonResponse({
             'roles': role_list,
@@ -144,6 +163,8 @@ def list_roles(request):
 
 
 @require_http_methods(["GET"])
+@read_replica()
+@conditional_directory(DirectoryVersion.ROLE, DirectoryVersion.EMPLOYEE, DirectoryVersion.DEPARTMENT)
 def get_role_members(request, role_id):
     """
     获取角色成员列表
@@ -163,18 +184,8 @@ def get_role_members(request, role_id):
     }
     """
     try:
-        role = Role.objects.prefetch_related('employees__user').get(id=role_id)
-        
-        member_list = []
-        for emp in role.employees.all():
-            member_list.append({
-                'id': emp.id,
-                'employee_id': emp.employee_id,
-                'name': emp.get_full_name(),
-                'email': emp.email,
-                'department': emp.department.name if emp.department else '',
-                'position': emp.position
-            })
+        role = Role.objects.only('name').get(id=role_id)
+        member_list = [role_member_row(row) for row in role_member_values(role.id)]
         
         return JsonResponse({
             'role_name': role.name,